@@ -1,14 +1,32 @@
 """Google Cloud Function 入口：處理大型 PDF 解析請求。"""
 
+import asyncio
 import logging
+import os
+import re
 import time
+import unicodedata
 
 import functions_framework
+import functions_framework.aio
+import google.auth.transport.requests
 from flask import Request, jsonify
+from google.api_core.exceptions import InvalidArgument
+from pydantic import ValidationError
+from starlette.requests import Request as AsyncRequest
+from starlette.responses import JSONResponse, Response
 
-from src.clients.gcs_client import GCSClient
-from src.clients.gemini_client import GeminiFileClient
+from src.clients.async_gcs_client import AsyncGCSClient
+from src.clients.async_gemini_client import AsyncGeminiFileClient
+from src.clients.client_pool import ClientPool, get_client_pool
+from src.models.schema import ParseOptions
+from src.services.async_processor import AsyncPDFProcessor
+from src.services.batch_ingest import BatchIngestService
+from src.services.image_publisher import URL_STYLE_GS, ImagePublisher
+from src.services.pdf_slimmer import PdfSlimmer
+from src.services.preparse import FinalizedObject, PreparseGate, event_age
 from src.services.processor import PDFProcessor
+from src.services.result_cache import ParseResultCache
 
 logger = logging.getLogger(__name__)
 
@@ -16,15 +34,124 @@ logger = logging.getLogger(__name__)
 PARSE_MAX_RETRIES = 2
 PARSE_RETRY_BACKOFF = 10.0  # 秒
 RETRYABLE_EXCEPTIONS = (TimeoutError, RuntimeError, ConnectionError, OSError)
+# 預解析遇到這些錯誤時重送也不會成功（PDF 或選項本身有問題），記錄後結束，不交給 Eventarc --retry 反覆重送
+# TimeoutError：解析已用掉整個 540s 仍未完成，重送同一份 PDF 也會再逾時
+PREPARSE_NON_RETRYABLE_EXCEPTIONS = (ValueError, InvalidArgument, ValidationError, TimeoutError)
+
+# 解析結果快取存放的 bucket；未設定時與 PDF 同一個 bucket
+RESULT_CACHE_BUCKET = os.environ.get("RESULT_CACHE_BUCKET")
+# image_output=url 時圖片上傳的 bucket；未設定時與 PDF 同一個 bucket
+IMAGE_BUCKET = os.environ.get("IMAGE_BUCKET")
+# 圖片 URL 形式：預設 gs://；IMAGE_BUCKET 設為公開讀取（IMAGE_BUCKET_PUBLIC=true）時才可用 https
+IMAGE_URL_STYLE = os.environ.get("IMAGE_URL_STYLE", URL_STYLE_GS).lower()
+IMAGE_BUCKET_PUBLIC = os.environ.get("IMAGE_BUCKET_PUBLIC", "").lower() in ("1", "true")
+
+# 上傳 Gemini 前的 PDF 瘦身：圖片降採樣的目標 DPI（0 表示停用）；process 共用以累計統計
+PDF_SLIM_DPI = int(os.environ.get("PDF_SLIM_DPI", "0"))
+_pdf_slimmer = PdfSlimmer(target_dpi=PDF_SLIM_DPI) if PDF_SLIM_DPI > 0 else None
+
+# 小檔快速路徑：不超過此大小（MB）的 PDF 以 inline bytes 送 Gemini，不經 File API 上傳與輪詢（0 表示停用）
+PDF_INLINE_MAX_BYTES = int(float(os.environ.get("PDF_INLINE_MAX_MB", "8")) * 1024 * 1024)
+
+# 大量離線匯入：manifest 存放的 bucket；未設定時與解析快取同一個 bucket
+BATCH_MANIFEST_BUCKET = os.environ.get("BATCH_MANIFEST_BUCKET")
+
+# 瀏覽器直傳：允許的 bucket（逗號分隔）、預設 bucket、CORS 來源（逗號分隔，預設為編輯器前端的網域）
+DEFAULT_UPLOAD_BUCKET = os.environ.get("GCS_BUCKET_NAME") or "obe-files"
+UPLOAD_ALLOWED_BUCKETS = {
+    b.strip() for b in os.environ.get("UPLOAD_ALLOWED_BUCKETS", DEFAULT_UPLOAD_BUCKET).split(",") if b.strip()
+}
+UPLOAD_ALLOWED_ORIGINS = {
+    o.strip() for o in os.environ.get("UPLOAD_ALLOWED_ORIGINS", "https://poro-ai.github.io").split(",") if o.strip()
+}
+UPLOAD_PREFIX = "uploads/"
+# 瀏覽器直傳：Google ID token 的 audience（編輯器的 OAuth client ID）與選填的 Workspace 網域（hd）；
+# 未設定 audience 時不發出 session
+UPLOAD_AUTH_AUDIENCE = os.environ.get("UPLOAD_AUTH_AUDIENCE")
+UPLOAD_ALLOWED_DOMAIN = os.environ.get("UPLOAD_ALLOWED_DOMAIN")
+# 瀏覽器直傳的單檔上限（MB），簽入 x-goog-content-length-range 由 GCS 強制
+UPLOAD_MAX_BYTES = int(float(os.environ.get("UPLOAD_MAX_MB", "150")) * 1024 * 1024)
+UPLOAD_MAX_NAME_LENGTH = 200
+
+# 上傳即預先解析：監看的前綴與每 instance 同時預解析數
+PREPARSE_PREFIX = os.environ.get("PREPARSE_PREFIX", UPLOAD_PREFIX)
+PREPARSE_MAX_CONCURRENCY = int(os.environ.get("PREPARSE_MAX_CONCURRENCY", "1"))
+_preparse_gate = PreparseGate(prefix=PREPARSE_PREFIX, max_concurrency=PREPARSE_MAX_CONCURRENCY)
+# 預解析只處理此時間（秒）內發出的事件；--retry 最多重送 24 小時，過舊的事件記錄後結束，交給 parse_pdf
+PREPARSE_MAX_EVENT_AGE_S = float(os.environ.get("PREPARSE_MAX_EVENT_AGE_S", "3600"))
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """判斷 If-None-Match 是否包含目前的 ETag（支援多值、W/ 前綴與 *）。"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+def _build_image_publisher(pool: ClientPool, bucket: str) -> ImagePublisher:
+    """圖片上傳至 IMAGE_BUCKET（未設定時與 PDF 同一個 bucket）；只有明確公開的 IMAGE_BUCKET 能回傳 https URL。"""
+    return ImagePublisher(
+        pool.get_gcs(IMAGE_BUCKET or bucket),
+        url_style=IMAGE_URL_STYLE,
+        public_bucket=IMAGE_BUCKET_PUBLIC and bool(IMAGE_BUCKET),
+    )
+
+
+def _build_processor(pool: ClientPool, bucket: str) -> PDFProcessor:
+    """
+    建立 PDFProcessor；暖 instance 重用 storage.Client 與 Gemini model，省去連線與授權往返。
+    parse_pdf 與 on_pdf_finalized 共用，確保兩者的快取 key 一致。
+    """
+    return PDFProcessor(
+        gcs_client=pool.get_gcs(bucket),
+        gemini_client=pool.get_gemini(),
+        sliced_download=True,
+        spool_to_disk=True,
+        gcs_factory=pool.get_gcs,
+        result_cache=ParseResultCache(pool.get_gcs(RESULT_CACHE_BUCKET or bucket)),
+        image_publisher=_build_image_publisher(pool, bucket),
+        pdf_slimmer=_pdf_slimmer,
+        inline_max_bytes=PDF_INLINE_MAX_BYTES,
+    )
+
+
+def _build_async_processor(pool: ClientPool, bucket: str) -> AsyncPDFProcessor:
+    """建立 AsyncPDFProcessor；底層 Client 與 _build_processor 共用同一個 ClientPool，快取 key 一致。"""
+    return AsyncPDFProcessor(
+        gcs_client=AsyncGCSClient(pool.get_gcs(bucket)),
+        gemini_client=AsyncGeminiFileClient(pool.get_gemini()),
+        sliced_download=True,
+        spool_to_disk=True,
+        gcs_factory=lambda name: AsyncGCSClient(pool.get_gcs(name)),
+        result_cache=ParseResultCache(pool.get_gcs(RESULT_CACHE_BUCKET or bucket)),
+        image_publisher=_build_image_publisher(pool, bucket),
+        pdf_slimmer=_pdf_slimmer,
+        inline_max_bytes=PDF_INLINE_MAX_BYTES,
+    )
+
+
+def _parse_request_options(data: dict) -> ParseOptions:
+    """由請求 body 取出 ParseOptions 欄位；格式錯誤時拋 ValidationError。"""
+    return ParseOptions(**{k: data[k] for k in ParseOptions.model_fields if k in data})
 
 
 @functions_framework.http
 def parse_pdf(request: Request):
     """
     HTTP 觸發：接收 bucket 與 blob_path，經 GCS + Gemini File API 結構化解析 PDF。
-    Body 範例: { "bucket": "my-bucket", "blob_path": "path/to/file.pdf" }
-    回傳格式: { "count", "pages": [{ "page", "elements": [{ "type", "content", "description" }] }] }
+    Body 範例: { "bucket": "my-bucket", "blob_path": "path/to/file.pdf", "image_output": "url" }
+    選填欄位對應 ParseOptions（image_output: inline | url；shard_pages、shard_concurrency 分片平行解析；hybrid 文字層優先混合解析）。
+    回傳格式: { "count", "pages": [{ "page", "elements": [{ "type", "content", "description" }] }], "etag" }
     大檔案（150MB）配合 540s Timeout，內建逾時重試。
+    結果快取於 GCS；回應帶 ETag，請求帶相同 If-None-Match 時回 304，呼叫端沿用手上的結果。
     """
     if request.method != "POST":
         return jsonify({"error": "Method not allowed"}), 405
@@ -34,20 +161,45 @@ def parse_pdf(request: Request):
     blob_path = data.get("blob_path")
     if not bucket or not blob_path:
         return jsonify({"error": "Missing bucket or blob_path"}), 400
+    try:
+        options = _parse_request_options(data)
+    except ValidationError as e:
+        return jsonify({"error": f"Invalid options: {e.errors()[0]['msg']}"}), 400
 
-    gcs = GCSClient(bucket_name=bucket)
-    gemini = GeminiFileClient()
-    processor = PDFProcessor(gcs_client=gcs, gemini_client=gemini)
+    pool = get_client_pool()
+    processor = _build_processor(pool, bucket)
+    logger.info("parse_pdf: client pool %s, gemini limiter %s", pool.stats(), pool.rate_limiter.stats())
+    if _pdf_slimmer is not None:
+        logger.info("parse_pdf: pdf slimmer %s", _pdf_slimmer.stats())
+    if pool.hedger is not None:
+        logger.info("parse_pdf: gemini hedging %s", pool.hedger.stats())
+
+    # metadata 只查一次：ETag 與解析（下載固定同一 generation）共用同一份 BlobInfo
+    try:
+        info = processor.blob_info(blob_path, bucket_name=bucket)
+        etag = processor.result_cache_key(blob_path, bucket_name=bucket, options=options, info=info)
+    except FileNotFoundError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    if etag and _etag_matches(request.headers.get("If-None-Match"), etag):
+        response = jsonify({"success": True, "etag": etag})
+        response.headers["ETag"] = f'"{etag}"'
+        return response, 304
 
     last_error: Exception | None = None
     for attempt in range(1, PARSE_MAX_RETRIES + 1):
         try:
-            blocks = processor.parse_from_gcs(blob_path, bucket_name=bucket)
-            return jsonify({
+            blocks = processor.parse_from_gcs(blob_path, bucket_name=bucket, options=options, info=info)
+            response = jsonify({
                 "success": True,
                 "count": len(blocks),
-                "pages": [b.model_dump() for b in blocks],
-            }), 200
+                "pages": [b.model_dump(exclude_none=True) for b in blocks],
+                "etag": etag,
+            })
+            if etag:
+                response.headers["ETag"] = f'"{etag}"'
+            return response, 200
+        except FileNotFoundError as e:
+            return jsonify({"success": False, "error": str(e)}), 404
         except RETRYABLE_EXCEPTIONS as e:
             last_error = e
             logger.warning("parse_pdf attempt %s/%s failed: %s", attempt, PARSE_MAX_RETRIES, e)
@@ -57,3 +209,279 @@ def parse_pdf(request: Request):
             return jsonify({"success": False, "error": str(e)}), 500
 
     return jsonify({"success": False, "error": str(last_error)}), 500
+
+
+@functions_framework.aio.http
+async def parse_pdf_async(request: AsyncRequest):
+    """
+    ASGI 版 parse_pdf（部署時 --entry-point=parse_pdf_async 並設定 FUNCTION_USE_ASGI=true）：
+    請求、回應與快取行為與 parse_pdf 相同，但下載、上傳、輪詢與生成皆在事件迴圈上等待，
+    同一 instance 可同時處理多個進行中的解析（搭配較高的 --concurrency）。
+    """
+    if request.method != "POST":
+        return JSONResponse({"error": "Method not allowed"}, status_code=405)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    bucket = data.get("bucket")
+    blob_path = data.get("blob_path")
+    if not bucket or not blob_path:
+        return JSONResponse({"error": "Missing bucket or blob_path"}, status_code=400)
+    try:
+        options = _parse_request_options(data)
+    except ValidationError as e:
+        return JSONResponse({"error": f"Invalid options: {e.errors()[0]['msg']}"}, status_code=400)
+
+    pool = get_client_pool()
+    processor = _build_async_processor(pool, bucket)
+
+    try:
+        info = await processor.blob_info(blob_path, bucket_name=bucket)
+        etag = await processor.result_cache_key(blob_path, bucket_name=bucket, options=options, info=info)
+    except FileNotFoundError as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=404)
+    etag_headers = {"ETag": f'"{etag}"'} if etag else None
+    if etag and _etag_matches(request.headers.get("If-None-Match"), etag):
+        # 304 不可帶 body（h11 依 Content-Length 檢查，帶 body 會讓 ASGI 伺服器中斷回應）
+        return Response(status_code=304, headers=etag_headers)
+
+    last_error: Exception | None = None
+    for attempt in range(1, PARSE_MAX_RETRIES + 1):
+        try:
+            blocks = await processor.parse_from_gcs(blob_path, bucket_name=bucket, options=options, info=info)
+            return JSONResponse(
+                {
+                    "success": True,
+                    "count": len(blocks),
+                    "pages": [b.model_dump(exclude_none=True) for b in blocks],
+                    "etag": etag,
+                },
+                headers=etag_headers,
+            )
+        except FileNotFoundError as e:
+            return JSONResponse({"success": False, "error": str(e)}, status_code=404)
+        except RETRYABLE_EXCEPTIONS as e:
+            last_error = e
+            logger.warning("parse_pdf_async attempt %s/%s failed: %s", attempt, PARSE_MAX_RETRIES, e)
+            if attempt < PARSE_MAX_RETRIES:
+                await asyncio.sleep(PARSE_RETRY_BACKOFF * (2 ** (attempt - 1)))
+        except Exception as e:
+            return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+    return JSONResponse({"success": False, "error": str(last_error)}, status_code=500)
+
+
+def _build_batch_ingest(pool: ClientPool, bucket: str) -> BatchIngestService:
+    """建立 BatchIngestService；快取 bucket 與 _build_processor 相同，批次結果可被 parse_pdf 命中。"""
+    cache_bucket = RESULT_CACHE_BUCKET or bucket
+    return BatchIngestService(
+        gcs_factory=pool.get_gcs,
+        gemini_client=pool.get_gemini(),
+        result_cache=ParseResultCache(pool.get_gcs(cache_bucket)),
+        manifest_gcs=pool.get_gcs(BATCH_MANIFEST_BUCKET or cache_bucket),
+        image_publisher=_build_image_publisher(pool, bucket),
+    )
+
+
+@functions_framework.http
+def batch_ingest(request: Request):
+    """
+    HTTP 觸發：供應商大量匯入，以 Gemini Batch API 離線解析，結果寫入解析快取。
+    送出 Body: { "bucket": "my-bucket", "blob_paths": ["a.pdf", "b.pdf"], ...ParseOptions 欄位 }
+      → { "job_id", "batch", "status", "submitted": [...], "cached": [...], "failed": {...} }
+      只在時間預算內上傳，不等待檔案就緒；batch 可能尚未送出（batch 為 null、status 為 uploading）。
+    推進／收尾 Body: { "bucket": "my-bucket", "job_id": "..." }（由 Cloud Scheduler 定期呼叫）
+      → 上傳中 { "state": "UPLOADING", "done": false, "uploaded", "ready", "total", "failed" }；
+        batch 未完成 { "state", "done": false }；完成 { "state", "done": true, "stored": [...], "failed": {...} }
+    """
+    if request.method != "POST":
+        return jsonify({"error": "Method not allowed"}), 405
+
+    data = request.get_json(silent=True) or {}
+    bucket = data.get("bucket")
+    job_id = data.get("job_id")
+    blob_paths = data.get("blob_paths")
+    if not bucket or not (job_id or blob_paths):
+        return jsonify({"error": "Missing bucket and job_id or blob_paths"}), 400
+    if blob_paths is not None and not (isinstance(blob_paths, list) and all(isinstance(p, str) for p in blob_paths)):
+        return jsonify({"error": "blob_paths must be a list of strings"}), 400
+
+    service = _build_batch_ingest(get_client_pool(), bucket)
+    try:
+        if job_id:
+            return jsonify({"success": True, **service.collect(job_id)}), 200
+        options = _parse_request_options(data)
+        return jsonify({"success": True, **service.submit(bucket, blob_paths, options=options)}), 200
+    except ValidationError as e:
+        return jsonify({"error": f"Invalid options: {e.errors()[0]['msg']}"}), 400
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except Exception as e:
+        logger.exception("batch_ingest failed")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+def _cors_headers(origin: str | None) -> dict[str, str]:
+    """只對白名單內的 Origin 回 Access-Control-Allow-Origin；其他來源的瀏覽器拿不到回應。"""
+    headers = {
+        "Access-Control-Allow-Methods": "POST, OPTIONS",
+        "Access-Control-Allow-Headers": "Authorization, Content-Type",
+        "Access-Control-Max-Age": "3600",
+        "Vary": "Origin",
+    }
+    if origin and origin in UPLOAD_ALLOWED_ORIGINS:
+        headers["Access-Control-Allow-Origin"] = origin
+    return headers
+
+
+def _verify_upload_caller(request: Request) -> tuple[str | None, int]:
+    """
+    驗證 Authorization: Bearer <Google ID token>（audience 為 UPLOAD_AUTH_AUDIENCE）。
+    通過時回傳 (None, 200)，否則回傳 (錯誤訊息, HTTP 狀態碼)。
+    """
+    if not UPLOAD_AUTH_AUDIENCE:
+        return "Upload auth not configured", 503
+    scheme, _, token = (request.headers.get("Authorization") or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return "Missing bearer token", 401
+    from google.oauth2 import id_token
+
+    try:
+        claims = id_token.verify_oauth2_token(
+            token, google.auth.transport.requests.Request(), audience=UPLOAD_AUTH_AUDIENCE
+        )
+    except ValueError as e:
+        logger.warning("create_upload_session: invalid ID token: %s", e)
+        return "Invalid ID token", 401
+    if not claims.get("email_verified"):
+        return "Email not verified", 403
+    if UPLOAD_ALLOWED_DOMAIN and claims.get("hd") != UPLOAD_ALLOWED_DOMAIN:
+        return "Domain not allowed", 403
+    return None, 200
+
+
+def _safe_object_name(file_name: str) -> str | None:
+    """
+    只保留檔名最後一段，並將控制字元與 GCS 萬用字元換成底線，避免寫到 uploads/ 以外；
+    正規化為 NFC 並限制長度。不是 .pdf 或只剩 . / .. 時回傳 None。
+    """
+    base = unicodedata.normalize("NFC", file_name).replace("\\", "/").split("/")[-1].strip()
+    base = re.sub(r"[\x00-\x1f\x7f#?\[\]*]", "_", base)
+    if base in ("", ".", "..") or not base.lower().endswith(".pdf"):
+        return None
+    if len(base) > UPLOAD_MAX_NAME_LENGTH:
+        base = base[: UPLOAD_MAX_NAME_LENGTH - 4] + ".pdf"
+    return base
+
+
+@functions_framework.http
+def create_upload_session(request: Request):
+    """
+    HTTP 觸發：為瀏覽器發出 GCS resumable 上傳 session，PDF 直接分塊上傳至 GCS，
+    不再經 GAS doPost 的 base64（+33%）與 Apps Script payload／時間限制。
+    需帶 Authorization: Bearer <Google ID token>；CORS 只允許 UPLOAD_ALLOWED_ORIGINS。
+    簽章 URL 限制單檔大小（UPLOAD_MAX_MB），物件一律寫在 uploads/ 之下。
+    Body 範例: { "file_name": "catalog.pdf", "bucket": "obe-files", "content_type": "application/pdf" }
+    回傳: { success, bucket, blob_path, upload_url, method, headers, requires_start, max_bytes }
+    上傳完成後以 { bucket, blob_path } 呼叫 parse_pdf。
+    """
+    origin = request.headers.get("Origin")
+    cors = _cors_headers(origin)
+    if request.method == "OPTIONS":
+        return "", 204, cors
+    if request.method != "POST":
+        return jsonify({"error": "Method not allowed"}), 405, cors
+    if origin and origin not in UPLOAD_ALLOWED_ORIGINS:
+        return jsonify({"error": "Origin not allowed"}), 403, cors
+    auth_error, auth_status = _verify_upload_caller(request)
+    if auth_error:
+        return jsonify({"error": auth_error}), auth_status, cors
+
+    data = request.get_json(silent=True) or {}
+    file_name = data.get("file_name")
+    bucket = data.get("bucket") or DEFAULT_UPLOAD_BUCKET
+    content_type = data.get("content_type") or "application/pdf"
+    if not file_name or not isinstance(file_name, str):
+        return jsonify({"error": "Missing file_name"}), 400, cors
+    if bucket not in UPLOAD_ALLOWED_BUCKETS:
+        return jsonify({"error": f"Bucket not allowed: {bucket}"}), 403, cors
+    if content_type != "application/pdf":
+        return jsonify({"error": f"Unsupported content_type: {content_type}"}), 400, cors
+    object_name = _safe_object_name(file_name)
+    if object_name is None:
+        return jsonify({"error": "file_name must be a .pdf file name"}), 400, cors
+
+    blob_path = f"{UPLOAD_PREFIX}{int(time.time() * 1000)}_{object_name}"
+    try:
+        session = get_client_pool().get_gcs(bucket).create_resumable_upload(
+            blob_path,
+            content_type=content_type,
+            origin=origin,
+            max_bytes=UPLOAD_MAX_BYTES,
+        )
+    except Exception as e:
+        logger.exception("create_upload_session failed for %s", blob_path)
+        return jsonify({"success": False, "error": str(e)}), 500, cors
+
+    return jsonify({
+        "success": True,
+        "bucket": bucket,
+        "blob_path": blob_path,
+        "upload_url": session.url,
+        "method": session.method,
+        "headers": session.headers,
+        "requires_start": session.requires_start,
+        "max_bytes": UPLOAD_MAX_BYTES,
+    }), 200, cors
+
+
+@functions_framework.cloud_event
+def on_pdf_finalized(cloud_event):
+    """
+    Eventarc 觸發（google.cloud.storage.object.v1.finalized）：PDF 上傳完成即以預設選項解析，
+    結果寫入解析快取，之後使用者呼叫 parse_pdf 時直接命中快取。
+    重複事件與超出每 instance 並行上限的事件直接略過；可重試的解析失敗時拋出，交由 Eventarc 重送；
+    不可重試的錯誤（PREPARSE_NON_RETRYABLE_EXCEPTIONS）只記錄，使用者開啟時由 parse_pdf 回報；
+    事件發出已超過 PREPARSE_MAX_EVENT_AGE_S 秒（反覆重送）時不再解析。
+    """
+    obj = FinalizedObject.from_event_data(cloud_event.data)
+    if not _preparse_gate.matches(obj):
+        return
+    age = event_age(cloud_event.get("time"))
+    if age is not None and age > PREPARSE_MAX_EVENT_AGE_S:
+        logger.warning("on_pdf_finalized: giving up on %s, event is %.0fs old", obj.key, age)
+        return
+
+    pool = get_client_pool()
+    claim_gcs = pool.get_gcs(RESULT_CACHE_BUCKET or obj.bucket)
+    if not _preparse_gate.try_acquire(obj, claim_gcs):
+        logger.info("on_pdf_finalized: skip %s (%s)", obj.key, _preparse_gate.stats())
+        return
+
+    success = False
+    start = time.monotonic()
+    try:
+        blocks = _build_processor(pool, obj.bucket).parse_from_gcs(obj.name, bucket_name=obj.bucket)
+        success = True
+        logger.info(
+            "on_pdf_finalized: pre-parsed %s (%s pages, %.1fs)",
+            obj.key,
+            len(blocks),
+            time.monotonic() - start,
+        )
+    except FileNotFoundError:
+        # 事件送達前物件已被刪除或覆寫，新版本會有自己的事件
+        success = True
+        logger.info("on_pdf_finalized: %s no longer exists", obj.key)
+    except PREPARSE_NON_RETRYABLE_EXCEPTIONS as e:
+        # 保留 claim 與去重紀錄：同一 generation 再解析也會得到相同錯誤
+        success = True
+        logger.error("on_pdf_finalized: giving up on %s (non-retryable): %s", obj.key, e)
+    finally:
+        _preparse_gate.release(obj, claim_gcs, success=success)
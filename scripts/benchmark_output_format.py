@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+比較結構化解析的兩種輸出格式（標準 json 與精簡 compact）的輸出 token 數與生成時間。
+
+使用方式：
+  # 實測：同一份 PDF 以兩種格式各呼叫 N 次（需 GEMINI_API_KEY，上傳一次後重用 File）
+  python scripts/benchmark_output_format.py --pdf samples/catalog.pdf --runs 3
+
+  # 離線：以既有的 parse_pdf 結果（PageBlock JSON）換算兩種格式的輸出大小，並比對精簡格式保留的欄位可還原
+  python scripts/benchmark_output_format.py --from-json result.json
+  python scripts/benchmark_output_format.py --from-json result.json --count-tokens   # 以 count_tokens 計算（需 API key）
+
+實測以非串流 generate_content 計時，輸出 token 取自 usage_metadata.candidates_token_count；
+兩種格式的解析結果會比對頁數與各頁元素種類是否一致。
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.clients.gemini_client import (  # noqa: E402
+    MODEL_NAME,
+    OUTPUT_FORMAT_COMPACT,
+    OUTPUT_FORMAT_JSON,
+    GeminiFileClient,
+    PageStreamAssembler,
+)
+from src.models.schema import PageBlock  # noqa: E402
+
+FORMATS = (OUTPUT_FORMAT_JSON, OUTPUT_FORMAT_COMPACT)
+
+
+def render_json(blocks: list[PageBlock]) -> str:
+    """標準格式的模型輸出（圖片 content 為空字串，與模型實際輸出相同）。"""
+    pages = []
+    for block in blocks:
+        elements = [
+            {
+                "type": el.type,
+                "content": "" if el.type == "image" else el.content,
+                "description": el.description,
+            }
+            for el in block.elements
+        ]
+        pages.append({"page": block.page, "elements": elements})
+    return json.dumps(pages, ensure_ascii=False)
+
+
+def render_compact(blocks: list[PageBlock]) -> str:
+    """精簡格式的模型輸出：[頁碼, [種類, 文字], ...]。"""
+    pages = []
+    for block in blocks:
+        items: list = [block.page]
+        for el in block.elements:
+            items.append(["i", el.description] if el.type == "image" else ["t", el.content])
+        pages.append(items)
+    return json.dumps(pages, ensure_ascii=False)
+
+
+def parse_output(text: str) -> list[PageBlock]:
+    """以與 GeminiFileClient 相同的規則解析模型輸出。"""
+    assembler = PageStreamAssembler()
+    return assembler.feed(text) + assembler.finish()
+
+
+def shape(blocks: list[PageBlock]) -> list[tuple[int, tuple[str, ...]]]:
+    """頁碼與各頁元素種類，用於比較兩種格式的結果。"""
+    return [(b.page, tuple(el.type for el in b.elements)) for b in blocks]
+
+
+def kept_fields(blocks: list[PageBlock]) -> list[tuple[int, str, str]]:
+    """精簡格式保留的欄位：頁碼、元素種類，文字元素的 content 與圖片元素的 description。"""
+    return [
+        (b.page, el.type, el.description if el.type == "image" else el.content)
+        for b in blocks
+        for el in b.elements
+    ]
+
+
+def bench_offline(path: Path, count_tokens: bool) -> None:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    # 接受 PageBlock 陣列，或 parse_pdf 的完整回應 { "success", "count", "pages": [...] }
+    pages = data["pages"] if isinstance(data, dict) else data
+    blocks = [PageBlock(**item) for item in pages]
+    counter = None
+    if count_tokens:
+        GeminiFileClient()  # 依 ConfigLoader 設定 API key
+        import google.generativeai as genai
+
+        counter = genai.GenerativeModel(MODEL_NAME).count_tokens
+
+    rendered = {OUTPUT_FORMAT_JSON: render_json(blocks), OUTPUT_FORMAT_COMPACT: render_compact(blocks)}
+    print(f"{len(blocks)} pages, {sum(len(b.elements) for b in blocks)} elements")
+    for fmt, text in rendered.items():
+        size = f"{len(text)} chars, {len(text.encode('utf-8'))} bytes"
+        if counter is not None:
+            size += f", {counter(text).total_tokens} tokens"
+        print(f"  {fmt:8s} {size}")
+    ratio = len(rendered[OUTPUT_FORMAT_COMPACT]) / max(len(rendered[OUTPUT_FORMAT_JSON]), 1)
+    print(f"  compact / json = {ratio:.2f}")
+
+    # 精簡格式不輸出文字元素的 description，只比對其保留的欄位；差異僅回報筆數，不中止
+    restored = kept_fields(parse_output(rendered[OUTPUT_FORMAT_COMPACT]))
+    expected = kept_fields(parse_output(rendered[OUTPUT_FORMAT_JSON]))
+    mismatches = sum(a != b for a, b in zip(restored, expected)) + abs(len(restored) - len(expected))
+    print(f"  compact round-trip mismatches (kept fields): {mismatches} / {len(expected)} elements")
+
+
+def bench_live(pdf: Path, runs: int) -> None:
+    results: dict[str, dict] = {}
+    file_uri = None
+    for fmt in FORMATS:
+        client = GeminiFileClient(output_format=fmt)
+        if file_uri is None:
+            file_uri = client.upload_file(pdf, mime_type="application/pdf")
+            print(f"uploaded {pdf} -> {file_uri}")
+        call = client.structured_call(file_uri)
+        seconds, tokens, blocks = [], [], []
+        for run in range(1, runs + 1):
+            start = time.monotonic()
+            response = call.model.generate_content(call.contents)
+            seconds.append(time.monotonic() - start)
+            usage = getattr(response, "usage_metadata", None)
+            tokens.append(int(getattr(usage, "candidates_token_count", 0) or 0))
+            blocks = client.parse_batch_output(response.text)
+            print(f"  {fmt:8s} run {run}: {seconds[-1]:.1f}s, {tokens[-1]} output tokens, {len(blocks)} pages")
+        results[fmt] = {
+            "median_seconds": round(statistics.median(seconds), 2),
+            "mean_output_tokens": round(statistics.mean(tokens)),
+            "shape": shape(blocks),
+        }
+
+    base, compact = results[OUTPUT_FORMAT_JSON], results[OUTPUT_FORMAT_COMPACT]
+    print()
+    for fmt in FORMATS:
+        r = results[fmt]
+        print(f"{fmt:8s} median {r['median_seconds']}s, mean {r['mean_output_tokens']} output tokens")
+    if base["mean_output_tokens"] and base["median_seconds"]:
+        print(
+            f"compact / json: tokens {compact['mean_output_tokens'] / base['mean_output_tokens']:.2f}, "
+            f"time {compact['median_seconds'] / base['median_seconds']:.2f}"
+        )
+    print(f"same pages and element types: {base['shape'] == compact['shape']}")
+
+
+def main() -> None:
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding="utf-8")
+    parser = argparse.ArgumentParser(description="比較 json 與 compact 輸出格式的 token 數與生成時間")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pdf", type=Path, help="實測用的 PDF（本機路徑）")
+    source.add_argument(
+        "--from-json", type=Path, help="既有的 parse_pdf 結果（完整回應 JSON 或 PageBlock 陣列）"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="實測時每種格式的呼叫次數")
+    parser.add_argument("--count-tokens", action="store_true", help="離線模式以 count_tokens 計算 token 數")
+    args = parser.parse_args()
+
+    if args.pdf:
+        bench_live(args.pdf, args.runs)
+    else:
+        bench_offline(args.from_json, args.count_tokens)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,5 +3,6 @@
 from src.clients.config_loader import ConfigLoader
 from src.clients.gemini_client import GeminiFileClient
 from src.clients.gcs_client import GCSClient
+from src.clients.client_pool import ClientPool, get_client_pool
 
-__all__ = ["ConfigLoader", "GeminiFileClient", "GCSClient"]
+__all__ = ["ConfigLoader", "GeminiFileClient", "GCSClient", "ClientPool", "get_client_pool"]
@@ -0,0 +1,55 @@
+"""
+GCSClient 的 asyncio 版本：google-cloud-storage 沒有原生 async API，
+各操作以 asyncio.to_thread 在執行緒中執行，等待 GCS 時不佔用事件迴圈。
+
+分段平行下載本身已在 GCSClient 內以執行緒池進行，此處只需把整個呼叫移出事件迴圈。
+"""
+
+import asyncio
+from pathlib import Path
+
+from src.clients.gcs_client import BlobInfo, GCSClient
+
+
+class AsyncGCSClient:
+    """包裝同步 GCSClient 的 async Client，介面與 GCSClient 對應。"""
+
+    def __init__(self, gcs_client: GCSClient) -> None:
+        self._gcs = gcs_client
+
+    @property
+    def bucket_name(self) -> str:
+        return self._gcs.bucket_name
+
+    @property
+    def sync_client(self) -> GCSClient:
+        """底層的同步 GCSClient（供結果快取等同步元件共用）。"""
+        return self._gcs
+
+    async def get_blob_info(self, blob_path: str) -> BlobInfo:
+        return await asyncio.to_thread(self._gcs.get_blob_info, blob_path)
+
+    async def read_blob_bytes(self, blob_path: str, info: BlobInfo | None = None) -> bytes:
+        return await asyncio.to_thread(self._gcs.read_blob_bytes, blob_path, info)
+
+    async def read_blob_bytes_sliced(self, blob_path: str, info: BlobInfo | None = None) -> bytes:
+        return await asyncio.to_thread(self._gcs.read_blob_bytes_sliced, blob_path, info)
+
+    async def read_blob_bytes_or_none(self, blob_path: str) -> bytes | None:
+        return await asyncio.to_thread(self._gcs.read_blob_bytes_or_none, blob_path)
+
+    async def download_blob_to_file(
+        self, blob_path: str, dest_path: str | Path, info: BlobInfo | None = None
+    ) -> BlobInfo:
+        return await asyncio.to_thread(self._gcs.download_blob_to_file, blob_path, dest_path, info)
+
+    async def upload_bytes(
+        self,
+        blob_path: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+    ) -> str:
+        return await asyncio.to_thread(self._gcs.upload_bytes, blob_path, data, content_type)
+
+    def get_blob_uri(self, blob_path: str) -> str:
+        return self._gcs.get_blob_uri(blob_path)
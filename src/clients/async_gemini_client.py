@@ -0,0 +1,218 @@
+"""
+GeminiFileClient 的 asyncio 版本：上傳、就緒輪詢與結構化解析皆不阻塞事件迴圈。
+
+- 上傳：雜湊與 resumable 分塊上傳（requests）以 asyncio.to_thread 執行，沿用同步 Client 的內容快取與續傳 session。
+- 輪詢：FileReadyPoller.wait_many_async，以 asyncio.sleep 等待，多個請求的輪詢可在同一迴圈上交錯。
+- 解析：GenerativeModel.generate_content_async(stream=True)，每頁物件一完整即交出（與同步版共用 PageStreamAssembler）。
+- Vertex 後端：同步 Client 帶 vertex 時也接受 gs:// URI（Vertex 的 GenerativeModel 同樣提供 generate_content_async）。
+- 對沖：同步 Client 帶 hedger 時，落後的請求以 Task 送出對沖，落敗的 Task 直接取消。
+"""
+
+import asyncio
+import io
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO
+
+from src.clients.file_poller import FileProcessingFailed
+from src.clients.gemini_client import (
+    FILE_URI_PREFIX,
+    GeminiFileClient,
+    PageStreamAssembler,
+    PendingFile,
+    StructuredCall,
+    is_truncated,
+    mark_partial,
+)
+from src.clients.vertex_backend import VertexGeminiBackend
+from src.models.schema import PageBlock
+
+
+class AsyncGeminiFileClient:
+    """包裝 GeminiFileClient 的 async Client；內容快取、上傳 session、輪詢統計與模型實例皆與同步 Client 共用。"""
+
+    def __init__(self, gemini_client: GeminiFileClient) -> None:
+        self._gemini = gemini_client
+
+    @property
+    def sync_client(self) -> GeminiFileClient:
+        return self._gemini
+
+    @property
+    def model_name(self) -> str:
+        return self._gemini.model_name
+
+    @property
+    def prompt_version(self) -> str:
+        return self._gemini.prompt_version
+
+    async def upload_file(
+        self,
+        path: str | Path,
+        mime_type: str = "application/pdf",
+        file_ready_timeout: float = 600.0,
+        poll_interval: float | None = None,
+    ) -> str:
+        """上傳本機檔案並等待 ACTIVE，回傳 file URI。"""
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"File not found: {path}")
+        with path.open("rb") as f:
+            return await self.upload_stream(
+                f,
+                display_name=path.name,
+                mime_type=mime_type,
+                file_ready_timeout=file_ready_timeout,
+                poll_interval=poll_interval,
+            )
+
+    async def upload_bytes(
+        self,
+        data: bytes,
+        display_name: str,
+        mime_type: str = "application/pdf",
+        file_ready_timeout: float = 600.0,
+        poll_interval: float | None = None,
+    ) -> str:
+        """上傳 bytes 並等待 ACTIVE，回傳 file URI。"""
+        return await self.upload_stream(
+            io.BytesIO(data),
+            display_name=display_name,
+            mime_type=mime_type,
+            file_ready_timeout=file_ready_timeout,
+            poll_interval=poll_interval,
+        )
+
+    async def upload_stream(
+        self,
+        stream: BinaryIO,
+        display_name: str | None = None,
+        mime_type: str = "application/pdf",
+        file_ready_timeout: float = 600.0,
+        poll_interval: float | None = None,
+    ) -> str:
+        """由可 seek 的檔案物件上傳（執行緒中），再於事件迴圈上輪詢直到 ACTIVE。"""
+        pending = await self.begin_upload(stream, display_name=display_name, mime_type=mime_type)
+        return await self.finish_upload(pending, file_ready_timeout=file_ready_timeout, poll_interval=poll_interval)
+
+    async def begin_upload(
+        self,
+        stream: BinaryIO,
+        display_name: str | None = None,
+        mime_type: str = "application/pdf",
+    ) -> PendingFile:
+        """在執行緒中上傳（或沿用既有檔案）但不等待處理完成；之後以 finish_upload 或 wait_for_files 等待。"""
+        return await asyncio.to_thread(
+            self._gemini.begin_upload, stream, display_name=display_name, mime_type=mime_type
+        )
+
+    async def finish_upload(
+        self,
+        pending: PendingFile,
+        file_ready_timeout: float = 600.0,
+        poll_interval: float | None = None,
+    ) -> str:
+        """等待 PendingFile 變為 ACTIVE；處理失敗時移除內容快取後拋出。"""
+        return (await self.wait_for_files([pending], timeout=file_ready_timeout, poll_interval=poll_interval))[0]
+
+    async def wait_for_files(
+        self,
+        pending: list[PendingFile],
+        timeout: float = 600.0,
+        poll_interval: float | None = None,
+    ) -> list[str]:
+        """一次等待多個 PendingFile 全部 ACTIVE（事件迴圈上輪詢），依序回傳 file URI；規則同同步版。"""
+        waiting = {p.name: p.size for p in pending if not p.active}
+        if waiting:
+            try:
+                await self._gemini.file_poller.wait_many_async(waiting, timeout=timeout, fixed_interval=poll_interval)
+            except FileProcessingFailed as e:
+                for item in pending:
+                    if item.name == e.file_name:
+                        self._gemini.forget_upload(item)
+                raise
+        return [f"{FILE_URI_PREFIX}{p.name}" for p in pending]
+
+    async def parse_pdf_structured(self, file_uri: str, size_bytes: int = 0) -> list[PageBlock]:
+        """結構化解析，回傳每頁的 elements。"""
+        return [block async for block in self.aiter_pdf_structured(file_uri, size_bytes=size_bytes)]
+
+    @property
+    def vertex(self) -> VertexGeminiBackend | None:
+        return self._gemini.vertex
+
+    def reads_gcs_uri(self, size_bytes: int) -> bool:
+        """解析方法可否直接接受 gs:// URI（見 GeminiFileClient.reads_gcs_uri）。"""
+        return self._gemini.reads_gcs_uri(size_bytes)
+
+    async def aiter_pdf_structured(self, file_uri: str, size_bytes: int = 0) -> AsyncIterator[PageBlock]:
+        """
+        串流版結構化解析：generate_content_async(stream=True)，每頁物件一完整即 yield；
+        尾端截斷或格式錯誤時保留已完成的頁面。get_file 沒有 async 版本，於執行緒中呼叫。
+        response_schema 模式下不串流；驗證、重試與 token 上限截斷後的接續規則與同步 Client 相同。
+        """
+        # get_file 與 CachedContent 的建立為同步網路呼叫，於執行緒中取得
+        call = await asyncio.to_thread(self._gemini.structured_call, file_uri, size_bytes)
+        async for block in self._aiter_structured(call):
+            yield block
+
+    async def parse_pdf_bytes(self, data: bytes, mime_type: str = "application/pdf") -> list[PageBlock]:
+        """小型 PDF 以 inline bytes 解析，不經 File API（見 GeminiFileClient.parse_pdf_bytes）。"""
+        call = self._gemini.inline_structured_call(data, mime_type)
+        return [block async for block in self._aiter_structured(call)]
+
+    async def _aiter_structured(self, call: StructuredCall) -> AsyncIterator[PageBlock]:
+        """依 StructuredCall 逐輪生成（截斷時接續），每頁完整即交出；最後一輪不完整時已交出的頁面標記 partial。"""
+        after_page = 0
+        round_index = 0
+        emitted: list[PageBlock] = []
+        while after_page is not None:
+            assembler = PageStreamAssembler(after_page=after_page)
+            request = self._gemini.continuation_contents(call.contents, after_page)
+            async for block in self._structured_pass(call, request, assembler):
+                emitted.append(block)
+                yield block
+            after_page = self._gemini.next_continuation(assembler, round_index)
+            round_index += 1
+        if not assembler.complete:
+            mark_partial(emitted)
+
+    async def _structured_pass(
+        self, call: StructuredCall, contents: list, assembler: PageStreamAssembler
+    ) -> AsyncIterator[PageBlock]:
+        """一次結構化生成（schema 模式或串流），頁面經 assembler 交出，截斷狀態留在 assembler。"""
+        model, tokens, config = call.model, call.tokens, call.generation_config
+        if config is not None:
+            for attempt in range(1, self._gemini.schema_attempts + 1):
+                response = await self._generate(model, contents, tokens=tokens, generation_config=config)
+                if is_truncated(response):
+                    for block in assembler.feed_chunk(response) + assembler.finish():
+                        yield block
+                    return
+                blocks = self._gemini.validate_schema_output(response, attempt)
+                if blocks is not None:
+                    for block in assembler.accept(blocks, validated=True):
+                        yield block
+                    return
+        async for chunk in self._generate_stream(model, contents, tokens=tokens):
+            for block in assembler.feed_chunk(chunk):
+                yield block
+        for block in assembler.finish():
+            yield block
+
+    async def _generate(self, model, contents: list, tokens: int, **kwargs):
+        """經限流的 generate_content_async；有 hedger 時逾時未回應即送出對沖請求。"""
+        limiter = self._gemini.rate_limiter
+        hedger = self._gemini.hedger
+        if hedger is None:
+            return await limiter.call_async(model.generate_content_async, contents, tokens=tokens, **kwargs)
+        return await hedger.call_async(
+            limiter.call_async, model.generate_content_async, contents, tokens=tokens, **kwargs
+        )
+
+    def _generate_stream(self, model, contents: list, tokens: int) -> AsyncIterator:
+        """經限流的串流 generate_content_async；有 hedger 時以第一個片段的等待時間決定是否對沖。"""
+        limiter = self._gemini.rate_limiter
+        hedger = self._gemini.hedger
+        if hedger is None:
+            return limiter.astream(model.generate_content_async, contents, tokens=tokens, stream=True)
+        return hedger.astream(limiter.astream, model.generate_content_async, contents, tokens=tokens, stream=True)
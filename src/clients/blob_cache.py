@@ -0,0 +1,159 @@
+"""
+GCS 物件本機磁碟快取：以 (bucket, blob_path, generation) 為 key，存放於 /tmp，容量上限 + LRU 淘汰。
+
+- 新鮮度：呼叫端先以一次 metadata 請求取得 generation，generation 相同即內容相同，命中時不再下載。
+- 寫入：先寫暫存檔再 os.replace，避免併發請求讀到寫一半的檔案。
+- 取出：優先以 hard link 連到目的路徑（同一檔案系統零複製），失敗才複製。
+- 統計：hit/miss、命中率與省下的位元組數寫入 log，供評估快取效益。
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / "obe_blob_cache"
+# GCF 的 /tmp 佔用記憶體配額，預設上限需小於 function 記憶體（1Gi）
+DEFAULT_MAX_BYTES = 400 * 1024 * 1024
+_ENTRY_SUFFIX = ".blob"
+
+
+class BlobDiskCache:
+    """執行緒安全的 GCS 物件磁碟快取，超過 max_bytes 時淘汰最久未使用的項目。"""
+
+    def __init__(self, cache_dir: str | Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self._dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._bytes_saved = 0
+        self._load_existing()
+
+    @staticmethod
+    def make_key(bucket_name: str, blob_path: str, generation: int) -> str:
+        """以 bucket、路徑與 generation 組成快取 key（sha256，可安全當檔名）。"""
+        raw = f"{bucket_name}/{blob_path}#{generation}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, bucket_name: str, blob_path: str, generation: int) -> Path | None:
+        """命中時回傳快取檔路徑並更新 LRU 順序；未命中回傳 None。"""
+        key = self.make_key(bucket_name, blob_path, generation)
+        path = self._entry_path(key)
+        with self._lock:
+            size = self._entries.get(key)
+            if size is None or not path.exists():
+                if size is not None:
+                    self._drop(key)
+                self._misses += 1
+                self._log_stats("miss", blob_path)
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            self._bytes_saved += size
+            self._log_stats("hit", blob_path)
+            return path
+
+    def put_file(self, bucket_name: str, blob_path: str, generation: int, src_path: str | Path) -> Path | None:
+        """將已下載的檔案放入快取；單檔超過上限則不快取並回傳 None。"""
+        src = Path(src_path)
+        size = src.stat().st_size
+        if size > self._max_bytes:
+            return None
+        key = self.make_key(bucket_name, blob_path, generation)
+        dest = self._entry_path(key)
+        tmp = dest.with_suffix(f".{threading.get_ident()}.tmp")
+        _link_or_copy(src, tmp)
+        os.replace(tmp, dest)
+        self._register(key, size)
+        return dest
+
+    def put_bytes(self, bucket_name: str, blob_path: str, generation: int, data: bytes) -> Path | None:
+        """將 bytes 內容放入快取；單檔超過上限則不快取並回傳 None。"""
+        if len(data) > self._max_bytes:
+            return None
+        key = self.make_key(bucket_name, blob_path, generation)
+        dest = self._entry_path(key)
+        tmp = dest.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, dest)
+        self._register(key, len(data))
+        return dest
+
+    def stats(self) -> dict[str, float]:
+        """回傳 hits、misses、hit_rate、bytes_saved、entries、total_bytes。"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+                "bytes_saved": self._bytes_saved,
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+            }
+
+    def _entry_path(self, key: str) -> Path:
+        return self._dir / f"{key}{_ENTRY_SUFFIX}"
+
+    def _register(self, key: str, size: int) -> None:
+        """登記新項目並依 LRU 淘汰至容量上限以下。"""
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            while self._total_bytes > self._max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                logger.info("BlobDiskCache: evict %s (%s bytes)", oldest[:12], self._entries[oldest])
+                self._drop(oldest)
+
+    def _drop(self, key: str) -> None:
+        """移除項目（呼叫端需持有 lock）。已被 hard link 取用的檔案不受影響。"""
+        self._total_bytes -= self._entries.pop(key, 0)
+        self._entry_path(key).unlink(missing_ok=True)
+
+    def _load_existing(self) -> None:
+        """instance 重用 /tmp 時，依修改時間重建索引（舊的先淘汰）。"""
+        files = sorted(self._dir.glob(f"*{_ENTRY_SUFFIX}"), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self._total_bytes += size
+        with self._lock:
+            while self._total_bytes > self._max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+
+    def _log_stats(self, outcome: str, blob_path: str) -> None:
+        lookups = self._hits + self._misses
+        logger.info(
+            "BlobDiskCache %s: %s (hit rate %.0f%% of %s, bytes saved %s)",
+            outcome,
+            blob_path,
+            100.0 * self._hits / lookups if lookups else 0.0,
+            lookups,
+            self._bytes_saved,
+        )
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """同一檔案系統以 hard link 零複製，否則退回複製。"""
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def copy_cached_file(cached: Path, dest_path: str | Path) -> None:
+    """將快取檔提供給呼叫端的目的路徑（hard link 優先）。"""
+    _link_or_copy(cached, Path(dest_path))
@@ -0,0 +1,227 @@
+"""
+Process 層級的 Client 池：在同一個 GCF instance 的多次請求間重用 GCS 與 Gemini Client。
+
+- GCS：所有 bucket 共用同一個 storage.Client（同一組 HTTP session 與 auth token），
+  每個 bucket 的 GCSClient 只建立一次。
+- Gemini：ConfigLoader / Secret Manager 查詢、genai.configure 與 GenerativeModel 只做一次。
+- 本機快取：所有 GCSClient 共用同一個 BlobDiskCache（BLOB_CACHE_MAX_MB，預設 0 停用）。
+  GCF gen2 的 /tmp 是記憶體檔案系統，快取會佔用 instance 記憶體，啟用前需一併調高記憶體上限。
+- File API 上傳快取：GeminiFileClient 帶 GeminiFileCache，設定 GEMINI_FILE_CACHE_BUCKET 時持久化於 GCS。
+- Gemini 限流：所有請求共用一個 GeminiRateLimiter（GEMINI_RPM、GEMINI_TPM、GEMINI_MAX_CONCURRENCY）。
+- Context caching：設定 GEMINI_CONTEXT_CACHE_TTL 秒（預設 0 停用）時，同一 File 的多次分析共用 CachedContent；
+  建立快取本身有成本且依存放時間計費，只解析一次的 PDF 不划算，故預設不啟用。
+- 請求對沖：設定 GEMINI_HEDGE_PERCENTILE（如 0.95）時，generate_content 超過近期延遲該 percentile 仍未回應即送出對沖請求，
+  對沖比例上限為 GEMINI_HEDGE_MAX_RATIO（預設 0.05）；未設定時停用。
+- 模型後端：GEMINI_BACKEND=vertex 時另建 Vertex AI 後端（VERTEX_PROJECT、VERTEX_LOCATION），
+  bucket 中的 PDF 以 gs:// URI 直接解析；預設 file_api 只走 File API 上傳。
+- 輸出格式：GEMINI_OUTPUT_FORMAT=compact 時結構化解析改用精簡陣列輸出（較少輸出 token），預設 json。
+- GEMINI_RESPONSE_SCHEMA=1 時結構化解析改用 response_schema 模式（見 GeminiFileClient）。
+- 執行緒安全：以 Lock 保護建立流程；hit/miss 計數供觀察暖啟動效果。
+"""
+
+import functools
+import logging
+import os
+import threading
+
+from google.cloud import storage
+
+from src.clients.blob_cache import BlobDiskCache
+from src.clients.context_cache import GeminiContextCache
+from src.clients.gcs_client import GCSClient
+from src.clients.gemini_client import MODEL_NAME, OUTPUT_FORMAT_JSON, GeminiFileClient
+from src.clients.gemini_file_cache import GeminiFileCache
+from src.clients.hedging import DEFAULT_MAX_HEDGE_RATIO, HedgedCaller
+from src.clients.rate_limiter import GeminiRateLimiter
+from src.clients.vertex_backend import DEFAULT_LOCATION, VertexGeminiBackend
+
+logger = logging.getLogger(__name__)
+
+
+class ClientPool:
+    """執行緒安全的 Client 註冊表，首次取用時建立，之後直接回傳同一實例。"""
+
+    def __init__(
+        self,
+        project: str | None = None,
+        blob_cache: BlobDiskCache | None = None,
+        gemini_file_cache_bucket: str | None = None,
+        gemini_response_schema: bool = False,
+        rate_limiter: GeminiRateLimiter | None = None,
+        context_cache_ttl: float = 0.0,
+        hedger: HedgedCaller | None = None,
+        vertex: VertexGeminiBackend | None = None,
+        output_format: str = OUTPUT_FORMAT_JSON,
+    ) -> None:
+        self._project = project
+        self._blob_cache = blob_cache
+        self._gemini_file_cache_bucket = gemini_file_cache_bucket
+        self._gemini_response_schema = gemini_response_schema
+        self._rate_limiter = rate_limiter or GeminiRateLimiter()
+        self._context_cache_ttl = context_cache_ttl
+        self._hedger = hedger
+        self._vertex = vertex
+        self._output_format = output_format
+        self._lock = threading.Lock()
+        self._storage_client: storage.Client | None = None
+        self._gcs_clients: dict[str, GCSClient] = {}
+        self._gemini: GeminiFileClient | None = None
+        self._hits = 0
+        self._misses = 0
+
+    def get_gcs(self, bucket_name: str) -> GCSClient:
+        """取得指定 bucket 的 GCSClient；所有 bucket 共用同一個 storage.Client。"""
+        with self._lock:
+            return self._get_gcs_locked(bucket_name)
+
+    def _get_gcs_locked(self, bucket_name: str) -> GCSClient:
+        """get_gcs 的本體（呼叫端需持有 lock）。"""
+        gcs = self._gcs_clients.get(bucket_name)
+        if gcs is not None:
+            self._hits += 1
+            return gcs
+        self._misses += 1
+        if self._storage_client is None:
+            self._storage_client = storage.Client(project=self._project)
+        gcs = GCSClient(
+            bucket_name=bucket_name,
+            client=self._storage_client,
+            blob_cache=self._blob_cache,
+        )
+        self._gcs_clients[bucket_name] = gcs
+        logger.info("ClientPool: created GCSClient for bucket %s", bucket_name)
+        return gcs
+
+    def get_gemini(self) -> GeminiFileClient:
+        """取得共用的 GeminiFileClient（金鑰查詢與 genai.configure 只做一次）。"""
+        with self._lock:
+            if self._gemini is not None:
+                self._hits += 1
+                return self._gemini
+            self._misses += 1
+            store = (
+                self._get_gcs_locked(self._gemini_file_cache_bucket)
+                if self._gemini_file_cache_bucket
+                else None
+            )
+            self._gemini = GeminiFileClient(
+                file_cache=GeminiFileCache(store=store),
+                response_schema=self._gemini_response_schema,
+                rate_limiter=self._rate_limiter,
+                context_cache=self._build_context_cache(),
+                hedger=self._hedger,
+                vertex=self._vertex,
+                output_format=self._output_format,
+            )
+            logger.info("ClientPool: created GeminiFileClient")
+            return self._gemini
+
+    def _build_context_cache(self) -> GeminiContextCache | None:
+        """context_cache_ttl > 0 時建立 GeminiContextCache；建立與延長快取只佔 rpm 配額。"""
+        if self._context_cache_ttl <= 0:
+            return None
+        return GeminiContextCache(
+            MODEL_NAME,
+            ttl_seconds=self._context_cache_ttl,
+            call=functools.partial(self._rate_limiter.call, bounded=False),
+        )
+
+    @property
+    def rate_limiter(self) -> GeminiRateLimiter:
+        """Gemini 呼叫共用的限流器（stats() 可觀察目前上限與排隊數）。"""
+        return self._rate_limiter
+
+    @property
+    def hedger(self) -> HedgedCaller | None:
+        """generate_content 共用的對沖呼叫器（未啟用時為 None）。"""
+        return self._hedger
+
+    @property
+    def blob_cache(self) -> BlobDiskCache | None:
+        """池內 GCSClient 共用的本機快取（未啟用時為 None）。"""
+        return self._blob_cache
+
+    def stats(self) -> dict[str, int]:
+        """回傳 hit/miss 計數與目前池內的 bucket 數。"""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "gcs_buckets": len(self._gcs_clients),
+            }
+
+    def clear(self) -> None:
+        """清空池（測試或金鑰輪替時使用）。"""
+        with self._lock:
+            self._storage_client = None
+            self._gcs_clients.clear()
+            self._gemini = None
+            self._hits = 0
+            self._misses = 0
+
+
+_default_pool: ClientPool | None = None
+_default_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> ClientPool:
+    """取得 process 層級的預設 ClientPool（module scope，warm instance 間共用）。"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ClientPool(
+                blob_cache=_blob_cache_from_env(),
+                gemini_file_cache_bucket=os.environ.get("GEMINI_FILE_CACHE_BUCKET"),
+                gemini_response_schema=os.environ.get("GEMINI_RESPONSE_SCHEMA", "").lower() in ("1", "true"),
+                rate_limiter=_rate_limiter_from_env(),
+                context_cache_ttl=float(os.environ.get("GEMINI_CONTEXT_CACHE_TTL", "0")),
+                hedger=_hedger_from_env(),
+                vertex=_vertex_from_env(),
+                output_format=os.environ.get("GEMINI_OUTPUT_FORMAT", OUTPUT_FORMAT_JSON).lower(),
+            )
+        return _default_pool
+
+
+def _blob_cache_from_env() -> BlobDiskCache | None:
+    """依 BLOB_CACHE_MAX_MB 建立本機快取；未設定或設為 0 時停用（/tmp 在 gen2 佔用記憶體）。"""
+    max_mb = int(os.environ.get("BLOB_CACHE_MAX_MB", "0"))
+    if max_mb <= 0:
+        return None
+    return BlobDiskCache(max_bytes=max_mb * 1024 * 1024)
+
+
+def _rate_limiter_from_env() -> GeminiRateLimiter:
+    """依 GEMINI_RPM、GEMINI_TPM、GEMINI_MAX_CONCURRENCY 建立限流器（預設值見 rate_limiter）。"""
+    kwargs = {}
+    for env, key, cast in (
+        ("GEMINI_RPM", "rpm", float),
+        ("GEMINI_TPM", "tpm", float),
+        ("GEMINI_MAX_CONCURRENCY", "max_concurrency", int),
+    ):
+        if os.environ.get(env):
+            kwargs[key] = cast(os.environ[env])
+    return GeminiRateLimiter(**kwargs)
+
+
+def _hedger_from_env() -> HedgedCaller | None:
+    """依 GEMINI_HEDGE_PERCENTILE、GEMINI_HEDGE_MAX_RATIO 建立對沖呼叫器；未設定 percentile 時停用。"""
+    percentile = os.environ.get("GEMINI_HEDGE_PERCENTILE")
+    if not percentile:
+        return None
+    return HedgedCaller(
+        percentile=float(percentile),
+        max_hedge_ratio=float(os.environ.get("GEMINI_HEDGE_MAX_RATIO", str(DEFAULT_MAX_HEDGE_RATIO))),
+    )
+
+
+def _vertex_from_env() -> VertexGeminiBackend | None:
+    """GEMINI_BACKEND=vertex 時依 VERTEX_PROJECT（預設 GOOGLE_CLOUD_PROJECT）與 VERTEX_LOCATION 建立 Vertex 後端。"""
+    backend = os.environ.get("GEMINI_BACKEND", "file_api").lower()
+    if backend == "file_api":
+        return None
+    if backend != "vertex":
+        raise ValueError(f"Unknown GEMINI_BACKEND: {backend}")
+    return VertexGeminiBackend(
+        project=os.environ.get("VERTEX_PROJECT") or os.environ.get("GOOGLE_CLOUD_PROJECT"),
+        location=os.environ.get("VERTEX_LOCATION", DEFAULT_LOCATION),
+    )
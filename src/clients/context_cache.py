@@ -0,0 +1,178 @@
+"""
+Gemini context caching：同一份已上傳 PDF 的多次分析（結構化解析、PageExtract、後續商品問答）共用一個 CachedContent。
+
+- CachedContent 內含 File 與共用的 System Instruction；各次分析的指令改放在 user prompt，
+  第二次以後的呼叫只付快取 token 的費用，也省去重新處理整份 PDF 的時間。
+- 以 File 名稱為 key，本機記錄到期時間；剩餘時間不足 refresh_margin 時延長 TTL，延長失敗則重新建立。
+- 已到期的記錄與其鎖在下次查詢時移除；超過 max_entries 時淘汰最早到期者，並刪除伺服器端的 CachedContent
+  （快取依存放時間計費，不等 TTL 到期）。invalidate 同樣刪除伺服器端快取。
+- 內容太小（低於最小快取 token 數）或模型不支援時 create 回 InvalidArgument，該 File 記為不可快取；
+  其他錯誤只在這一次退回一般呼叫。呼叫端拿到 None 即改走原本「prompt + File」的方式。
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from google.generativeai import caching
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_CACHE_TTL = 600.0
+DEFAULT_REFRESH_MARGIN = 60.0
+DEFAULT_MAX_ENTRIES = 100
+
+# CachedContent 的 System Instruction：各次分析的輸出格式由 user prompt 指定
+DOCUMENT_SYSTEM_INSTRUCTION = """你是一個 PDF 型錄分析助手。使用者會針對同一份 PDF 提出不同的分析需求，
+請嚴格依照每次訊息指定的規則與輸出格式回答，只根據 PDF 內容作答。"""
+
+
+@dataclass
+class _Entry:
+    cached: Any
+    model: Any
+    expires_at: float
+
+
+class GeminiContextCache:
+    """執行緒安全的 CachedContent 註冊表；同一 File 同時只建立一次。"""
+
+    def __init__(
+        self,
+        model_name: str,
+        ttl_seconds: float = DEFAULT_CONTEXT_CACHE_TTL,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+        system_instruction: str = DOCUMENT_SYSTEM_INSTRUCTION,
+        call: Callable[..., Any] | None = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self._model_name = model_name
+        self._ttl = ttl_seconds
+        self._margin = refresh_margin
+        self._max_entries = max(1, max_entries)
+        self._system_instruction = system_instruction
+        # 經限流器呼叫（GeminiFileClient 傳入 rate_limiter.call）；預設直接呼叫
+        self._call = call or (lambda fn, *args, **kwargs: fn(*args, **kwargs))
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._entries: dict[str, _Entry] = {}
+        self._unavailable: set[str] = set()
+        self._stats = {"created": 0, "hits": 0, "refreshed": 0, "fallbacks": 0, "evicted": 0}
+
+    def model_for(self, file_obj) -> Any | None:
+        """回傳綁定此 File 之 CachedContent 的 GenerativeModel；無法快取時回傳 None（呼叫端退回一般呼叫）。"""
+        name = file_obj.name
+        with self._lock:
+            self._prune_locked(time.time())
+            if name in self._unavailable:
+                self._stats["fallbacks"] += 1
+                return None
+            key_lock = self._key_locks.setdefault(name, threading.Lock())
+
+        with key_lock:
+            entry = self._entries.get(name)
+            now = time.time()
+            if entry is not None and entry.expires_at - now > self._margin:
+                self._count("hits")
+                return entry.model
+            if entry is not None and entry.expires_at > now and self._refresh(entry, now):
+                self._count("hits")
+                return entry.model
+            model = self._create(file_obj, now)
+
+        with self._lock:
+            evicted = self._evict_over_capacity_locked()
+        self._delete_remote(evicted)
+        return model
+
+    @property
+    def system_instruction(self) -> str:
+        """CachedContent 的 System Instruction（納入 prompt_version，快取與非快取模式的結果不共用）。"""
+        return self._system_instruction
+
+    def invalidate(self, file_name: str) -> None:
+        """移除本機記錄並刪除伺服器端的 CachedContent（例如 File 處理失敗或已不再使用）。"""
+        with self._lock:
+            entry = self._entries.pop(file_name, None)
+        if entry is not None:
+            self._delete_remote([entry])
+
+    def stats(self) -> dict[str, int]:
+        """回傳 created、hits、refreshed、fallbacks、evicted、active（目前持有的快取數）、unavailable。"""
+        with self._lock:
+            return {**self._stats, "active": len(self._entries), "unavailable": len(self._unavailable)}
+
+    def _prune_locked(self, now: float) -> None:
+        """移除已到期的記錄（伺服器端已自行刪除），以及沒有記錄且未被持有的 File 鎖（呼叫端持有 _lock）。"""
+        for name in [name for name, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[name]
+        for name in [name for name, lock in self._key_locks.items() if name not in self._entries and not lock.locked()]:
+            del self._key_locks[name]
+
+    def _evict_over_capacity_locked(self) -> list[_Entry]:
+        """超過 max_entries 時依到期時間由早到晚淘汰，回傳待刪除伺服器端快取的記錄（呼叫端持有 _lock）。"""
+        overflow = len(self._entries) - self._max_entries
+        if overflow <= 0:
+            return []
+        names = sorted(self._entries, key=lambda name: self._entries[name].expires_at)[:overflow]
+        self._stats["evicted"] += len(names)
+        return [self._entries.pop(name) for name in names]
+
+    def _delete_remote(self, entries: list[_Entry]) -> None:
+        """刪除伺服器端的 CachedContent；失敗只記錄（TTL 到期後仍會自行刪除）。"""
+        for entry in entries:
+            try:
+                self._call(entry.cached.delete)
+            except Exception as e:
+                logger.info("Context cache delete failed for %s: %s", entry.cached.name, e)
+
+    def _refresh(self, entry: _Entry, now: float) -> bool:
+        try:
+            self._call(entry.cached.update, ttl=timedelta(seconds=self._ttl))
+        except Exception as e:
+            logger.info("Context cache refresh failed for %s: %s", entry.cached.name, e)
+            return False
+        entry.expires_at = now + self._ttl
+        self._count("refreshed")
+        return True
+
+    def _create(self, file_obj, now: float) -> Any | None:
+        name = file_obj.name
+        start = time.monotonic()
+        try:
+            cached = self._call(
+                caching.CachedContent.create,
+                model=self._model_name,
+                display_name=name.replace("/", "-"),
+                system_instruction=self._system_instruction,
+                contents=[file_obj],
+                ttl=timedelta(seconds=self._ttl),
+            )
+            model = genai.GenerativeModel.from_cached_content(cached)
+        except google_exceptions.InvalidArgument as e:
+            logger.info("Context cache unavailable for %s: %s", name, e)
+            with self._lock:
+                self._unavailable.add(name)
+                self._entries.pop(name, None)
+                self._stats["fallbacks"] += 1
+            return None
+        except Exception as e:
+            logger.warning("Context cache create failed for %s: %s", name, e)
+            with self._lock:
+                self._entries.pop(name, None)
+                self._stats["fallbacks"] += 1
+            return None
+        with self._lock:
+            self._entries[name] = _Entry(cached=cached, model=model, expires_at=now + self._ttl)
+            self._stats["created"] += 1
+        logger.info("Context cache created for %s (%.1fs, ttl %ss)", name, time.monotonic() - start, self._ttl)
+        return model
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
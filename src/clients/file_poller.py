@@ -0,0 +1,247 @@
+"""
+Gemini File API 就緒輪詢：依檔案大小與實測處理時間調整輪詢間隔，並支援一次等待多個檔案。
+
+- 首次輪詢：依大小區間的歷史處理時間（EWMA）推估，無歷史時以大小除以預設處理速率估計；
+  小檔很快就會確認，大檔不會在處理初期浪費大量 get_file 請求。
+- 之後指數退避（backoff 倍率 + jitter），間隔夾在 [min_interval, max_interval]。
+- wait_many：多個檔案共用同一個輪詢迴圈，每輪只查詢到期的檔案；wait_many_async 為 asyncio 版本。
+- 統計：依大小區間記錄輪詢次數與 PROCESSING 時間，供調整 timeout。
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_INTERVAL = 0.5
+DEFAULT_MAX_INTERVAL = 15.0
+DEFAULT_BACKOFF = 1.6
+DEFAULT_JITTER = 0.2
+# 無歷史資料時的處理速率估計（bytes/s），150MB 約 15 秒後首次輪詢
+DEFAULT_PROCESSING_RATE = 10 * 1024 * 1024
+# 歷史處理時間的 EWMA 權重
+_EWMA_ALPHA = 0.3
+
+_MB = 1024 * 1024
+SIZE_BUCKETS: list[tuple[str, int]] = [
+    ("<10MB", 10 * _MB),
+    ("10-50MB", 50 * _MB),
+    ("50-100MB", 100 * _MB),
+    (">=100MB", 2**63),
+]
+
+
+def size_bucket(size_bytes: int) -> str:
+    """回傳檔案大小所屬區間名稱。"""
+    for name, upper in SIZE_BUCKETS:
+        if size_bytes < upper:
+            return name
+    return SIZE_BUCKETS[-1][0]
+
+
+class FileProcessingFailed(RuntimeError):
+    """File 處理失敗（FAILED）；file_name 供一次等待多個檔案的呼叫端找出是哪一個。"""
+
+    def __init__(self, file_name: str) -> None:
+        super().__init__(f"File upload failed: {file_name}")
+        self.file_name = file_name
+
+
+@dataclass
+class _Pending:
+    """wait_many 中尚未就緒的檔案狀態。"""
+
+    name: str
+    size: int
+    started: float
+    next_poll: float
+    interval: float
+    polls: int = 0
+
+
+class FileReadyPoller:
+    """執行緒安全的自適應輪詢器；get_state(file_name) 回傳 File 狀態名稱（ACTIVE / PROCESSING / FAILED）。"""
+
+    def __init__(
+        self,
+        get_state: Callable[[str], str],
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        backoff: float = DEFAULT_BACKOFF,
+        jitter: float = DEFAULT_JITTER,
+        processing_rate: float = DEFAULT_PROCESSING_RATE,
+    ) -> None:
+        self._get_state = get_state
+        self._min = min_interval
+        self._max = max(max_interval, min_interval)
+        self._backoff = backoff
+        self._jitter = jitter
+        self._rate = processing_rate
+        self._lock = threading.Lock()
+        self._expected: dict[str, float] = {}
+        self._stats: dict[str, dict[str, float]] = {}
+
+    def wait(
+        self,
+        file_name: str,
+        size_bytes: int = 0,
+        timeout: float = 600.0,
+        fixed_interval: float | None = None,
+    ) -> None:
+        """等待單一檔案變為 ACTIVE；FAILED 拋 FileProcessingFailed（RuntimeError），逾時拋 TimeoutError。"""
+        self.wait_many({file_name: size_bytes}, timeout=timeout, fixed_interval=fixed_interval)
+
+    def wait_many(
+        self,
+        files: dict[str, int],
+        timeout: float = 600.0,
+        fixed_interval: float | None = None,
+    ) -> None:
+        """
+        以單一迴圈等待多個檔案（file_name → 大小）全部變為 ACTIVE。
+        任一檔案 FAILED 立即拋 FileProcessingFailed；超過 timeout 時拋 TimeoutError 並列出未就緒的檔案。
+        fixed_interval 有給時改為固定間隔輪詢（不自適應、不加 jitter）。
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        pending = self._new_pending(files, start)
+        # 首次輪詢立即確認（可能已是 ACTIVE，例如重用的檔案），之後才依推估時間等待
+        while True:
+            now = time.monotonic()
+            for item in [p for p in pending.values() if p.next_poll <= now]:
+                self._apply_state(item, self._get_state(item.name), pending, deadline, fixed_interval)
+            delay = self._next_delay(pending, deadline, timeout)
+            if delay is None:
+                return
+            time.sleep(delay)
+
+    async def wait_many_async(
+        self,
+        files: dict[str, int],
+        timeout: float = 600.0,
+        fixed_interval: float | None = None,
+    ) -> None:
+        """
+        wait_many 的 asyncio 版本：以 asyncio.sleep 等待，get_state 在執行緒中呼叫，
+        等待期間不佔用事件迴圈，多個解析請求可同時輪詢。
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        pending = self._new_pending(files, start)
+        while True:
+            now = time.monotonic()
+            due = [p for p in pending.values() if p.next_poll <= now]
+            states = await asyncio.gather(*(asyncio.to_thread(self._get_state, p.name) for p in due))
+            for item, state in zip(due, states):
+                self._apply_state(item, state, pending, deadline, fixed_interval)
+            delay = self._next_delay(pending, deadline, timeout)
+            if delay is None:
+                return
+            await asyncio.sleep(delay)
+
+    def _new_pending(self, files: dict[str, int], start: float) -> dict[str, _Pending]:
+        return {
+            name: _Pending(name=name, size=size, started=start, next_poll=start, interval=self._min)
+            for name, size in files.items()
+        }
+
+    def _apply_state(
+        self,
+        item: _Pending,
+        state: str,
+        pending: dict[str, _Pending],
+        deadline: float,
+        fixed_interval: float | None,
+    ) -> None:
+        """依單次輪詢結果更新：ACTIVE 移出 pending；FAILED 拋 FileProcessingFailed；其餘排定下次輪詢。"""
+        item.polls += 1
+        if state == "ACTIVE":
+            self._record(item, time.monotonic() - item.started)
+            del pending[item.name]
+            return
+        if state == "FAILED":
+            self._record(item, None)
+            raise FileProcessingFailed(item.name)
+        item.interval = fixed_interval if fixed_interval is not None else self._next_interval(item)
+        # 不超過截止時間，逾時前最後再確認一次
+        item.next_poll = min(time.monotonic() + item.interval, deadline)
+
+    def _next_delay(self, pending: dict[str, _Pending], deadline: float, timeout: float) -> float | None:
+        """全部就緒回傳 None；已過截止時間拋 TimeoutError；否則回傳距下一個到期輪詢的秒數。"""
+        if not pending:
+            return None
+        if time.monotonic() >= deadline:
+            for item in pending.values():
+                self._record(item, None, timed_out=True)
+            names = ", ".join(sorted(pending))
+            raise TimeoutError(f"File not ready within {timeout}s: {names}")
+        next_due = min(p.next_poll for p in pending.values())
+        return max(0.0, next_due - time.monotonic())
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """
+        依大小區間回傳 files、polls、avg_polls、avg_processing_s、max_processing_s、failures、timeouts。
+        """
+        with self._lock:
+            result: dict[str, dict[str, float]] = {}
+            for bucket, raw in self._stats.items():
+                done = raw["completed"]
+                result[bucket] = {
+                    "files": raw["files"],
+                    "polls": raw["polls"],
+                    "avg_polls": raw["polls"] / raw["files"] if raw["files"] else 0.0,
+                    "avg_processing_s": raw["processing_s"] / done if done else 0.0,
+                    "max_processing_s": raw["max_processing_s"],
+                    "failures": raw["failures"],
+                    "timeouts": raw["timeouts"],
+                }
+            return result
+
+    def _next_interval(self, item: _Pending) -> float:
+        """第一次等待依推估處理時間，之後指數退避；皆加上 jitter 並夾在上下限內。"""
+        if item.polls == 1:
+            base = self._expected_duration(item.size) * 0.8
+        else:
+            base = item.interval * self._backoff
+        base = min(self._max, max(self._min, base))
+        return base * random.uniform(1.0 - self._jitter, 1.0 + self._jitter)
+
+    def _expected_duration(self, size_bytes: int) -> float:
+        with self._lock:
+            expected = self._expected.get(size_bucket(size_bytes))
+        if expected is not None:
+            return expected
+        return size_bytes / self._rate if self._rate else self._min
+
+    def _record(self, item: _Pending, duration: float | None, timed_out: bool = False) -> None:
+        """記錄單一檔案的輪詢結果；duration 為 None 表示失敗或逾時。"""
+        bucket = size_bucket(item.size)
+        with self._lock:
+            raw = self._stats.setdefault(
+                bucket,
+                {"files": 0, "polls": 0, "completed": 0, "processing_s": 0.0,
+                 "max_processing_s": 0.0, "failures": 0, "timeouts": 0},
+            )
+            raw["files"] += 1
+            raw["polls"] += item.polls
+            if duration is not None:
+                raw["completed"] += 1
+                raw["processing_s"] += duration
+                raw["max_processing_s"] = max(raw["max_processing_s"], duration)
+                previous = self._expected.get(bucket)
+                self._expected[bucket] = (
+                    duration if previous is None else _EWMA_ALPHA * duration + (1 - _EWMA_ALPHA) * previous
+                )
+            elif timed_out:
+                raw["timeouts"] += 1
+            else:
+                raw["failures"] += 1
+        if duration is not None:
+            logger.info(
+                "Gemini file %s ACTIVE after %.1fs (%s polls, bucket %s)", item.name, duration, item.polls, bucket
+            )
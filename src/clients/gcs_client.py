@@ -1,21 +1,345 @@
 """GCS Client：封裝 Google Cloud Storage 讀取邏輯。"""
 
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable
+
+import google.auth.credentials
+import google.auth.transport.requests
+from google.api_core.exceptions import NotFound, PreconditionFailed
 from google.cloud import storage
 
+from src.clients.blob_cache import BlobDiskCache, copy_cached_file
+
+# 分段平行下載：每段大小與同時下載的執行緒數（150MB 約切 10 段）
+DEFAULT_SLICE_SIZE = 16 * 1024 * 1024
+DEFAULT_MAX_WORKERS = 8
+# 上傳 session 簽章有效期（秒）；resumable session 建立後本身可用一週
+DEFAULT_UPLOAD_URL_EXPIRATION = 15 * 60
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    """GCS 物件中繼資料：大小、generation（用於固定物件版本）與內容 md5（base64）。"""
+
+    name: str
+    size: int
+    generation: int
+    md5_hash: str | None = None
+
+
+@dataclass(frozen=True)
+class UploadSession:
+    """
+    瀏覽器直傳 GCS 所需資訊。
+    - requires_start=True：先對 url 以 method（POST）帶 headers 開 session，回應 Location 為 session URI，再分塊 PUT。
+    - requires_start=False：url 已是 session URI（本機 emulator），直接分塊 PUT。
+    """
+
+    url: str
+    method: str
+    headers: dict[str, str] = field(default_factory=dict)
+    requires_start: bool = True
+
+
+def _slice_ranges(size: int, slice_size: int) -> list[tuple[int, int]]:
+    """將 [0, size) 切成多個 (start, end) 區段，end 為含端點（與 GCS Range 語意一致）。"""
+    return [(start, min(start + slice_size, size) - 1) for start in range(0, size, slice_size)]
+
 
 class GCSClient:
     """讀取 GCS 桶內檔案的 Client，僅負責 I/O，不含業務邏輯。"""
 
-    def __init__(self, bucket_name: str, project: str | None = None) -> None:
+    def __init__(
+        self,
+        bucket_name: str,
+        project: str | None = None,
+        slice_size: int = DEFAULT_SLICE_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        client: storage.Client | None = None,
+        blob_cache: BlobDiskCache | None = None,
+    ) -> None:
+        """
+        client 可傳入共用的 storage.Client（跨 bucket 共用連線與授權）；未傳則自行建立。
+        blob_cache 有給時，讀取前先以 metadata 取得 generation，命中本機快取就不再下載。
+        """
         self._bucket_name = bucket_name
-        self._client = storage.Client(project=project)
+        self._client = client or storage.Client(project=project)
+        self._slice_size = slice_size
+        self._max_workers = max_workers
+        self._blob_cache = blob_cache
 
-    def read_blob_bytes(self, blob_path: str) -> bytes:
-        """從 GCS 讀取指定路徑的檔案內容為 bytes。"""
+    @property
+    def bucket_name(self) -> str:
+        """此 Client 讀寫的 bucket 名稱。"""
+        return self._bucket_name
+
+    def read_blob_bytes(self, blob_path: str, info: BlobInfo | None = None) -> bytes:
+        """
+        從 GCS 讀取指定路徑的檔案內容為 bytes（有 blob_cache 時先查本機快取）。
+        info 為呼叫端已取得的 metadata：不再重查，並下載該 generation（與快取 key 為同一版本）。
+        """
+        if self._blob_cache is not None or info is not None:
+            info = info or self.get_blob_info(blob_path)
+            cached = self._cache_get(info)
+            if cached is not None:
+                return cached.read_bytes()
+            data = self._pinned_blob(info).download_as_bytes(if_generation_match=info.generation)
+            if self._blob_cache is not None:
+                self._blob_cache.put_bytes(self._bucket_name, blob_path, info.generation, data)
+            return data
         bucket = self._client.bucket(self._bucket_name)
         blob = bucket.blob(blob_path)
         return blob.download_as_bytes()
 
+    def get_blob_info(self, blob_path: str) -> BlobInfo:
+        """以一次 metadata 請求取得物件大小與 generation；物件不存在時拋 FileNotFoundError。"""
+        bucket = self._client.bucket(self._bucket_name)
+        blob = bucket.get_blob(blob_path)
+        if blob is None:
+            raise FileNotFoundError(f"Blob not found: {self.get_blob_uri(blob_path)}")
+        return BlobInfo(
+            name=blob_path,
+            size=int(blob.size or 0),
+            generation=int(blob.generation),
+            md5_hash=blob.md5_hash or None,
+        )
+
+    def read_blob_bytes_or_none(self, blob_path: str) -> bytes | None:
+        """讀取小型物件（如快取 JSON）；物件不存在時回傳 None 而非拋例外。"""
+        bucket = self._client.bucket(self._bucket_name)
+        try:
+            return bucket.blob(blob_path).download_as_bytes()
+        except NotFound:
+            return None
+
+    def read_blob_versioned(self, blob_path: str) -> tuple[bytes, int] | None:
+        """讀取小型物件的內容與 generation（供條件式覆寫）；物件不存在或讀取中被改寫時回傳 None。"""
+        blob = self._client.bucket(self._bucket_name).get_blob(blob_path)
+        if blob is None:
+            return None
+        generation = int(blob.generation)
+        try:
+            return blob.download_as_bytes(if_generation_match=generation), generation
+        except (NotFound, PreconditionFailed):
+            return None
+
+    def upload_bytes(
+        self,
+        blob_path: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+    ) -> str:
+        """將 bytes 寫入 GCS 物件，回傳 gs:// URI。"""
+        bucket = self._client.bucket(self._bucket_name)
+        bucket.blob(blob_path).upload_from_string(data, content_type=content_type)
+        return self.get_blob_uri(blob_path)
+
+    def delete_blob(self, blob_path: str) -> None:
+        """刪除物件；物件不存在時視為已刪除。"""
+        try:
+            self._client.bucket(self._bucket_name).blob(blob_path).delete()
+        except NotFound:
+            pass
+
+    def read_blob_bytes_sliced(self, blob_path: str, info: BlobInfo | None = None) -> bytes | bytearray:
+        """
+        分段平行下載：依物件大小切成多個 byte range，以執行緒池同時下載並寫入預先配置的緩衝區。
+        每段皆指定同一個 generation，物件若在下載途中被覆寫會直接失敗，不會拼出不同版本的內容。
+        物件小於單段大小時退回單一請求；有 blob_cache 時先查本機快取。
+        分段下載時直接回傳該 bytearray（不再複製成 bytes），呼叫端僅以 bytes-like 方式讀取。
+        info 有給時沿用（不再查 metadata），下載該 generation。
+        """
+        info = info or self.get_blob_info(blob_path)
+        cached = self._cache_get(info)
+        if cached is not None:
+            return cached.read_bytes()
+        data = self._download_sliced_bytes(info)
+        if self._blob_cache is not None:
+            self._blob_cache.put_bytes(self._bucket_name, blob_path, info.generation, data)
+        return data
+
+    def _download_sliced_bytes(self, info: BlobInfo) -> bytes | bytearray:
+        """依 info 分段下載至預先配置的 bytearray 並原樣回傳，避免大檔多一份完整複製。"""
+        if info.size <= self._slice_size:
+            blob = self._pinned_blob(info)
+            return blob.download_as_bytes(if_generation_match=info.generation)
+
+        buffer = bytearray(info.size)
+        view = memoryview(buffer)
+
+        def write(start: int, chunk: bytes) -> None:
+            view[start:start + len(chunk)] = chunk
+
+        self._download_slices(info, write)
+        view.release()
+        return buffer
+
+    def download_blob_to_file(self, blob_path: str, dest_path: str | Path, info: BlobInfo | None = None) -> BlobInfo:
+        """
+        將物件直接串流寫入本機檔案（不經過整份 bytes）：先預先配置檔案大小，
+        再以分段平行下載寫入各自的 offset。回傳下載時固定的 BlobInfo。
+        有 blob_cache 時命中即從本機快取取出，未命中則下載後放入快取。
+        info 有給時沿用（不再查 metadata），下載該 generation。
+        """
+        info = info or self.get_blob_info(blob_path)
+        dest = Path(dest_path)
+        cached = self._cache_get(info)
+        if cached is not None:
+            copy_cached_file(cached, dest)
+            return info
+        self._download_sliced_to_file(info, dest)
+        if self._blob_cache is not None:
+            self._blob_cache.put_file(self._bucket_name, blob_path, info.generation, dest)
+        return info
+
+    def _download_sliced_to_file(self, info: BlobInfo, dest: Path) -> None:
+        """依 info 分段下載並寫入 dest 的對應 offset。"""
+        if info.size <= self._slice_size:
+            with dest.open("wb") as f:
+                self._pinned_blob(info).download_to_file(f, if_generation_match=info.generation)
+            return
+
+        with dest.open("wb") as f:
+            f.truncate(info.size)
+        lock = threading.Lock()
+
+        with dest.open("r+b") as f:
+            def write(start: int, chunk: bytes) -> None:
+                with lock:
+                    f.seek(start)
+                    f.write(chunk)
+
+            self._download_slices(info, write)
+
+    def _cache_get(self, info: BlobInfo) -> Path | None:
+        """查詢本機快取（generation 相同即視為新鮮）；未設定快取時回傳 None。"""
+        if self._blob_cache is None:
+            return None
+        return self._blob_cache.get(self._bucket_name, info.name, info.generation)
+
+    def _pinned_blob(self, info: BlobInfo) -> storage.Blob:
+        """建立固定在 info.generation 的 Blob 物件。"""
+        bucket = self._client.bucket(self._bucket_name)
+        return bucket.blob(info.name, generation=info.generation)
+
+    def _download_slices(self, info: BlobInfo, write: Callable[[int, bytes], None]) -> None:
+        """以執行緒池下載各段並交給 write(start, chunk) 寫入；任一段失敗即拋出。"""
+
+        def fetch(byte_range: tuple[int, int]) -> None:
+            start, end = byte_range
+            # 每段各自建立 Blob，避免多執行緒共用同一物件的內部狀態
+            chunk = self._pinned_blob(info).download_as_bytes(
+                start=start,
+                end=end,
+                if_generation_match=info.generation,
+                checksum=None,
+            )
+            if len(chunk) != end - start + 1:
+                raise IOError(
+                    f"Short read for {info.name} range {start}-{end}: got {len(chunk)} bytes"
+                )
+            write(start, chunk)
+
+        ranges = _slice_ranges(info.size, self._slice_size)
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(ranges))) as pool:
+            # list() 讓任一段的例外在此拋出
+            list(pool.map(fetch, ranges))
+
+    def upload_bytes_if_absent(
+        self,
+        blob_path: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+    ) -> bool:
+        """
+        物件不存在時才上傳（內容雜湊命名的物件重複上傳無意義）。
+        先以 exists() 做便宜檢查，再以 if_generation_match=0 避免併發覆寫；回傳是否實際上傳。
+        """
+        blob = self._client.bucket(self._bucket_name).blob(blob_path)
+        if blob.exists():
+            return False
+        try:
+            blob.upload_from_string(data, content_type=content_type, if_generation_match=0)
+        except PreconditionFailed:
+            return False
+        return True
+
+    def upload_bytes_if_generation_match(
+        self,
+        blob_path: str,
+        data: bytes,
+        generation: int,
+        content_type: str = "application/octet-stream",
+    ) -> bool:
+        """物件仍為指定 generation 時才覆寫（compare-and-swap）；已被其他寫入者改寫時回傳 False。"""
+        blob = self._client.bucket(self._bucket_name).blob(blob_path)
+        try:
+            blob.upload_from_string(data, content_type=content_type, if_generation_match=generation)
+        except PreconditionFailed:
+            return False
+        return True
+
+    def create_resumable_upload(
+        self,
+        blob_path: str,
+        content_type: str = "application/pdf",
+        origin: str | None = None,
+        expiration_seconds: int = DEFAULT_UPLOAD_URL_EXPIRATION,
+        max_bytes: int | None = None,
+    ) -> UploadSession:
+        """
+        產生讓瀏覽器直接分塊上傳至 GCS 的 resumable session。
+        正式環境回傳 V4 簽章的 POST URL（x-goog-resumable: start）；
+        max_bytes 有值時一併簽入 x-goog-content-length-range: 0,<max_bytes>，超過大小的上傳由 GCS 拒絕。
+        設定 STORAGE_EMULATOR_HOST 時 emulator 不驗簽章，改由伺服器端直接建立 session URI。
+        """
+        blob = self._client.bucket(self._bucket_name).blob(blob_path)
+        if os.environ.get("STORAGE_EMULATOR_HOST"):
+            session_url = blob.create_resumable_upload_session(content_type=content_type, origin=origin)
+            return UploadSession(
+                url=session_url,
+                method="PUT",
+                headers={"Content-Type": content_type},
+                requires_start=False,
+            )
+
+        signed_headers = {"x-goog-resumable": "start"}
+        if max_bytes is not None:
+            signed_headers["x-goog-content-length-range"] = f"0,{max_bytes}"
+        url = blob.generate_signed_url(
+            version="v4",
+            expiration=timedelta(seconds=expiration_seconds),
+            method="POST",
+            content_type=content_type,
+            headers=signed_headers,
+            **self._signing_kwargs(),
+        )
+        return UploadSession(url=url, method="POST", headers={**signed_headers, "Content-Type": content_type})
+
+    def _signing_kwargs(self) -> dict[str, str]:
+        """
+        GCF 預設憑證（metadata server）沒有私鑰，無法本機簽章；
+        此時改傳 service_account_email + access_token，由 IAM signBlob 代簽。
+        """
+        credentials = self._client._credentials
+        if isinstance(credentials, google.auth.credentials.Signing):
+            return {}
+        if not credentials.valid:
+            credentials.refresh(google.auth.transport.requests.Request())
+        return {
+            "service_account_email": credentials.service_account_email,
+            "access_token": credentials.token,
+        }
+
+    def get_public_url(self, blob_path: str) -> str:
+        """取得 https://storage.googleapis.com/ 形式的 URL（物件需可公開讀取或由呼叫端簽署）。"""
+        return f"https://storage.googleapis.com/{self._bucket_name}/{blob_path}"
+
     def get_blob_uri(self, blob_path: str) -> str:
         """取得 GCS 物件的 gs:// URI，供其他服務參考。"""
         return f"gs://{self._bucket_name}/{blob_path}"
@@ -0,0 +1,146 @@
+"""
+Gemini Batch API（batchGenerateContent）的 REST Client：大量離線解析不佔互動配額。
+
+google.generativeai 沒有 batch 介面，此模組直接呼叫 REST：
+- submit：POST /v1beta/models/{model}:batchGenerateContent，inline 帶入多個 GenerateContentRequest，
+  每筆以 metadata.key 標記；回傳 batch 名稱（batches/xxx）。
+- get：GET /v1beta/batches/xxx，回傳狀態與（完成時）各 key 的回應文字或錯誤。
+- cancel：POST /v1beta/batches/xxx:cancel。
+Batch 以非同步方式執行（通常數分鐘到 24 小時內完成），費用約為互動呼叫的一半，且配額與互動呼叫分開。
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+DEFAULT_REQUEST_TIMEOUT = 120.0
+# 終止狀態（成功、失敗、取消、逾期）；新舊 API 版本分別使用 BATCH_STATE_ / JOB_STATE_ 前綴
+_TERMINAL_STATES = {"SUCCEEDED", "FAILED", "CANCELLED", "EXPIRED"}
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """batch 中單一請求的結果：text 為回應文字；error 非空表示該筆失敗。truncated 為輸出達 token 上限。"""
+
+    key: str
+    text: str = ""
+    error: str = ""
+    truncated: bool = False
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    """batch 狀態；state 去除前綴（PENDING、RUNNING、SUCCEEDED、FAILED、CANCELLED、EXPIRED）。"""
+
+    name: str
+    state: str
+    results: dict[str, BatchResult] = field(default_factory=dict)
+
+    @property
+    def done(self) -> bool:
+        return self.state in _TERMINAL_STATES
+
+    @property
+    def succeeded(self) -> bool:
+        return self.state == "SUCCEEDED"
+
+
+class GeminiBatchClient:
+    """以 API key 呼叫 Gemini Batch REST API。"""
+
+    def __init__(
+        self,
+        api_key: str,
+        timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        session: requests.Session | None = None,
+    ) -> None:
+        self._api_key = api_key
+        self._timeout = timeout
+        self._http = session or requests.Session()
+
+    def submit(self, model_name: str, requests_by_key: dict[str, dict[str, Any]], display_name: str) -> str:
+        """送出一個 batch（key → GenerateContentRequest JSON），回傳 batch 名稱。"""
+        if not requests_by_key:
+            raise ValueError("Batch requires at least one request")
+        body = {
+            "batch": {
+                "display_name": display_name,
+                "input_config": {
+                    "requests": {
+                        "requests": [
+                            {"request": request, "metadata": {"key": key}}
+                            for key, request in requests_by_key.items()
+                        ]
+                    }
+                },
+            }
+        }
+        data = self._call("POST", f"models/{model_name}:batchGenerateContent", json=body)
+        name = data.get("name") or data.get("metadata", {}).get("name")
+        if not name:
+            raise RuntimeError("Gemini batch submit returned no batch name")
+        logger.info("Gemini batch %s submitted (%s requests)", name, len(requests_by_key))
+        return name
+
+    def get(self, batch_name: str) -> BatchJob:
+        """查詢 batch 狀態；完成時一併解析各筆回應。"""
+        data = self._call("GET", batch_name)
+        return parse_batch(batch_name, data)
+
+    def cancel(self, batch_name: str) -> None:
+        self._call("POST", f"{batch_name}:cancel")
+
+    def _call(self, method: str, path: str, **kwargs: Any) -> dict[str, Any]:
+        resp = self._http.request(
+            method,
+            f"{API_BASE}/{path}",
+            headers={"x-goog-api-key": self._api_key},
+            timeout=self._timeout,
+            **kwargs,
+        )
+        if resp.status_code == 429 or resp.status_code >= 500:
+            raise ConnectionError(f"Gemini batch API HTTP {resp.status_code}")
+        if resp.status_code >= 400:
+            raise RuntimeError(f"Gemini batch API failed: HTTP {resp.status_code} {resp.text[:200]}")
+        return resp.json() if resp.content else {}
+
+
+def parse_batch(batch_name: str, data: dict[str, Any]) -> BatchJob:
+    """
+    由 batches.get 的回應（Operation 或 GenerateContentBatch）取出狀態與 inline 回應。
+    回應未帶 metadata.key 時依請求順序以索引字串為 key。
+    """
+    metadata = data.get("metadata") or {}
+    raw_state = metadata.get("state") or data.get("state") or ("SUCCEEDED" if data.get("done") else "PENDING")
+    state = raw_state.replace("BATCH_STATE_", "").replace("JOB_STATE_", "")
+
+    output = data.get("response") or metadata.get("output") or data.get("output") or {}
+    inlined = output.get("inlinedResponses") or {}
+    if isinstance(inlined, dict):
+        inlined = inlined.get("inlinedResponses") or []
+
+    results: dict[str, BatchResult] = {}
+    for index, item in enumerate(inlined):
+        key = str((item.get("metadata") or {}).get("key", index))
+        if item.get("error"):
+            results[key] = BatchResult(key=key, error=str(item["error"].get("message") or item["error"]))
+            continue
+        text, truncated = _response_text(item.get("response") or {})
+        results[key] = BatchResult(key=key, text=text, truncated=truncated)
+    return BatchJob(name=batch_name, state=state, results=results)
+
+
+def _response_text(response: dict[str, Any]) -> tuple[str, bool]:
+    """GenerateContentResponse JSON 的第一個候選文字，以及是否因 MAX_TOKENS 截斷。"""
+    candidates = response.get("candidates") or []
+    if not candidates:
+        return "", False
+    candidate = candidates[0]
+    parts = (candidate.get("content") or {}).get("parts") or []
+    text = "".join(part.get("text", "") for part in parts)
+    return text, candidate.get("finishReason") == "MAX_TOKENS"
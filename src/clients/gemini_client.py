@@ -1,15 +1,36 @@
 """Gemini Client：使用 Gemini File API 處理大檔案上傳與解析。"""
 
+import hashlib
+import io
 import json
-import tempfile
+import logging
+import threading
 import time
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, BinaryIO, Iterator
 
 import google.generativeai as genai
+from pydantic import TypeAdapter, ValidationError
 
 from src.clients.config_loader import ConfigLoader
+from src.clients.context_cache import GeminiContextCache
+from src.clients.file_poller import FileProcessingFailed, FileReadyPoller
+from src.clients.gemini_batch import GeminiBatchClient
+from src.clients.gemini_file_cache import GeminiFileCache
+from src.clients.gemini_upload import ResumableUploader, UploadInterrupted
+from src.clients.hedging import HedgedCaller
+from src.clients.json_stream import JsonArrayStreamParser
+from src.clients.rate_limiter import GeminiRateLimiter, estimate_tokens
+from src.clients.response_schema import gemini_response_schema, to_rest_schema
+from src.clients.vertex_backend import VertexGeminiBackend, is_gcs_uri
 from src.models.schema import BlockElement, PageBlock, PageExtract
 
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-2.5-flash"
+FILE_URI_PREFIX = "https://generativelanguage.googleapis.com/v1beta/"
+
 # 結構化解析的 System Instruction：每頁輸出 page + elements（page_number, type, content, summary）
 STRUCTURED_SYSTEM_INSTRUCTION = """你是一個 PDF 結構化解析助手。
 
@@ -24,32 +45,171 @@ STRUCTURED_SYSTEM_INSTRUCTION = """你是一個 PDF 結構化解析助手。
 - elements 內：type 必為 "image" 或 "text"；content 必填（圖片可為 GCS URL 或空字串）；description 圖片必填 20 字內精簡描述，文字可為空字串。
 - 依頁面從上到下、從左到右的視覺順序排列，圖文對應正確。"""
 
+STRUCTURED_PROMPT = "請依 System Instruction 分析此 PDF，輸出每頁的 page 與 elements（圖片與文字塊）JSON 陣列。"
+
+# 精簡輸出格式：不重複輸出鍵名、不輸出圖片 content（由 parse_common.fill_image_content 於本機填入），縮短生成的 token 數；
+# 解析時展開為與標準格式相同的 PageBlock／BlockElement
+OUTPUT_FORMAT_JSON = "json"
+OUTPUT_FORMAT_COMPACT = "compact"
+COMPACT_SYSTEM_INSTRUCTION = """你是一個 PDF 結構化解析助手。
+
+請解析此 PDF，將每一頁的「圖片」與「文字內容」依視覺順序提取出來。針對圖片，請給予 20 字內的精簡描述。請確保圖文對應關係正確。
+
+輸出格式：嚴格返回 JSON 陣列（僅輸出 JSON，不要 markdown 包裝或額外說明），每頁一個陣列，第一項為頁碼，其後每個元素為 [種類, 文字]：
+
+[[1, ["i", "20字內圖片描述"], ["t", "該區塊的完整文字內容"]], [2, ...], ...]
+
+規則：
+- 頁碼從 1 開始。
+- 種類只能是 "t"（文字塊，文字為完整內容）或 "i"（圖片，文字為 20 字內精簡描述）；不要輸出圖片本身。
+- 依頁面從上到下、從左到右的視覺順序排列，圖文對應正確。"""
+COMPACT_PROMPT = "請依 System Instruction 分析此 PDF，以精簡陣列格式輸出每頁的頁碼與圖文元素。"
+
+# response_schema 模式：由 PageBlock／BlockElement 產生的回應 schema，回應直接以 TypeAdapter 驗證
+# source 由混合解析自行填入，不要求模型輸出
+PAGE_BLOCKS_RESPONSE_SCHEMA = gemini_response_schema(list[PageBlock], exclude=frozenset({"source"}))
+DEFAULT_SCHEMA_RETRIES = 1
+# inline bytes 的上限：整個請求（base64 後約 4/3 倍）需低於 20MB
+MAX_INLINE_BYTES = 14 * 1024 * 1024
+# 輸出達 token 上限（finish_reason=MAX_TOKENS）時，接續請求後續頁面的最多次數
+DEFAULT_MAX_CONTINUATIONS = 8
+CONTINUATION_PROMPT = (
+    "上一次輸出在第 {page} 頁之後因長度上限中斷。請只輸出第 {next_page} 頁（含）之後的頁面，"
+    "格式與規則同上，同樣以 JSON 陣列輸出。"
+)
+_PAGE_BLOCKS = TypeAdapter(list[PageBlock])
+
+
+@dataclass(frozen=True)
+class StructuredCall:
+    """一次結構化解析的模型、contents、估計輸入 token 與 response_schema 模式的 GenerationConfig（未開啟為 None）。"""
+
+    model: Any
+    contents: list
+    tokens: int
+    generation_config: Any = None
+
+
+@dataclass(frozen=True)
+class PendingFile:
+    """已上傳（或沿用）但尚未確認可用的 File：名稱、位元組數、內容 SHA-256；active 表示已確認 ACTIVE。"""
+
+    name: str
+    size: int
+    digest: str
+    active: bool = False
+
 
 class GeminiFileClient:
     """
     透過 Gemini File API 上傳並解析大型 PDF（如 150MB）。
     大檔案需先上傳至 File API，再以 file URI 呼叫 generate_content，避免記憶體一次性載入。
     金鑰由 ConfigLoader 統一取得（依 ENV_MODE 從 .env 或 Secret Manager）。
+    有 file_cache 時，內容相同（SHA-256）且遠端仍可用的檔案直接沿用，不再上傳與等待處理。
+    上傳走 resumable 分塊協定，中斷後從最後確認的 offset 續傳。
+    response_schema 開啟時，結構化解析改以 response_schema + application/json 約束輸出，
+    回應直接驗證為 PageBlock；格式錯誤時重新呼叫（最多 schema_retries 次）並計數。
+    輸出因 token 上限截斷時保留已完整的頁面，再請模型只輸出其後的頁面（最多 max_continuations 次）。
+    上傳、get_file 與 generate_content 皆經 rate_limiter（ClientPool 傳入 process 共用的實例）。
+    有 context_cache 時，同一 File 的各次分析（結構化、PageExtract、ask_document）共用一個 CachedContent，
+    無法快取時自動退回「prompt + File」的一般呼叫。
+    有 hedger 時 generate_content 超過近期延遲的 percentile 仍未回應即送出相同的對沖請求，取先完成者。
+    有 vertex 後端時，解析方法也接受 gs:// URI：由 Vertex AI 直接讀取 GCS，不經 File API 上傳。
+    小型 PDF 可以 parse_pdf_bytes 直接以 inline bytes 送出，省去上傳與就緒輪詢；prompt 與解析規則相同，輸出一致。
+    output_format="compact" 時模型改以精簡陣列輸出（較少輸出 token），解析後的 PageBlock 與標準格式相同；
+    response_schema 模式固定使用標準格式。
     """
 
-    def __init__(self, api_key: str | None = None, config_loader: ConfigLoader | None = None) -> None:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        config_loader: ConfigLoader | None = None,
+        file_cache: GeminiFileCache | None = None,
+        uploader: ResumableUploader | None = None,
+        response_schema: bool = False,
+        schema_retries: int = DEFAULT_SCHEMA_RETRIES,
+        rate_limiter: GeminiRateLimiter | None = None,
+        context_cache: GeminiContextCache | None = None,
+        max_continuations: int = DEFAULT_MAX_CONTINUATIONS,
+        hedger: HedgedCaller | None = None,
+        vertex: VertexGeminiBackend | None = None,
+        output_format: str = OUTPUT_FORMAT_JSON,
+    ) -> None:
+        if output_format not in (OUTPUT_FORMAT_JSON, OUTPUT_FORMAT_COMPACT):
+            raise ValueError(f"Unknown output_format: {output_format}")
+        if output_format == OUTPUT_FORMAT_COMPACT and response_schema:
+            logger.warning("output_format=compact is ignored in response_schema mode")
+            output_format = OUTPUT_FORMAT_JSON
+        self._output_format = output_format
+        if output_format == OUTPUT_FORMAT_COMPACT:
+            self._instruction, self._prompt = COMPACT_SYSTEM_INSTRUCTION, COMPACT_PROMPT
+        else:
+            self._instruction, self._prompt = STRUCTURED_SYSTEM_INSTRUCTION, STRUCTURED_PROMPT
+        self._file_cache = file_cache
+        self._hedger = hedger
+        self._vertex = vertex
+        self._context_cache = context_cache
+        self._limiter = rate_limiter or GeminiRateLimiter()
+        self._response_schema = response_schema
+        self._schema_retries = schema_retries
+        self._schema_stats = {"calls": 0, "attempts": 0, "malformed": 0, "retries": 0, "salvaged": 0}
+        self._schema_lock = threading.Lock()
+        self._max_continuations = max_continuations
+        self._continuation_stats = {"truncated": 0, "continuations": 0, "incomplete": 0}
         loader = config_loader or ConfigLoader()
         key = api_key or loader.get_secret("GEMINI_API_KEY")
         if key:
             genai.configure(api_key=key)
-        self._model = genai.GenerativeModel("gemini-2.5-flash")
+        self._uploader = uploader or (ResumableUploader(key) if key else None)
+        self._batch = GeminiBatchClient(key) if key else None
+        # 中斷的上傳 session（內容 SHA-256 → session URL），供重試續傳
+        self._pending_sessions: dict[str, str] = {}
+        self._pending_lock = threading.Lock()
+        self._poller = FileReadyPoller(lambda name: self.get_file(name).state.name)
+        self._model = genai.GenerativeModel(MODEL_NAME)
+        self._structured_model = None
+
+    @property
+    def model_name(self) -> str:
+        """結構化解析使用的模型名稱（供結果快取 key 使用）。"""
+        return MODEL_NAME
+
+    @property
+    def prompt_version(self) -> str:
+        """
+        System Instruction 與 prompt 的雜湊；指令一改，舊的解析結果快取即失效。
+        啟用 context cache 時結構化規則改放在 user prompt、System Instruction 為 CachedContent 的共用指令，
+        輸出可能不同，因此一併納入，與非快取模式的結果分開。
+        """
+        raw = f"{self._instruction}\n{self._prompt}"
+        if self._context_cache is not None:
+            raw += "\ncached:" + self._context_cache.system_instruction
+        if self._response_schema:
+            raw += "\n" + json.dumps(PAGE_BLOCKS_RESPONSE_SCHEMA, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
 
-    def upload_file(self, file_path: str | Path, mime_type: str = "application/pdf") -> str:
+    def upload_file(
+        self,
+        path: str | Path,
+        mime_type: str = "application/pdf",
+        file_ready_timeout: float = 600.0,
+        poll_interval: float | None = None,
+    ) -> str:
         """
         使用 File API 上傳檔案，回傳 file URI。
-        適用於大型 PDF，不會將整檔載入記憶體。
+        適用於大型 PDF，不會將整檔載入記憶體；spool 模式下直接上傳已下載到本機的檔案。
         """
-        path = Path(file_path)
+        path = Path(path)
         if not path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
-
-        uploaded = genai.upload_file(path=str(path), mime_type=mime_type)
-        return self._wait_for_file_ready(uploaded.name)
+            raise FileNotFoundError(f"File not found: {path}")
+        with path.open("rb") as f:
+            return self.upload_stream(
+                f,
+                display_name=path.name,
+                mime_type=mime_type,
+                file_ready_timeout=file_ready_timeout,
+                poll_interval=poll_interval,
+            )
 
     def upload_bytes(
         self,
@@ -57,102 +217,526 @@ class GeminiFileClient:
         display_name: str,
         mime_type: str = "application/pdf",
         file_ready_timeout: float = 600.0,
-        poll_interval: float = 2.0,
+        poll_interval: float | None = None,
     ) -> str:
         """
-        上傳 bytes 至 File API（適合從 GCS 讀取後的小塊或中繼資料）。
-        genai.upload_file 僅接受 path=，故先寫入暫存檔再上傳。
+        上傳 bytes 至 File API（適合從 GCS 讀取後的內容），直接以 BytesIO 分塊上傳，不寫暫存檔。
         file_ready_timeout: 輪詢等待 ACTIVE 的最長時間（秒），150MB 可設 900。
+        poll_interval: 固定輪詢間隔（秒）；None 時依檔案大小與實測處理時間自適應。
+        """
+        return self.upload_stream(
+            io.BytesIO(data),
+            display_name=display_name,
+            mime_type=mime_type,
+            file_ready_timeout=file_ready_timeout,
+            poll_interval=poll_interval,
+        )
+
+    def upload_stream(
+        self,
+        stream: BinaryIO,
+        display_name: str | None = None,
+        mime_type: str = "application/pdf",
+        file_ready_timeout: float = 600.0,
+        poll_interval: float | None = None,
+    ) -> str:
+        """
+        由可 seek 的檔案物件分塊上傳（resumable 協定），回傳 file URI。
+        同一內容先前中斷的上傳會從最後確認的 offset 續傳，而不是從頭重傳。
+        """
+        pending = self.begin_upload(stream, display_name=display_name, mime_type=mime_type)
+        return self.finish_upload(pending, file_ready_timeout=file_ready_timeout, poll_interval=poll_interval)
+
+    def begin_upload(
+        self,
+        stream: BinaryIO,
+        display_name: str | None = None,
+        mime_type: str = "application/pdf",
+    ) -> PendingFile:
+        """
+        上傳（或沿用同內容仍可用的既有檔案）但不等待處理完成，回傳 PendingFile。
+        之後以 finish_upload 等待；多個檔案（分片、批次）先全部上傳，再以 wait_for_files 一次等待。
+        """
+        size = stream.seek(0, io.SEEK_END)
+        stream.seek(0)
+        digest = hashlib.file_digest(stream, "sha256").hexdigest()
+        stream.seek(0)
+
+        reused = self._reusable_file(digest, size)
+        if reused is not None:
+            return reused
+
+        file_name = self._upload_resumable(stream, size, digest, mime_type, display_name)
+        self._remember_upload(digest, file_name)
+        return PendingFile(name=file_name, size=size, digest=digest)
+
+    def finish_upload(
+        self,
+        pending: PendingFile,
+        file_ready_timeout: float = 600.0,
+        poll_interval: float | None = None,
+    ) -> str:
+        """等待 begin_upload 的檔案變為 ACTIVE 並回傳 file URI；處理失敗時移除內容快取後拋出。"""
+        return self.wait_for_files([pending], timeout=file_ready_timeout, poll_interval=poll_interval)[0]
+
+    def forget_upload(self, pending: PendingFile) -> None:
+        """檔案處理失敗（FAILED）時移除內容快取中的對應，下次重新上傳。"""
+        if self._file_cache is not None:
+            self._file_cache.forget(pending.digest)
+
+    def upload_stats(self) -> dict[str, float]:
+        """上傳吞吐量（throughput_mbps）與續傳／重新開始次數；未使用 resumable 上傳時為空。"""
+        return self._uploader.stats() if self._uploader is not None else {}
+
+    def _upload_resumable(
+        self,
+        stream: BinaryIO,
+        size: int,
+        digest: str,
+        mime_type: str,
+        display_name: str | None,
+    ) -> str:
+        """
+        以 ResumableUploader 上傳並回傳 File 名稱；中斷時以內容雜湊記下 session，
+        限流器因 429（UploadThrottled）退避重試，或呼叫端（FileHandler / parse_pdf）重試同一內容時，
+        都從已確認的 offset 續傳。
+        無 API key（由環境設定 genai）時退回 genai.upload_file。
+        """
+        if self._uploader is None:
+            return self._limiter.call(
+                genai.upload_file, path=stream, mime_type=mime_type, display_name=display_name, bounded=False
+            ).name
+
+        def attempt() -> dict:
+            # 每次嘗試（含限流器在 429 後的重試）都從上次記下的 session 續傳
+            with self._pending_lock:
+                session_url = self._pending_sessions.pop(digest, None)
+            try:
+                return self._uploader.upload(
+                    stream, size, mime_type=mime_type, display_name=display_name, session_url=session_url
+                )
+            except UploadInterrupted as e:
+                if e.session_url:
+                    with self._pending_lock:
+                        self._pending_sessions[digest] = e.session_url
+                raise
+
+        return self._limiter.call(attempt, bounded=False)["name"]
+
+    def _reusable_file(self, digest: str, size: int) -> PendingFile | None:
+        """
+        查詢相同內容先前上傳的檔案，以 get_file 確認仍可用：ACTIVE 可直接使用；
+        PROCESSING（前次請求上傳後逾時）交由呼叫端繼續等待；其餘狀態或已不存在則移除對應並回傳 None。
         """
-        suffix = Path(display_name).suffix or ".pdf"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
-            f.write(data)
-            path = f.name
+        if self._file_cache is None:
+            return None
+        file_name = self._file_cache.get(digest)
+        if file_name is None:
+            return None
         try:
-            uploaded = genai.upload_file(path=path, mime_type=mime_type)
-            return self._wait_for_file_ready(
-                uploaded.name, poll_interval=poll_interval, timeout=file_ready_timeout
-            )
-        finally:
-            Path(path).unlink(missing_ok=True)
-
-    def _wait_for_file_ready(self, file_name: str, poll_interval: float = 2.0, timeout: float = 600.0) -> str:
-        """輪詢直到檔案狀態為 ACTIVE，回傳可用於 generate_content 的 file URI。"""
-        start = time.monotonic()
-        while time.monotonic() - start < timeout:
-            state = genai.get_file(file_name).state
-            if state.name == "ACTIVE":
-                return f"https://generativelanguage.googleapis.com/v1beta/{file_name}"
-            if state.name == "FAILED":
-                raise RuntimeError(f"File upload failed: {file_name}")
-            time.sleep(poll_interval)
-        raise TimeoutError(f"File not ready within {timeout}s: {file_name}")
-
-    def parse_pdf_structured(self, file_uri: str) -> list[PageBlock]:
-        """
-        以 File API 的 file URI 呼叫 generate_content，使用結構化 System Instruction，
+            state = self.get_file(file_name).state.name
+        except Exception as e:
+            logger.info("Cached Gemini file %s unavailable: %s", file_name, e)
+            state = "MISSING"
+        if state in ("ACTIVE", "PROCESSING"):
+            logger.info("Reusing Gemini file %s (%s) for sha256 %s", file_name, state, digest[:12])
+            return PendingFile(name=file_name, size=size, digest=digest, active=state == "ACTIVE")
+        self._file_cache.forget(digest)
+        return None
+
+    def _remember_upload(self, digest: str, file_name: str) -> None:
+        """上傳完成即登記（不等 ACTIVE），等待逾時後的重試可直接沿用處理中的檔案。"""
+        if self._file_cache is not None:
+            self._file_cache.put(digest, file_name)
+
+    def wait_for_files(
+        self,
+        pending: list[PendingFile],
+        timeout: float = 600.0,
+        poll_interval: float | None = None,
+    ) -> list[str]:
+        """
+        一次等待多個 begin_upload 的檔案全部 ACTIVE，依序回傳 file URI；已確認 ACTIVE 的檔案不再輪詢。
+        分片或批次上傳共用同一個輪詢迴圈，不必每個檔案各自阻塞輪詢。
+        任一檔案 FAILED 時移除其內容快取後拋出（FileProcessingFailed）；逾時拋 TimeoutError。
+        """
+        waiting = {p.name: p.size for p in pending if not p.active}
+        if waiting:
+            try:
+                self._poller.wait_many(waiting, timeout=timeout, fixed_interval=poll_interval)
+            except FileProcessingFailed as e:
+                self._forget_failed(pending, e.file_name)
+                raise
+        return [f"{FILE_URI_PREFIX}{p.name}" for p in pending]
+
+    def file_states(self, pending: list[PendingFile]) -> dict[str, str]:
+        """
+        單次查詢（不等待）各檔案的處理狀態：file 名稱 → ACTIVE／PROCESSING／FAILED；查詢失敗（已過期或刪除）為 MISSING。
+        FAILED 與 MISSING 的檔案移除內容快取，下次重新上傳。供跨請求推進的批次匯入使用。
+        """
+        states: dict[str, str] = {}
+        for item in pending:
+            if item.active:
+                states[item.name] = "ACTIVE"
+                continue
+            try:
+                states[item.name] = self.get_file(item.name).state.name
+            except Exception as e:
+                logger.info("Gemini file %s unavailable: %s", item.name, e)
+                states[item.name] = "MISSING"
+            if states[item.name] in ("FAILED", "MISSING"):
+                self.forget_upload(item)
+        return states
+
+    def _forget_failed(self, pending: list[PendingFile], file_name: str) -> None:
+        """移除處理失敗（FAILED）檔案的內容快取，下次重新上傳。"""
+        for item in pending:
+            if item.name == file_name:
+                self.forget_upload(item)
+
+    def poll_stats(self) -> dict[str, dict[str, float]]:
+        """依檔案大小區間的輪詢次數與 PROCESSING 時間統計。"""
+        return self._poller.stats()
+
+    def parse_pdf_structured(self, file_uri: str, size_bytes: int = 0) -> list[PageBlock]:
+        """
+        以 File API 的 file URI（或 Vertex 後端的 gs:// URI）呼叫 generate_content，使用結構化 System Instruction，
         回傳每頁的 elements（type: image/text, content, description）供編輯器使用。
         """
-        file_name = file_uri.replace("https://generativelanguage.googleapis.com/v1beta/", "").strip()
-        if not file_name:
-            raise ValueError("Invalid file_uri: " + file_uri)
-        file_obj = genai.get_file(file_name)
-        model = genai.GenerativeModel(
-            "gemini-2.5-flash",
-            system_instruction=STRUCTURED_SYSTEM_INSTRUCTION,
+        return list(self.iter_pdf_structured(file_uri, size_bytes=size_bytes))
+
+    def iter_pdf_structured(self, file_uri: str, size_bytes: int = 0) -> Iterator[PageBlock]:
+        """
+        串流版結構化解析：generate_content(stream=True) 搭配增量 JSON 陣列解析，
+        每頁物件一完整即 yield；尾端截斷或格式錯誤時保留已完成的頁面。
+        response_schema 模式下不串流：整份回應驗證通過才交出，格式錯誤時重新呼叫。
+        因 token 上限截斷（MAX_TOKENS）時接續請求最後一個完整頁面之後的頁面，直到輸出完整。
+        size_bytes 只用於 gs:// URI 的 token 估計（File API 的檔案大小由 get_file 取得）。
+        """
+        return self._iter_structured(self.structured_call(file_uri, size_bytes))
+
+    def parse_pdf_bytes(self, data: bytes, mime_type: str = "application/pdf") -> list[PageBlock]:
+        """
+        小型 PDF 的快速路徑：PDF 以 inline bytes 放入 generate_content，不經 File API 上傳與就緒輪詢。
+        System Instruction、prompt、schema 與截斷接續規則與 parse_pdf_structured 相同。
+        """
+        return list(self._iter_structured(self.inline_structured_call(data, mime_type)))
+
+    def inline_structured_call(self, data: bytes, mime_type: str = "application/pdf") -> StructuredCall:
+        """
+        以 inline bytes 帶入 PDF 的 StructuredCall（同步與 async 共用；沒有 File 可供 CachedContent 使用）。
+        protos.Blob 只接受 bytes，分段下載回傳的 bytearray 在此轉換（僅限 MAX_INLINE_BYTES 以內的小檔）。
+        """
+        if len(data) > MAX_INLINE_BYTES:
+            raise ValueError(f"Inline PDF too large: {len(data)} bytes (max {MAX_INLINE_BYTES})")
+        return StructuredCall(
+            model=self._get_structured_model(),
+            contents=[self._prompt, {"mime_type": mime_type, "data": bytes(data)}],
+            tokens=estimate_tokens(len(data)),
+            generation_config=self.schema_generation_config,
         )
-        prompt = "請依 System Instruction 分析此 PDF，輸出每頁的 page 與 elements（圖片與文字塊）JSON 陣列。"
-        response = model.generate_content([prompt, file_obj])
-        return self._parse_response_to_page_blocks(response)
 
-    def _parse_response_to_page_blocks(self, response) -> list[PageBlock]:
-        """將 Gemini 結構化回應轉成 PageBlock 列表。"""
-        blocks: list[PageBlock] = []
-        text = (response.text or "").strip()
-        if not text:
-            return blocks
-        # 去除可能的 markdown 程式碼區塊
-        if text.startswith("```"):
-            lines = text.split("\n")
-            if lines[0].startswith("```"):
-                lines = lines[1:]
-            if lines and lines[-1].strip() == "```":
-                lines = lines[:-1]
-            text = "\n".join(lines)
+    def _iter_structured(self, call: StructuredCall) -> Iterator[PageBlock]:
+        """
+        依 StructuredCall 逐輪生成（截斷時接續），每頁完整即交出。
+        最後一輪不完整（搶救、退回文字塊或截斷後放棄）時，所有已交出的頁面標記 partial。
+        """
+        after_page = 0
+        emitted: list[PageBlock] = []
+        for round_index in range(self._max_continuations + 1):
+            assembler = PageStreamAssembler(after_page=after_page)
+            request = self.continuation_contents(call.contents, after_page)
+            for block in self._structured_pass(call, request, assembler):
+                emitted.append(block)
+                yield block
+            after_page = self.next_continuation(assembler, round_index)
+            if after_page is None:
+                if not assembler.complete:
+                    mark_partial(emitted)
+                return
+
+    def structured_call(self, file_uri: str, size_bytes: int = 0) -> StructuredCall:
+        """
+        結構化解析的 StructuredCall（同步與 async 共用）：gs:// URI 交由 Vertex 後端直接讀取 GCS，
+        File API URI 則 get_file 後沿用 structured_request（可用 CachedContent）。
+        """
+        if is_gcs_uri(file_uri):
+            vertex = self._require_vertex(file_uri)
+            config = None
+            if self._response_schema:
+                config = vertex.generation_config(to_rest_schema(PAGE_BLOCKS_RESPONSE_SCHEMA))
+            return StructuredCall(
+                model=vertex.model(MODEL_NAME, self._instruction),
+                contents=[self._prompt, vertex.file_part(file_uri)],
+                tokens=estimate_tokens(size_bytes),
+                generation_config=config,
+            )
+        file_obj = self.get_file(file_name_from_uri(file_uri))
+        model, contents = self.structured_request(file_obj)
+        return StructuredCall(
+            model=model,
+            contents=contents,
+            tokens=estimate_file_tokens(file_obj),
+            generation_config=self.schema_generation_config,
+        )
+
+    def reads_gcs_uri(self, size_bytes: int) -> bool:
+        """有 Vertex 後端且檔案未超過其上限時，解析方法可直接接受 gs:// URI（不需下載與上傳）。"""
+        return self._vertex is not None and self._vertex.accepts(size_bytes)
+
+    @property
+    def vertex(self) -> VertexGeminiBackend | None:
+        """可直接讀取 gs:// 的 Vertex AI 後端（未啟用時為 None）。"""
+        return self._vertex
+
+    def _require_vertex(self, file_uri: str) -> VertexGeminiBackend:
+        if self._vertex is None:
+            raise ValueError(f"gs:// URI requires the Vertex AI backend: {file_uri}")
+        return self._vertex
+
+    def _structured_pass(
+        self, call: StructuredCall, contents: list, assembler: "PageStreamAssembler"
+    ) -> Iterator[PageBlock]:
+        """一次結構化生成（schema 模式或串流），頁面經 assembler 交出，截斷狀態留在 assembler。"""
+        model, tokens = call.model, call.tokens
+        if call.generation_config is not None:
+            for attempt in range(1, self.schema_attempts + 1):
+                response = self._generate(model, contents, tokens=tokens, generation_config=call.generation_config)
+                if is_truncated(response):
+                    yield from assembler.feed_chunk(response)
+                    yield from assembler.finish()
+                    return
+                blocks = self.validate_schema_output(response, attempt)
+                if blocks is not None:
+                    yield from assembler.accept(blocks, validated=True)
+                    return
+        for chunk in self._generate_stream(model, contents, tokens=tokens):
+            yield from assembler.feed_chunk(chunk)
+        yield from assembler.finish()
+
+    def continuation_contents(self, contents: list, after_page: int) -> list:
+        """接續請求的 contents：原本的 prompt（與 File）之後加上「只輸出 after_page 之後頁面」的指示。"""
+        if after_page <= 0:
+            return contents
+        return [*contents, CONTINUATION_PROMPT.format(page=after_page, next_page=after_page + 1)]
+
+    def next_continuation(self, assembler: "PageStreamAssembler", round_index: int) -> int | None:
+        """
+        一次生成結束後決定是否接續（同步與 async 共用）：因 token 上限截斷且有新完成的頁面時，
+        回傳下一輪的起點（最後一個完整頁碼）；輸出完整、沒有進展或已達 max_continuations 時回傳 None。
+        """
+        if not assembler.truncated:
+            return None
+        with self._schema_lock:
+            self._continuation_stats["truncated"] += 1
+        if assembler.last_page <= assembler.after_page or round_index >= self._max_continuations:
+            with self._schema_lock:
+                self._continuation_stats["incomplete"] += 1
+            logger.warning(
+                "Structured parse truncated after page %s, giving up (round %s)", assembler.last_page, round_index
+            )
+            return None
+        with self._schema_lock:
+            self._continuation_stats["continuations"] += 1
+        logger.info("Structured parse truncated at token limit after page %s, continuing", assembler.last_page)
+        return assembler.last_page
+
+    def structured_batch_request(self, file_uri: str) -> dict:
+        """
+        結構化解析的 GenerateContentRequest JSON（供 Batch API）：System Instruction、prompt 與 File 與互動呼叫相同，
+        response_schema 模式一併帶入 schema，輸出可與互動結果共用快取。
+        """
+        request = {
+            "system_instruction": {"parts": [{"text": self._instruction}]},
+            "contents": [
+                {
+                    "role": "user",
+                    "parts": [
+                        {"text": self._prompt},
+                        {"file_data": {"mime_type": "application/pdf", "file_uri": file_uri}},
+                    ],
+                }
+            ],
+        }
+        if self._response_schema:
+            request["generation_config"] = {
+                "response_mime_type": "application/json",
+                "response_schema": to_rest_schema(PAGE_BLOCKS_RESPONSE_SCHEMA),
+            }
+        return request
+
+    def parse_batch_output(self, text: str) -> list[PageBlock]:
+        """
+        以與串流相同的規則將 batch 回應文字轉為 PageBlock（保留完整頁面，無頁面時退回文字塊）；
+        輸出不完整時頁面標記 partial。
+        """
+        assembler = PageStreamAssembler()
+        blocks = assembler.feed(text) + assembler.finish()
+        if not assembler.complete:
+            mark_partial(blocks)
+        return blocks
+
+    @property
+    def batch_client(self) -> GeminiBatchClient | None:
+        """Gemini Batch API Client；無 API key（由環境設定 genai）時為 None。"""
+        return self._batch
+
+    def continuation_stats(self) -> dict[str, int]:
+        """truncated（輸出達 token 上限）、continuations（接續請求）、incomplete（仍未完整即放棄）次數。"""
+        with self._schema_lock:
+            return dict(self._continuation_stats)
+
+    def structured_request(self, file_obj) -> tuple[genai.GenerativeModel, list]:
+        """
+        結構化解析的 (model, contents)：有可用的 CachedContent 時 File 與共用指令已在快取中，
+        結構化規則改放在 user prompt；否則為含 System Instruction 的 model + [prompt, File]。
+        """
+        cached = self._cached_model(file_obj)
+        if cached is not None:
+            return cached, [f"{self._instruction}\n\n{self._prompt}"]
+        return self._get_structured_model(), [self._prompt, file_obj]
+
+    def ask_document(self, file_uri: str, question: str) -> str:
+        """針對同一份 PDF 的後續提問（例如商品層級的問題），有 CachedContent 時不再重送整份 PDF。"""
+        model, contents, tokens = self._document_call(file_uri, question)
+        response = self._generate(model, contents, tokens=tokens)
+        return _chunk_text(response).strip()
+
+    def _generate(self, model, contents: list, tokens: int, **kwargs):
+        """經限流的 generate_content；有 hedger 時逾時未回應即送出對沖請求。"""
+        if self._hedger is None:
+            return self._limiter.call(model.generate_content, contents, tokens=tokens, **kwargs)
+        return self._hedger.call(self._limiter.call, model.generate_content, contents, tokens=tokens, **kwargs)
+
+    def _generate_stream(self, model, contents: list, tokens: int) -> Iterator:
+        """經限流的串流 generate_content；有 hedger 時以第一個片段的等待時間決定是否對沖。"""
+        if self._hedger is None:
+            return self._limiter.stream(model.generate_content, contents, tokens=tokens, stream=True)
+        return self._hedger.stream(self._limiter.stream, model.generate_content, contents, tokens=tokens, stream=True)
+
+    @property
+    def hedger(self) -> HedgedCaller | None:
+        """generate_content 的對沖呼叫器（未啟用時為 None）。"""
+        return self._hedger
+
+    def hedge_stats(self) -> dict[str, float]:
+        """對沖請求的送出數、勝出數與比例；未啟用時為空。"""
+        return self._hedger.stats() if self._hedger is not None else {}
+
+    def context_cache_stats(self) -> dict[str, int]:
+        """CachedContent 的建立、命中、延長與退回次數；未啟用時為空。"""
+        return self._context_cache.stats() if self._context_cache is not None else {}
+
+    def _cached_model(self, file_obj):
+        if self._context_cache is None:
+            return None
+        return self._context_cache.model_for(file_obj)
+
+    def _document_call(self, file_uri: str, prompt: str) -> tuple[Any, list, int]:
+        """一般分析的 (model, contents, tokens)：gs:// URI 交由 Vertex 後端，否則為 File API（可用 CachedContent）。"""
+        if is_gcs_uri(file_uri):
+            vertex = self._require_vertex(file_uri)
+            return vertex.model(MODEL_NAME), [prompt, vertex.file_part(file_uri)], estimate_tokens(0)
+        file_obj = self.get_file(file_name_from_uri(file_uri))
+        model, contents = self._document_request(file_obj, prompt)
+        return model, contents, estimate_file_tokens(file_obj)
+
+    def _document_request(self, file_obj, prompt: str) -> tuple[genai.GenerativeModel, list]:
+        """一般分析的 (model, contents)：優先使用 CachedContent，否則為 [prompt, File]。"""
+        cached = self._cached_model(file_obj)
+        if cached is not None:
+            return cached, [prompt]
+        return self._model, [prompt, file_obj]
+
+    def get_file(self, file_name: str):
+        """genai.get_file（經限流，不佔並行名額）。"""
+        return self._limiter.call(genai.get_file, file_name, bounded=False)
+
+    @property
+    def rate_limiter(self) -> GeminiRateLimiter:
+        """Gemini 呼叫共用的限流器（async Client 以 call_async／astream 共用同一組配額）。"""
+        return self._limiter
+
+    @property
+    def schema_generation_config(self) -> genai.GenerationConfig | None:
+        """response_schema 模式的 GenerationConfig；未開啟時為 None。"""
+        if not self._response_schema:
+            return None
+        return genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=PAGE_BLOCKS_RESPONSE_SCHEMA,
+        )
+
+    @property
+    def schema_attempts(self) -> int:
+        """response_schema 模式每次解析最多呼叫模型的次數（首次 + 重試）。"""
+        return self._schema_retries + 1
+
+    def validate_schema_output(self, response, attempt: int) -> list[PageBlock] | None:
+        """
+        以 TypeAdapter.validate_json 直接將回應驗證為 PageBlock 列表（同步與 async 共用）。
+        格式錯誤且仍可重試時回傳 None，由呼叫端重新呼叫；最後一次仍失敗時搶救已完整的頁面（標記 partial）。
+        """
+        raw = _chunk_text(response)
+        with self._schema_lock:
+            self._schema_stats["attempts"] += 1
+            if attempt == 1:
+                self._schema_stats["calls"] += 1
+            else:
+                self._schema_stats["retries"] += 1
         try:
-            data = json.loads(text)
-            if isinstance(data, list):
-                for item in data:
-                    if isinstance(item, dict) and "page" in item:
-                        elts = [
-                            BlockElement(
-                                type=e.get("type", "text"),
-                                content=e.get("content", ""),
-                                description=e.get("description", "") or e.get("summary", ""),
-                            )
-                            for e in item.get("elements", [])
-                        ]
-                        blocks.append(PageBlock(page=int(item.get("page", item.get("page_number", 1))), elements=elts))
-        except (json.JSONDecodeError, TypeError, KeyError):
-            blocks.append(
-                PageBlock(
-                    page=1,
-                    elements=[BlockElement(type="text", content=text[:10000], description="")],
-                )
+            return _PAGE_BLOCKS.validate_json(raw)
+        except ValidationError as e:
+            with self._schema_lock:
+                self._schema_stats["malformed"] += 1
+            logger.warning(
+                "Schema output malformed (attempt %s/%s): %s", attempt, self.schema_attempts, e.errors()[0]["msg"]
             )
+        if attempt < self.schema_attempts:
+            return None
+        with self._schema_lock:
+            self._schema_stats["salvaged"] += 1
+        assembler = PageStreamAssembler()
+        blocks = assembler.feed(raw) + assembler.finish()
+        mark_partial(blocks)
         return blocks
 
+    def schema_stats(self) -> dict[str, int]:
+        """
+        response_schema 模式統計：calls（解析次數）、attempts（模型呼叫次數）、malformed（格式錯誤）、
+        retries（因格式錯誤重新呼叫）、salvaged（重試用盡後改為搶救頁面）。
+        """
+        with self._schema_lock:
+            return dict(self._schema_stats)
+
+    @property
+    def structured_model(self):
+        """結構化解析用的 GenerativeModel（async Client 以 generate_content_async 共用同一個實例）。"""
+        return self._get_structured_model()
+
+    @property
+    def file_poller(self) -> FileReadyPoller:
+        """就緒輪詢器（async Client 以 wait_many_async 共用歷史處理時間與統計）。"""
+        return self._poller
+
+    def _get_structured_model(self):
+        """結構化解析用的 GenerativeModel（含 System Instruction），建立一次後重複使用。"""
+        if self._structured_model is None:
+            self._structured_model = genai.GenerativeModel(
+                MODEL_NAME,
+                system_instruction=self._instruction,
+            )
+        return self._structured_model
+
     def parse_pdf_with_file_uri(self, file_uri: str) -> list[PageExtract]:
         """
         以 File API 回傳的 file URI 呼叫 generate_content，解析 PDF 並回傳結構化結果。
         google.generativeai 無 genai.types.Part，改以 genai.get_file(file_name) 取得檔案物件傳入。
+        有 Vertex 後端時也接受 gs:// URI。
         """
-        file_name = file_uri.replace("https://generativelanguage.googleapis.com/v1beta/", "").strip()
-        if not file_name:
-            raise ValueError("Invalid file_uri: " + file_uri)
-        file_obj = genai.get_file(file_name)
         prompt = "請分析此 PDF，針對每一頁或每個圖文區塊，輸出：group_id、視覺摘要(visual_summary)、對應文字(associated_text)、頁碼(page_number)。"
-        response = self._model.generate_content([prompt, file_obj])
+        model, contents, tokens = self._document_call(file_uri, prompt)
+        response = self._generate(model, contents, tokens=tokens)
         return self._parse_response_to_page_extracts(response)
 
     def _parse_response_to_page_extracts(self, response) -> list[PageExtract]:
@@ -182,3 +766,181 @@ class GeminiFileClient:
                 )
             )
         return extracts
+
+
+class PageStreamAssembler:
+    """
+    將結構化回應的文字片段組成 PageBlock，每頁物件一完整即交出；同步與 async 串流共用。
+    尾端截斷或格式錯誤時保留已完成的頁面；完全解析不出頁面時，finish() 以整段文字作為第 1 頁。
+    after_page > 0（接續請求）時略過不大於 after_page 的重複頁面，且不產生退回文字塊。
+    """
+
+    def __init__(self, after_page: int = 0) -> None:
+        self._parser = JsonArrayStreamParser()
+        self._raw_parts: list[str] = []
+        self._emitted = 0
+        self._start = time.monotonic()
+        self.after_page = after_page
+        self.last_page = after_page
+        self.truncated = False
+        self._validated = False
+
+    def feed(self, text: str) -> list[PageBlock]:
+        """加入一段回應文字，回傳本次新完成的頁面。"""
+        if not text:
+            return []
+        if self._emitted == 0:
+            self._raw_parts.append(text)
+        blocks = [b for b in map(_page_block_from_item, self._parser.feed(text)) if b is not None]
+        if blocks and self._emitted == 0:
+            logger.info("Structured parse: first page after %.1fs", time.monotonic() - self._start)
+            self._raw_parts.clear()
+        return self.accept(blocks)
+
+    def accept(self, blocks: list[PageBlock], validated: bool = False) -> list[PageBlock]:
+        """
+        登記已完成的頁面（略過接續前已交出的頁碼），回傳應交出的頁面。
+        validated=True 表示 blocks 為整份通過 schema 驗證的回應（不經串流解析器）。
+        """
+        if validated:
+            self._validated = not any(b.partial for b in blocks)
+        fresh = [b for b in blocks if b.page > self.after_page]
+        self._emitted += len(fresh)
+        if fresh:
+            self.last_page = max(self.last_page, max(b.page for b in fresh))
+        return fresh
+
+    def feed_chunk(self, chunk) -> list[PageBlock]:
+        """加入一個回應片段（GenerateContentResponse），回傳本次新完成的頁面；最後一個片段帶有 finish_reason。"""
+        if is_truncated(chunk):
+            self.truncated = True
+        return self.feed(_chunk_text(chunk))
+
+    @property
+    def complete(self) -> bool:
+        """
+        輸出是否完整：未截斷、JSON 陣列完整結束且未略過格式錯誤的項目（或整份通過 schema 驗證）；
+        首輪另需至少一個頁面（退回文字塊不算完整）。
+        """
+        if self.truncated:
+            return False
+        if not self._validated and (not self._parser.finished or self._parser.skipped):
+            return False
+        return self._emitted > 0 or self.after_page > 0
+
+    def finish(self) -> list[PageBlock]:
+        """回應結束：沒有任何頁面時回傳退回的文字塊，否則記錄搶救情形並回傳空列表。"""
+        if self._emitted == 0:
+            if self.after_page > 0:
+                return []
+            return _fallback_text_block("".join(self._raw_parts))
+        if not self._parser.finished or self._parser.skipped:
+            logger.warning(
+                "Structured parse: salvaged %s pages (skipped %s malformed, tail %r)",
+                self._emitted,
+                self._parser.skipped,
+                self._parser.remainder[:80],
+            )
+        return []
+
+
+def file_name_from_uri(file_uri: str) -> str:
+    """由 file URI 取出 File 名稱（files/xxx）；無效時拋 ValueError。"""
+    file_name = file_uri.replace(FILE_URI_PREFIX, "").strip()
+    if not file_name:
+        raise ValueError("Invalid file_uri: " + file_uri)
+    return file_name
+
+
+def _fallback_text_block(text: str) -> list[PageBlock]:
+    """無法解析出任何頁面時，將去除 markdown 包裝後的文字（前 10000 字）作為第 1 頁（標記 partial）。"""
+    text = text.strip()
+    if not text:
+        return []
+    if text.startswith("```"):
+        lines = text.split("\n")
+        if lines[0].startswith("```"):
+            lines = lines[1:]
+        if lines and lines[-1].strip() == "```":
+            lines = lines[:-1]
+        text = "\n".join(lines)
+    return [
+        PageBlock(page=1, elements=[BlockElement(type="text", content=text[:10000], description="")], partial=True)
+    ]
+
+
+def mark_partial(blocks: list[PageBlock]) -> None:
+    """將解析不完整的頁面標記 partial（同一批物件，已交給呼叫端的列表一併生效）。"""
+    for block in blocks:
+        block.partial = True
+
+
+def estimate_file_tokens(file_obj) -> int:
+    """由 File 的 size_bytes 粗估輸入 token 數（供限流使用）。"""
+    try:
+        return estimate_tokens(int(file_obj.size_bytes or 0))
+    except (AttributeError, TypeError, ValueError):
+        return estimate_tokens(0)
+
+
+def is_truncated(response) -> bool:
+    """回應（或串流的最後一個片段）是否因輸出 token 上限而中斷（finish_reason=MAX_TOKENS）。"""
+    try:
+        candidates = response.candidates
+        reason = candidates[0].finish_reason if candidates else None
+    except (AttributeError, IndexError, TypeError):
+        return False
+    return getattr(reason, "name", reason) == "MAX_TOKENS"
+
+
+def _chunk_text(chunk) -> str:
+    """取得串流片段文字；安全過濾等原因沒有 parts 時 .text 會拋 ValueError，視為空字串。"""
+    try:
+        return chunk.text or ""
+    except ValueError:
+        return ""
+
+
+def _page_block_from_item(item) -> PageBlock | None:
+    """將模型輸出的單頁物件（或精簡格式的單頁陣列）轉成 PageBlock；非頁面物件或欄位型別錯誤時回傳 None。"""
+    if isinstance(item, list):
+        return _page_block_from_compact(item)
+    if not isinstance(item, dict) or ("page" not in item and "page_number" not in item):
+        return None
+    try:
+        elements = [
+            BlockElement(
+                type=e.get("type", "text"),
+                content=e.get("content", ""),
+                description=e.get("description", "") or e.get("summary", ""),
+            )
+            for e in item.get("elements", [])
+            if isinstance(e, dict)
+        ]
+        return PageBlock(page=int(item.get("page", item.get("page_number", 1))), elements=elements)
+    except (TypeError, ValueError) as e:
+        logger.warning("Skip malformed page object: %s", e)
+        return None
+
+
+def _page_block_from_compact(item: list) -> PageBlock | None:
+    """
+    精簡格式 [頁碼, [種類, 文字], ...] 展開為 PageBlock：種類 "i" 為圖片（文字為描述，content 留空待填入），
+    其餘為文字塊。頁碼不是整數或元素格式錯誤時略過。
+    """
+    if not item or isinstance(item[0], bool):
+        return None
+    try:
+        page = int(item[0])
+    except (TypeError, ValueError):
+        logger.warning("Skip malformed compact page: %.80s", item)
+        return None
+    elements: list[BlockElement] = []
+    for pair in item[1:]:
+        if not isinstance(pair, list) or len(pair) < 2 or not isinstance(pair[1], str):
+            continue
+        if pair[0] == "i":
+            elements.append(BlockElement(type="image", content="", description=pair[1]))
+        else:
+            elements.append(BlockElement(type="text", content=pair[1], description=""))
+    return PageBlock(page=page, elements=elements)
@@ -0,0 +1,101 @@
+"""
+Gemini File API 上傳快取：以內容 SHA-256 對應已上傳的 File 名稱（files/xxx），相同內容不再重新上傳。
+
+- File API 物件約保留 48 小時；快取項目 TTL 取較短的 46 小時，避免用到即將過期的檔案。
+- 先查 process 內記憶體，未命中再查 GCS（選用，跨 instance 共用）；GCS 讀寫失敗只記 log、視為未命中。
+- 本模組只負責「內容 → 檔名」的對應；檔案是否仍為 ACTIVE 由 GeminiFileClient 以 get_file 確認。
+"""
+
+import json
+import logging
+import threading
+import time
+
+from src.clients.gcs_client import GCSClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FILE_CACHE_PREFIX = "gemini-files/"
+DEFAULT_TTL_SECONDS = 46 * 3600
+
+
+class GeminiFileCache:
+    """執行緒安全的 SHA-256 → File API 檔名對應表，可選擇持久化於 GCS。"""
+
+    def __init__(
+        self,
+        store: GCSClient | None = None,
+        prefix: str = DEFAULT_FILE_CACHE_PREFIX,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ) -> None:
+        self._store = store
+        self._prefix = prefix
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[str, float]] = {}
+        self._stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+    def get(self, digest: str) -> str | None:
+        """回傳未過期的 File 名稱；記憶體未命中時查 GCS 並回填。"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[1] > now:
+                self._stats["hits"] += 1
+                return entry[0]
+            self._entries.pop(digest, None)
+
+        entry = self._load(digest)
+        with self._lock:
+            if entry is None or entry[1] <= now:
+                self._stats["misses"] += 1
+                return None
+            self._entries[digest] = entry
+            self._stats["hits"] += 1
+        return entry[0]
+
+    def put(self, digest: str, file_name: str) -> None:
+        """登記剛上傳的 File 名稱（到期時間由現在起算 TTL）。"""
+        expires_at = time.time() + self._ttl
+        with self._lock:
+            self._entries[digest] = (file_name, expires_at)
+        if self._store is None:
+            return
+        payload = json.dumps({"name": file_name, "expires_at": int(expires_at)}).encode("utf-8")
+        try:
+            self._store.upload_bytes(self._object_path(digest), payload, content_type="application/json")
+        except Exception as e:
+            logger.warning("GeminiFileCache put failed for %s: %s", digest[:12], e)
+
+    def forget(self, digest: str) -> None:
+        """遠端檔案已失效（過期、FAILED、被刪除）時移除對應。"""
+        with self._lock:
+            self._entries.pop(digest, None)
+            self._stats["invalidated"] += 1
+        if self._store is None:
+            return
+        try:
+            self._store.delete_blob(self._object_path(digest))
+        except Exception as e:
+            logger.warning("GeminiFileCache forget failed for %s: %s", digest[:12], e)
+
+    def stats(self) -> dict[str, int]:
+        """回傳 hits、misses、invalidated 計數。"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _load(self, digest: str) -> tuple[str, float] | None:
+        if self._store is None:
+            return None
+        try:
+            raw = self._store.read_blob_bytes_or_none(self._object_path(digest))
+            if raw is None:
+                return None
+            data = json.loads(raw)
+            return str(data["name"]), float(data["expires_at"])
+        except Exception as e:
+            logger.warning("GeminiFileCache get failed for %s: %s", digest[:12], e)
+            return None
+
+    def _object_path(self, digest: str) -> str:
+        return f"{self._prefix}{digest}.json"
@@ -0,0 +1,228 @@
+"""
+Gemini File API resumable 上傳協定（分塊、可續傳）。
+
+google.generativeai.upload_file 雖使用 resumable 協定，但 session 不對外公開，
+中斷後只能從頭重傳；150MB 在 GCF 上重傳一次就是數十秒。此模組直接實作協定：
+- start：POST /upload/v1beta/files 取得 session URL（X-Goog-Upload-URL）。
+- upload：依 X-Goog-Upload-Offset 分塊 POST，最後一塊帶 finalize，回應含 File 資源。
+- query：中斷後詢問已確認的位元組數（X-Goog-Upload-Size-Received），從該 offset 續傳。
+- 暫時性失敗（連線中斷、5xx、429）於 start 與各分塊皆以同一個續傳迴圈退避重試；
+  429 對應 google.api_core TooManyRequests，用完續傳次數時拋 UploadThrottled，由 GeminiRateLimiter 退避並縮減並行上限。
+來源為可 seek 的檔案物件（本機檔或 BytesIO），不需先寫暫存檔。
+"""
+
+import logging
+import threading
+import time
+from typing import Any, BinaryIO
+
+import requests
+from google.api_core import exceptions as google_exceptions
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ENDPOINT = "https://generativelanguage.googleapis.com/upload/v1beta/files"
+# 分塊大小需為 256KiB 的倍數（最後一塊除外）
+CHUNK_GRANULARITY = 256 * 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_RESUMES = 3
+DEFAULT_REQUEST_TIMEOUT = 120.0
+# 同一次呼叫內暫時性失敗後的退避（秒），依續傳次數指數成長
+DEFAULT_RETRY_BACKOFF = 1.0
+
+
+class UploadInterrupted(ConnectionError):
+    """分塊上傳中斷且本次呼叫已用完續傳次數；session_url 為 None 表示 session 已失效，需重新開始。"""
+
+    def __init__(self, message: str, session_url: str | None, offset: int) -> None:
+        super().__init__(message)
+        self.session_url = session_url
+        self.offset = offset
+
+
+class UploadThrottled(UploadInterrupted, google_exceptions.TooManyRequests):
+    """因 429 中斷：同時是 UploadInterrupted（可續傳）與 TooManyRequests（限流器據此退避並縮減並行上限）。"""
+
+    def __init__(self, message: str, session_url: str | None, offset: int) -> None:
+        UploadInterrupted.__init__(self, message, session_url, offset)
+        google_exceptions.TooManyRequests.__init__(self, message)
+
+
+# 可於同一次呼叫內退避後重試的失敗：連線中斷、逾時、5xx（ConnectionError）與 429
+_TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, ConnectionError, google_exceptions.TooManyRequests)
+
+
+class ResumableUploader:
+    """以 API key 執行 File API resumable 上傳，記錄吞吐量與續傳次數。執行緒安全。"""
+
+    def __init__(
+        self,
+        api_key: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_resumes: int = DEFAULT_MAX_RESUMES,
+        timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        session: requests.Session | None = None,
+        retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+    ) -> None:
+        if chunk_size <= 0 or chunk_size % CHUNK_GRANULARITY:
+            raise ValueError(f"chunk_size must be a positive multiple of {CHUNK_GRANULARITY}")
+        self._api_key = api_key
+        self._chunk_size = chunk_size
+        self._max_resumes = max_resumes
+        self._timeout = timeout
+        self._retry_backoff = retry_backoff
+        self._http = session or requests.Session()
+        self._lock = threading.Lock()
+        self._stats = {"uploads": 0, "bytes": 0, "seconds": 0.0, "resumes": 0, "restarts": 0}
+
+    def upload(
+        self,
+        stream: BinaryIO,
+        size: int,
+        mime_type: str = "application/pdf",
+        display_name: str | None = None,
+        session_url: str | None = None,
+    ) -> dict[str, Any]:
+        """
+        上傳 stream 的 [0, size) 並回傳 File 資源（含 name）。
+        傳入先前中斷的 session_url 時先查詢已確認的 offset，從該處續傳；session 已失效則重新開始。
+        本次呼叫內的暫時性失敗（含開啟 session）最多重試 max_resumes 次，仍失敗時拋 UploadInterrupted
+        （429 為 UploadThrottled）供呼叫端下次續傳。
+        """
+        start = time.monotonic()
+        offset = 0
+        if session_url is not None:
+            acked = self._query(session_url)
+            if isinstance(acked, dict):
+                return acked
+            if acked is None:
+                self._count("restarts")
+                session_url = None
+            else:
+                offset = acked
+                self._count("resumes")
+                logger.info("Resuming Gemini upload at %s/%s bytes", offset, size)
+
+        sent_from = offset
+        retries = 0
+        while True:
+            try:
+                if session_url is None:
+                    session_url = self._start(size, mime_type, display_name)
+                stream.seek(offset)
+                chunk = stream.read(self._chunk_size)
+                last = offset + len(chunk) >= size
+                resp = self._post(
+                    session_url,
+                    data=chunk,
+                    headers={
+                        "Content-Length": str(len(chunk)),
+                        "X-Goog-Upload-Offset": str(offset),
+                        "X-Goog-Upload-Command": "upload, finalize" if last else "upload",
+                    },
+                )
+            except _TRANSIENT_ERRORS as e:
+                if retries >= self._max_resumes:
+                    raise self._interrupted(e, session_url, offset) from e
+                time.sleep(self._retry_backoff * (2**retries))
+                retries += 1
+                if session_url is None:
+                    logger.warning("Gemini upload start failed (%s), retrying", e)
+                    continue
+                acked = self._query(session_url)
+                if isinstance(acked, dict):
+                    return self._finish(acked, size - sent_from, start)
+                if acked is None:
+                    raise UploadInterrupted(f"Gemini upload session lost: {e}", None, 0) from e
+                self._count("resumes")
+                logger.warning("Gemini upload chunk at %s failed (%s), resuming at %s", offset, e, acked)
+                offset = acked
+                continue
+            offset += len(chunk)
+            if last:
+                return self._finish(resp.json()["file"], size - sent_from, start)
+
+    def stats(self) -> dict[str, float]:
+        """回傳 uploads、bytes、seconds、throughput_mbps（MB/s）、resumes、restarts。"""
+        with self._lock:
+            stats = dict(self._stats)
+        seconds = stats["seconds"]
+        stats["throughput_mbps"] = (stats["bytes"] / 1e6 / seconds) if seconds else 0.0
+        return stats
+
+    def _start(self, size: int, mime_type: str, display_name: str | None) -> str:
+        """開啟 resumable session，回傳 session URL。"""
+        body = {"file": {"display_name": display_name}} if display_name else {}
+        resp = self._post(
+            UPLOAD_ENDPOINT,
+            params={"key": self._api_key},
+            json=body,
+            headers={
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(size),
+                "X-Goog-Upload-Header-Content-Type": mime_type,
+            },
+        )
+        session_url = resp.headers.get("X-Goog-Upload-URL")
+        if not session_url:
+            raise RuntimeError("Gemini upload start returned no X-Goog-Upload-URL")
+        return session_url
+
+    def _query(self, session_url: str) -> int | dict[str, Any] | None:
+        """
+        查詢 session 狀態：active 回傳已確認位元組數；final 回傳 File 資源（finalize 已成功但回應遺失）；
+        session 已失效或查詢失敗回傳 None。
+        """
+        try:
+            resp = self._post(session_url, headers={"X-Goog-Upload-Command": "query"})
+        except (requests.RequestException, ConnectionError, google_exceptions.TooManyRequests, RuntimeError) as e:
+            logger.warning("Gemini upload query failed: %s", e)
+            return None
+        status = resp.headers.get("X-Goog-Upload-Status", "")
+        if status == "final":
+            try:
+                return resp.json()["file"]
+            except (ValueError, KeyError):
+                return None
+        if status != "active":
+            return None
+        return int(resp.headers.get("X-Goog-Upload-Size-Received", "0"))
+
+    def _post(self, url: str, **kwargs: Any) -> requests.Response:
+        """429 拋 TooManyRequests、5xx 拋 ConnectionError（皆可重試），其他 4xx 拋 RuntimeError。"""
+        resp = self._http.post(url, timeout=self._timeout, **kwargs)
+        if resp.status_code == 429:
+            raise google_exceptions.TooManyRequests(f"Gemini upload throttled: HTTP {resp.status_code}")
+        if resp.status_code >= 500:
+            raise ConnectionError(f"Gemini upload failed: HTTP {resp.status_code}")
+        if resp.status_code >= 400:
+            raise RuntimeError(f"Gemini upload failed: HTTP {resp.status_code} {resp.text[:200]}")
+        return resp
+
+    @staticmethod
+    def _interrupted(error: Exception, session_url: str | None, offset: int) -> UploadInterrupted:
+        """用完重試次數時的例外：保留 session 與 offset；最後一次失敗為 429 時為 UploadThrottled。"""
+        message = f"Gemini upload interrupted at {offset}: {error}"
+        if isinstance(error, google_exceptions.TooManyRequests):
+            return UploadThrottled(message, session_url, offset)
+        return UploadInterrupted(message, session_url, offset)
+
+    def _finish(self, file_resource: dict[str, Any], sent: int, start: float) -> dict[str, Any]:
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._stats["uploads"] += 1
+            self._stats["bytes"] += sent
+            self._stats["seconds"] += elapsed
+        logger.info(
+            "Gemini upload %s: %s bytes in %.1fs (%.1f MB/s)",
+            file_resource.get("name"),
+            sent,
+            elapsed,
+            (sent / 1e6 / elapsed) if elapsed else 0.0,
+        )
+        return file_resource
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
@@ -0,0 +1,233 @@
+"""
+generate_content 的請求對沖（hedging）：壓低偶發慢 replica 造成的長尾延遲。
+
+- 第一個呼叫在「近期延遲的 percentile」內未完成時，送出第二個相同的呼叫，取先完成者，另一個取消或忽略。
+- 對沖比例有上限（max_hedge_ratio，對沖數 / 呼叫數），成本最多增加該比例。
+- 樣本不足 min_samples 時以 initial_delay 作為等待時間，避免冷啟動時過早對沖。
+- 串流呼叫以「取得第一個片段」為準：先交出第一個片段的串流勝出，落敗的串流關閉（釋放限流名額）。
+  非串流（整份回應）與串流（第一個片段）的延遲分布差異很大，各自保留延遲樣本與 percentile。
+- 任一呼叫先失敗時等待另一個；兩者皆失敗才拋出第一個呼叫的例外。
+- stats()：calls、hedged（送出對沖數）、won（對沖呼叫先完成的次數）、兩種呼叫目前的對沖等待秒數。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_MAX_HEDGE_RATIO = 0.05
+DEFAULT_MIN_SAMPLES = 20
+DEFAULT_INITIAL_DELAY = 60.0
+DEFAULT_WINDOW = 200
+DEFAULT_MAX_WORKERS = 32
+
+# 延遲樣本的種類：非串流呼叫的完整延遲、串流呼叫取得第一個片段的延遲
+KIND_CALL = "call"
+KIND_STREAM = "stream"
+
+_END = object()
+
+
+class HedgedCaller:
+    """執行緒安全的對沖呼叫器；同步呼叫在自有的執行緒池中執行，async 呼叫以 Task 執行。"""
+
+    def __init__(
+        self,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        max_hedge_ratio: float = DEFAULT_MAX_HEDGE_RATIO,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        initial_delay: float = DEFAULT_INITIAL_DELAY,
+        window: int = DEFAULT_WINDOW,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not 0.0 < percentile < 1.0:
+            raise ValueError("percentile must be between 0 and 1")
+        self._percentile = percentile
+        self._max_ratio = max_hedge_ratio
+        self._min_samples = min_samples
+        self._initial_delay = initial_delay
+        self._clock = clock
+        self._latencies: dict[str, deque[float]] = {
+            KIND_CALL: deque(maxlen=window),
+            KIND_STREAM: deque(maxlen=window),
+        }
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "hedged": 0, "won": 0}
+
+    def hedge_delay(self, kind: str = KIND_CALL) -> float:
+        """kind（call／stream）目前的對沖等待秒數：該種呼叫近期延遲的 percentile；樣本不足時為 initial_delay。"""
+        with self._lock:
+            latencies = self._latencies[kind]
+            if len(latencies) < self._min_samples:
+                return self._initial_delay
+            ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self._percentile))]
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """呼叫 fn；超過 hedge_delay 仍未完成且未達對沖上限時送出第二個相同呼叫，回傳先完成者。"""
+        return self._call(KIND_CALL, fn, *args, **kwargs)
+
+    def _call(self, kind: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        start = self._clock()
+        primary = self._executor.submit(fn, *args, **kwargs)
+        done, _ = wait([primary], timeout=self.hedge_delay(kind))
+        if done or not self._try_hedge():
+            result = primary.result()
+            self._record(kind, start)
+            return result
+
+        secondary = self._executor.submit(fn, *args, **kwargs)
+        winner = self._first_success(primary, secondary)
+        loser = secondary if winner is primary else primary
+        loser.cancel()
+        loser.add_done_callback(_close_stream)
+        self._record(kind, start, won=winner is secondary)
+        return winner.result()
+
+    def stream(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Iterator[Any]:
+        """
+        串流版：以取得第一個片段的時間決定是否對沖，之後沿用勝出的串流。
+        落敗的串流在其第一個片段到達後關閉。
+        """
+        def start() -> tuple[Iterator[Any], Any]:
+            iterator = iter(fn(*args, **kwargs))
+            return iterator, next(iterator, _END)
+
+        iterator, first = self._call(KIND_STREAM, start)
+        if first is _END:
+            return
+        yield first
+        yield from iterator
+
+    async def call_async(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """call 的 asyncio 版本：落敗的 Task 直接取消（連同其 HTTP 請求）。"""
+        return await self._call_async(KIND_CALL, fn, *args, **kwargs)
+
+    async def _call_async(self, kind: str, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        start = self._clock()
+        primary = asyncio.ensure_future(fn(*args, **kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay(kind))
+        if done or not self._try_hedge():
+            result = await primary
+            self._record(kind, start)
+            return result
+
+        secondary = asyncio.ensure_future(fn(*args, **kwargs))
+        pending = {primary, secondary}
+        winner = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if not task.cancelled() and task.exception() is None), None)
+            if winner is not None:
+                break
+        for task in (primary, secondary):
+            if task is winner:
+                continue
+            if task.done():
+                await _aclose_result(task)
+            else:
+                task.cancel()
+        if winner is None:
+            self._record(kind, start)
+            return primary.result()
+        self._record(kind, start, won=winner is secondary)
+        return winner.result()
+
+    async def astream(self, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        """stream 的 asyncio 版本：fn 回傳 async iterable（或回傳 async iterable 的 coroutine）。"""
+        async def start() -> tuple[AsyncIterator[Any], Any]:
+            source = fn(*args, **kwargs)
+            if asyncio.iscoroutine(source):
+                source = await source
+            iterator = source.__aiter__()
+            try:
+                return iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return iterator, _END
+            except asyncio.CancelledError:
+                # 落敗的串流：關閉以釋放限流名額
+                await _aclose(iterator)
+                raise
+
+        iterator, first = await self._call_async(KIND_STREAM, start)
+        if first is _END:
+            return
+        yield first
+        async for item in iterator:
+            yield item
+
+    def stats(self) -> dict[str, float]:
+        """回傳 calls、hedged、won、hedge_rate 與目前的對沖等待秒數（delay：非串流，stream_delay：串流）。"""
+        delay = self.hedge_delay(KIND_CALL)
+        stream_delay = self.hedge_delay(KIND_STREAM)
+        with self._lock:
+            stats = dict(self._stats)
+        stats["hedge_rate"] = round(stats["hedged"] / stats["calls"], 4) if stats["calls"] else 0.0
+        stats["delay"] = round(delay, 2)
+        stats["stream_delay"] = round(stream_delay, 2)
+        return stats
+
+    def _try_hedge(self) -> bool:
+        """未超過對沖比例上限時登記一次對沖並回傳 True。"""
+        with self._lock:
+            if self._stats["hedged"] + 1 > self._max_ratio * (self._stats["calls"] + 1):
+                return False
+            self._stats["hedged"] += 1
+        return True
+
+    def _first_success(self, primary: Future, secondary: Future) -> Future:
+        """回傳先成功完成的 Future；兩者皆失敗時回傳 primary（由呼叫端拋出其例外）。"""
+        pending = {primary, secondary}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future
+        return primary
+
+    def _record(self, kind: str, start: float, won: bool = False) -> None:
+        elapsed = self._clock() - start
+        with self._lock:
+            self._stats["calls"] += 1
+            self._latencies[kind].append(elapsed)
+            if won:
+                self._stats["won"] += 1
+        if won:
+            logger.info("Hedged request won after %.1fs", elapsed)
+
+
+def _close_stream(future: Future) -> None:
+    """落敗的串流呼叫完成後關閉其 iterator（同步串流）。"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    if isinstance(result, tuple) and result and hasattr(result[0], "close"):
+        result[0].close()
+
+
+async def _aclose_result(task: asyncio.Future) -> None:
+    """已完成但落敗的 async 串流呼叫：關閉其 iterator。"""
+    if task.cancelled() or task.exception() is not None:
+        return
+    result = task.result()
+    if isinstance(result, tuple) and result:
+        await _aclose(result[0])
+
+
+async def _aclose(iterator: Any) -> None:
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception as e:
+            logger.debug("Closing losing stream failed: %s", e)
@@ -0,0 +1,112 @@
+"""
+增量 JSON 陣列解析：模型以串流輸出 `[{...}, {...}, ...]` 時，每個頂層元素一完整就交出。
+
+- feed(text) 接收任意切分的片段，回傳本次新完成的元素；已交出的部分自緩衝區移除，記憶體只保留未完成的元素。
+- 容忍 ```json 程式碼區塊包裝與陣列前的說明文字（從第一個 '[' 開始解析）。
+- 字串內的括號與跳脫字元不影響深度判斷；單一元素 json.loads 失敗時略過該元素、繼續後面的元素。
+- 回應在中途截斷或尾端格式錯誤時，已完成的元素不受影響；remainder 為未能解析的尾端文字。
+"""
+
+import json
+import logging
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class JsonArrayStreamParser:
+    """逐段解析頂層 JSON 陣列，元素完整即交出。非執行緒安全，每個回應使用一個實例。"""
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element_start: int | None = None
+        self._skipped = 0
+
+    @property
+    def finished(self) -> bool:
+        """已讀到頂層陣列的結尾 ']'。"""
+        return self._finished
+
+    @property
+    def skipped(self) -> int:
+        """格式錯誤而略過的元素數。"""
+        return self._skipped
+
+    @property
+    def remainder(self) -> str:
+        """尚未構成完整元素的尾端文字（串流結束後非空表示尾端截斷或格式錯誤）。"""
+        start = self._element_start if self._element_start is not None else self._pos
+        return self._buffer[start:].strip() if not self._finished else ""
+
+    def feed(self, text: str) -> list[Any]:
+        """加入一段文字，回傳本次新完成的頂層元素。"""
+        if self._finished or not text:
+            return []
+        self._buffer += text
+        items: list[Any] = []
+        buf = self._buffer
+        i = self._pos
+
+        if not self._started:
+            bracket = buf.find("[", i)
+            if bracket < 0:
+                self._pos = len(buf)
+                return items
+            self._started = True
+            i = bracket + 1
+
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif self._element_start is None:
+                if ch == "]":
+                    self._finished = True
+                    i += 1
+                    break
+                if not ch.isspace() and ch != ",":
+                    self._element_start = i
+                    continue
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf[self._element_start:i + 1], items)
+            elif self._depth == 0 and ch in ",]":
+                # 頂層純量元素（數字、字串、true/false/null）以逗號或陣列結尾為界
+                self._emit(buf[self._element_start:i], items)
+                if ch == "]":
+                    self._finished = True
+                    i += 1
+                    break
+            i += 1
+
+        # 丟棄已處理的部分，只保留進行中的元素
+        keep_from = self._element_start if self._element_start is not None else i
+        self._buffer = buf[keep_from:]
+        self._pos = i - keep_from
+        if self._element_start is not None:
+            self._element_start = 0
+        return items
+
+    def _emit(self, raw: str, items: list[Any]) -> None:
+        self._element_start = None
+        try:
+            items.append(json.loads(raw))
+        except json.JSONDecodeError as e:
+            self._skipped += 1
+            logger.warning("JsonArrayStreamParser: skip malformed element (%s): %.80s", e, raw)
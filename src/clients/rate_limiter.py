@@ -0,0 +1,281 @@
+"""
+Gemini 呼叫的 process 層級限流：多個請求、執行緒與分片共用同一組配額。
+
+- Token bucket：每分鐘請求數（rpm）與每分鐘估計 token 數（tpm）兩個桶，平滑發送而非一次爆量後長時間退避。
+- AIMD 並行上限（只限制生成等長時間呼叫，get_file 等短呼叫只受 rpm 限制）：成功時緩慢加大（每輪約 +1），收到 429 / RESOURCE_EXHAUSTED 時減半（冷卻期內只減一次），
+  並清空請求桶讓所有呼叫端一起放慢。
+- 被限流的呼叫在此重試（退避 + jitter），上層的 FileHandler／parse_pdf 重試只需處理其他暫時性錯誤。
+- stats()：目前並行上限、執行中與排隊中的呼叫數、兩個桶的剩餘量與限流次數。
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+from google.api_core import exceptions as google_exceptions
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_RPM = 1000
+DEFAULT_TPM = 1_000_000
+DEFAULT_INITIAL_CONCURRENCY = 4
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_THROTTLE_RETRIES = 4
+DEFAULT_THROTTLE_BACKOFF = 2.0
+# AIMD：限流時的縮減倍率與兩次縮減的最短間隔（同一波 429 只縮一次）
+_DECREASE_FACTOR = 0.5
+_DECREASE_COOLDOWN = 1.0
+# PDF 每頁約 258 token；以平均每頁約 50KB 估算每 token 對應的位元組數
+BYTES_PER_TOKEN = 200
+# 並行上限已滿時，async 呼叫端重新檢查的間隔（秒）
+_ASYNC_POLL_INTERVAL = 0.05
+
+THROTTLE_EXCEPTIONS = (google_exceptions.TooManyRequests,)
+
+
+def estimate_tokens(size_bytes: int) -> int:
+    """依 PDF 大小粗估輸入 token 數（僅用於限流，不需精確）。"""
+    return max(1, int(size_bytes) // BYTES_PER_TOKEN)
+
+
+class _TokenBucket:
+    """每秒補充 rate、容量 capacity 的 token bucket；呼叫端需持有 limiter 的 lock。"""
+
+    def __init__(self, per_minute: float, now: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self._updated = now
+
+    def refill(self, now: float) -> None:
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """取得 amount 還需等待的秒數（0 表示足夠）；超過容量的請求以容量計，避免永遠等不到。"""
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate if self.rate else float("inf")
+
+
+class GeminiRateLimiter:
+    """執行緒安全且可在 asyncio 中使用的限流器；同步與 async 呼叫端共用同一組配額與並行上限。"""
+
+    def __init__(
+        self,
+        rpm: float = DEFAULT_RPM,
+        tpm: float = DEFAULT_TPM,
+        initial_concurrency: int = DEFAULT_INITIAL_CONCURRENCY,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        throttle_retries: int = DEFAULT_THROTTLE_RETRIES,
+        throttle_backoff: float = DEFAULT_THROTTLE_BACKOFF,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._clock = clock
+        self._sleep = sleep
+        now = clock()
+        self._requests = _TokenBucket(rpm, now)
+        self._tokens = _TokenBucket(tpm, now)
+        self._max_concurrency = max(1, max_concurrency)
+        self._limit = float(min(max(1, initial_concurrency), self._max_concurrency))
+        self._throttle_retries = throttle_retries
+        self._throttle_backoff = throttle_backoff
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queued = 0
+        self._last_decrease = float("-inf")
+        self._stats = {"calls": 0, "throttled": 0, "retries": 0, "decreases": 0}
+
+    def call(
+        self, fn: Callable[..., T], *args: Any, tokens: int = 0, bounded: bool = True, **kwargs: Any
+    ) -> T:
+        """
+        在限流下呼叫 fn；被限流時退避後重試，最多 throttle_retries 次。
+        bounded=False 的呼叫（輪詢、上傳）只消耗 rpm／tpm 配額，不佔並行名額。
+        """
+        for attempt in range(self._throttle_retries + 1):
+            try:
+                with self.slot(tokens, bounded=bounded):
+                    return fn(*args, **kwargs)
+            except THROTTLE_EXCEPTIONS:
+                if attempt == self._throttle_retries:
+                    raise
+                self._sleep(self._retry_delay(attempt))
+
+    async def call_async(
+        self, fn: Callable[..., Awaitable[T]], *args: Any, tokens: int = 0, bounded: bool = True, **kwargs: Any
+    ) -> T:
+        """call 的 asyncio 版本：fn 回傳 awaitable，等待期間不佔用事件迴圈。"""
+        for attempt in range(self._throttle_retries + 1):
+            try:
+                async with self.slot_async(tokens, bounded=bounded):
+                    return await fn(*args, **kwargs)
+            except THROTTLE_EXCEPTIONS:
+                if attempt == self._throttle_retries:
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt))
+
+    def stream(self, fn: Callable[..., Any], *args: Any, tokens: int = 0, **kwargs: Any) -> Iterator[Any]:
+        """
+        串流呼叫：整個串流期間佔用一個並行名額；尚未收到第一個片段前被限流可重試，
+        已交出片段後的限流直接拋出（避免重複輸出）。
+        """
+        for attempt in range(self._throttle_retries + 1):
+            started = False
+            try:
+                with self.slot(tokens):
+                    for item in fn(*args, **kwargs):
+                        started = True
+                        yield item
+                return
+            except THROTTLE_EXCEPTIONS:
+                if started or attempt == self._throttle_retries:
+                    raise
+                self._sleep(self._retry_delay(attempt))
+
+    async def astream(
+        self, fn: Callable[..., Awaitable[Any]], *args: Any, tokens: int = 0, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        """stream 的 asyncio 版本：fn 為回傳 async iterable 的 coroutine（如 generate_content_async）。"""
+        for attempt in range(self._throttle_retries + 1):
+            started = False
+            try:
+                async with self.slot_async(tokens):
+                    async for item in await fn(*args, **kwargs):
+                        started = True
+                        yield item
+                return
+            except THROTTLE_EXCEPTIONS:
+                if started or attempt == self._throttle_retries:
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt))
+
+    @contextmanager
+    def slot(self, tokens: int = 0, bounded: bool = True) -> Iterator[None]:
+        """取得 rpm／tpm 配額（bounded 時另佔一個並行名額）；區塊內拋出限流例外時縮減並行上限。"""
+        self._acquire(tokens, bounded)
+        try:
+            yield
+        except THROTTLE_EXCEPTIONS:
+            self._release(bounded, throttled=True)
+            raise
+        except BaseException:
+            self._release(bounded, success=False)
+            raise
+        else:
+            self._release(bounded)
+
+    @asynccontextmanager
+    async def slot_async(self, tokens: int = 0, bounded: bool = True) -> AsyncIterator[None]:
+        """slot 的 asyncio 版本。"""
+        await self._acquire_async(tokens, bounded)
+        try:
+            yield
+        except THROTTLE_EXCEPTIONS:
+            self._release(bounded, throttled=True)
+            raise
+        except BaseException:
+            self._release(bounded, success=False)
+            raise
+        else:
+            self._release(bounded)
+
+    def stats(self) -> dict[str, float]:
+        """回傳並行上限、執行中／排隊數、兩個桶的剩餘量與累計的呼叫、限流、重試、縮減次數。"""
+        with self._cond:
+            now = self._clock()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            return {
+                "concurrency_limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "requests_available": round(self._requests.available, 1),
+                "tokens_available": round(self._tokens.available),
+                **self._stats,
+            }
+
+    def _acquire(self, tokens: int, bounded: bool) -> None:
+        with self._cond:
+            self._queued += 1
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire_locked(tokens, bounded)
+                    if wait == 0.0:
+                        return
+                    if wait is None:
+                        self._cond.wait()
+                        continue
+                self._sleep(wait)
+        finally:
+            with self._cond:
+                self._queued -= 1
+
+    async def _acquire_async(self, tokens: int, bounded: bool) -> None:
+        with self._cond:
+            self._queued += 1
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire_locked(tokens, bounded)
+                if wait == 0.0:
+                    return
+                await asyncio.sleep(_ASYNC_POLL_INTERVAL if wait is None else wait)
+        finally:
+            with self._cond:
+                self._queued -= 1
+
+    def _try_acquire_locked(self, tokens: int, bounded: bool) -> float | None:
+        """成功時扣除配額並回傳 0；並行已滿回傳 None；配額不足回傳需等待的秒數。"""
+        if bounded and self._in_flight >= int(self._limit):
+            return None
+        now = self._clock()
+        self._requests.refill(now)
+        self._tokens.refill(now)
+        wait = max(self._requests.wait_for(1), self._tokens.wait_for(tokens))
+        if wait > 0:
+            return wait
+        self._requests.available -= 1
+        self._tokens.available -= min(tokens, self._tokens.capacity)
+        if bounded:
+            self._in_flight += 1
+        self._stats["calls"] += 1
+        return 0.0
+
+    def _release(self, bounded: bool, throttled: bool = False, success: bool = True) -> None:
+        with self._cond:
+            if bounded:
+                self._in_flight -= 1
+            if throttled:
+                self._on_throttle_locked()
+            elif success and bounded:
+                # 加法增加：每完成約 limit 次呼叫，上限 +1
+                self._limit = min(float(self._max_concurrency), self._limit + 1.0 / self._limit)
+            self._cond.notify_all()
+
+    def _on_throttle_locked(self) -> None:
+        self._stats["throttled"] += 1
+        now = self._clock()
+        # 清空請求桶：其他呼叫端也一起放慢，而不是各自繼續撞 429
+        self._requests.refill(now)
+        self._requests.available = min(self._requests.available, 0.0)
+        if now - self._last_decrease < _DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self._limit = max(1.0, self._limit * _DECREASE_FACTOR)
+        self._stats["decreases"] += 1
+        logger.warning("Gemini throttled, concurrency limit -> %s", int(self._limit))
+
+    def _retry_delay(self, attempt: int) -> float:
+        with self._cond:
+            self._stats["retries"] += 1
+        return self._throttle_backoff * (2**attempt) * random.uniform(0.8, 1.2)
@@ -0,0 +1,64 @@
+"""
+由 Pydantic 模型產生 Gemini response_schema（OpenAPI Schema 子集）。
+
+- 以 TypeAdapter(...).json_schema(mode="serialization") 取得輸出形狀的 JSON Schema（不含 exclude=True 的內部欄位），
+  展開 $ref／$defs（Gemini 不支援參照）。
+- 只保留 Gemini 支援的欄位：type、description、enum、items、properties、required、nullable；
+  title、default、minimum 等約束交給回應驗證（TypeAdapter.validate_json）處理。
+- 物件的所有屬性皆列為 required：要求模型輸出完整的欄位，即使模型端有預設值。
+- Optional[X]（anyOf 含 null）轉為 X + nullable。
+- to_rest_schema：直接呼叫 REST API（例如 Batch）時 type 需為大寫列舉（ARRAY、OBJECT…）。
+- exclude 中的屬性名稱（本服務自行填入、不需模型輸出的欄位）從所有物件中移除。
+"""
+
+from typing import Any
+
+from pydantic import TypeAdapter
+
+_KEPT_KEYS = ("type", "description", "enum")
+
+
+def gemini_response_schema(tp: Any, exclude: frozenset[str] = frozenset()) -> dict[str, Any]:
+    """回傳 tp（Pydantic 模型或 list[模型] 等型別）對應的 Gemini response_schema dict。"""
+    raw = TypeAdapter(tp).json_schema(mode="serialization")
+    return _convert(raw, raw.get("$defs", {}), exclude)
+
+
+def _convert(node: dict[str, Any], defs: dict[str, Any], exclude: frozenset[str]) -> dict[str, Any]:
+    if "$ref" in node:
+        target = defs[node["$ref"].rsplit("/", 1)[-1]]
+        merged = {**target, **{k: v for k, v in node.items() if k != "$ref"}}
+        return _convert(merged, defs, exclude)
+    if "anyOf" in node:
+        variants = [v for v in node["anyOf"] if v.get("type") != "null"]
+        if len(variants) != 1:
+            raise ValueError(f"Unsupported union in response schema: {node['anyOf']}")
+        converted = _convert({**variants[0], **{k: v for k, v in node.items() if k != "anyOf"}}, defs, exclude)
+        if len(variants) < len(node["anyOf"]):
+            converted["nullable"] = True
+        return converted
+
+    out = {k: node[k] for k in _KEPT_KEYS if k in node}
+    if "items" in node:
+        out["items"] = _convert(node["items"], defs, exclude)
+    if "properties" in node:
+        out["properties"] = {
+            name: _convert(prop, defs, exclude) for name, prop in node["properties"].items() if name not in exclude
+        }
+        out["required"] = list(out["properties"])
+    return out
+
+
+def to_rest_schema(schema: dict[str, Any]) -> dict[str, Any]:
+    """將 gemini_response_schema 的結果轉為 REST API 的 Schema JSON（type 改為大寫列舉）。"""
+    out: dict[str, Any] = {}
+    for key, value in schema.items():
+        if key == "type":
+            out[key] = value.upper()
+        elif key == "items":
+            out[key] = to_rest_schema(value)
+        elif key == "properties":
+            out[key] = {name: to_rest_schema(prop) for name, prop in value.items()}
+        else:
+            out[key] = value
+    return out
@@ -0,0 +1,79 @@
+"""
+Vertex AI 上的 Gemini 後端：以 gs:// URI 直接引用 bucket 中的 PDF，省去下載、暫存檔、File API 上傳與就緒等待。
+
+- GeminiFileClient 遇到 gs:// URI 時改由此後端建立模型與檔案 Part（Part.from_uri）；
+  生成、限流、對沖、schema 驗證與截斷接續仍由 GeminiFileClient 處理，輸出與快取和 File API 路徑相同。
+- 以服務帳戶（ADC）驗證，需 roles/aiplatform.user 與 bucket 的讀取權限；
+  vertexai（google-cloud-aiplatform）於首次使用時才匯入與初始化。
+- Vertex AI 對 gs:// PDF 有大小上限（max_pdf_bytes），超過時 accepts 回傳 False，呼叫端改走 File API 上傳。
+"""
+
+import logging
+import threading
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCATION = "us-central1"
+# Vertex AI 以 Cloud Storage URI 引用 PDF 時的單檔上限
+DEFAULT_MAX_PDF_BYTES = 50 * 1024 * 1024
+GCS_URI_PREFIX = "gs://"
+
+
+class VertexGeminiBackend:
+    """執行緒安全的 Vertex AI 模型工廠；GenerativeModel 依 (model, system_instruction) 建立一次後重複使用。"""
+
+    def __init__(
+        self,
+        project: str | None = None,
+        location: str = DEFAULT_LOCATION,
+        max_pdf_bytes: int = DEFAULT_MAX_PDF_BYTES,
+    ) -> None:
+        self._project = project
+        self._location = location
+        self._max_pdf_bytes = max_pdf_bytes
+        self._lock = threading.Lock()
+        self._sdk: Any = None
+        self._models: dict[tuple[str, str | None], Any] = {}
+
+    def accepts(self, size_bytes: int) -> bool:
+        """此大小（位元組）的 PDF 能否以 gs:// URI 直接交給 Vertex AI。"""
+        return size_bytes <= self._max_pdf_bytes
+
+    def model(self, model_name: str, system_instruction: str | None = None):
+        """Vertex AI 的 GenerativeModel（介面與 google.generativeai 相同：generate_content／generate_content_async）。"""
+        key = (model_name, system_instruction)
+        with self._lock:
+            if key not in self._models:
+                sdk = self._generative_models()
+                self._models[key] = sdk.GenerativeModel(model_name, system_instruction=system_instruction)
+            return self._models[key]
+
+    def file_part(self, gcs_uri: str, mime_type: str = "application/pdf"):
+        """以 gs:// URI 引用檔案的 Part，由 Vertex AI 直接讀取 GCS。"""
+        if not gcs_uri.startswith(GCS_URI_PREFIX):
+            raise ValueError(f"Invalid GCS URI: {gcs_uri}")
+        with self._lock:
+            sdk = self._generative_models()
+        return sdk.Part.from_uri(gcs_uri, mime_type=mime_type)
+
+    def generation_config(self, response_schema: dict):
+        """response_schema 模式的 Vertex GenerationConfig（schema 為 REST 格式，見 to_rest_schema）。"""
+        with self._lock:
+            sdk = self._generative_models()
+        return sdk.GenerationConfig(response_mime_type="application/json", response_schema=response_schema)
+
+    def _generative_models(self):
+        """首次使用時匯入並初始化 vertexai（呼叫端持有 _lock）。"""
+        if self._sdk is None:
+            import vertexai
+            from vertexai import generative_models
+
+            vertexai.init(project=self._project, location=self._location)
+            logger.info("VertexGeminiBackend: initialized (project=%s, location=%s)", self._project, self._location)
+            self._sdk = generative_models
+        return self._sdk
+
+
+def is_gcs_uri(uri: str) -> bool:
+    return uri.startswith(GCS_URI_PREFIX)
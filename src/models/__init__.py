@@ -1,5 +1,5 @@
 """Models 套件：Pydantic 資料結構。"""
 
-from src.models.schema import ImageTextExtract, PageExtract
+from src.models.schema import ImageTextExtract, PageExtract, ParseOptions
 
-__all__ = ["ImageTextExtract", "PageExtract"]
+__all__ = ["ImageTextExtract", "PageExtract", "ParseOptions"]
@@ -1,5 +1,7 @@
 """Pydantic 資料模型：PDF 解析結果與相關結構。"""
 
+from typing import Literal, Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -16,6 +18,40 @@ class PageBlock(BaseModel):
 
     page: int = Field(..., ge=1, description="頁碼，從 1 開始")
     elements: list[BlockElement] = Field(default_factory=list, description="該頁的圖片與文字塊")
+    source: Optional[str] = Field(
+        default=None,
+        description="產生此頁的路徑：'text_layer'（PDF 文字層）或 'gemini'；僅混合解析時填入",
+    )
+    partial: bool = Field(
+        default=False,
+        exclude=True,
+        description="所屬解析不完整（退回文字塊、搶救的頁面或截斷後放棄接續）；不輸出，只用於決定是否寫入結果快取",
+    )
+
+
+class ParseOptions(BaseModel):
+    """parse_pdf 每次請求可調整的解析選項（皆有預設值，未帶即維持原行為）。"""
+
+    image_output: Literal["inline", "url"] = Field(
+        default="inline",
+        description="圖片輸出方式：inline 為 data URI；url 為上傳 GCS 後回傳 URL",
+    )
+    shard_pages: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=500,
+        description="分片解析：每片頁數；None 為整份一次解析",
+    )
+    shard_concurrency: int = Field(
+        default=4,
+        ge=1,
+        le=16,
+        description="分片解析時同時上傳與解析的分片數",
+    )
+    hybrid: bool = Field(
+        default=False,
+        description="混合解析：文字為主的頁面直接取 PDF 文字層，只有需視覺的頁面送 Gemini",
+    )
 
 
 class PageExtract(BaseModel):
@@ -0,0 +1,81 @@
+"""FileHandler 的 asyncio 版本：上傳重試以 asyncio.sleep 退避，等待期間不佔用事件迴圈。"""
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Awaitable, BinaryIO, Callable
+
+from src.clients.async_gemini_client import AsyncGeminiFileClient
+from src.services.file_handler import RETRYABLE_EXCEPTIONS
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFileHandler:
+    """
+    以 AsyncGeminiFileClient 上傳大型檔案至 Gemini File API，可重試的錯誤以指數退避重試。
+    與 FileHandler 相同的重試語意；重試同一內容時由 Client 從中斷的 offset 續傳。
+    """
+
+    def __init__(
+        self,
+        gemini_client: AsyncGeminiFileClient,
+        max_retries: int = 3,
+        retry_backoff_seconds: float = 5.0,
+    ) -> None:
+        self._gemini = gemini_client
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff_seconds
+
+    async def upload_to_gemini(
+        self,
+        file_path: str | Path,
+        mime_type: str = "application/pdf",
+    ) -> str:
+        """上傳本機檔案並等待 ACTIVE，含重試；回傳 file_uri。"""
+        path = Path(file_path)
+        if not path.exists():
+            raise FileNotFoundError(f"File not found: {file_path}")
+        return await self._with_retry(
+            "upload_to_gemini",
+            path.name,
+            lambda: self._gemini.upload_file(path, mime_type=mime_type),
+        )
+
+    async def upload_from_stream(
+        self,
+        data: bytes | BinaryIO,
+        display_name: str,
+        mime_type: str = "application/pdf",
+    ) -> str:
+        """上傳 bytes 或可 seek 的檔案物件並等待 ACTIVE，含重試；回傳 file_uri。"""
+        if hasattr(data, "read"):
+            if hasattr(data, "seekable") and data.seekable():
+                stream = data
+                return await self._with_retry(
+                    "upload_from_stream",
+                    display_name,
+                    lambda: self._gemini.upload_stream(stream, display_name=display_name, mime_type=mime_type),
+                )
+            data = await asyncio.to_thread(data.read)
+        if not isinstance(data, (bytes, bytearray)):
+            raise TypeError("data must be bytes or file-like with .read()")
+        return await self._with_retry(
+            "upload_from_stream",
+            display_name,
+            lambda: self._gemini.upload_bytes(data, display_name=display_name, mime_type=mime_type),
+        )
+
+    async def _with_retry(self, op: str, name: str, call: Callable[[], Awaitable[str]]) -> str:
+        """執行上傳；可重試的錯誤以 asyncio.sleep 指數退避後重試，最後一次仍失敗即拋出。"""
+        for attempt in range(1, self._max_retries + 1):
+            try:
+                file_uri = await call()
+                logger.info("%s succeeded on attempt %s: %s", op, attempt, name)
+                return file_uri
+            except RETRYABLE_EXCEPTIONS as e:
+                logger.warning("%s attempt %s/%s failed: %s", op, attempt, self._max_retries, e)
+                if attempt == self._max_retries:
+                    raise
+                await asyncio.sleep(self._retry_backoff * (2 ** (attempt - 1)))
+        raise ValueError("max_retries must be >= 1")
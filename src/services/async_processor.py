@@ -0,0 +1,388 @@
+"""
+PDFProcessor 的 asyncio 版本：同一事件迴圈上可同時進行多個解析請求。
+
+- GCS 下載／spool、結果快取讀寫、圖片擷取與分片切割仍為同步 I/O 或 CPU 工作，以 asyncio.to_thread 移出事件迴圈。
+- Gemini 上傳後的就緒輪詢以 asyncio.sleep 等待；結構化解析使用 generate_content_async。
+- 分片解析以 asyncio.Semaphore 限制並行數（shard_concurrency）：先上傳全部分片，以 wait_for_files 一次等待就緒，
+  再交錯進行各分片的生成。
+- PDF 瘦身（PdfSlimmer）於執行緒中進行，上傳瘦身後的檔案。
+- 不超過 inline_max_bytes 的文件（或分片）以 inline bytes 送出，不經 File API 上傳與輪詢。
+- Vertex 直讀：Gemini Client 可直接讀取 gs:// 時不下載、不上傳，只在需要圖片時讀取 PDF（規則同 PDFProcessor）。
+- 快取 key、圖片擷取與填入、分片與混合解析的合併等規則由 parse_common 提供，與同步版共用，兩者輸出與快取互通。
+"""
+
+import asyncio
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from src.clients.async_gcs_client import AsyncGCSClient
+from src.clients.gcs_client import BlobInfo
+from src.clients.async_gemini_client import AsyncGeminiFileClient
+from src.clients.gemini_client import MAX_INLINE_BYTES, PendingFile
+from src.models.schema import PageBlock, ParseOptions
+from src.services.async_file_handler import AsyncFileHandler
+from src.services.file_handler import RETRYABLE_EXCEPTIONS
+from src.services.image_publisher import ImagePublisher
+from src.services.parse_common import (
+    DEFAULT_FILE_READY_TIMEOUT,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_SHARD_MAX_RETRIES,
+    DEFAULT_SHARD_RETRY_BACKOFF,
+    display_name_for,
+    extract_images,
+    fill_image_content,
+    fits_inline,
+    inline_bytes,
+    is_complete,
+    merge_hybrid,
+    merge_page_blocks,
+    needs_image_content,
+    reads_gcs_uri,
+    result_cache_key,
+    shard_file_uris,
+)
+from src.services.pdf_sharder import PdfShard, remap_pages, split_pdf
+from src.services.pdf_slimmer import PdfSlimmer, SlimResult
+from src.services.pdf_text_layer import HybridPlan, plan_hybrid
+from src.services.result_cache import ParseResultCache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncPDFProcessor:
+    """
+    編排 async 版 PDF 結構化解析：GCS 讀取 → 上傳至 Gemini File API（事件迴圈上輪詢直到 ACTIVE）→
+    generate_content_async 取得每頁的 elements。參數與 PDFProcessor 對應。
+    """
+
+    def __init__(
+        self,
+        gcs_client: AsyncGCSClient,
+        gemini_client: AsyncGeminiFileClient,
+        file_handler: Optional[AsyncFileHandler] = None,
+        file_ready_timeout: float = DEFAULT_FILE_READY_TIMEOUT,
+        poll_interval: float | None = DEFAULT_POLL_INTERVAL,
+        sliced_download: bool = False,
+        spool_to_disk: bool = False,
+        gcs_factory: Optional[Callable[[str], AsyncGCSClient]] = None,
+        result_cache: Optional[ParseResultCache] = None,
+        image_publisher: Optional[ImagePublisher] = None,
+        shard_max_retries: int = DEFAULT_SHARD_MAX_RETRIES,
+        shard_retry_backoff: float = DEFAULT_SHARD_RETRY_BACKOFF,
+        pdf_slimmer: Optional[PdfSlimmer] = None,
+        inline_max_bytes: int = 0,
+    ) -> None:
+        self._gcs = gcs_client
+        self._gemini = gemini_client
+        self._file_handler = file_handler
+        self._file_ready_timeout = file_ready_timeout
+        self._poll_interval = poll_interval
+        self._sliced_download = sliced_download
+        self._spool_to_disk = spool_to_disk
+        self._gcs_factory = gcs_factory
+        self._result_cache = result_cache
+        self._image_publisher = image_publisher
+        self._shard_max_retries = shard_max_retries
+        self._shard_retry_backoff = shard_retry_backoff
+        self._pdf_slimmer = pdf_slimmer
+        self._inline_max_bytes = min(inline_max_bytes, MAX_INLINE_BYTES)
+
+    async def parse_from_gcs(
+        self,
+        blob_path: str,
+        bucket_name: Optional[str] = None,
+        options: Optional[ParseOptions] = None,
+        info: Optional[BlobInfo] = None,
+    ) -> list[PageBlock]:
+        """
+        從 GCS 讀取 PDF 並結構化解析；有 result_cache 時先查快取，命中即不下載、不呼叫 Gemini。
+        info 為呼叫端已取得的 metadata（例如計算 ETag 時），有給則不再重查。
+        """
+        options = options or ParseOptions()
+        gcs = self._resolve_gcs(bucket_name)
+        # metadata 只查一次：結果快取 key、Vertex 直讀（檔案大小）與下載共用同一份 BlobInfo，
+        # 下載固定在該 generation，寫入快取的內容與 key 對應同一版本
+        if info is None and (self._result_cache is not None or self._reads_gcs_uri(options)):
+            info = await gcs.get_blob_info(blob_path)
+        cache_key = self._cache_key_for(gcs, info, options) if self._result_cache is not None else None
+        if cache_key is not None:
+            cached = await asyncio.to_thread(self._result_cache.get, cache_key)
+            if cached is not None:
+                return cached
+
+        blocks = await self._parse_blob(gcs, blob_path, options, info)
+        if cache_key is not None:
+            # 退回文字塊、搶救的頁面或截斷後放棄接續的結果不快取，下次請求重新解析
+            if is_complete(blocks):
+                await asyncio.to_thread(self._result_cache.put, cache_key, blocks)
+            else:
+                logger.warning("AsyncPDFProcessor: incomplete parse of %s, not cached", blob_path)
+        return blocks
+
+    async def result_cache_key(
+        self,
+        blob_path: str,
+        bucket_name: Optional[str] = None,
+        options: Optional[ParseOptions] = None,
+        info: Optional[BlobInfo] = None,
+    ) -> Optional[str]:
+        """結果快取 key（亦作為 ETag）；info 有給時不再查詢；未設定 result_cache 時回傳 None。"""
+        if self._result_cache is None:
+            return None
+        gcs = self._resolve_gcs(bucket_name)
+        return self._cache_key_for(gcs, info or await gcs.get_blob_info(blob_path), options or ParseOptions())
+
+    async def blob_info(self, blob_path: str, bucket_name: Optional[str] = None) -> BlobInfo:
+        """以一次 metadata 請求取得 BlobInfo，供 result_cache_key 與 parse_from_gcs 共用（同 PDFProcessor.blob_info）。"""
+        return await self._resolve_gcs(bucket_name).get_blob_info(blob_path)
+
+    def _cache_key_for(self, gcs: AsyncGCSClient, info: BlobInfo, options: ParseOptions) -> str:
+        return result_cache_key(
+            gcs.bucket_name,
+            info,
+            self._gemini.model_name,
+            self._gemini.prompt_version,
+            options,
+            self._image_publisher,
+        )
+
+    async def _parse_blob(
+        self, gcs: AsyncGCSClient, blob_path: str, options: ParseOptions, info: Optional[BlobInfo] = None
+    ) -> list[PageBlock]:
+        """下載（或 spool）→ 圖片擷取與 Gemini 解析同時進行 → 填入圖片。"""
+        if info is not None and self._reads_gcs_uri(options):
+            direct = await self._parse_gcs_uri(gcs, blob_path, options, info)
+            if direct is not None:
+                return direct
+        display_name = display_name_for(blob_path)
+        if self._spool_to_disk:
+            with tempfile.TemporaryDirectory(prefix="obe_spool_") as spool_dir:
+                spool_path = Path(spool_dir) / "document.pdf"
+                logger.info("parse_from_gcs_async: spooling blob %s to %s", blob_path, spool_path)
+                await gcs.download_blob_to_file(blob_path, spool_path, info=info)
+                images_by_page, blocks = await asyncio.gather(
+                    self._extract_images(spool_path, options),
+                    self._parse_document(spool_path, display_name, options),
+                )
+        else:
+            logger.info("parse_from_gcs_async: reading blob %s", blob_path)
+            if self._sliced_download:
+                data = await gcs.read_blob_bytes_sliced(blob_path, info=info)
+            else:
+                data = await gcs.read_blob_bytes(blob_path, info=info)
+            images_by_page, blocks = await asyncio.gather(
+                self._extract_images(data, options),
+                self._parse_document(data, display_name, options),
+            )
+
+        return fill_image_content(blocks, images_by_page, inline=options.image_output == "inline")
+
+    def _reads_gcs_uri(self, options: ParseOptions) -> bool:
+        return reads_gcs_uri(options, self._gemini.vertex)
+
+    async def _parse_gcs_uri(
+        self, gcs: AsyncGCSClient, blob_path: str, options: ParseOptions, info: BlobInfo
+    ) -> Optional[list[PageBlock]]:
+        """後端可直接讀取此大小的檔案時以 gs:// URI 解析，之後只在需要圖片時讀取 PDF；否則回傳 None。"""
+        size = info.size
+        if not self._gemini.reads_gcs_uri(size):
+            return None
+        logger.info("parse_from_gcs_async: parsing %s directly from GCS", blob_path)
+        blocks = await self._gemini.parse_pdf_structured(gcs.get_blob_uri(blob_path), size_bytes=size)
+        if not needs_image_content(blocks):
+            return blocks
+        if self._spool_to_disk:
+            with tempfile.TemporaryDirectory(prefix="obe_spool_") as spool_dir:
+                spool_path = Path(spool_dir) / "document.pdf"
+                await gcs.download_blob_to_file(blob_path, spool_path, info=info)
+                images_by_page = await self._extract_images(spool_path, options)
+        elif self._sliced_download:
+            data = await gcs.read_blob_bytes_sliced(blob_path, info=info)
+            images_by_page = await self._extract_images(data, options)
+        else:
+            data = await gcs.read_blob_bytes(blob_path, info=info)
+            images_by_page = await self._extract_images(data, options)
+        return fill_image_content(blocks, images_by_page, inline=options.image_output == "inline")
+
+    async def _parse_document(
+        self, source: bytes | Path, display_name: str, options: ParseOptions
+    ) -> list[PageBlock]:
+        """混合解析或（瘦身後）整份上傳解析。"""
+        if options.hybrid:
+            with tempfile.TemporaryDirectory(prefix="obe_hybrid_") as hybrid_dir:
+                plan = await asyncio.to_thread(plan_hybrid, source, hybrid_dir)
+                if plan is not None:
+                    return await self._parse_hybrid(plan, display_name, options)
+
+        if self._pdf_slimmer is None:
+            return await self._upload_and_parse(source, display_name, options)
+        with tempfile.TemporaryDirectory(prefix="obe_slim_") as slim_dir:
+            slim = await asyncio.to_thread(self._pdf_slimmer.slim, source, slim_dir)
+            if slim is None:
+                return await self._upload_and_parse(source, display_name, options)
+            return await self._upload_and_parse(slim.path, display_name, options, slim)
+
+    async def _upload_and_parse(
+        self,
+        source: bytes | Path,
+        display_name: str,
+        options: ParseOptions,
+        slim: Optional[SlimResult] = None,
+    ) -> list[PageBlock]:
+        """整份或分片上傳並解析；shard_pages 未設定、文件只有一片或無法分片時整份解析。"""
+        if options.shard_pages is not None:
+            with tempfile.TemporaryDirectory(prefix="obe_shards_") as shard_dir:
+                shards = await asyncio.to_thread(split_pdf, source, options.shard_pages, shard_dir)
+                if len(shards) > 1:
+                    return await self._parse_shards(shards, options.shard_concurrency)
+
+        data = inline_bytes(source, self._inline_max_bytes)
+        if data is not None:
+            logger.info("parse_from_gcs_async: %s bytes, parsing inline without File API", len(data))
+            return await self._gemini.parse_pdf_bytes(data)
+
+        start = time.monotonic()
+        if isinstance(source, Path):
+            file_uri = await self._upload_spooled(source)
+        else:
+            file_uri = await self._upload_bytes(source, display_name)
+        if slim is not None:
+            self._pdf_slimmer.record_upload(slim, time.monotonic() - start)
+        logger.info("parse_from_gcs_async: file ready, parsing structured content")
+        return await self._gemini.parse_pdf_structured(file_uri)
+
+    async def _parse_hybrid(self, plan: HybridPlan, display_name: str, options: ParseOptions) -> list[PageBlock]:
+        """只上傳需視覺的頁面子文件（仍可分片），其餘頁面已由文字層產生。"""
+        vision_blocks: list[PageBlock] = []
+        if plan.vision_path is not None:
+            logger.info("parse_from_gcs_async: hybrid, %s pages need vision", len(plan.vision_pages))
+            vision_options = options.model_copy(update={"hybrid": False})
+            vision_blocks = await self._parse_document(plan.vision_path, display_name, vision_options)
+        return merge_hybrid(plan, vision_blocks)
+
+    async def _parse_shards(self, shards: list[PdfShard], concurrency: int) -> list[PageBlock]:
+        """
+        以 Semaphore 限制並行數：先開始上傳全部分片，以 wait_for_files 一次等待全部 ACTIVE，再解析各分片；
+        頁碼換回原文件後依序合併，任一分片最終失敗即拋出。
+        """
+        logger.info("parse_from_gcs_async: parsing %s shards (concurrency %s)", len(shards), concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(action: Awaitable[T]) -> T:
+            async with semaphore:
+                return await action
+
+        uploads = await asyncio.gather(*(bounded(self._begin_shard_upload(shard)) for shard in shards))
+        file_uris = await self._wait_for_shards(uploads)
+        results = await asyncio.gather(
+            *(bounded(self._parse_shard_with_retry(shard, uri)) for shard, uri in zip(shards, file_uris))
+        )
+        return merge_page_blocks([block for blocks in results for block in blocks])
+
+    async def _begin_shard_upload(self, shard: PdfShard) -> Optional[PendingFile]:
+        """開始上傳單一分片（執行緒中）但不等待就緒；走 inline 的分片回傳 None。"""
+        if fits_inline(shard.path, self._inline_max_bytes):
+            return None
+
+        async def begin(attempt: int) -> PendingFile:
+            with shard.path.open("rb") as f:
+                return await self._gemini.begin_upload(f, display_name=shard.path.name, mime_type="application/pdf")
+
+        return await self._with_shard_retry(shard, begin)
+
+    async def _wait_for_shards(self, uploads: list[Optional[PendingFile]]) -> list[Optional[str]]:
+        """
+        以單一輪詢迴圈等待所有已上傳的分片 ACTIVE，回傳與分片對應的 file URI（inline 分片為 None）。
+        等待失敗（逾時、處理失敗）時全部回傳 None，由各分片的重試自行上傳與等待。
+        """
+        pending = [upload for upload in uploads if upload is not None]
+        if not pending:
+            return [None] * len(uploads)
+        try:
+            uris = await self._gemini.wait_for_files(
+                pending, timeout=self._file_ready_timeout, poll_interval=self._poll_interval
+            )
+        except RETRYABLE_EXCEPTIONS as e:
+            logger.warning("parse_from_gcs_async: waiting for %s shard files failed: %s", len(pending), e)
+            return [None] * len(uploads)
+        return shard_file_uris(uploads, uris)
+
+    async def _parse_shard_with_retry(self, shard: PdfShard, file_uri: Optional[str] = None) -> list[PageBlock]:
+        """解析單一分片（已就緒的 file URI、inline bytes 或重新上傳）；可重試的錯誤只重試此分片。"""
+
+        async def parse(attempt: int) -> list[PageBlock]:
+            data = inline_bytes(shard.path, self._inline_max_bytes)
+            if data is not None:
+                blocks = await self._gemini.parse_pdf_bytes(data)
+            else:
+                blocks = await self._gemini.parse_pdf_structured(file_uri or await self._upload_spooled(shard.path))
+            logger.info(
+                "parse_from_gcs_async: shard %s (pages %s-%s) parsed on attempt %s",
+                shard.index,
+                shard.first_page,
+                shard.last_page,
+                attempt,
+            )
+            return remap_pages(blocks, shard)
+
+        return await self._with_shard_retry(shard, parse)
+
+    async def _with_shard_retry(self, shard: PdfShard, action: Callable[[int], Awaitable[T]]) -> T:
+        """以第幾次嘗試呼叫 action；可重試的錯誤依 shard_retry_backoff 指數退避後重試。"""
+        attempts = self._shard_max_retries + 1
+        for attempt in range(1, attempts + 1):
+            try:
+                return await action(attempt)
+            except RETRYABLE_EXCEPTIONS as e:
+                logger.warning(
+                    "parse_from_gcs_async: shard %s attempt %s/%s failed: %s", shard.index, attempt, attempts, e
+                )
+                if attempt == attempts:
+                    raise
+                await asyncio.sleep(self._shard_retry_backoff * (2 ** (attempt - 1)))
+
+    async def _extract_images(
+        self, pdf_source: bytes | Path, options: ParseOptions
+    ) -> dict[int, list[tuple[str, str]]]:
+        """依 image_output 擷取圖片（執行緒中）：inline 回傳 base64；url 則上傳 GCS 後回傳 URL。"""
+        return await asyncio.to_thread(extract_images, pdf_source, options, self._image_publisher)
+
+    def _resolve_gcs(self, bucket_name: Optional[str]) -> AsyncGCSClient:
+        """依 bucket_name 決定使用的 AsyncGCSClient；需有 gcs_factory（例如包裝 ClientPool.get_gcs）。"""
+        if bucket_name is None:
+            return self._gcs
+        if self._gcs_factory is None:
+            raise ValueError("bucket_name requires a gcs_factory")
+        return self._gcs_factory(bucket_name)
+
+    async def _upload_bytes(self, data: bytes, display_name: str) -> str:
+        """將記憶體中的 PDF 上傳至 File API（有 AsyncFileHandler 時走其重試）。"""
+        if self._file_handler is not None:
+            return await self._file_handler.upload_from_stream(
+                data=data,
+                display_name=display_name,
+                mime_type="application/pdf",
+            )
+        return await self._gemini.upload_bytes(
+            data=data,
+            display_name=display_name,
+            mime_type="application/pdf",
+            file_ready_timeout=self._file_ready_timeout,
+            poll_interval=self._poll_interval,
+        )
+
+    async def _upload_spooled(self, spool_path: Path) -> str:
+        """直接上傳 spool 檔案（有 AsyncFileHandler 時走其重試）。"""
+        if self._file_handler is not None:
+            return await self._file_handler.upload_to_gemini(spool_path, mime_type="application/pdf")
+        return await self._gemini.upload_file(
+            spool_path,
+            mime_type="application/pdf",
+            file_ready_timeout=self._file_ready_timeout,
+            poll_interval=self._poll_interval,
+        )
@@ -0,0 +1,348 @@
+"""
+大量離線匯入：一次解析供應商的數十到數百份 PDF，以 Gemini Batch API 執行，不受 540s timeout 與互動配額限制。
+
+- submit：略過已有解析快取的 PDF，其餘寫入工作清單（manifest，存於 GCS，任何 instance 都能接續）後，
+  在 step_budget 內以有上限的執行緒池 spool 並上傳至 File API，上傳的檔案名稱逐一記入 manifest。
+- collect（可由 Cloud Scheduler 定期呼叫）逐步推進：接續未完成的上傳、單次查詢檔案狀態（不阻塞等待），
+  全部就緒時將結構化解析請求（與互動呼叫相同的 System Instruction、prompt 與 schema）合成一個 batch 送出；
+  batch 完成後以既有的解析規則將各筆回應轉為 PageBlock、填入圖片，寫入 ParseResultCache；
+  快取 key 與 parse_pdf 相同，使用者開啟編輯器時直接命中。
+- 上傳多次失敗、檔案處理失敗（FAILED）或逾時的 PDF 移入 failed，其餘照常送出。
+- 單筆失敗、輸出不完整或達 token 上限（batch 無法接續）時不寫入快取，該 PDF 之後由互動解析處理。
+"""
+
+import json
+import logging
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from src.clients.gcs_client import BlobInfo, GCSClient
+from src.clients.gemini_batch import GeminiBatchClient
+from src.clients.gemini_client import FILE_URI_PREFIX, GeminiFileClient, PendingFile
+from src.models.schema import PageBlock, ParseOptions
+from src.services.image_publisher import ImagePublisher
+from src.services.parse_common import (
+    DEFAULT_FILE_READY_TIMEOUT,
+    display_name_for,
+    extract_images,
+    fill_image_content,
+    is_complete,
+    needs_image_content,
+    result_cache_key,
+)
+from src.services.result_cache import ParseResultCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_PREFIX = "batch-jobs/"
+DEFAULT_UPLOAD_CONCURRENCY = 4
+# 每次 submit／collect 用於上傳的時間（秒），保留 GCF 540s timeout 內寫回 manifest 的餘裕
+DEFAULT_STEP_BUDGET = 420.0
+# 同一 PDF 上傳失敗幾次後移入 failed
+DEFAULT_MAX_UPLOAD_ATTEMPTS = 3
+
+
+class BatchIngestService:
+    """以 Gemini Batch API 大量預先解析 PDF，結果寫入解析快取。"""
+
+    def __init__(
+        self,
+        gcs_factory: Callable[[str], GCSClient],
+        gemini_client: GeminiFileClient,
+        result_cache: ParseResultCache,
+        manifest_gcs: GCSClient,
+        batch_client: Optional[GeminiBatchClient] = None,
+        image_publisher: Optional[ImagePublisher] = None,
+        upload_concurrency: int = DEFAULT_UPLOAD_CONCURRENCY,
+        file_ready_timeout: float = DEFAULT_FILE_READY_TIMEOUT,
+        manifest_prefix: str = DEFAULT_MANIFEST_PREFIX,
+        step_budget: float = DEFAULT_STEP_BUDGET,
+        max_upload_attempts: int = DEFAULT_MAX_UPLOAD_ATTEMPTS,
+    ) -> None:
+        self._gcs_factory = gcs_factory
+        self._gemini = gemini_client
+        self._result_cache = result_cache
+        self._manifest_gcs = manifest_gcs
+        self._batch = batch_client or gemini_client.batch_client
+        self._image_publisher = image_publisher
+        self._upload_concurrency = max(1, upload_concurrency)
+        self._file_ready_timeout = file_ready_timeout
+        self._manifest_prefix = manifest_prefix
+        self._step_budget = step_budget
+        self._max_upload_attempts = max(1, max_upload_attempts)
+
+    def submit(self, bucket: str, blob_paths: list[str], options: Optional[ParseOptions] = None) -> dict[str, Any]:
+        """
+        建立匯入工作：略過已快取的 PDF，其餘寫入 manifest 後在 step_budget 內盡量上傳，並推進一次（見 collect）。
+        回傳 job_id、目前狀態、送出與已快取的路徑；全部已快取時不建立工作（job_id 為 None）。
+        未上傳完或檔案仍在處理時，由之後的 collect（Cloud Scheduler 定期呼叫）接續。
+        """
+        options = options or ParseOptions()
+        if options.hybrid:
+            raise ValueError("hybrid parsing is not supported in batch mode")
+        if self._batch is None:
+            raise ValueError("Batch mode requires a Gemini API key")
+        deadline = time.monotonic() + self._step_budget
+        gcs = self._gcs_factory(bucket)
+
+        entries: list[dict[str, Any]] = []
+        cached: list[str] = []
+        for blob_path in dict.fromkeys(blob_paths):
+            info = gcs.get_blob_info(blob_path)
+            cache_key = self._cache_key(gcs, info, options)
+            if self._result_cache.get(cache_key) is not None:
+                cached.append(blob_path)
+            else:
+                # 記下 generation：之後的上傳與圖片擷取下載同一版本，與 cache_key 對應
+                entries.append(
+                    {
+                        "key": str(len(entries)),
+                        "blob_path": blob_path,
+                        "cache_key": cache_key,
+                        "generation": info.generation,
+                        "blob_size": info.size,
+                    }
+                )
+        if not entries:
+            return {"job_id": None, "batch": None, "submitted": [], "cached": cached}
+
+        job_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        manifest = {
+            "batch": None,
+            "bucket": bucket,
+            "options": options.model_dump(),
+            "created_at": int(time.time()),
+            "status": "uploading",
+            "entries": entries,
+            "failed": {},
+        }
+        self._write_manifest(job_id, manifest)
+        logger.info("BatchIngest: job %s created for %s PDFs (%s cached)", job_id, len(entries), len(cached))
+        self._prepare(job_id, manifest, gcs, deadline)
+        return {
+            "job_id": job_id,
+            "batch": manifest["batch"],
+            "status": manifest["status"],
+            "submitted": [entry["blob_path"] for entry in manifest["entries"]],
+            "cached": cached,
+            "failed": manifest["failed"],
+        }
+
+    def collect(self, job_id: str) -> dict[str, Any]:
+        """
+        推進工作，可重複呼叫：上傳中時接續上傳並檢查檔案是否就緒，全部就緒即送出 batch；
+        batch 未完成時回傳目前狀態；完成時將成功的結果寫入解析快取並更新 manifest，
+        回傳 stored（已寫入）與 failed（路徑 → 原因）。已收尾的 job 直接回傳先前的結果。
+        """
+        deadline = time.monotonic() + self._step_budget
+        manifest = self._read_manifest(job_id)
+        if manifest["status"] == "collected":
+            return self._summary(job_id, manifest)
+        gcs = self._gcs_factory(manifest["bucket"])
+        if manifest["status"] == "uploading":
+            self._prepare(job_id, manifest, gcs, deadline)
+            if manifest["status"] == "collected":
+                return self._summary(job_id, manifest)
+            if manifest["status"] == "uploading":
+                return self._preparing_state(job_id, manifest)
+
+        job = self._batch.get(manifest["batch"])
+        if not job.done:
+            return {"job_id": job_id, "state": job.state, "done": False}
+
+        options = ParseOptions(**manifest["options"])
+        stored: list[str] = []
+        failed: dict[str, str] = dict(manifest.get("failed", {}))
+        for entry in manifest["entries"]:
+            blob_path = entry["blob_path"]
+            result = job.results.get(entry["key"])
+            if result is None or result.error:
+                failed[blob_path] = result.error if result is not None else f"batch {job.state.lower()}"
+                continue
+            if result.truncated:
+                failed[blob_path] = "output truncated at token limit"
+                continue
+            blocks = self._gemini.parse_batch_output(result.text)
+            if not is_complete(blocks):
+                failed[blob_path] = "incomplete output"
+                continue
+            self._result_cache.put(entry["cache_key"], self._fill_images(gcs, entry, blocks, options))
+            stored.append(blob_path)
+
+        manifest.update(status="collected", state=job.state, stored=stored, failed=failed)
+        self._write_manifest(job_id, manifest)
+        logger.info("BatchIngest: job %s %s, stored %s, failed %s", job_id, job.state, len(stored), len(failed))
+        return self._summary(job_id, manifest)
+
+    def _prepare(self, job_id: str, manifest: dict[str, Any], gcs: GCSClient, deadline: float) -> None:
+        """
+        上傳階段的一步：在 deadline 前上傳尚未上傳的 PDF，單次查詢檔案狀態；
+        上傳多次失敗、處理失敗（FAILED）或處理逾時的檔案移入 failed，不影響其他檔案。
+        全部就緒時送出 batch（status → submitted）；全部失敗時直接收尾（status → collected）。
+        """
+        self._upload_entries(manifest, gcs, deadline)
+        self._check_ready(manifest)
+        failed = manifest["failed"]
+        entries = manifest["entries"]
+        if not entries:
+            manifest.update(status="collected", state="FAILED", stored=[])
+            logger.warning("BatchIngest: job %s has no usable PDFs (%s failed)", job_id, len(failed))
+        # 先記下上傳進度，送出 batch 失敗時下次推進不必重新上傳
+        self._write_manifest(job_id, manifest)
+        if entries and all(entry.get("active") for entry in entries):
+            manifest["batch"] = self._batch.submit(
+                self._gemini.model_name,
+                {
+                    entry["key"]: self._gemini.structured_batch_request(f"{FILE_URI_PREFIX}{entry['file_name']}")
+                    for entry in entries
+                },
+                display_name=f"obe-{manifest['bucket']}-{len(entries)}",
+            )
+            manifest["status"] = "submitted"
+            logger.info(
+                "BatchIngest: job %s submitted %s PDFs as %s (%s failed)",
+                job_id,
+                len(entries),
+                manifest["batch"],
+                len(failed),
+            )
+            self._write_manifest(job_id, manifest)
+
+    def _upload_entries(self, manifest: dict[str, Any], gcs: GCSClient, deadline: float) -> None:
+        """以有上限的執行緒池上傳尚未上傳的 PDF；deadline 之後不再開始新的上傳，留待下次推進。"""
+        waiting = [entry for entry in manifest["entries"] if "file_name" not in entry]
+        if not waiting:
+            return
+
+        def upload(entry: dict[str, Any]) -> Optional[PendingFile | Exception]:
+            if time.monotonic() >= deadline:
+                return None
+            try:
+                return self._begin_upload(gcs, entry)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(self._upload_concurrency, len(waiting))) as pool:
+            outcomes = list(pool.map(upload, waiting))
+        for entry, outcome in zip(waiting, outcomes):
+            if isinstance(outcome, PendingFile):
+                entry.update(
+                    file_name=outcome.name,
+                    size=outcome.size,
+                    digest=outcome.digest,
+                    active=outcome.active,
+                    uploaded_at=int(time.time()),
+                )
+            elif isinstance(outcome, Exception):
+                entry["upload_errors"] = entry.get("upload_errors", 0) + 1
+                logger.warning("BatchIngest: upload of %s failed: %s", entry["blob_path"], outcome)
+                if entry["upload_errors"] >= self._max_upload_attempts:
+                    self._fail(manifest, entry, f"upload failed: {outcome}")
+
+    def _check_ready(self, manifest: dict[str, Any]) -> None:
+        """單次查詢已上傳但尚未 ACTIVE 的檔案；FAILED、已不存在或處理超過 file_ready_timeout 的移入 failed。"""
+        uploaded = [entry for entry in manifest["entries"] if "file_name" in entry and not entry.get("active")]
+        if not uploaded:
+            return
+        states = self._gemini.file_states(
+            [PendingFile(name=e["file_name"], size=e["size"], digest=e["digest"]) for e in uploaded]
+        )
+        now = time.time()
+        for entry in uploaded:
+            state = states.get(entry["file_name"], "MISSING")
+            if state == "ACTIVE":
+                entry["active"] = True
+            elif state != "PROCESSING":
+                self._fail(manifest, entry, f"file processing {state.lower()}")
+            elif now - entry["uploaded_at"] > self._file_ready_timeout:
+                self._fail(manifest, entry, "file processing timed out")
+
+    @staticmethod
+    def _fail(manifest: dict[str, Any], entry: dict[str, Any], reason: str) -> None:
+        """將無法送出的 PDF 自 entries 移入 failed（路徑 → 原因）。"""
+        manifest["entries"].remove(entry)
+        manifest["failed"][entry["blob_path"]] = reason
+
+    @staticmethod
+    def _preparing_state(job_id: str, manifest: dict[str, Any]) -> dict[str, Any]:
+        """上傳階段的進度：已上傳、已就緒的檔案數與目前的 failed。"""
+        entries = manifest["entries"]
+        return {
+            "job_id": job_id,
+            "state": "UPLOADING",
+            "done": False,
+            "uploaded": sum(1 for entry in entries if "file_name" in entry),
+            "ready": sum(1 for entry in entries if entry.get("active")),
+            "total": len(entries),
+            "failed": manifest["failed"],
+        }
+
+    def _cache_key(self, gcs: GCSClient, info: BlobInfo, options: ParseOptions) -> str:
+        """與 PDFProcessor 相同的結果快取 key。"""
+        return result_cache_key(
+            gcs.bucket_name,
+            info,
+            self._gemini.model_name,
+            self._gemini.prompt_version,
+            options,
+            self._image_publisher,
+        )
+
+    @staticmethod
+    def _blob_info(entry: dict[str, Any]) -> Optional[BlobInfo]:
+        """manifest 記下的 PDF 版本：下載時固定該 generation，不再查 metadata；未記錄時為 None（重新查詢）。"""
+        if "generation" not in entry:
+            return None
+        return BlobInfo(name=entry["blob_path"], size=entry["blob_size"], generation=entry["generation"])
+
+    def _begin_upload(self, gcs: GCSClient, entry: dict[str, Any]) -> PendingFile:
+        """spool 後上傳至 File API，不等待 ACTIVE（由 _check_ready 之後查詢）；內容相同的既有檔案直接沿用。"""
+        blob_path = entry["blob_path"]
+        with tempfile.TemporaryDirectory(prefix="obe_batch_") as spool_dir:
+            spool_path = Path(spool_dir) / "document.pdf"
+            gcs.download_blob_to_file(blob_path, spool_path, info=self._blob_info(entry))
+            with spool_path.open("rb") as f:
+                return self._gemini.begin_upload(
+                    f, display_name=display_name_for(blob_path), mime_type="application/pdf"
+                )
+
+    def _fill_images(
+        self, gcs: GCSClient, entry: dict[str, Any], blocks: list[PageBlock], options: ParseOptions
+    ) -> list[PageBlock]:
+        """有待填入的圖片元素時重新讀取 PDF 擷取圖片（規則與 PDFProcessor 相同）。"""
+        if not needs_image_content(blocks):
+            return blocks
+        with tempfile.TemporaryDirectory(prefix="obe_batch_") as spool_dir:
+            spool_path = Path(spool_dir) / "document.pdf"
+            gcs.download_blob_to_file(entry["blob_path"], spool_path, info=self._blob_info(entry))
+            images_by_page = extract_images(spool_path, options, self._image_publisher)
+        return fill_image_content(blocks, images_by_page, inline=options.image_output == "inline")
+
+    def _summary(self, job_id: str, manifest: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "job_id": job_id,
+            "state": manifest.get("state"),
+            "done": True,
+            "stored": manifest.get("stored", []),
+            "failed": manifest.get("failed", {}),
+        }
+
+    def _manifest_path(self, job_id: str) -> str:
+        return f"{self._manifest_prefix}{job_id}.json"
+
+    def _write_manifest(self, job_id: str, manifest: dict[str, Any]) -> None:
+        self._manifest_gcs.upload_bytes(
+            self._manifest_path(job_id),
+            json.dumps(manifest, ensure_ascii=False).encode("utf-8"),
+            content_type="application/json",
+        )
+
+    def _read_manifest(self, job_id: str) -> dict[str, Any]:
+        raw = self._manifest_gcs.read_blob_bytes_or_none(self._manifest_path(job_id))
+        if raw is None:
+            raise FileNotFoundError(f"Batch job not found: {job_id}")
+        return json.loads(raw)
@@ -73,21 +73,33 @@ class FileHandler:
     ) -> str:
         """
         接受從 GCSClient 傳來的檔案流（bytes 或 BinaryIO），上傳至 Gemini File API。
+        可 seek 的檔案物件直接分塊上傳，不先讀成整份 bytes；重試時由 Client 從中斷的 offset 續傳。
         輪詢直到狀態為 ACTIVE，含重試。回傳 file_uri 供 DocumentProcessor 使用。
         """
+        stream: BinaryIO | None = None
         if hasattr(data, "read"):
-            data = data.read()
-        if not isinstance(data, bytes):
+            if hasattr(data, "seekable") and data.seekable():
+                stream = data
+            else:
+                data = data.read()
+        if stream is None and not isinstance(data, (bytes, bytearray)):
             raise TypeError("data must be bytes or file-like with .read()")
 
         last_error: BaseException | None = None
         for attempt in range(1, self._max_retries + 1):
             try:
-                file_uri = self._gemini.upload_bytes(
-                    data=data,
-                    display_name=display_name,
-                    mime_type=mime_type,
-                )
+                if stream is not None:
+                    file_uri = self._gemini.upload_stream(
+                        stream,
+                        display_name=display_name,
+                        mime_type=mime_type,
+                    )
+                else:
+                    file_uri = self._gemini.upload_bytes(
+                        data=data,
+                        display_name=display_name,
+                        mime_type=mime_type,
+                    )
                 logger.info(
                     "upload_from_stream succeeded on attempt %s: %s",
                     attempt,
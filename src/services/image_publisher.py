@@ -0,0 +1,96 @@
+"""
+圖片外部化：將 PDF 擷取出的圖片平行上傳 GCS，解析結果改回傳 URL 而非 inline data URI。
+
+- 物件名稱為內容 sha256（parsed-images/<hash>.<ext>），同一張圖不論出現在哪份 PDF 都只上傳一次。
+- 已存在的物件直接略過（GCSClient.upload_bytes_if_absent）。
+- URL 預設為 gs:// URI（bucket 不需公開，由有權限的一方讀取）；https 公開 URL 只在 bucket 明確設為公開讀取時允許，
+  否則私有 bucket 上的 https URL 會讓編輯器拿到 403。
+- 回應大小隨頁數成長，不再隨圖片位元組成長，GAS 端 JSON 解析與 CacheService 分塊壓力大減。
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from src.clients.gcs_client import GCSClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_PREFIX = "parsed-images/"
+DEFAULT_MAX_WORKERS = 8
+URL_STYLE_HTTPS = "https"
+URL_STYLE_GS = "gs"
+
+_MIME_TO_EXT = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+
+
+class ImagePublisher:
+    """將擷取出的圖片以內容雜湊命名上傳 GCS，回傳每頁的 (url, mime_type)。"""
+
+    def __init__(
+        self,
+        gcs_client: GCSClient,
+        prefix: str = DEFAULT_IMAGE_PREFIX,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        url_style: str = URL_STYLE_GS,
+        public_bucket: bool = False,
+    ) -> None:
+        if url_style not in (URL_STYLE_HTTPS, URL_STYLE_GS):
+            raise ValueError(f"Unsupported url_style: {url_style}")
+        if url_style == URL_STYLE_HTTPS and not public_bucket:
+            raise ValueError("url_style=https requires a publicly readable image bucket")
+        self._gcs = gcs_client
+        self._prefix = prefix
+        self._max_workers = max_workers
+        self._url_style = url_style
+
+    @property
+    def url_base(self) -> str:
+        """發佈圖片 URL 的共同前綴（含 bucket、prefix 與 URL 形式），bucket 或 URL 形式改變時即不同。"""
+        return self._url(self._prefix)
+
+    def publish(self, images_by_page: dict[int, list[tuple[bytes, str]]]) -> dict[int, list[tuple[str, str]]]:
+        """
+        上傳 { page_index: [(raw_bytes, mime), ...] } 內的圖片，回傳 { page_index: [(url, mime), ...] }，
+        順序與輸入一致。同一份文件內重複的圖片只上傳一次。
+        """
+        unique: dict[str, tuple[bytes, str]] = {}
+        paths_by_page: dict[int, list[tuple[str, str]]] = {}
+        for page_index, images in images_by_page.items():
+            for raw, mime in images:
+                path = self._object_path(raw, mime)
+                unique.setdefault(path, (raw, mime))
+                paths_by_page.setdefault(page_index, []).append((path, mime))
+
+        if unique:
+            with ThreadPoolExecutor(max_workers=min(self._max_workers, len(unique))) as pool:
+                uploaded = list(pool.map(lambda item: self._upload(*item), unique.items()))
+            logger.info(
+                "ImagePublisher: %s unique images, %s uploaded, %s already in GCS",
+                len(unique),
+                sum(uploaded),
+                len(unique) - sum(uploaded),
+            )
+
+        return {
+            page_index: [(self._url(path), mime) for path, mime in items]
+            for page_index, items in paths_by_page.items()
+        }
+
+    def _object_path(self, raw: bytes, mime: str) -> str:
+        ext = _MIME_TO_EXT.get(mime, "png")
+        return f"{self._prefix}{hashlib.sha256(raw).hexdigest()}.{ext}"
+
+    def _upload(self, path: str, item: tuple[bytes, str]) -> bool:
+        raw, mime = item
+        return self._gcs.upload_bytes_if_absent(path, raw, content_type=mime)
+
+    def _url(self, path: str) -> str:
+        if self._url_style == URL_STYLE_GS:
+            return self._gcs.get_blob_uri(path)
+        return self._gcs.get_public_url(path)
@@ -0,0 +1,169 @@
+"""
+PDFProcessor、AsyncPDFProcessor 與 BatchIngestService 共用的解析規則（同步與 async 版只負責 I/O 編排）。
+
+- 結果快取 key：PDF 版本、模型、prompt 與影響輸出的選項相同時三者得到相同 key，快取互通。
+- 圖片：依 image_output 擷取 PDF 圖片（inline base64 或經 ImagePublisher 上傳取得 URL），填入模型留空的 image 元素。
+- 合併：分片與混合解析的結果換回原頁碼後依頁碼合併。
+- 路徑選擇：小檔 inline、Vertex gs:// 直讀與分片就緒結果的對應。
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Optional
+
+from src.clients.gcs_client import BlobInfo
+from src.models.schema import BlockElement, PageBlock, ParseOptions
+from src.services.image_publisher import ImagePublisher
+from src.services.pdf_image_extractor import extract_images_by_page, extract_raw_images_by_page
+from src.services.pdf_text_layer import SOURCE_GEMINI, HybridPlan, remap_selected_pages
+from src.services.result_cache import ParseResultCache
+
+# 大檔案（如 150MB）輪詢等待時間（秒），配合 GCF 540s Timeout
+DEFAULT_FILE_READY_TIMEOUT = 540.0
+# None：依檔案大小與實測處理時間自適應輪詢（見 FileReadyPoller）
+DEFAULT_POLL_INTERVAL: float | None = None
+# 圖片改上傳 GCS 時不受 inline payload 限制，單張上限放寬
+MAX_PUBLISHED_IMAGE_BYTES = 10 * 1024 * 1024
+# 分片解析：單一分片失敗時的重試次數與退避（秒）
+DEFAULT_SHARD_MAX_RETRIES = 2
+DEFAULT_SHARD_RETRY_BACKOFF = 5.0
+# 只影響執行方式、不影響輸出內容的選項，不納入結果快取 key
+EXECUTION_OPTIONS = {"shard_pages", "shard_concurrency"}
+DEFAULT_DISPLAY_NAME = "document.pdf"
+
+
+def options_variant(options: ParseOptions, image_publisher: Optional[ImagePublisher] = None) -> str:
+    """
+    影響輸出內容的非預設選項，作為結果快取 key 的一部分；全為預設值時為空字串。
+    image_output=url 時圖片 URL 的前綴（IMAGE_BUCKET、URL 形式）也會出現在結果中，一併納入。
+    """
+    changed = options.model_dump(exclude_defaults=True, exclude=EXECUTION_OPTIONS)
+    if options.image_output == "url" and image_publisher is not None:
+        changed["image_url_base"] = image_publisher.url_base
+    return json.dumps(changed, sort_keys=True) if changed else ""
+
+
+def result_cache_key(
+    bucket_name: str,
+    info: BlobInfo,
+    model_name: str,
+    prompt_version: str,
+    options: ParseOptions,
+    image_publisher: Optional[ImagePublisher] = None,
+) -> str:
+    """解析結果快取 key（亦作為 parse_pdf 的 ETag）。"""
+    return ParseResultCache.make_key(
+        bucket_name,
+        info,
+        model_name=model_name,
+        prompt_version=prompt_version,
+        variant=options_variant(options, image_publisher),
+    )
+
+
+def is_complete(blocks: list[PageBlock]) -> bool:
+    """解析結果是否完整、可寫入結果快取（非空且沒有 partial 頁面）。"""
+    return bool(blocks) and not any(block.partial for block in blocks)
+
+
+def reads_gcs_uri(options: ParseOptions, vertex: Any) -> bool:
+    """有 Vertex 後端且選項不需本機檔案（混合解析、分片）時，可能以 gs:// URI 直接解析。"""
+    return vertex is not None and not options.hybrid and options.shard_pages is None
+
+
+def display_name_for(blob_path: str) -> str:
+    """上傳 File API 時的顯示名稱：物件路徑的最後一段。"""
+    return blob_path.split("/")[-1] or DEFAULT_DISPLAY_NAME
+
+
+def fits_inline(source: bytes | bytearray | Path, max_bytes: int) -> bool:
+    """PDF 是否不超過 max_bytes（可 inline 送出，不經 File API）；max_bytes <= 0 表示停用。"""
+    if max_bytes <= 0:
+        return False
+    size = source.stat().st_size if isinstance(source, Path) else len(source)
+    return size <= max_bytes
+
+
+def inline_bytes(source: bytes | bytearray | Path, max_bytes: int) -> Optional[bytes | bytearray]:
+    """不超過 max_bytes 的 PDF 回傳其 bytes（inline 送出）；否則回傳 None（上傳 File API）。"""
+    if not fits_inline(source, max_bytes):
+        return None
+    return source.read_bytes() if isinstance(source, Path) else source
+
+
+def shard_file_uris(uploads: list[Optional[Any]], uris: list[str]) -> list[Optional[str]]:
+    """將 wait_for_files 的結果（只含已上傳的分片）依序對回全部分片；inline 分片為 None。"""
+    ready = iter(uris)
+    return [None if upload is None else next(ready) for upload in uploads]
+
+
+def extract_images(
+    pdf_source: bytes | bytearray | Path,
+    options: ParseOptions,
+    image_publisher: Optional[ImagePublisher],
+) -> dict[int, list[tuple[str, str]]]:
+    """依 image_output 擷取圖片：inline 回傳 base64；url 則上傳 GCS 後回傳 URL。"""
+    if options.image_output == "url":
+        if image_publisher is None:
+            raise ValueError("image_output=url requires an ImagePublisher")
+        raw = extract_raw_images_by_page(pdf_source, max_image_bytes=MAX_PUBLISHED_IMAGE_BYTES)
+        return image_publisher.publish(raw)
+    return extract_images_by_page(pdf_source)
+
+
+def fill_image_content(
+    blocks: list[PageBlock],
+    images_by_page: dict[int, list[tuple[str, str]]],
+    inline: bool = True,
+) -> list[PageBlock]:
+    """
+    將擷取出的 PDF 圖片填入 type=image 且 content 為空的區塊。
+    images_by_page: page_index_0based -> [(base64, mime_type), ...]；
+    inline=False 時為 [(url, mime_type), ...]，content 直接填 URL。
+    """
+    out: list[PageBlock] = []
+    for block in blocks:
+        page_idx = (block.page or 1) - 1
+        image_list = list(images_by_page.get(page_idx, []))
+        new_elements: list[BlockElement] = []
+        for el in block.elements:
+            if (el.type or "").lower() == "image" and not (el.content or "").strip() and image_list:
+                value, mime = image_list.pop(0)
+                content = f"data:{mime};base64,{value}" if inline else value
+                new_elements.append(
+                    BlockElement(type="image", content=content, description=el.description or "")
+                )
+            else:
+                new_elements.append(el)
+        out.append(block.model_copy(update={"elements": new_elements}))
+    return out
+
+
+def needs_image_content(blocks: list[PageBlock]) -> bool:
+    """是否有 type=image 且 content 為空、需由 PDF 擷取圖片填入的元素。"""
+    return any(
+        (el.type or "").lower() == "image" and not (el.content or "").strip()
+        for block in blocks
+        for el in block.elements
+    )
+
+
+def merge_page_blocks(blocks: list[PageBlock]) -> list[PageBlock]:
+    """依頁碼排序合併分片結果；同一頁出現多次時（模型頁碼越界被夾回）串接其 elements。"""
+    merged: dict[int, PageBlock] = {}
+    for block in sorted(blocks, key=lambda b: b.page):
+        existing = merged.get(block.page)
+        if existing is None:
+            merged[block.page] = block
+        else:
+            merged[block.page] = existing.model_copy(
+                update={"elements": existing.elements + block.elements, "partial": existing.partial or block.partial}
+            )
+    return list(merged.values())
+
+
+def merge_hybrid(plan: HybridPlan, vision_blocks: list[PageBlock]) -> list[PageBlock]:
+    """子文件解析結果換回原頁碼、標記來源後與文字層頁面依頁碼合併。"""
+    remapped = remap_selected_pages(vision_blocks, plan.vision_pages)
+    tagged = [block.model_copy(update={"source": SOURCE_GEMINI}) for block in remapped]
+    return merge_page_blocks(plan.text_blocks + tagged)
@@ -2,12 +2,15 @@
 從 PDF 擷取內嵌圖片，供結構化解析結果填入 image content。
 
 - 使用 PyMuPDF：page.get_images() + doc.extract_image(xref)。
+- 可傳入 bytes 或本機檔案路徑；傳路徑時由 PyMuPDF 直接開檔，不需整份載入記憶體。
 - 回傳依頁分組的 (base64, mime_type)，供 processor 填入 type=image 且 content 為空的區塊。
+- extract_raw_images_by_page 回傳原始位元組，供 ImagePublisher 上傳 GCS 改以 URL 輸出。
 """
 
 import base64
 import logging
 from io import BytesIO
+from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
@@ -29,22 +32,42 @@ def _ext_to_mime(ext: str) -> str:
     return "image/png"
 
 
-def extract_images_by_page(pdf_bytes: bytes) -> dict[int, list[tuple[str, str]]]:
+def extract_images_by_page(pdf_source: bytes | str | Path) -> dict[int, list[tuple[str, str]]]:
     """
-    從 PDF 位元組擷取每頁的內嵌圖片，回傳 base64 與 MIME。
+    從 PDF 位元組或本機檔案路徑擷取每頁的內嵌圖片，回傳 base64 與 MIME。
 
     回傳：{ page_index_0based: [ (base64_str, mime_type), ... ] }
     每頁最多 MAX_IMAGES_PER_PAGE 張，單張超過 MAX_IMAGE_BYTES 則略過。
     """
+    raw_by_page = extract_raw_images_by_page(pdf_source, max_image_bytes=MAX_IMAGE_BYTES)
+    return {
+        page_index: [(base64.standard_b64encode(raw).decode("ascii"), mime) for raw, mime in images]
+        for page_index, images in raw_by_page.items()
+    }
+
+
+def extract_raw_images_by_page(
+    pdf_source: bytes | str | Path,
+    max_image_bytes: int = MAX_IMAGE_BYTES,
+) -> dict[int, list[tuple[bytes, str]]]:
+    """
+    從 PDF 擷取每頁內嵌圖片的原始位元組（不做 base64），供上傳 GCS 等用途。
+
+    回傳：{ page_index_0based: [ (raw_bytes, mime_type), ... ] }
+    每頁最多 MAX_IMAGES_PER_PAGE 張，單張超過 max_image_bytes 則略過。
+    """
     try:
         import pymupdf
     except ImportError:
         logger.warning("pymupdf not installed, skip PDF image extraction")
         return {}
 
-    result: dict[int, list[tuple[str, str]]] = {}
+    result: dict[int, list[tuple[bytes, str]]] = {}
     try:
-        doc = pymupdf.open(stream=BytesIO(pdf_bytes), filetype="pdf")
+        if isinstance(pdf_source, (str, Path)):
+            doc = pymupdf.open(str(pdf_source), filetype="pdf")
+        else:
+            doc = pymupdf.open(stream=BytesIO(pdf_source), filetype="pdf")
     except Exception as e:
         logger.warning("pymupdf.open failed: %s", e)
         return {}
@@ -54,7 +77,7 @@ def extract_images_by_page(pdf_bytes: bytes) -> dict[int, list[tuple[str, str]]]
             images = doc[page_index].get_images()
             if not images:
                 continue
-            list_for_page: list[tuple[str, str]] = []
+            list_for_page: list[tuple[bytes, str]] = []
             for item in images[:MAX_IMAGES_PER_PAGE]:
                 xref = item[0] if isinstance(item, (list, tuple)) else item
                 try:
@@ -65,13 +88,11 @@ def extract_images_by_page(pdf_bytes: bytes) -> dict[int, list[tuple[str, str]]]
                 if not info or "image" not in info:
                     continue
                 raw = info.get("image", b"")
-                if len(raw) > MAX_IMAGE_BYTES:
+                if len(raw) > max_image_bytes:
                     logger.debug("skip large image page=%s size=%s", page_index, len(raw))
                     continue
                 ext = info.get("ext") or "png"
-                mime = _ext_to_mime(ext)
-                b64 = base64.standard_b64encode(raw).decode("ascii")
-                list_for_page.append((b64, mime))
+                list_for_page.append((raw, _ext_to_mime(ext)))
             if list_for_page:
                 result[page_index] = list_for_page
     finally:
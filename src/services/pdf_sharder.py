@@ -0,0 +1,87 @@
+"""
+PDF 頁面分片：將大型 PDF 依固定頁數切成多個子文件，供平行上傳與解析。
+
+- 使用 PyMuPDF：insert_pdf(from_page, to_page) 複製頁面範圍，save(garbage, deflate) 只保留該範圍用到的物件。
+- 可傳入 bytes 或本機檔案路徑；子文件寫入呼叫端提供的目錄，由呼叫端負責清理。
+- remap_pages 將子文件內的頁碼（從 1 開始）換回原文件頁碼，合併後與未分片的輸出一致。
+- 未安裝 pymupdf 或開檔失敗時回傳空列表，呼叫端退回整份解析。
+"""
+
+import logging
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+
+from src.models.schema import PageBlock
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PdfShard:
+    """一個頁面範圍子文件：first_page 為原文件頁碼（從 1 開始）。"""
+
+    index: int
+    first_page: int
+    page_count: int
+    path: Path
+
+    @property
+    def last_page(self) -> int:
+        return self.first_page + self.page_count - 1
+
+
+def split_pdf(pdf_source: bytes | str | Path, shard_pages: int, out_dir: str | Path) -> list[PdfShard]:
+    """
+    將 PDF 每 shard_pages 頁切成一個子文件，寫入 out_dir，依頁序回傳。
+    無法分片（未安裝 pymupdf、開檔失敗）時回傳空列表。
+    """
+    if shard_pages < 1:
+        raise ValueError("shard_pages must be >= 1")
+    try:
+        import pymupdf
+    except ImportError:
+        logger.warning("pymupdf not installed, skip PDF sharding")
+        return []
+
+    try:
+        if isinstance(pdf_source, (str, Path)):
+            doc = pymupdf.open(str(pdf_source), filetype="pdf")
+        else:
+            doc = pymupdf.open(stream=BytesIO(pdf_source), filetype="pdf")
+    except Exception as e:
+        logger.warning("pymupdf.open failed: %s", e)
+        return []
+
+    out = Path(out_dir)
+    shards: list[PdfShard] = []
+    try:
+        total = len(doc)
+        for index, start in enumerate(range(0, total, shard_pages)):
+            end = min(start + shard_pages, total) - 1
+            path = out / f"shard_{index:04d}.pdf"
+            sub = pymupdf.open()
+            try:
+                sub.insert_pdf(doc, from_page=start, to_page=end)
+                sub.save(str(path), garbage=3, deflate=True)
+            finally:
+                sub.close()
+            shards.append(PdfShard(index=index, first_page=start + 1, page_count=end - start + 1, path=path))
+    finally:
+        doc.close()
+    logger.info("split_pdf: %s pages into %s shards of %s", total, len(shards), shard_pages)
+    return shards
+
+
+def remap_pages(blocks: list[PageBlock], shard: PdfShard) -> list[PageBlock]:
+    """
+    將子文件的頁碼換回原文件頁碼。模型偶爾回報超出子文件範圍的頁碼，
+    此時夾在子文件的頁碼範圍內，避免與相鄰分片的頁面重疊。
+    """
+    remapped: list[PageBlock] = []
+    for block in blocks:
+        local = min(max(block.page, 1), shard.page_count)
+        if local != block.page:
+            logger.debug("remap_pages: shard %s page %s out of range", shard.index, block.page)
+        remapped.append(block.model_copy(update={"page": shard.first_page + local - 1}))
+    return remapped
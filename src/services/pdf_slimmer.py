@@ -0,0 +1,152 @@
+"""
+上傳 Gemini 前的 PDF 瘦身：供應商型錄常帶 300–600 DPI 印刷用圖片、完整內嵌字型與未使用物件，
+版面理解用不到，卻拉長上傳與 File API 處理（就緒輪詢）時間。
+
+- 使用 PyMuPDF：rewrite_images 將高於 target_dpi 的圖片降採樣並重新壓縮為 JPEG；
+  subset_fonts 只保留用到的字形（需 fontTools，未安裝則略過）；
+  save(garbage=4, deflate, clean, use_objstms) 移除未使用物件並重新壓縮串流。
+- 只用於上傳：圖片擷取仍讀原始 PDF，輸出的圖片解析度不受影響。
+- 瘦身後沒有變小（或低於 min_bytes、失敗）時回傳 None，呼叫端沿用原檔。
+- stats()：累計的前後位元組、瘦身耗時，以及依上傳＋就緒等待時間按比例估算的節省秒數。
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGET_DPI = 150
+DEFAULT_IMAGE_QUALITY = 80
+# 小於此大小的 PDF 不值得瘦身（開檔與重寫的時間高於省下的上傳時間）
+DEFAULT_MIN_BYTES = 2 * 1024 * 1024
+# 只處理比 target_dpi 高出此倍率的圖片，避免對接近目標解析度的圖片重複壓縮
+_DPI_THRESHOLD_FACTOR = 1.2
+
+
+@dataclass(frozen=True)
+class SlimResult:
+    """一次瘦身的結果：path 為瘦身後的檔案。"""
+
+    path: Path
+    original_bytes: int
+    slim_bytes: int
+    seconds: float
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - self.slim_bytes
+
+
+class PdfSlimmer:
+    """執行緒安全的 PDF 瘦身器；process 共用一個實例以累計統計。"""
+
+    def __init__(
+        self,
+        target_dpi: int = DEFAULT_TARGET_DPI,
+        image_quality: int = DEFAULT_IMAGE_QUALITY,
+        min_bytes: int = DEFAULT_MIN_BYTES,
+    ) -> None:
+        self._target_dpi = target_dpi
+        self._image_quality = image_quality
+        self._min_bytes = min_bytes
+        self._lock = threading.Lock()
+        self._stats = {
+            "documents": 0,
+            "slimmed": 0,
+            "bytes_before": 0,
+            "bytes_after": 0,
+            "slim_seconds": 0.0,
+            "estimated_seconds_saved": 0.0,
+        }
+
+    def slim(self, pdf_source: bytes | str | Path, out_dir: str | Path) -> Optional[SlimResult]:
+        """將瘦身後的 PDF 寫入 out_dir；未變小、太小或失敗時回傳 None。"""
+        original_bytes = len(pdf_source) if isinstance(pdf_source, (bytes, bytearray)) else Path(pdf_source).stat().st_size
+        with self._lock:
+            self._stats["documents"] += 1
+        if original_bytes < self._min_bytes:
+            return None
+        try:
+            import pymupdf
+        except ImportError:
+            logger.warning("pymupdf not installed, skip PDF slimming")
+            return None
+
+        start = time.monotonic()
+        path = Path(out_dir) / "slim.pdf"
+        try:
+            if isinstance(pdf_source, (str, Path)):
+                doc = pymupdf.open(str(pdf_source), filetype="pdf")
+            else:
+                doc = pymupdf.open(stream=BytesIO(pdf_source), filetype="pdf")
+        except Exception as e:
+            logger.warning("pymupdf.open failed: %s", e)
+            return None
+        try:
+            self._rewrite(doc)
+            doc.save(str(path), garbage=4, deflate=True, clean=True, use_objstms=1)
+        except Exception as e:
+            logger.warning("PDF slimming failed: %s", e)
+            return None
+        finally:
+            doc.close()
+
+        result = SlimResult(
+            path=path,
+            original_bytes=original_bytes,
+            slim_bytes=path.stat().st_size,
+            seconds=time.monotonic() - start,
+        )
+        logger.info(
+            "slim_pdf: %s -> %s bytes (%.0f%%) in %.2fs",
+            result.original_bytes,
+            result.slim_bytes,
+            100.0 * result.slim_bytes / result.original_bytes,
+            result.seconds,
+        )
+        if result.saved_bytes <= 0:
+            return None
+        with self._lock:
+            self._stats["slimmed"] += 1
+            self._stats["bytes_before"] += result.original_bytes
+            self._stats["bytes_after"] += result.slim_bytes
+            self._stats["slim_seconds"] += result.seconds
+        return result
+
+    def record_upload(self, result: SlimResult, upload_seconds: float) -> float:
+        """
+        記錄瘦身檔的上傳＋就緒等待秒數，依位元組比例估算原檔所需時間，回傳估計節省秒數（已扣除瘦身耗時）。
+        """
+        estimated_original = upload_seconds * result.original_bytes / max(result.slim_bytes, 1)
+        saved = estimated_original - upload_seconds - result.seconds
+        with self._lock:
+            self._stats["estimated_seconds_saved"] += saved
+        logger.info("slim_pdf: upload %.1fs, estimated %.1fs saved", upload_seconds, saved)
+        return saved
+
+    def stats(self) -> dict[str, float]:
+        """回傳累計的文件數、瘦身數、前後位元組、瘦身耗時與估計節省秒數。"""
+        with self._lock:
+            return {
+                **self._stats,
+                "slim_seconds": round(self._stats["slim_seconds"], 2),
+                "estimated_seconds_saved": round(self._stats["estimated_seconds_saved"], 1),
+            }
+
+    def _rewrite(self, doc) -> None:
+        """降採樣圖片並子集化字型；舊版 PyMuPDF 沒有 rewrite_images 時只做物件清理與壓縮。"""
+        if hasattr(doc, "rewrite_images"):
+            doc.rewrite_images(
+                dpi_threshold=int(self._target_dpi * _DPI_THRESHOLD_FACTOR),
+                dpi_target=self._target_dpi,
+                quality=self._image_quality,
+            )
+        try:
+            doc.subset_fonts()
+        except Exception as e:
+            logger.debug("subset_fonts skipped: %s", e)
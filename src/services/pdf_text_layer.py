@@ -0,0 +1,139 @@
+"""
+文字層優先的混合解析：以 PyMuPDF 判斷每頁是否需要視覺模型。
+
+- 以文字字數與圖片面積比例分類：文字足夠且圖片佔比低的頁面視為文字頁，
+  直接由 PyMuPDF 文字塊（依閱讀順序，含圖片佔位）產生 PageBlock，不送 Gemini。
+- 其餘頁面（掃描檔、圖片為主的商品頁）複製成子文件交給 Gemini；
+  remap_selected_pages 將子文件頁碼換回原文件頁碼。
+- PageBlock.source 記錄各頁由哪條路徑產生（text_layer / gemini）。
+- 未安裝 pymupdf、開檔失敗或沒有任何文字頁時回傳 None，呼叫端退回整份送 Gemini。
+"""
+
+import logging
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+from src.models.schema import BlockElement, PageBlock
+
+logger = logging.getLogger(__name__)
+
+SOURCE_TEXT_LAYER = "text_layer"
+SOURCE_GEMINI = "gemini"
+# 文字頁門檻：至少 MIN_TEXT_CHARS 個非空白字元，且圖片面積不超過頁面的 MAX_IMAGE_RATIO
+MIN_TEXT_CHARS = 200
+MAX_IMAGE_RATIO = 0.3
+
+
+@dataclass(frozen=True)
+class HybridPlan:
+    """
+    混合解析計畫：text_blocks 為已由文字層產生的頁面；vision_pages 為需送 Gemini 的原文件頁碼（從 1 開始，遞增），
+    vision_path 為只含這些頁面的子文件（沒有時為 None）。
+    """
+
+    text_blocks: list[PageBlock]
+    vision_pages: list[int]
+    vision_path: Optional[Path]
+
+
+def plan_hybrid(
+    pdf_source: bytes | str | Path,
+    out_dir: str | Path,
+    min_text_chars: int = MIN_TEXT_CHARS,
+    max_image_ratio: float = MAX_IMAGE_RATIO,
+) -> Optional[HybridPlan]:
+    """
+    逐頁分類並產生文字頁的 PageBlock；需視覺的頁面寫成 out_dir 下的子文件。
+    無法分類或沒有文字頁（整份仍需送 Gemini）時回傳 None。
+    """
+    try:
+        import pymupdf
+    except ImportError:
+        logger.warning("pymupdf not installed, skip hybrid parsing")
+        return None
+
+    try:
+        if isinstance(pdf_source, (str, Path)):
+            doc = pymupdf.open(str(pdf_source), filetype="pdf")
+        else:
+            doc = pymupdf.open(stream=BytesIO(pdf_source), filetype="pdf")
+    except Exception as e:
+        logger.warning("pymupdf.open failed: %s", e)
+        return None
+
+    try:
+        text_blocks: list[PageBlock] = []
+        vision_pages: list[int] = []
+        for index in range(len(doc)):
+            page = doc[index]
+            if _is_text_page(page, min_text_chars, max_image_ratio):
+                text_blocks.append(_page_block_from_text_layer(page, index + 1, pymupdf))
+            else:
+                vision_pages.append(index + 1)
+        if not text_blocks:
+            return None
+        vision_path = _write_pages(doc, vision_pages, Path(out_dir), pymupdf) if vision_pages else None
+    finally:
+        doc.close()
+    logger.info("plan_hybrid: %s text-layer pages, %s vision pages", len(text_blocks), len(vision_pages))
+    return HybridPlan(text_blocks=text_blocks, vision_pages=vision_pages, vision_path=vision_path)
+
+
+def remap_selected_pages(blocks: list[PageBlock], pages: list[int]) -> list[PageBlock]:
+    """將子文件頁碼（從 1 開始）換回 pages 對應的原文件頁碼；越界的頁碼夾在子文件範圍內。"""
+    remapped: list[PageBlock] = []
+    for block in blocks:
+        local = min(max(block.page, 1), len(pages))
+        remapped.append(block.model_copy(update={"page": pages[local - 1]}))
+    return remapped
+
+
+def _is_text_page(page, min_text_chars: int, max_image_ratio: float) -> bool:
+    text_chars = sum(1 for ch in page.get_text() if not ch.isspace())
+    if text_chars < min_text_chars:
+        return False
+    page_area = page.rect.width * page.rect.height
+    if page_area <= 0:
+        return False
+    image_area = 0.0
+    for info in page.get_image_info():
+        rect = page.rect & info["bbox"]
+        if not rect.is_empty:
+            image_area += rect.width * rect.height
+    return min(image_area / page_area, 1.0) <= max_image_ratio
+
+
+def _page_block_from_text_layer(page, page_number: int, pymupdf) -> PageBlock:
+    """文字塊依閱讀順序轉為 text 元素；圖片塊保留為 content 為空的 image 元素，由 processor 填入圖片。"""
+    flags = pymupdf.TEXTFLAGS_BLOCKS | pymupdf.TEXT_PRESERVE_IMAGES
+    elements: list[BlockElement] = []
+    for block in page.get_text("blocks", sort=True, flags=flags):
+        block_type = block[6]
+        if block_type == 1:
+            elements.append(BlockElement(type="image", content="", description=""))
+            continue
+        text = block[4].strip()
+        if text:
+            elements.append(BlockElement(type="text", content=text, description=""))
+    return PageBlock(page=page_number, elements=elements, source=SOURCE_TEXT_LAYER)
+
+
+def _write_pages(doc, pages: list[int], out_dir: Path, pymupdf) -> Path:
+    """將指定頁面（連續頁一次複製）寫成子文件。"""
+    path = out_dir / "vision_pages.pdf"
+    sub = pymupdf.open()
+    try:
+        start = prev = pages[0]
+        for page in pages[1:] + [None]:
+            if page is not None and page == prev + 1:
+                prev = page
+                continue
+            sub.insert_pdf(doc, from_page=start - 1, to_page=prev - 1)
+            if page is not None:
+                start = prev = page
+        sub.save(str(path), garbage=3, deflate=True)
+    finally:
+        sub.close()
+    return path
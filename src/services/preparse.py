@@ -0,0 +1,200 @@
+"""
+上傳即預先解析：GCS object-finalize 事件觸發 parse_from_gcs，結果寫入 ParseResultCache，
+使用者開啟編輯器時的 parse_pdf 只需讀快取。
+
+- 過濾：只處理指定前綴下的 .pdf，其餘（解析快取 JSON、發佈的圖片）直接略過。
+- 去重：Eventarc 為 at-least-once，同一 (bucket, name, generation) 可能送達多次；
+  instance 內以 TTL 記錄近期處理過的事件，跨 instance 以 GCS claim 物件（if_generation_match=0）搶佔。
+- 過期 claim：instance 逾時或被回收時 release 不會執行，claim 會一直留著；
+  claimed_at 超過 claim_timeout（GCF timeout 540s）的 claim 視為過期，以 if_generation_match 原子地接手。
+  已成功的 claim 過期後若再收到重送事件也會被接手，此時解析直接命中解析快取。
+- 限流：每個 instance 同時只跑 max_concurrency 個預解析，超過的事件直接略過（互動請求仍會正常解析）。
+- 失敗時釋放 claim，讓 Eventarc 重送或下次事件可重新處理。
+- 事件時間：--retry 會以退避持續重送最多 24 小時，event_age 供呼叫端略過過舊的事件。
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from src.clients.gcs_client import GCSClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREPARSE_PREFIX = "uploads/"
+DEFAULT_CLAIM_PREFIX = "preparse-claims/"
+DEFAULT_MAX_CONCURRENCY = 1
+# 需大於 GCF timeout（540s），避免處理中的事件被當成過期而重跑
+DEFAULT_DEDUP_TTL = 3600.0
+# claim 超過 GCF timeout 仍未釋放時，持有者必然已結束（逾時或 instance 被回收）
+DEFAULT_CLAIM_TIMEOUT = 540.0
+# RFC 3339 小數秒超過 6 位（奈秒）時截斷，datetime.fromisoformat 只接受微秒
+_FRACTION_RE = re.compile(r"(\.\d{6})\d+")
+
+
+def event_age(event_time: Any, now: Optional[float] = None) -> Optional[float]:
+    """
+    CloudEvent time 屬性（RFC 3339，例如 2026-01-01T00:00:00.123Z）距今的秒數。
+    缺少或無法解析時回傳 None（呼叫端照常處理）。
+    """
+    if not isinstance(event_time, str) or not event_time:
+        return None
+    text = _FRACTION_RE.sub(r"\1", event_time.strip()).replace("Z", "+00:00").replace("z", "+00:00")
+    try:
+        sent = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if sent.tzinfo is None:
+        sent = sent.replace(tzinfo=timezone.utc)
+    return (time.time() if now is None else now) - sent.timestamp()
+
+
+@dataclass(frozen=True)
+class FinalizedObject:
+    """object-finalize 事件中與預解析有關的欄位。"""
+
+    bucket: str
+    name: str
+    generation: int
+    size: int = 0
+
+    @classmethod
+    def from_event_data(cls, data: dict[str, Any]) -> "FinalizedObject":
+        """由 CloudEvent data（GCS object 資源 JSON）建立；generation／size 在 JSON 中為字串。"""
+        return cls(
+            bucket=data["bucket"],
+            name=data["name"],
+            generation=int(data.get("generation") or 0),
+            size=int(data.get("size") or 0),
+        )
+
+    @property
+    def key(self) -> str:
+        return f"{self.bucket}/{self.name}#{self.generation}"
+
+
+class PreparseGate:
+    """決定 finalize 事件是否執行預解析：前綴過濾、去重與每 instance 並行上限。執行緒安全。"""
+
+    def __init__(
+        self,
+        prefix: str = DEFAULT_PREPARSE_PREFIX,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        dedup_ttl: float = DEFAULT_DEDUP_TTL,
+        claim_prefix: str = DEFAULT_CLAIM_PREFIX,
+        claim_timeout: float = DEFAULT_CLAIM_TIMEOUT,
+    ) -> None:
+        self._prefix = prefix
+        self._dedup_ttl = dedup_ttl
+        self._claim_prefix = claim_prefix
+        self._claim_timeout = claim_timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._lock = threading.Lock()
+        self._recent: dict[str, float] = {}
+        self._stats = {"started": 0, "duplicates": 0, "throttled": 0, "skipped": 0, "stale_takeovers": 0}
+
+    def matches(self, obj: FinalizedObject) -> bool:
+        """是否為需要預解析的物件（前綴符合且為 .pdf）。"""
+        ok = obj.name.startswith(self._prefix) and obj.name.lower().endswith(".pdf")
+        if not ok:
+            with self._lock:
+                self._stats["skipped"] += 1
+        return ok
+
+    def try_acquire(self, obj: FinalizedObject, claim_gcs: GCSClient) -> bool:
+        """
+        取得處理權：近期處理過、instance 已滿或其他 instance 已 claim 時回傳 False。
+        回傳 True 時呼叫端必須在結束後呼叫 release()。
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            if obj.key in self._recent:
+                self._stats["duplicates"] += 1
+                return False
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["throttled"] += 1
+            return False
+
+        if not self._claim(obj, claim_gcs):
+            self._slots.release()
+            with self._lock:
+                self._recent[obj.key] = now
+                self._stats["duplicates"] += 1
+            return False
+
+        with self._lock:
+            self._recent[obj.key] = now
+            self._stats["started"] += 1
+        return True
+
+    def release(self, obj: FinalizedObject, claim_gcs: GCSClient, success: bool) -> None:
+        """釋放並行名額；失敗時一併移除去重紀錄與 claim，讓重送的事件可以重新處理。"""
+        self._slots.release()
+        if success:
+            return
+        with self._lock:
+            self._recent.pop(obj.key, None)
+        try:
+            claim_gcs.delete_blob(self._claim_path(obj))
+        except Exception as e:
+            logger.warning("PreparseGate: failed to release claim for %s: %s", obj.key, e)
+
+    def stats(self) -> dict[str, int]:
+        """回傳 started、duplicates、throttled、skipped、stale_takeovers 計數。"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _claim(self, obj: FinalizedObject, claim_gcs: GCSClient) -> bool:
+        """
+        以建立 claim 物件搶佔跨 instance 的處理權；已有 claim 時只接手過期的 claim。
+        GCS 寫入失敗時仍放行（寧可重複解析）。
+        """
+        path = self._claim_path(obj)
+        payload = json.dumps({"key": obj.key, "claimed_at": int(time.time())}).encode("utf-8")
+        try:
+            if claim_gcs.upload_bytes_if_absent(path, payload, content_type="application/json"):
+                return True
+            return self._take_over_stale(obj, path, payload, claim_gcs)
+        except Exception as e:
+            logger.warning("PreparseGate: claim failed for %s, proceeding: %s", obj.key, e)
+            return True
+
+    def _take_over_stale(self, obj: FinalizedObject, path: str, payload: bytes, claim_gcs: GCSClient) -> bool:
+        """
+        既有 claim 的 claimed_at 超過 claim_timeout（或內容無法解析）時，
+        以 if_generation_match 覆寫接手；多個 instance 同時接手時只有一個成功。
+        """
+        current = claim_gcs.read_blob_versioned(path)
+        if current is None:
+            # claim 剛被釋放：交給重送的事件處理
+            return False
+        data, generation = current
+        try:
+            claimed_at = float(json.loads(data)["claimed_at"])
+        except (ValueError, KeyError, TypeError):
+            claimed_at = 0.0
+        age = time.time() - claimed_at
+        if age <= self._claim_timeout:
+            return False
+        if not claim_gcs.upload_bytes_if_generation_match(path, payload, generation, content_type="application/json"):
+            return False
+        logger.warning("PreparseGate: took over stale claim for %s (%.0fs old)", obj.key, age)
+        with self._lock:
+            self._stats["stale_takeovers"] += 1
+        return True
+
+    def _claim_path(self, obj: FinalizedObject) -> str:
+        return f"{self._claim_prefix}{obj.bucket}/{obj.name}#{obj.generation}"
+
+    def _purge_expired(self, now: float) -> None:
+        """移除超過 TTL 的去重紀錄（呼叫端需持有 lock）。"""
+        expired = [k for k, t in self._recent.items() if now - t > self._dedup_ttl]
+        for k in expired:
+            del self._recent[k]
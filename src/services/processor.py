@@ -5,50 +5,62 @@ PDF 結構化解析處理器：GCS 讀取 → Gemini File API 上傳（含狀態
 - 結構化解析：使用 System Instruction 讓 gemini-2.5-flash 輸出
   [{ "page": 1, "elements": [{ "type": "image"|"text", "content", "description" }] }]。
 - 多模態：解析結果含圖片精簡描述，供前端編輯器顯示。
-- 錯誤處理：針對 150MB 可能產生的解析超時，使用狀態輪詢（_wait_for_file_ready）
+- 錯誤處理：針對 150MB 可能產生的解析超時，使用自適應狀態輪詢（FileReadyPoller）
   與可選的 FileHandler 重試。
+- Spool 模式：GCS 直接寫入單一暫存檔，圖片擷取與 File API 上傳皆讀同一路徑，
+  整份 PDF 不以 bytes 形式留在記憶體。
+- 結果快取：可選的 ParseResultCache，PDF、模型與 prompt 皆未變時直接回傳先前結果。
+- 圖片輸出：ParseOptions.image_output="url" 時由 ImagePublisher 上傳 GCS，content 改為 URL。
+- 分片解析：ParseOptions.shard_pages 有給時以 PyMuPDF 切成多個子文件，先平行上傳全部分片（不等待就緒），
+  以 wait_for_files 一次等待全部 ACTIVE，再平行解析；頁碼換回原文件後依序合併，單一分片失敗只重試該分片。
+- 混合解析：ParseOptions.hybrid 開啟時文字為主的頁面直接取 PDF 文字層，只把需視覺的頁面組成子文件送 Gemini，
+  依原頁碼合併，PageBlock.source 記錄各頁來源。
+- 瘦身：有 PdfSlimmer 時上傳前先降採樣圖片、移除未使用物件；圖片擷取仍讀原檔。
+- 快取 key、圖片擷取與填入、分片與混合解析的合併等規則在 parse_common，與 async 版及大量匯入共用。
+- 小檔快速路徑：不超過 inline_max_bytes 的文件（或分片）以 inline bytes 放入 generate_content，
+  省去 File API 上傳與就緒輪詢；prompt 與解析規則相同，輸出的 PageBlock 與上傳路徑一致。
+- Vertex 直讀：Gemini Client 帶 Vertex 後端時以 gs:// URI 解析，不下載、不上傳；
+  只有結果含待填入的圖片時才讀取 PDF 擷取圖片。混合解析、分片與超過後端上限的檔案仍走上傳流程。
 """
 
 import logging
-from typing import Optional
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional, TypeVar
 
-from src.clients.gcs_client import GCSClient
-from src.clients.gemini_client import GeminiFileClient
-from src.models.schema import BlockElement, PageBlock
-from src.services.file_handler import FileHandler
-from src.services.pdf_image_extractor import extract_images_by_page
+from src.clients.gcs_client import BlobInfo, GCSClient
+from src.clients.gemini_client import MAX_INLINE_BYTES, GeminiFileClient, PendingFile
+from src.models.schema import PageBlock, ParseOptions
+from src.services.file_handler import RETRYABLE_EXCEPTIONS, FileHandler
+from src.services.image_publisher import ImagePublisher
+from src.services.parse_common import (
+    DEFAULT_FILE_READY_TIMEOUT,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_SHARD_MAX_RETRIES,
+    DEFAULT_SHARD_RETRY_BACKOFF,
+    display_name_for,
+    extract_images,
+    fill_image_content,
+    fits_inline,
+    inline_bytes,
+    is_complete,
+    merge_hybrid,
+    merge_page_blocks,
+    needs_image_content,
+    reads_gcs_uri,
+    result_cache_key,
+    shard_file_uris,
+)
+from src.services.pdf_sharder import PdfShard, remap_pages, split_pdf
+from src.services.pdf_slimmer import PdfSlimmer, SlimResult
+from src.services.pdf_text_layer import HybridPlan, plan_hybrid
+from src.services.result_cache import ParseResultCache
 
 logger = logging.getLogger(__name__)
 
-# 大檔案（如 150MB）輪詢等待時間（秒），配合 GCF 540s Timeout
-DEFAULT_FILE_READY_TIMEOUT = 540.0
-DEFAULT_POLL_INTERVAL = 2.0
-
-
-def _fill_image_content(
-    blocks: list[PageBlock],
-    images_by_page: dict[int, list[tuple[str, str]]],
-) -> list[PageBlock]:
-    """
-    將擷取出的 PDF 圖片填入 type=image 且 content 為空的區塊。
-    images_by_page: page_index_0based -> [(base64, mime_type), ...]
-    """
-    out: list[PageBlock] = []
-    for block in blocks:
-        page_idx = (block.page or 1) - 1
-        image_list = list(images_by_page.get(page_idx, []))
-        new_elements: list[BlockElement] = []
-        for el in block.elements:
-            if (el.type or "").lower() == "image" and not (el.content or "").strip() and image_list:
-                b64, mime = image_list.pop(0)
-                content = f"data:{mime};base64,{b64}"
-                new_elements.append(
-                    BlockElement(type="image", content=content, description=el.description or "")
-                )
-            else:
-                new_elements.append(el)
-        out.append(PageBlock(page=block.page, elements=new_elements))
-    return out
+T = TypeVar("T")
 
 
 class PDFProcessor:
@@ -63,49 +75,317 @@ class PDFProcessor:
         gemini_client: GeminiFileClient,
         file_handler: Optional[FileHandler] = None,
         file_ready_timeout: float = DEFAULT_FILE_READY_TIMEOUT,
-        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        poll_interval: float | None = DEFAULT_POLL_INTERVAL,
+        sliced_download: bool = False,
+        spool_to_disk: bool = False,
+        gcs_factory: Optional[Callable[[str], GCSClient]] = None,
+        result_cache: Optional[ParseResultCache] = None,
+        image_publisher: Optional[ImagePublisher] = None,
+        shard_max_retries: int = DEFAULT_SHARD_MAX_RETRIES,
+        shard_retry_backoff: float = DEFAULT_SHARD_RETRY_BACKOFF,
+        pdf_slimmer: Optional[PdfSlimmer] = None,
+        inline_max_bytes: int = 0,
     ) -> None:
         self._gcs = gcs_client
         self._gemini = gemini_client
         self._file_handler = file_handler
         self._file_ready_timeout = file_ready_timeout
         self._poll_interval = poll_interval
+        self._sliced_download = sliced_download
+        self._spool_to_disk = spool_to_disk
+        self._gcs_factory = gcs_factory
+        self._result_cache = result_cache
+        self._image_publisher = image_publisher
+        self._shard_max_retries = shard_max_retries
+        self._shard_retry_backoff = shard_retry_backoff
+        self._pdf_slimmer = pdf_slimmer
+        self._inline_max_bytes = min(inline_max_bytes, MAX_INLINE_BYTES)
 
     def parse_from_gcs(
         self,
         blob_path: str,
         bucket_name: Optional[str] = None,
+        options: Optional[ParseOptions] = None,
+        info: Optional[BlobInfo] = None,
     ) -> list[PageBlock]:
         """
         從 GCS 讀取 PDF，上傳至 Gemini File API（含狀態輪詢），再以結構化指令解析。
         回傳 [{ page, elements: [{ type, content, description }] }]。
-        若 bucket_name 有給則暫時使用該 bucket。
+        若 bucket_name 有給則暫時使用該 bucket（由 gcs_factory 取得，例如 ClientPool.get_gcs）。
+        sliced_download 開啟時以分段平行下載取代單一串流（大檔較快）。
+        spool_to_disk 開啟時 GCS 直接寫入暫存檔，圖片擷取與上傳共用同一路徑。
+        有 result_cache 時先查快取，命中即不下載、不呼叫 Gemini。
+        options 為每次請求的解析選項（圖片輸出方式等），未給則用預設值。
+        info 為呼叫端已取得的 metadata（例如計算 ETag 時），有給則不再重查。
         """
-        gcs = self._gcs
-        if bucket_name is not None:
-            gcs = GCSClient(bucket_name)
+        options = options or ParseOptions()
+        gcs = self._resolve_gcs(bucket_name)
+        # metadata 只查一次：結果快取 key、Vertex 直讀（檔案大小）與下載共用同一份 BlobInfo，
+        # 下載固定在該 generation，寫入快取的內容與 key 對應同一版本
+        if info is None and (self._result_cache is not None or self._reads_gcs_uri(options)):
+            info = gcs.get_blob_info(blob_path)
+        cache_key = self._cache_key_for(gcs, info, options) if self._result_cache is not None else None
+        if cache_key is not None:
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                return cached
 
-        display_name = blob_path.split("/")[-1] or "document.pdf"
-        logger.info("parse_from_gcs: reading blob %s", blob_path)
-        data = gcs.read_blob_bytes(blob_path)
+        blocks = self._parse_blob(gcs, blob_path, options, info)
+        if cache_key is not None:
+            # 退回文字塊、搶救的頁面或截斷後放棄接續的結果不快取，下次請求重新解析
+            if is_complete(blocks):
+                self._result_cache.put(cache_key, blocks)
+            else:
+                logger.warning("PDFProcessor: incomplete parse of %s, not cached", blob_path)
+        return blocks
 
-        images_by_page = extract_images_by_page(data)
+    def result_cache_key(
+        self,
+        blob_path: str,
+        bucket_name: Optional[str] = None,
+        options: Optional[ParseOptions] = None,
+        info: Optional[BlobInfo] = None,
+    ) -> Optional[str]:
+        """
+        以一次 metadata 請求計算結果快取 key（亦作為 parse_pdf 的 ETag）；info 有給時不再查詢。
+        未設定 result_cache 時回傳 None。
+        """
+        if self._result_cache is None:
+            return None
+        gcs = self._resolve_gcs(bucket_name)
+        return self._cache_key_for(gcs, info or gcs.get_blob_info(blob_path), options or ParseOptions())
 
-        if self._file_handler is not None:
-            file_uri = self._file_handler.upload_from_stream(
-                data=data,
-                display_name=display_name,
-                mime_type="application/pdf",
-            )
+    def blob_info(self, blob_path: str, bucket_name: Optional[str] = None) -> BlobInfo:
+        """
+        以一次 metadata 請求取得 PDF 的 BlobInfo；交給 result_cache_key 與 parse_from_gcs 共用，
+        同一請求只查一次，且 ETag 與解析的內容為同一 generation。物件不存在時拋 FileNotFoundError。
+        """
+        return self._resolve_gcs(bucket_name).get_blob_info(blob_path)
+
+    def _cache_key_for(self, gcs: GCSClient, info: BlobInfo, options: ParseOptions) -> str:
+        return result_cache_key(
+            gcs.bucket_name,
+            info,
+            self._gemini.model_name,
+            self._gemini.prompt_version,
+            options,
+            self._image_publisher,
+        )
+
+    def _parse_blob(
+        self, gcs: GCSClient, blob_path: str, options: ParseOptions, info: Optional[BlobInfo] = None
+    ) -> list[PageBlock]:
+        """下載（或 spool）→ 擷取圖片 → 上傳 File API → 結構化解析 → 填入圖片。"""
+        if info is not None and self._reads_gcs_uri(options):
+            direct = self._parse_gcs_uri(gcs, blob_path, options, info)
+            if direct is not None:
+                return direct
+        display_name = display_name_for(blob_path)
+        if self._spool_to_disk:
+            with tempfile.TemporaryDirectory(prefix="obe_spool_") as spool_dir:
+                spool_path = Path(spool_dir) / "document.pdf"
+                logger.info("parse_from_gcs: spooling blob %s to %s", blob_path, spool_path)
+                gcs.download_blob_to_file(blob_path, spool_path, info=info)
+                images_by_page = self._extract_images(spool_path, options)
+                blocks = self._parse_document(spool_path, display_name, options)
+        else:
+            logger.info("parse_from_gcs: reading blob %s", blob_path)
+            if self._sliced_download:
+                data = gcs.read_blob_bytes_sliced(blob_path, info=info)
+            else:
+                data = gcs.read_blob_bytes(blob_path, info=info)
+            images_by_page = self._extract_images(data, options)
+            blocks = self._parse_document(data, display_name, options)
+
+        return fill_image_content(blocks, images_by_page, inline=options.image_output == "inline")
+
+    def _reads_gcs_uri(self, options: ParseOptions) -> bool:
+        return reads_gcs_uri(options, self._gemini.vertex)
+
+    def _parse_gcs_uri(
+        self, gcs: GCSClient, blob_path: str, options: ParseOptions, info: BlobInfo
+    ) -> Optional[list[PageBlock]]:
+        """
+        後端可直接讀取此大小的檔案時以 gs:// URI 解析，之後只在需要圖片時讀取 PDF；
+        超過後端上限時回傳 None，改走下載與上傳流程。info 為 parse_from_gcs 已取得的 metadata，不再重查。
+        """
+        size = info.size
+        if not self._gemini.reads_gcs_uri(size):
+            return None
+        logger.info("parse_from_gcs: parsing %s directly from GCS", blob_path)
+        blocks = self._gemini.parse_pdf_structured(gcs.get_blob_uri(blob_path), size_bytes=size)
+        if not needs_image_content(blocks):
+            return blocks
+        if self._spool_to_disk:
+            with tempfile.TemporaryDirectory(prefix="obe_spool_") as spool_dir:
+                spool_path = Path(spool_dir) / "document.pdf"
+                gcs.download_blob_to_file(blob_path, spool_path, info=info)
+                images_by_page = self._extract_images(spool_path, options)
+        elif self._sliced_download:
+            images_by_page = self._extract_images(gcs.read_blob_bytes_sliced(blob_path, info=info), options)
+        else:
+            images_by_page = self._extract_images(gcs.read_blob_bytes(blob_path, info=info), options)
+        return fill_image_content(blocks, images_by_page, inline=options.image_output == "inline")
+
+    def _parse_document(self, source: bytes | Path, display_name: str, options: ParseOptions) -> list[PageBlock]:
+        """混合解析或（瘦身後）整份上傳解析。"""
+        if options.hybrid:
+            with tempfile.TemporaryDirectory(prefix="obe_hybrid_") as hybrid_dir:
+                plan = plan_hybrid(source, hybrid_dir)
+                if plan is not None:
+                    return self._parse_hybrid(plan, display_name, options)
+
+        if self._pdf_slimmer is None:
+            return self._upload_and_parse(source, display_name, options)
+        with tempfile.TemporaryDirectory(prefix="obe_slim_") as slim_dir:
+            slim = self._pdf_slimmer.slim(source, slim_dir)
+            if slim is None:
+                return self._upload_and_parse(source, display_name, options)
+            return self._upload_and_parse(slim.path, display_name, options, slim)
+
+    def _upload_and_parse(
+        self,
+        source: bytes | Path,
+        display_name: str,
+        options: ParseOptions,
+        slim: Optional[SlimResult] = None,
+    ) -> list[PageBlock]:
+        """整份或分片上傳並解析；shard_pages 未設定、文件只有一片或無法分片時整份解析。"""
+        if options.shard_pages is not None:
+            with tempfile.TemporaryDirectory(prefix="obe_shards_") as shard_dir:
+                shards = split_pdf(source, options.shard_pages, shard_dir)
+                if len(shards) > 1:
+                    return self._parse_shards(shards, options.shard_concurrency)
+
+        data = inline_bytes(source, self._inline_max_bytes)
+        if data is not None:
+            logger.info("parse_from_gcs: %s bytes, parsing inline without File API", len(data))
+            return self._gemini.parse_pdf_bytes(data)
+
+        start = time.monotonic()
+        if isinstance(source, Path):
+            file_uri = self._upload_spooled(source)
         else:
-            file_uri = self._gemini.upload_bytes(
+            file_uri = self._upload_bytes(source, display_name)
+        if slim is not None:
+            self._pdf_slimmer.record_upload(slim, time.monotonic() - start)
+        logger.info("parse_from_gcs: file ready, parsing structured content")
+        return self._gemini.parse_pdf_structured(file_uri)
+
+    def _parse_hybrid(self, plan: HybridPlan, display_name: str, options: ParseOptions) -> list[PageBlock]:
+        """只上傳需視覺的頁面子文件（仍可分片），其餘頁面已由文字層產生。"""
+        vision_blocks: list[PageBlock] = []
+        if plan.vision_path is not None:
+            logger.info("parse_from_gcs: hybrid, %s pages need vision", len(plan.vision_pages))
+            vision_options = options.model_copy(update={"hybrid": False})
+            vision_blocks = self._parse_document(plan.vision_path, display_name, vision_options)
+        return merge_hybrid(plan, vision_blocks)
+
+    def _parse_shards(self, shards: list[PdfShard], concurrency: int) -> list[PageBlock]:
+        """
+        先以有上限的執行緒池開始上傳全部分片（不等待就緒），以 wait_for_files 一次等待全部 ACTIVE，
+        再平行解析；頁碼換回原文件後依序合併，任一分片最終失敗即拋出。
+        """
+        logger.info("parse_from_gcs: parsing %s shards (concurrency %s)", len(shards), concurrency)
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(shards))) as pool:
+            uploads = list(pool.map(self._begin_shard_upload, shards))
+            file_uris = self._wait_for_shards(uploads)
+            results = list(pool.map(self._parse_shard_with_retry, shards, file_uris))
+        return merge_page_blocks([block for blocks in results for block in blocks])
+
+    def _begin_shard_upload(self, shard: PdfShard) -> Optional[PendingFile]:
+        """開始上傳單一分片但不等待就緒；走 inline 的分片回傳 None。"""
+        if fits_inline(shard.path, self._inline_max_bytes):
+            return None
+
+        def begin(attempt: int) -> PendingFile:
+            with shard.path.open("rb") as f:
+                return self._gemini.begin_upload(f, display_name=shard.path.name, mime_type="application/pdf")
+
+        return self._with_shard_retry(shard, begin)
+
+    def _wait_for_shards(self, uploads: list[Optional[PendingFile]]) -> list[Optional[str]]:
+        """
+        以單一輪詢迴圈等待所有已上傳的分片 ACTIVE，回傳與分片對應的 file URI（inline 分片為 None）。
+        等待失敗（逾時、處理失敗）時全部回傳 None，由各分片的重試自行上傳與等待。
+        """
+        pending = [upload for upload in uploads if upload is not None]
+        if not pending:
+            return [None] * len(uploads)
+        try:
+            uris = self._gemini.wait_for_files(
+                pending, timeout=self._file_ready_timeout, poll_interval=self._poll_interval
+            )
+        except RETRYABLE_EXCEPTIONS as e:
+            logger.warning("parse_from_gcs: waiting for %s shard files failed: %s", len(pending), e)
+            return [None] * len(uploads)
+        return shard_file_uris(uploads, uris)
+
+    def _parse_shard_with_retry(self, shard: PdfShard, file_uri: Optional[str] = None) -> list[PageBlock]:
+        """解析單一分片（已就緒的 file URI、inline bytes 或重新上傳）；可重試的錯誤只重試此分片。"""
+
+        def parse(attempt: int) -> list[PageBlock]:
+            data = inline_bytes(shard.path, self._inline_max_bytes)
+            if data is not None:
+                blocks = self._gemini.parse_pdf_bytes(data)
+            else:
+                blocks = self._gemini.parse_pdf_structured(file_uri or self._upload_spooled(shard.path))
+            logger.info(
+                "parse_from_gcs: shard %s (pages %s-%s) parsed on attempt %s",
+                shard.index,
+                shard.first_page,
+                shard.last_page,
+                attempt,
+            )
+            return remap_pages(blocks, shard)
+
+        return self._with_shard_retry(shard, parse)
+
+    def _with_shard_retry(self, shard: PdfShard, action: Callable[[int], T]) -> T:
+        """以第幾次嘗試呼叫 action；可重試的錯誤依 shard_retry_backoff 指數退避後重試。"""
+        attempts = self._shard_max_retries + 1
+        for attempt in range(1, attempts + 1):
+            try:
+                return action(attempt)
+            except RETRYABLE_EXCEPTIONS as e:
+                logger.warning("parse_from_gcs: shard %s attempt %s/%s failed: %s", shard.index, attempt, attempts, e)
+                if attempt == attempts:
+                    raise
+                time.sleep(self._shard_retry_backoff * (2 ** (attempt - 1)))
+
+    def _extract_images(self, pdf_source: bytes | Path, options: ParseOptions) -> dict[int, list[tuple[str, str]]]:
+        return extract_images(pdf_source, options, self._image_publisher)
+
+    def _resolve_gcs(self, bucket_name: Optional[str]) -> GCSClient:
+        """依 bucket_name 決定使用的 GCSClient；有 gcs_factory 時重用其快取的 Client。"""
+        if bucket_name is None:
+            return self._gcs
+        factory = self._gcs_factory or GCSClient
+        return factory(bucket_name)
+
+    def _upload_bytes(self, data: bytes, display_name: str) -> str:
+        """將記憶體中的 PDF 上傳至 File API（有 FileHandler 時走其重試）。"""
+        if self._file_handler is not None:
+            return self._file_handler.upload_from_stream(
                 data=data,
                 display_name=display_name,
                 mime_type="application/pdf",
-                file_ready_timeout=self._file_ready_timeout,
-                poll_interval=self._poll_interval,
             )
+        return self._gemini.upload_bytes(
+            data=data,
+            display_name=display_name,
+            mime_type="application/pdf",
+            file_ready_timeout=self._file_ready_timeout,
+            poll_interval=self._poll_interval,
+        )
 
-        logger.info("parse_from_gcs: file ready, parsing structured content")
-        blocks = self._gemini.parse_pdf_structured(file_uri)
-        return _fill_image_content(blocks, images_by_page)
+    def _upload_spooled(self, spool_path: Path) -> str:
+        """直接上傳 spool 檔案，不再另寫暫存檔（有 FileHandler 時走其重試）。"""
+        if self._file_handler is not None:
+            return self._file_handler.upload_to_gemini(spool_path, mime_type="application/pdf")
+        return self._gemini.upload_file(
+            spool_path,
+            mime_type="application/pdf",
+            file_ready_timeout=self._file_ready_timeout,
+            poll_interval=self._poll_interval,
+        )
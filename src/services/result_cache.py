@@ -0,0 +1,83 @@
+"""
+解析結果快取：將 PDFProcessor 的最終 PageBlock 列表存於 GCS，重複請求直接回傳。
+
+- Key：PDF 內容（md5，無則 bucket/路徑/generation）+ 模型名稱 + prompt 版本雜湊 + 輸出變體。
+  任一項改變（PDF 被覆寫、換模型、改 System Instruction）都會產生新 key，不需手動失效。
+- Key 同時作為 parse_pdf 回應的 ETag，GAS 側邊欄／編輯器可用 If-None-Match 略過重新下載。
+- 快取讀寫失敗只記 log、視為未命中，不影響正常解析。
+"""
+
+import hashlib
+import json
+import logging
+import time
+
+from pydantic import TypeAdapter
+
+from src.clients.gcs_client import BlobInfo, GCSClient
+from src.models.schema import PageBlock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULT_CACHE_PREFIX = "parse-cache/"
+
+_PAGE_BLOCKS = TypeAdapter(list[PageBlock])
+
+
+class ParseResultCache:
+    """以 GCS 物件儲存解析結果（JSON），key 由內容與解析設定決定。"""
+
+    def __init__(self, gcs_client: GCSClient, prefix: str = DEFAULT_RESULT_CACHE_PREFIX) -> None:
+        self._gcs = gcs_client
+        self._prefix = prefix
+
+    @staticmethod
+    def make_key(
+        bucket_name: str,
+        info: BlobInfo,
+        model_name: str,
+        prompt_version: str,
+        variant: str = "",
+    ) -> str:
+        """組成快取 key；相同內容的 PDF（md5 相同）即使路徑不同也共用結果。"""
+        content_id = info.md5_hash or f"{bucket_name}/{info.name}#{info.generation}"
+        raw = "|".join([content_id, model_name, prompt_version, variant])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> list[PageBlock] | None:
+        """讀取快取結果；不存在或內容損壞時回傳 None。"""
+        start = time.monotonic()
+        try:
+            raw = self._gcs.read_blob_bytes_or_none(self._object_path(key))
+            if raw is None:
+                logger.info("ParseResultCache miss: %s", key[:12])
+                return None
+            blocks = _PAGE_BLOCKS.validate_python(json.loads(raw)["pages"])
+        except Exception as e:
+            logger.warning("ParseResultCache get failed for %s: %s", key[:12], e)
+            return None
+        logger.info(
+            "ParseResultCache hit: %s (%s pages, %.0f ms)",
+            key[:12],
+            len(blocks),
+            (time.monotonic() - start) * 1000,
+        )
+        return blocks
+
+    def put(self, key: str, blocks: list[PageBlock]) -> None:
+        """寫入解析結果；失敗只記 log。"""
+        payload = {
+            "created_at": int(time.time()),
+            "pages": [b.model_dump(exclude_none=True) for b in blocks],
+        }
+        try:
+            self._gcs.upload_bytes(
+                self._object_path(key),
+                json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                content_type="application/json",
+            )
+        except Exception as e:
+            logger.warning("ParseResultCache put failed for %s: %s", key[:12], e)
+
+    def _object_path(self, key: str) -> str:
+        return f"{self._prefix}{key}.json"
@@ -0,0 +1,48 @@
+"""AsyncFileHandler 單元測試：可重試錯誤以 asyncio.sleep 退避重試，不可重試的錯誤直接拋出。"""
+
+import asyncio
+import io
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.clients.async_gemini_client import AsyncGeminiFileClient
+from src.services.async_file_handler import AsyncFileHandler
+
+
+@pytest.fixture
+def mock_gemini() -> MagicMock:
+    gemini = MagicMock(spec=AsyncGeminiFileClient)
+    gemini.upload_bytes = AsyncMock(return_value="uri")
+    gemini.upload_stream = AsyncMock(return_value="uri")
+    gemini.upload_file = AsyncMock(return_value="uri")
+    return gemini
+
+
+def test_upload_from_stream_retries_with_async_sleep(mock_gemini: MagicMock) -> None:
+    mock_gemini.upload_bytes.side_effect = [TimeoutError("t"), "uri"]
+    handler = AsyncFileHandler(mock_gemini, max_retries=3, retry_backoff_seconds=2.0)
+    with patch("src.services.async_file_handler.asyncio.sleep", new=AsyncMock()) as sleep:
+        assert asyncio.run(handler.upload_from_stream(b"pdf", display_name="a.pdf")) == "uri"
+    sleep.assert_awaited_once_with(2.0)
+    assert mock_gemini.upload_bytes.await_count == 2
+
+
+def test_upload_from_stream_raises_after_max_retries(mock_gemini: MagicMock) -> None:
+    mock_gemini.upload_bytes.side_effect = ConnectionError("down")
+    handler = AsyncFileHandler(mock_gemini, max_retries=2, retry_backoff_seconds=0.0)
+    with pytest.raises(ConnectionError):
+        asyncio.run(handler.upload_from_stream(b"pdf", display_name="a.pdf"))
+    assert mock_gemini.upload_bytes.await_count == 2
+
+
+def test_seekable_stream_uploaded_without_reading(mock_gemini: MagicMock) -> None:
+    stream = io.BytesIO(b"pdf")
+    asyncio.run(AsyncFileHandler(mock_gemini).upload_from_stream(stream, display_name="a.pdf"))
+    assert mock_gemini.upload_stream.await_args.args[0] is stream
+    mock_gemini.upload_bytes.assert_not_awaited()
+
+
+def test_upload_to_gemini_missing_file_raises(mock_gemini: MagicMock, tmp_path) -> None:
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(AsyncFileHandler(mock_gemini).upload_to_gemini(tmp_path / "missing.pdf"))
@@ -0,0 +1,40 @@
+"""AsyncGCSClient 單元測試：各操作委派給同步 GCSClient，並在執行緒中執行。"""
+
+import asyncio
+import threading
+
+from unittest.mock import MagicMock
+
+from src.clients.async_gcs_client import AsyncGCSClient
+from src.clients.gcs_client import GCSClient
+
+
+def test_read_blob_bytes_runs_off_event_loop_thread() -> None:
+    gcs = MagicMock(spec=GCSClient)
+    threads: list[int] = []
+
+    def read(path: str, info=None) -> bytes:
+        threads.append(threading.get_ident())
+        return b"data"
+
+    gcs.read_blob_bytes.side_effect = read
+
+    async def run() -> bytes:
+        result = await AsyncGCSClient(gcs).read_blob_bytes("a.pdf")
+        assert threads[0] != threading.get_ident()
+        return result
+
+    assert asyncio.run(run()) == b"data"
+    gcs.read_blob_bytes.assert_called_once_with("a.pdf", None)
+
+
+def test_upload_and_download_delegate(tmp_path) -> None:
+    gcs = MagicMock(spec=GCSClient)
+    gcs.bucket_name = "bucket"
+    client = AsyncGCSClient(gcs)
+    asyncio.run(client.upload_bytes("x.json", b"{}", "application/json"))
+    asyncio.run(client.download_blob_to_file("a.pdf", tmp_path / "a.pdf"))
+    gcs.upload_bytes.assert_called_once_with("x.json", b"{}", "application/json")
+    gcs.download_blob_to_file.assert_called_once_with("a.pdf", tmp_path / "a.pdf", None)
+    assert client.bucket_name == "bucket"
+    assert client.sync_client is gcs
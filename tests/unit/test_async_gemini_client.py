@@ -0,0 +1,147 @@
+"""AsyncGeminiFileClient 單元測試（Mock）：上傳後於事件迴圈輪詢、FAILED 時移除快取、async 串流解析。"""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.clients.async_gemini_client import AsyncGeminiFileClient
+from src.clients.file_poller import FileProcessingFailed
+from src.clients.gemini_client import GeminiFileClient, PendingFile, StructuredCall
+from src.clients.rate_limiter import GeminiRateLimiter
+
+URI = "https://generativelanguage.googleapis.com/v1beta/"
+
+
+@pytest.fixture
+def sync_client() -> MagicMock:
+    client = MagicMock(spec=GeminiFileClient)
+    client.begin_upload.return_value = PendingFile(name="files/abc", size=3, digest="d")
+    client.file_poller.wait_many_async = AsyncMock()
+    client.rate_limiter = GeminiRateLimiter()
+    client.hedger = None
+    client.continuation_contents.side_effect = lambda contents, after_page: contents
+    client.next_continuation.return_value = None
+    return client
+
+
+def test_upload_bytes_uploads_in_thread_then_polls_async(sync_client: MagicMock) -> None:
+    client = AsyncGeminiFileClient(sync_client)
+    uri = asyncio.run(client.upload_bytes(b"pdf", display_name="a.pdf", poll_interval=1.0))
+    assert uri == URI + "files/abc"
+    assert sync_client.begin_upload.call_args.kwargs["display_name"] == "a.pdf"
+    sync_client.file_poller.wait_many_async.assert_awaited_once_with(
+        {"files/abc": 3}, timeout=600.0, fixed_interval=1.0
+    )
+
+
+def test_active_pending_file_skips_polling(sync_client: MagicMock) -> None:
+    sync_client.begin_upload.return_value = PendingFile(name="files/abc", size=3, digest="d", active=True)
+    uri = asyncio.run(AsyncGeminiFileClient(sync_client).upload_bytes(b"pdf", display_name="a.pdf"))
+    assert uri == URI + "files/abc"
+    sync_client.file_poller.wait_many_async.assert_not_awaited()
+
+
+def test_failed_file_forgets_upload(sync_client: MagicMock) -> None:
+    sync_client.file_poller.wait_many_async.side_effect = FileProcessingFailed("files/abc")
+    with pytest.raises(RuntimeError):
+        asyncio.run(AsyncGeminiFileClient(sync_client).upload_bytes(b"pdf", display_name="a.pdf"))
+    sync_client.forget_upload.assert_called_once_with(sync_client.begin_upload.return_value)
+
+
+def test_wait_for_files_polls_pending_in_one_loop(sync_client: MagicMock) -> None:
+    """多個 PendingFile 一次等待；已 ACTIVE 的不輪詢，依序回傳 file URI。"""
+    pending = [
+        PendingFile(name="files/a", size=1, digest="da"),
+        PendingFile(name="files/b", size=2, digest="db", active=True),
+        PendingFile(name="files/c", size=3, digest="dc"),
+    ]
+    uris = asyncio.run(AsyncGeminiFileClient(sync_client).wait_for_files(pending, timeout=60.0))
+    assert uris == [URI + "files/a", URI + "files/b", URI + "files/c"]
+    sync_client.file_poller.wait_many_async.assert_awaited_once_with(
+        {"files/a": 1, "files/c": 3}, timeout=60.0, fixed_interval=None
+    )
+
+
+def test_upload_file_missing_raises(sync_client: MagicMock, tmp_path) -> None:
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(AsyncGeminiFileClient(sync_client).upload_file(tmp_path / "missing.pdf"))
+
+
+class _AsyncChunks:
+    def __init__(self, texts: list[str]) -> None:
+        self._chunks = []
+        for text in texts:
+            chunk = MagicMock()
+            chunk.text = text
+            self._chunks.append(chunk)
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+def test_parse_pdf_structured_streams_with_generate_content_async(sync_client: MagicMock) -> None:
+    model = MagicMock()
+    model.generate_content_async = AsyncMock(
+        return_value=_AsyncChunks(['[{"page": 1, "elements": []}, {"pa', 'ge": 2, "elements": []}, {"page": 3'])
+    )
+    sync_client.structured_call.return_value = StructuredCall(model=model, contents=["prompt"], tokens=10)
+    result = asyncio.run(AsyncGeminiFileClient(sync_client).parse_pdf_structured(URI + "files/x"))
+    sync_client.structured_call.assert_called_once_with(URI + "files/x", 0)
+    assert model.generate_content_async.call_args.kwargs["stream"] is True
+    assert [b.page for b in result] == [1, 2]
+
+
+def test_parse_pdf_structured_invalid_uri_raises(sync_client: MagicMock) -> None:
+    sync_client.structured_call.side_effect = ValueError("Invalid file URI")
+    with pytest.raises(ValueError):
+        asyncio.run(AsyncGeminiFileClient(sync_client).parse_pdf_structured(URI))
+
+
+def test_schema_mode_retries_malformed_output(sync_client: MagicMock) -> None:
+    """response_schema 模式：validate_schema_output 回傳 None 時重新呼叫，不串流。"""
+    model = MagicMock()
+    model.generate_content_async = AsyncMock(return_value=MagicMock())
+    sync_client.structured_call.return_value = StructuredCall(
+        model=model, contents=["prompt"], tokens=10, generation_config="config"
+    )
+    sync_client.schema_attempts = 2
+    sync_client.validate_schema_output.side_effect = [None, [MagicMock(page=1)]]
+    result = asyncio.run(AsyncGeminiFileClient(sync_client).parse_pdf_structured(URI + "files/x"))
+    assert [b.page for b in result] == [1]
+    assert model.generate_content_async.await_count == 2
+    assert model.generate_content_async.call_args.kwargs == {"generation_config": "config"}
+    assert [c.args[1] for c in sync_client.validate_schema_output.call_args_list] == [1, 2]
+
+
+def test_truncated_stream_continues_after_last_complete_page(sync_client: MagicMock) -> None:
+    """next_continuation 回傳起點頁碼時以接續 contents 再呼叫一次，重複頁面不再交出。"""
+    model = MagicMock()
+    model.generate_content_async = AsyncMock(
+        side_effect=[
+            _AsyncChunks(['[{"page": 1, "elements": []}, {"page": 2, "elements": []}, {"pa']),
+            _AsyncChunks(['[{"page": 2, "elements": []}, {"page": 3, "elements": []}]']),
+        ]
+    )
+    sync_client.structured_call.return_value = StructuredCall(model=model, contents=["prompt"], tokens=10)
+    sync_client.continuation_contents.side_effect = lambda contents, after_page: [*contents, f"after {after_page}"]
+    sync_client.next_continuation.side_effect = [2, None]
+    result = asyncio.run(AsyncGeminiFileClient(sync_client).parse_pdf_structured(URI + "files/x"))
+    assert [b.page for b in result] == [1, 2, 3]
+    assert model.generate_content_async.call_args.args[0] == ["prompt", "after 2"]
+    first_assembler = sync_client.next_continuation.call_args_list[0].args[0]
+    assert first_assembler.last_page == 2
+
+
+def test_parse_pdf_bytes_uses_inline_call(sync_client: MagicMock) -> None:
+    model = MagicMock()
+    model.generate_content_async = AsyncMock(return_value=_AsyncChunks(['[{"page": 1, "elements": []}]']))
+    sync_client.inline_structured_call.return_value = StructuredCall(model=model, contents=["prompt"], tokens=10)
+    result = asyncio.run(AsyncGeminiFileClient(sync_client).parse_pdf_bytes(b"%PDF"))
+    sync_client.inline_structured_call.assert_called_once_with(b"%PDF", "application/pdf")
+    sync_client.structured_call.assert_not_called()
+    assert [b.page for b in result] == [1]
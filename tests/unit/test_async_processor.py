@@ -0,0 +1,226 @@
+"""AsyncPDFProcessor 單元測試：parse_from_gcs 編排、結果快取、分片並行上限（mock async Client）。"""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.clients.async_gcs_client import AsyncGCSClient
+from src.clients.async_gemini_client import AsyncGeminiFileClient
+from src.clients.gcs_client import BlobInfo
+from src.clients.gemini_client import PendingFile
+from src.models.schema import BlockElement, PageBlock, ParseOptions
+from src.services.async_processor import AsyncPDFProcessor
+from src.services.pdf_sharder import PdfShard
+from src.services.result_cache import ParseResultCache
+
+
+@pytest.fixture
+def mock_gcs() -> MagicMock:
+    gcs = MagicMock(spec=AsyncGCSClient)
+    gcs.bucket_name = "bucket"
+    gcs.read_blob_bytes = AsyncMock(return_value=b"fake pdf bytes")
+    gcs.get_blob_info = AsyncMock(return_value=BlobInfo(name="a.pdf", size=14, generation=1, md5_hash="md5"))
+    return gcs
+
+
+@pytest.fixture
+def mock_gemini() -> MagicMock:
+    gemini = MagicMock(spec=AsyncGeminiFileClient)
+    gemini.reads_gcs_uri.return_value = False
+    gemini.model_name = "gemini-2.5-flash"
+    gemini.prompt_version = "v1"
+    gemini.upload_bytes = AsyncMock(return_value="uri")
+    gemini.upload_file = AsyncMock(return_value="uri")
+    gemini.parse_pdf_structured = AsyncMock(
+        return_value=[PageBlock(page=1, elements=[BlockElement(type="text", content="hi", description="")])]
+    )
+    return gemini
+
+
+@pytest.fixture(autouse=True)
+def no_images():
+    with patch("src.services.parse_common.extract_images_by_page", return_value={}):
+        yield
+
+
+def test_parse_from_gcs_reads_uploads_and_parses(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    processor = AsyncPDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    result = asyncio.run(processor.parse_from_gcs("uploads/report.pdf"))
+    mock_gcs.read_blob_bytes.assert_awaited_once_with("uploads/report.pdf", info=mock_gcs.get_blob_info.return_value)
+    assert mock_gemini.upload_bytes.await_args.kwargs["display_name"] == "report.pdf"
+    mock_gemini.parse_pdf_structured.assert_awaited_once_with("uri")
+    assert result[0].elements[0].content == "hi"
+
+
+def test_cache_hit_skips_download_and_gemini(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    cache = MagicMock(spec=ParseResultCache)
+    cache.get.return_value = [PageBlock(page=7, elements=[])]
+    processor = AsyncPDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, result_cache=cache)
+    result = asyncio.run(processor.parse_from_gcs("a.pdf"))
+    assert result[0].page == 7
+    mock_gcs.read_blob_bytes.assert_not_awaited()
+    mock_gemini.upload_bytes.assert_not_awaited()
+
+
+def test_cache_miss_stores_only_complete_result(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    cache = MagicMock(spec=ParseResultCache)
+    cache.get.return_value = None
+    processor = AsyncPDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, result_cache=cache)
+    result = asyncio.run(processor.parse_from_gcs("a.pdf"))
+    cache.put.assert_called_once_with(asyncio.run(processor.result_cache_key("a.pdf")), result)
+
+    cache.put.reset_mock()
+    mock_gemini.parse_pdf_structured.return_value = [PageBlock(page=1, elements=[], partial=True)]
+    asyncio.run(processor.parse_from_gcs("a.pdf"))
+    cache.put.assert_not_called()
+
+
+def test_cache_key_matches_sync_processor(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    """同步與 async 版本的快取 key 一致，預解析結果兩者互通。"""
+    cache = MagicMock(spec=ParseResultCache)
+    processor = AsyncPDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, result_cache=cache)
+    key = asyncio.run(processor.result_cache_key("a.pdf"))
+    expected = ParseResultCache.make_key(
+        "bucket", mock_gcs.get_blob_info.return_value, model_name="gemini-2.5-flash", prompt_version="v1"
+    )
+    assert key == expected
+
+
+def test_bucket_name_without_factory_raises(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    processor = AsyncPDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with pytest.raises(ValueError):
+        asyncio.run(processor.parse_from_gcs("a.pdf", bucket_name="other"))
+
+
+def _shard_files(tmp_path: Path, count: int, pages: int = 1) -> list[PdfShard]:
+    shards = []
+    for i in range(count):
+        path = tmp_path / f"s{i}.pdf"
+        path.write_bytes(b"%PDF shard")
+        shards.append(PdfShard(index=i, first_page=i * pages + 1, page_count=pages, path=path))
+    return shards
+
+
+def _begin_and_wait(mock_gemini: MagicMock) -> None:
+    """begin_upload 回傳以檔名命名的 PendingFile；wait_for_files 依序回傳 uri:<File 名稱>。"""
+    mock_gemini.begin_upload = AsyncMock(
+        side_effect=lambda f, display_name, mime_type: PendingFile(name=f"files/{display_name}", size=10, digest="d")
+    )
+    mock_gemini.wait_for_files = AsyncMock(side_effect=lambda pending, **kw: [f"uri:{p.name}" for p in pending])
+
+
+def test_shards_respect_concurrency_and_merge_in_page_order(
+    mock_gcs: MagicMock, mock_gemini: MagicMock, tmp_path: Path
+) -> None:
+    """先上傳全部分片、一次等待就緒，再以 shard_concurrency 為上限解析。"""
+    shards = _shard_files(tmp_path, 4, pages=2)
+    active = 0
+    peak = 0
+
+    async def parse(uri: str) -> list[PageBlock]:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0)
+        active -= 1
+        return [PageBlock(page=1, elements=[]), PageBlock(page=2, elements=[])]
+
+    _begin_and_wait(mock_gemini)
+    mock_gemini.parse_pdf_structured = AsyncMock(side_effect=parse)
+    processor = AsyncPDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with patch("src.services.async_processor.split_pdf", return_value=shards):
+        result = asyncio.run(processor.parse_from_gcs("a.pdf", options=ParseOptions(shard_pages=2, shard_concurrency=2)))
+    assert [b.page for b in result] == list(range(1, 9))
+    assert peak <= 2
+    assert mock_gemini.begin_upload.await_count == 4
+    mock_gemini.wait_for_files.assert_awaited_once()
+    assert [p.name for p in mock_gemini.wait_for_files.await_args.args[0]] == [f"files/s{i}.pdf" for i in range(4)]
+    assert sorted(c.args[0] for c in mock_gemini.parse_pdf_structured.await_args_list) == [
+        f"uri:files/s{i}.pdf" for i in range(4)
+    ]
+    mock_gemini.upload_file.assert_not_awaited()
+
+
+def test_failed_shard_is_retried_alone(mock_gcs: MagicMock, mock_gemini: MagicMock, tmp_path: Path) -> None:
+    shards = _shard_files(tmp_path, 2)
+    _begin_and_wait(mock_gemini)
+    calls: list[str] = []
+
+    async def parse(uri: str) -> list[PageBlock]:
+        calls.append(uri)
+        if uri == "uri:files/s1.pdf" and calls.count(uri) == 1:
+            raise TimeoutError("t")
+        return [PageBlock(page=1, elements=[])]
+
+    mock_gemini.parse_pdf_structured = AsyncMock(side_effect=parse)
+    processor = AsyncPDFProcessor(
+        gcs_client=mock_gcs, gemini_client=mock_gemini, shard_retry_backoff=0.0
+    )
+    with patch("src.services.async_processor.split_pdf", return_value=shards):
+        result = asyncio.run(processor.parse_from_gcs("a.pdf", options=ParseOptions(shard_pages=1)))
+    assert [b.page for b in result] == [1, 2]
+    assert calls.count("uri:files/s0.pdf") == 1
+    assert calls.count("uri:files/s1.pdf") == 2
+
+
+def test_shared_wait_failure_falls_back_to_per_shard_upload(
+    mock_gcs: MagicMock, mock_gemini: MagicMock, tmp_path: Path
+) -> None:
+    """一次等待失敗（逾時）時改由各分片自行上傳並等待。"""
+    shards = _shard_files(tmp_path, 2)
+    _begin_and_wait(mock_gemini)
+    mock_gemini.wait_for_files = AsyncMock(side_effect=TimeoutError("not ready"))
+    mock_gemini.parse_pdf_structured = AsyncMock(return_value=[PageBlock(page=1, elements=[])])
+    processor = AsyncPDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with patch("src.services.async_processor.split_pdf", return_value=shards):
+        result = asyncio.run(processor.parse_from_gcs("a.pdf", options=ParseOptions(shard_pages=1)))
+    assert [b.page for b in result] == [1, 2]
+    assert mock_gemini.upload_file.await_count == 2
+
+
+def test_hybrid_uploads_only_vision_pages(mock_gcs: MagicMock, mock_gemini: MagicMock, tmp_path: Path) -> None:
+    from src.services.pdf_text_layer import HybridPlan
+
+    plan = HybridPlan(
+        text_blocks=[PageBlock(page=2, source="text_layer")], vision_pages=[1], vision_path=tmp_path / "v.pdf"
+    )
+    processor = AsyncPDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with patch("src.services.async_processor.plan_hybrid", return_value=plan):
+        result = asyncio.run(processor.parse_from_gcs("a.pdf", options=ParseOptions(hybrid=True)))
+    assert [(b.page, b.source) for b in result] == [(1, "gemini"), (2, "text_layer")]
+    mock_gemini.upload_file.assert_awaited_once()
+    mock_gemini.upload_bytes.assert_not_awaited()
+
+
+def test_slimmer_runs_before_upload(mock_gcs: MagicMock, mock_gemini: MagicMock, tmp_path: Path) -> None:
+    from src.services.pdf_slimmer import SlimResult
+
+    slimmer = MagicMock()
+    slimmer.slim.return_value = SlimResult(path=tmp_path / "slim.pdf", original_bytes=10, slim_bytes=5, seconds=0.0)
+    processor = AsyncPDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, pdf_slimmer=slimmer)
+    asyncio.run(processor.parse_from_gcs("a.pdf"))
+    assert mock_gemini.upload_file.await_args.args[0] == tmp_path / "slim.pdf"
+    slimmer.record_upload.assert_called_once()
+
+
+def test_vertex_backend_parses_gs_uri_without_download(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    mock_gcs.get_blob_uri.return_value = "gs://bucket/a.pdf"
+    mock_gemini.reads_gcs_uri.return_value = True
+    processor = AsyncPDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    result = asyncio.run(processor.parse_from_gcs("a.pdf"))
+    mock_gemini.parse_pdf_structured.assert_awaited_once_with("gs://bucket/a.pdf", size_bytes=14)
+    mock_gcs.get_blob_info.assert_awaited_once_with("a.pdf")
+    mock_gcs.read_blob_bytes.assert_not_awaited()
+    mock_gemini.upload_bytes.assert_not_awaited()
+    assert result[0].elements[0].content == "hi"
+
+
+def test_small_pdf_parsed_inline_without_upload(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    mock_gemini.parse_pdf_bytes = AsyncMock(return_value=[PageBlock(page=1, elements=[])])
+    processor = AsyncPDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, inline_max_bytes=1024)
+    result = asyncio.run(processor.parse_from_gcs("a.pdf"))
+    mock_gemini.parse_pdf_bytes.assert_awaited_once_with(b"fake pdf bytes")
+    mock_gemini.upload_bytes.assert_not_awaited()
+    assert [b.page for b in result] == [1]
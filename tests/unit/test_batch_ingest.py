@@ -0,0 +1,268 @@
+"""BatchIngestService 單元測試（Mock）：略過已快取、逐步上傳與檢查就緒後送出一個 batch、完成時寫入解析快取。"""
+
+import json
+from pathlib import Path
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.clients.gcs_client import BlobInfo, GCSClient
+from src.clients.gemini_batch import BatchJob, BatchResult, GeminiBatchClient
+from src.clients.gemini_client import GeminiFileClient, PendingFile
+from src.models.schema import BlockElement, PageBlock, ParseOptions
+from src.services.batch_ingest import BatchIngestService
+from src.services.result_cache import ParseResultCache
+
+
+class FakeManifestStore:
+    """以 dict 模擬 manifest bucket。"""
+
+    def __init__(self) -> None:
+        self.objects: dict[str, bytes] = {}
+
+    def upload_bytes(self, path: str, data: bytes, content_type: str = "") -> None:
+        self.objects[path] = data
+
+    def read_blob_bytes_or_none(self, path: str) -> bytes | None:
+        return self.objects.get(path)
+
+
+@pytest.fixture
+def deps():
+    gcs = MagicMock(spec=GCSClient)
+    gcs.bucket_name = "bucket"
+    gcs.get_blob_info.side_effect = lambda path: BlobInfo(name=path, size=1, generation=1, md5_hash=f"md5-{path}")
+    gcs.download_blob_to_file.side_effect = lambda path, dest, info=None: Path(dest).write_bytes(b"%PDF")
+    gemini = MagicMock(spec=GeminiFileClient)
+    gemini.model_name = "gemini-2.5-flash"
+    gemini.prompt_version = "v1"
+    gemini.begin_upload.side_effect = lambda f, display_name, mime_type: PendingFile(
+        name=f"files/{display_name}", size=1, digest="d"
+    )
+    gemini.file_states.side_effect = lambda pending: {p.name: "ACTIVE" for p in pending}
+    gemini.structured_batch_request.side_effect = lambda uri: {"file": uri.rsplit("/", 2)[-2:]}
+    gemini.parse_batch_output.side_effect = lambda text: [
+        PageBlock(page=1, elements=[BlockElement(type="text", content=text)])
+    ]
+    cache = MagicMock(spec=ParseResultCache)
+    cache.get.return_value = None
+    batch = MagicMock(spec=GeminiBatchClient)
+    batch.submit.return_value = "batches/job1"
+    manifests = FakeManifestStore()
+    service = BatchIngestService(
+        gcs_factory=lambda name: gcs,
+        gemini_client=gemini,
+        result_cache=cache,
+        manifest_gcs=manifests,
+        batch_client=batch,
+    )
+    return service, gcs, gemini, cache, batch, manifests
+
+
+def _manifest(manifests: FakeManifestStore, job_id: str) -> dict:
+    return json.loads(manifests.objects[f"batch-jobs/{job_id}.json"])
+
+
+def test_submit_skips_cached_and_submits_one_batch(deps) -> None:
+    service, gcs, gemini, cache, batch, manifests = deps
+    cache.get.side_effect = lambda key: [PageBlock(page=1)] if key == _key("b.pdf") else None
+    result = service.submit("bucket", ["a.pdf", "b.pdf", "c.pdf", "a.pdf"])
+    job_id = result["job_id"]
+    assert result == {
+        "job_id": job_id,
+        "batch": "batches/job1",
+        "status": "submitted",
+        "submitted": ["a.pdf", "c.pdf"],
+        "cached": ["b.pdf"],
+        "failed": {},
+    }
+    assert gemini.begin_upload.call_count == 2
+    gemini.wait_for_files.assert_not_called()
+    assert [p.name for p in gemini.file_states.call_args.args[0]] == ["files/a.pdf", "files/c.pdf"]
+    gemini.upload_file.assert_not_called()
+    model, requests = batch.submit.call_args.args
+    assert model == "gemini-2.5-flash"
+    assert requests == {"0": {"file": ["files", "a.pdf"]}, "1": {"file": ["files", "c.pdf"]}}
+    manifest = _manifest(manifests, job_id)
+    assert manifest["status"] == "submitted" and manifest["batch"] == "batches/job1"
+    assert [e["cache_key"] for e in manifest["entries"]] == [_key("a.pdf"), _key("c.pdf")]
+    assert [e["file_name"] for e in manifest["entries"]] == ["files/a.pdf", "files/c.pdf"]
+    # metadata 每個 PDF 只查一次；上傳下載固定在算 cache_key 時的 generation
+    assert gcs.get_blob_info.call_count == 3
+    assert {c.kwargs["info"] for c in gcs.download_blob_to_file.call_args_list} == {
+        BlobInfo(name="a.pdf", size=1, generation=1),
+        BlobInfo(name="c.pdf", size=1, generation=1),
+    }
+
+
+def test_submit_all_cached_does_not_submit(deps) -> None:
+    service, _gcs, _gemini, cache, batch, _manifests = deps
+    cache.get.side_effect = None
+    cache.get.return_value = [PageBlock(page=1)]
+    assert service.submit("bucket", ["a.pdf"])["job_id"] is None
+    batch.submit.assert_not_called()
+
+
+def test_submit_rejects_hybrid(deps) -> None:
+    service = deps[0]
+    with pytest.raises(ValueError):
+        service.submit("bucket", ["a.pdf"], options=ParseOptions(hybrid=True))
+
+
+def test_processing_files_are_submitted_on_a_later_collect(deps) -> None:
+    """檔案仍在處理時 submit 不阻塞等待；之後的 collect 單次查詢，全部 ACTIVE 才送出 batch，不重新上傳。"""
+    service, _gcs, gemini, _cache, batch, manifests = deps
+    states = {"files/a.pdf": "PROCESSING", "files/b.pdf": "ACTIVE"}
+    gemini.file_states.side_effect = lambda pending: {p.name: states[p.name] for p in pending}
+    job_id = service.submit("bucket", ["a.pdf", "b.pdf"])["job_id"]
+    batch.submit.assert_not_called()
+    assert _manifest(manifests, job_id)["status"] == "uploading"
+
+    progress = service.collect(job_id)
+    assert progress["state"] == "UPLOADING" and progress["done"] is False
+    assert (progress["uploaded"], progress["ready"], progress["total"]) == (2, 1, 2)
+    assert [p.name for p in gemini.file_states.call_args.args[0]] == ["files/a.pdf"]
+
+    states["files/a.pdf"] = "ACTIVE"
+    batch.get.return_value = BatchJob(name="batches/job1", state="RUNNING")
+    assert service.collect(job_id) == {"job_id": job_id, "state": "RUNNING", "done": False}
+    batch.submit.assert_called_once()
+    assert gemini.begin_upload.call_count == 2
+
+
+def test_failed_file_moves_to_failed_without_aborting(deps) -> None:
+    """檔案處理失敗（FAILED）或上傳多次失敗時移入 failed，其餘照常送出並收尾。"""
+    service, gcs, gemini, cache, batch, _manifests = deps
+    gemini.file_states.side_effect = lambda pending: {
+        p.name: "FAILED" if p.name == "files/b.pdf" else "ACTIVE" for p in pending
+    }
+    download = gcs.download_blob_to_file.side_effect
+
+    def flaky_download(path: str, dest: Path, info: BlobInfo | None = None) -> None:
+        if path == "c.pdf":
+            raise ConnectionError("reset")
+        download(path, dest, info)
+
+    gcs.download_blob_to_file.side_effect = flaky_download
+    service._max_upload_attempts = 2
+    result = service.submit("bucket", ["a.pdf", "b.pdf", "c.pdf"])
+    assert result["status"] == "uploading"
+    assert result["failed"] == {"b.pdf": "file processing failed"}
+
+    batch.get.return_value = BatchJob(
+        name="batches/job1", state="SUCCEEDED", results={"0": BatchResult(key="0", text="ok")}
+    )
+    done = service.collect(result["job_id"])
+    assert list(batch.submit.call_args.args[1]) == ["0"]
+    assert done["stored"] == ["a.pdf"]
+    assert done["failed"] == {"b.pdf": "file processing failed", "c.pdf": "upload failed: reset"}
+    cache.put.assert_called_once()
+
+
+def test_upload_stops_at_step_budget_and_resumes(deps) -> None:
+    """超過 step_budget 後不再開始新的上傳，已上傳的檔案名稱記入 manifest，下次推進接續。"""
+    service, _gcs, gemini, _cache, batch, manifests = deps
+    service._step_budget = 0.0
+    job_id = service.submit("bucket", ["a.pdf"])["job_id"]
+    gemini.begin_upload.assert_not_called()
+    assert "file_name" not in _manifest(manifests, job_id)["entries"][0]
+
+    service._step_budget = 60.0
+    batch.get.return_value = BatchJob(name="batches/job1", state="PENDING")
+    service.collect(job_id)
+    gemini.begin_upload.assert_called_once()
+    assert _manifest(manifests, job_id)["entries"][0]["file_name"] == "files/a.pdf"
+    batch.submit.assert_called_once()
+
+
+def test_file_processing_past_timeout_is_failed(deps) -> None:
+    service, _gcs, gemini, _cache, batch, _manifests = deps
+    gemini.file_states.side_effect = lambda pending: {p.name: "PROCESSING" for p in pending}
+    service._file_ready_timeout = -1.0
+    result = service.submit("bucket", ["a.pdf"])
+    assert result["failed"] == {"a.pdf": "file processing timed out"}
+    batch.submit.assert_not_called()
+
+
+def test_all_files_failed_collects_without_batch(deps) -> None:
+    service, _gcs, gemini, _cache, batch, _manifests = deps
+    gemini.file_states.side_effect = lambda pending: {p.name: "FAILED" for p in pending}
+    result = service.submit("bucket", ["a.pdf"])
+    assert result["status"] == "collected"
+    batch.submit.assert_not_called()
+    assert service.collect(result["job_id"]) == {
+        "job_id": result["job_id"],
+        "state": "FAILED",
+        "done": True,
+        "stored": [],
+        "failed": {"a.pdf": "file processing failed"},
+    }
+
+
+def test_collect_pending_job_reports_state(deps) -> None:
+    service, *_rest, batch, _manifests = deps
+    job_id = service.submit("bucket", ["a.pdf"])["job_id"]
+    batch.get.return_value = BatchJob(name="batches/job1", state="RUNNING")
+    assert service.collect(job_id) == {"job_id": job_id, "state": "RUNNING", "done": False}
+
+
+def test_collect_stores_successful_results(deps) -> None:
+    """成功的結果寫入與 parse_pdf 相同 key 的快取；錯誤與截斷的不寫入，再次 collect 不重複處理。"""
+    service, _gcs, _gemini, cache, batch, _manifests = deps
+    job_id = service.submit("bucket", ["a.pdf", "b.pdf", "c.pdf"])["job_id"]
+    batch.get.return_value = BatchJob(
+        name="batches/job1",
+        state="SUCCEEDED",
+        results={
+            "0": BatchResult(key="0", text="ok"),
+            "1": BatchResult(key="1", error="bad file"),
+            "2": BatchResult(key="2", text="[", truncated=True),
+        },
+    )
+    result = service.collect(job_id)
+    assert result["stored"] == ["a.pdf"]
+    assert result["failed"] == {"b.pdf": "bad file", "c.pdf": "output truncated at token limit"}
+    key, blocks = cache.put.call_args.args
+    assert key == _key("a.pdf") and blocks[0].elements[0].content == "ok"
+
+    assert service.collect(job_id)["stored"] == ["a.pdf"]
+    assert batch.get.call_count == 1
+
+
+def test_collect_incomplete_output_is_failed_not_cached(deps) -> None:
+    """輸出不完整（搶救的頁面或退回文字塊）不寫入快取，列入 failed 以便重新送出。"""
+    service, _gcs, gemini, cache, batch, _manifests = deps
+    gemini.parse_batch_output.side_effect = lambda text: [PageBlock(page=1, elements=[], partial=True)]
+    job_id = service.submit("bucket", ["a.pdf"])["job_id"]
+    batch.get.return_value = BatchJob(
+        name="batches/job1", state="SUCCEEDED", results={"0": BatchResult(key="0", text="[{")}
+    )
+    result = service.collect(job_id)
+    assert result["stored"] == []
+    assert result["failed"] == {"a.pdf": "incomplete output"}
+    cache.put.assert_not_called()
+
+
+def test_collect_fills_images_from_pdf(deps) -> None:
+    service, gcs, gemini, cache, batch, _manifests = deps
+    gemini.parse_batch_output.side_effect = lambda text: [
+        PageBlock(page=1, elements=[BlockElement(type="image", content="", description="logo")])
+    ]
+    job_id = service.submit("bucket", ["a.pdf"])["job_id"]
+    batch.get.return_value = BatchJob(
+        name="batches/job1", state="SUCCEEDED", results={"0": BatchResult(key="0", text="x")}
+    )
+    with patch("src.services.parse_common.extract_images_by_page", return_value={0: [("QUJD", "image/png")]}):
+        service.collect(job_id)
+    blocks = cache.put.call_args.args[1]
+    assert blocks[0].elements[0].content == "data:image/png;base64,QUJD"
+
+
+def test_collect_unknown_job_raises(deps) -> None:
+    with pytest.raises(FileNotFoundError):
+        deps[0].collect("missing")
+
+
+def _key(path: str) -> str:
+    info = BlobInfo(name=path, size=1, generation=1, md5_hash=f"md5-{path}")
+    return ParseResultCache.make_key("bucket", info, model_name="gemini-2.5-flash", prompt_version="v1")
@@ -0,0 +1,63 @@
+"""BlobDiskCache 單元測試：generation 為 key、LRU 淘汰、容量上限、統計、重建索引。"""
+
+from pathlib import Path
+
+from src.clients.blob_cache import BlobDiskCache, copy_cached_file
+
+
+def test_put_then_get_hits_and_counts_bytes_saved(tmp_path: Path) -> None:
+    """put_bytes 後以相同 generation 取得應命中，並累計 bytes_saved。"""
+    cache = BlobDiskCache(cache_dir=tmp_path, max_bytes=1000)
+    cache.put_bytes("b", "a.pdf", 1, b"hello")
+    hit = cache.get("b", "a.pdf", 1)
+    assert hit is not None and hit.read_bytes() == b"hello"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["bytes_saved"] == 5
+
+
+def test_different_generation_misses(tmp_path: Path) -> None:
+    """generation 不同（物件已被覆寫）應視為未命中。"""
+    cache = BlobDiskCache(cache_dir=tmp_path, max_bytes=1000)
+    cache.put_bytes("b", "a.pdf", 1, b"old")
+    assert cache.get("b", "a.pdf", 2) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path: Path) -> None:
+    """超過上限時應淘汰最久未使用者；最近 get 過的保留。"""
+    cache = BlobDiskCache(cache_dir=tmp_path, max_bytes=10)
+    cache.put_bytes("b", "one", 1, b"aaaa")
+    cache.put_bytes("b", "two", 1, b"bbbb")
+    assert cache.get("b", "one", 1) is not None  # one 變為最近使用
+    cache.put_bytes("b", "three", 1, b"cccc")
+    assert cache.get("b", "two", 1) is None
+    assert cache.get("b", "one", 1) is not None
+    assert cache.stats()["total_bytes"] <= 10
+
+
+def test_oversized_entry_not_cached(tmp_path: Path) -> None:
+    """單檔超過上限時不快取。"""
+    cache = BlobDiskCache(cache_dir=tmp_path, max_bytes=3)
+    assert cache.put_bytes("b", "big", 1, b"toolarge") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_put_file_and_copy_cached_file(tmp_path: Path) -> None:
+    """put_file 後 copy_cached_file 應提供相同內容；刪除原檔不影響快取。"""
+    cache = BlobDiskCache(cache_dir=tmp_path / "cache", max_bytes=1000)
+    src = tmp_path / "spool.pdf"
+    src.write_bytes(b"pdf-data")
+    cache.put_file("b", "doc.pdf", 5, src)
+    src.unlink()
+    hit = cache.get("b", "doc.pdf", 5)
+    dest = tmp_path / "out.pdf"
+    copy_cached_file(hit, dest)
+    assert dest.read_bytes() == b"pdf-data"
+
+
+def test_rebuilds_index_from_existing_dir(tmp_path: Path) -> None:
+    """新建的 cache 實例應從既有目錄重建索引（同一 instance 的 /tmp 重用）。"""
+    BlobDiskCache(cache_dir=tmp_path, max_bytes=1000).put_bytes("b", "a.pdf", 1, b"xyz")
+    again = BlobDiskCache(cache_dir=tmp_path, max_bytes=1000)
+    assert again.get("b", "a.pdf", 1) is not None
@@ -0,0 +1,146 @@
+"""ClientPool 單元測試：跨請求／跨 bucket 重用 Client、hit/miss 計數、執行緒安全。"""
+
+import threading
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.clients.client_pool import ClientPool, _blob_cache_from_env, _vertex_from_env, get_client_pool
+
+
+@pytest.fixture
+def mock_clients():
+    """Mock storage.Client 與 GeminiFileClient 建構，計算建立次數。"""
+    with (
+        patch("src.clients.client_pool.storage") as mock_storage,
+        patch("src.clients.client_pool.GeminiFileClient") as MockGemini,
+    ):
+        mock_storage.Client.return_value = MagicMock()
+        yield mock_storage, MockGemini
+
+
+def test_get_gcs_reuses_client_per_bucket(mock_clients) -> None:
+    """同一 bucket 第二次取得應回傳同一個 GCSClient，並記 1 miss + 1 hit。"""
+    pool = ClientPool()
+    first = pool.get_gcs("bucket-a")
+    second = pool.get_gcs("bucket-a")
+    assert first is second
+    assert pool.stats() == {"hits": 1, "misses": 1, "gcs_buckets": 1}
+
+
+def test_get_gcs_shares_storage_client_across_buckets(mock_clients) -> None:
+    """不同 bucket 應共用同一個 storage.Client（只建立一次）。"""
+    mock_storage, _ = mock_clients
+    pool = ClientPool()
+    a = pool.get_gcs("bucket-a")
+    b = pool.get_gcs("bucket-b")
+    assert a is not b
+    assert a.bucket_name == "bucket-a"
+    assert b.bucket_name == "bucket-b"
+    mock_storage.Client.assert_called_once()
+    assert a._client is b._client
+
+
+def test_get_gemini_created_once(mock_clients) -> None:
+    """GeminiFileClient 只建立一次，之後皆為 hit。"""
+    _, MockGemini = mock_clients
+    pool = ClientPool()
+    assert pool.get_gemini() is pool.get_gemini()
+    MockGemini.assert_called_once()
+    assert pool.stats()["hits"] == 1
+
+
+def test_concurrent_get_gcs_creates_single_client(mock_clients) -> None:
+    """多執行緒同時取同一 bucket 時仍只建立一個 GCSClient。"""
+    pool = ClientPool()
+    results: list = []
+
+    def worker() -> None:
+        results.append(pool.get_gcs("shared"))
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(r is results[0] for r in results)
+    assert pool.stats()["misses"] == 1
+
+
+def test_clear_resets_pool(mock_clients) -> None:
+    """clear 後應重新建立 Client 並歸零計數。"""
+    pool = ClientPool()
+    first = pool.get_gcs("b")
+    pool.clear()
+    assert pool.stats() == {"hits": 0, "misses": 0, "gcs_buckets": 0}
+    assert pool.get_gcs("b") is not first
+
+
+def test_get_client_pool_returns_singleton() -> None:
+    """get_client_pool 應回傳 module 層級的同一實例。"""
+    assert get_client_pool() is get_client_pool()
+
+
+def test_get_gemini_persists_file_cache_in_configured_bucket(mock_clients) -> None:
+    """設定 gemini_file_cache_bucket 時，GeminiFileCache 應以該 bucket 的 GCSClient 持久化。"""
+    _, MockGemini = mock_clients
+    pool = ClientPool(gemini_file_cache_bucket="cache-bucket")
+    pool.get_gemini()
+    file_cache = MockGemini.call_args.kwargs["file_cache"]
+    assert file_cache._store is pool.get_gcs("cache-bucket")
+
+
+def test_get_gemini_passes_response_schema_mode(mock_clients) -> None:
+    _, MockGemini = mock_clients
+    ClientPool(gemini_response_schema=True).get_gemini()
+    assert MockGemini.call_args.kwargs["response_schema"] is True
+
+
+def test_gemini_client_shares_pool_rate_limiter(mock_clients) -> None:
+    _, MockGemini = mock_clients
+    pool = ClientPool()
+    pool.get_gemini()
+    assert MockGemini.call_args.kwargs["rate_limiter"] is pool.rate_limiter
+
+
+def test_context_cache_enabled_by_ttl(mock_clients) -> None:
+    _, MockGemini = mock_clients
+    ClientPool().get_gemini()
+    assert MockGemini.call_args.kwargs["context_cache"] is None
+    ClientPool(context_cache_ttl=300).get_gemini()
+    assert MockGemini.call_args.kwargs["context_cache"] is not None
+
+
+def test_hedger_passed_to_gemini_client(mock_clients) -> None:
+    _, MockGemini = mock_clients
+    hedger = MagicMock()
+    pool = ClientPool(hedger=hedger)
+    pool.get_gemini()
+    assert MockGemini.call_args.kwargs["hedger"] is pool.hedger is hedger
+
+
+def test_vertex_backend_selected_by_env(monkeypatch) -> None:
+    monkeypatch.delenv("GEMINI_BACKEND", raising=False)
+    assert _vertex_from_env() is None
+    monkeypatch.setenv("GEMINI_BACKEND", "vertex")
+    monkeypatch.setenv("VERTEX_PROJECT", "proj")
+    assert _vertex_from_env() is not None
+    monkeypatch.setenv("GEMINI_BACKEND", "other")
+    with pytest.raises(ValueError):
+        _vertex_from_env()
+
+
+def test_blob_cache_disabled_by_default(monkeypatch) -> None:
+    """gen2 的 /tmp 佔用記憶體，未設定 BLOB_CACHE_MAX_MB 時不建立本機快取。"""
+    monkeypatch.delenv("BLOB_CACHE_MAX_MB", raising=False)
+    assert _blob_cache_from_env() is None
+    monkeypatch.setenv("BLOB_CACHE_MAX_MB", "64")
+    with patch("src.clients.client_pool.BlobDiskCache") as MockCache:
+        assert _blob_cache_from_env() is MockCache.return_value
+    assert MockCache.call_args.kwargs["max_bytes"] == 64 * 1024 * 1024
+
+
+def test_output_format_passed_to_gemini_client(mock_clients) -> None:
+    _, MockGemini = mock_clients
+    ClientPool(output_format="compact").get_gemini()
+    assert MockGemini.call_args.kwargs["output_format"] == "compact"
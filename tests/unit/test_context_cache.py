@@ -0,0 +1,127 @@
+"""GeminiContextCache 單元測試（Mock）：建立一次後重用、TTL 將到期時延長、無法快取時退回。"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from src.clients.context_cache import GeminiContextCache
+
+
+@pytest.fixture
+def mock_caching():
+    with (
+        patch("src.clients.context_cache.caching.CachedContent.create") as create,
+        patch("src.clients.context_cache.genai.GenerativeModel.from_cached_content") as from_cached,
+    ):
+        create.return_value = MagicMock(name="cached")
+        yield create, from_cached
+
+
+def _file(name: str = "files/abc") -> MagicMock:
+    file_obj = MagicMock()
+    file_obj.name = name
+    return file_obj
+
+
+def test_model_for_creates_once_and_reuses(mock_caching) -> None:
+    create, from_cached = mock_caching
+    cache = GeminiContextCache("gemini-2.5-flash", ttl_seconds=600)
+    file_obj = _file()
+    first = cache.model_for(file_obj)
+    second = cache.model_for(file_obj)
+    assert first is second is from_cached.return_value
+    create.assert_called_once()
+    kwargs = create.call_args.kwargs
+    assert kwargs["model"] == "gemini-2.5-flash"
+    assert kwargs["contents"] == [file_obj]
+    assert kwargs["ttl"].total_seconds() == 600
+    assert cache.stats() == {
+        "created": 1, "hits": 1, "refreshed": 0, "fallbacks": 0, "evicted": 0, "active": 1, "unavailable": 0
+    }
+
+
+def test_model_for_refreshes_ttl_near_expiry(mock_caching) -> None:
+    create, _ = mock_caching
+    cache = GeminiContextCache("m", ttl_seconds=100, refresh_margin=60)
+    file_obj = _file()
+    now = [1000.0]
+    with patch("src.clients.context_cache.time.time", side_effect=lambda: now[0]):
+        cache.model_for(file_obj)
+        now[0] = 1050.0
+        cache.model_for(file_obj)
+    create.return_value.update.assert_called_once()
+    assert create.call_count == 1
+    assert cache.stats()["refreshed"] == 1
+
+
+def test_expired_entry_is_recreated(mock_caching) -> None:
+    create, _ = mock_caching
+    cache = GeminiContextCache("m", ttl_seconds=100)
+    now = [1000.0]
+    with patch("src.clients.context_cache.time.time", side_effect=lambda: now[0]):
+        cache.model_for(_file())
+        now[0] = 1200.0
+        cache.model_for(_file())
+    assert create.call_count == 2
+    create.return_value.delete.assert_not_called()  # 已到期，伺服器端已自行刪除
+
+
+def test_over_capacity_evicts_earliest_and_deletes_remote(mock_caching) -> None:
+    """超過 max_entries 時淘汰最早到期者並刪除伺服器端快取；到期記錄連同其鎖一併移除。"""
+    create, _ = mock_caching
+    remotes = [MagicMock(name=f"cached-{i}") for i in range(4)]
+    create.side_effect = remotes
+    cache = GeminiContextCache("m", ttl_seconds=100, max_entries=2)
+    now = [1000.0]
+    with patch("src.clients.context_cache.time.time", side_effect=lambda: now[0]):
+        for i in range(3):
+            cache.model_for(_file(f"files/{i}"))
+            now[0] += 10
+        remotes[0].delete.assert_called_once()
+        assert cache.stats()["active"] == 2 and cache.stats()["evicted"] == 1
+        now[0] = 5000.0
+        cache.model_for(_file("files/new"))
+    assert set(cache._entries) == {"files/new"}
+    assert set(cache._key_locks) == {"files/new"}
+
+
+def test_invalidate_deletes_remote_cache(mock_caching) -> None:
+    create, _ = mock_caching
+    cache = GeminiContextCache("m")
+    cache.model_for(_file())
+    cache.invalidate("files/abc")
+    create.return_value.delete.assert_called_once()
+    assert cache.stats()["active"] == 0
+
+
+def test_invalid_argument_marks_file_unavailable(mock_caching) -> None:
+    """內容低於最小快取 token 數等情況：之後同一 File 不再嘗試建立。"""
+    create, _ = mock_caching
+    create.side_effect = google_exceptions.InvalidArgument("too small")
+    cache = GeminiContextCache("m")
+    assert cache.model_for(_file()) is None
+    assert cache.model_for(_file()) is None
+    create.assert_called_once()
+    assert cache.stats()["unavailable"] == 1 and cache.stats()["fallbacks"] == 2
+
+
+def test_other_errors_fall_back_once(mock_caching) -> None:
+    create, _ = mock_caching
+    create.side_effect = [RuntimeError("boom"), MagicMock()]
+    cache = GeminiContextCache("m")
+    assert cache.model_for(_file()) is None
+    assert cache.model_for(_file()) is not None
+    assert cache.stats()["created"] == 1
+
+
+def test_calls_go_through_injected_caller(mock_caching) -> None:
+    calls = []
+
+    def call(fn, *args, **kwargs):
+        calls.append(fn)
+        return fn(*args, **kwargs)
+
+    create, _ = mock_caching
+    GeminiContextCache("m", call=call).model_for(_file())
+    assert calls == [create]
@@ -83,16 +83,30 @@ def test_upload_from_stream_bytes_success(
     )
 
 
-def test_upload_from_stream_binary_io_reads_then_uploads(
+def test_upload_from_stream_seekable_io_uploads_stream_directly(
     file_handler: FileHandler,
     mock_gemini: MagicMock,
 ) -> None:
-    """upload_from_stream 接受 BinaryIO 時應 read() 後再上傳。"""
+    """upload_from_stream 接受可 seek 的 BinaryIO 時應直接交給 upload_stream，不先 read()。"""
     from io import BytesIO
+    mock_gemini.upload_stream.return_value = "https://generativelanguage.googleapis.com/v1beta/files/f3"
     data = BytesIO(b"streamed pdf")
     uri = file_handler.upload_from_stream(data, display_name="s.pdf")
-    call_data = mock_gemini.upload_bytes.call_args[1]["data"]
-    assert call_data == b"streamed pdf"
+    assert uri.endswith("files/f3")
+    assert mock_gemini.upload_stream.call_args.args[0] is data
+    mock_gemini.upload_bytes.assert_not_called()
+
+
+def test_upload_from_stream_non_seekable_io_reads_then_uploads(
+    file_handler: FileHandler,
+    mock_gemini: MagicMock,
+) -> None:
+    """不可 seek 的串流（無法續傳）應 read() 後以 upload_bytes 上傳。"""
+    stream = MagicMock()
+    stream.seekable.return_value = False
+    stream.read.return_value = b"piped pdf"
+    file_handler.upload_from_stream(stream, display_name="p.pdf")
+    assert mock_gemini.upload_bytes.call_args[1]["data"] == b"piped pdf"
 
 
 def test_upload_from_stream_retries_on_connection_error(
@@ -0,0 +1,141 @@
+"""FileReadyPoller 單元測試：自適應間隔、退避上限、wait_many、FAILED／逾時與依大小區間的統計。"""
+
+import asyncio
+
+import pytest
+from unittest.mock import patch
+
+from src.clients.file_poller import FileProcessingFailed, FileReadyPoller, size_bucket
+
+MB = 1024 * 1024
+
+
+class FakeClock:
+    """取代 time.monotonic / time.sleep，sleep 直接推進時間並記錄每次等待。"""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    fake = FakeClock()
+    with patch("src.clients.file_poller.time") as mock_time:
+        mock_time.monotonic.side_effect = fake.monotonic
+        mock_time.sleep.side_effect = fake.sleep
+        yield fake
+
+
+def _active_after(clock: FakeClock, ready_at: dict[str, float]):
+    """回傳 get_state：各檔案在指定時間之後變為 ACTIVE。"""
+    calls: list[str] = []
+
+    def get_state(name: str) -> str:
+        calls.append(name)
+        return "ACTIVE" if clock.now >= ready_at[name] else "PROCESSING"
+
+    return get_state, calls
+
+
+def test_size_bucket() -> None:
+    assert size_bucket(1 * MB) == "<10MB"
+    assert size_bucket(30 * MB) == "10-50MB"
+    assert size_bucket(150 * MB) == ">=100MB"
+
+
+def test_already_active_returns_after_single_poll(clock: FakeClock) -> None:
+    get_state, calls = _active_after(clock, {"files/a": 0.0})
+    FileReadyPoller(get_state).wait("files/a", size_bytes=MB)
+    assert calls == ["files/a"]
+    assert clock.sleeps == []
+
+
+def test_large_file_polls_far_less_than_fixed_two_seconds(clock: FakeClock) -> None:
+    """150MB 處理 120 秒：自適應輪詢次數應遠少於固定 2 秒的 60 次。"""
+    get_state, calls = _active_after(clock, {"files/big": 120.0})
+    FileReadyPoller(get_state, jitter=0.0).wait("files/big", size_bytes=150 * MB)
+    assert len(calls) < 20
+    assert max(clock.sleeps) <= 15.0
+
+
+def test_small_file_first_wait_is_short(clock: FakeClock) -> None:
+    get_state, _calls = _active_after(clock, {"files/s": 1.0})
+    FileReadyPoller(get_state, jitter=0.0).wait("files/s", size_bytes=MB)
+    assert clock.sleeps[0] == pytest.approx(0.5)
+
+
+def test_observed_duration_tunes_first_wait(clock: FakeClock) -> None:
+    """同一大小區間已有實測處理時間時，首次等待依 EWMA 推估。"""
+    get_state, _calls = _active_after(clock, {"files/a": 10.0, "files/b": 1e9})
+    poller = FileReadyPoller(get_state, jitter=0.0)
+    poller.wait("files/a", size_bytes=MB)
+
+    clock.sleeps.clear()
+    with pytest.raises(TimeoutError):
+        poller.wait("files/b", size_bytes=2 * MB, timeout=9.0)
+    # 首次等待約為推估處理時間（>= 10s）的 0.8 倍，被 timeout 截止
+    assert clock.sleeps[0] == pytest.approx(8.0, rel=0.3)
+
+
+def test_fixed_interval_disables_adaptation(clock: FakeClock) -> None:
+    get_state, calls = _active_after(clock, {"files/a": 6.0})
+    FileReadyPoller(get_state).wait("files/a", size_bytes=150 * MB, fixed_interval=2.0)
+    assert clock.sleeps == [2.0, 2.0, 2.0]
+    assert len(calls) == 4
+
+
+def test_wait_many_shares_one_loop(clock: FakeClock) -> None:
+    """多檔共用同一迴圈；小檔先完成不必等大檔。"""
+    get_state, calls = _active_after(clock, {"files/s": 1.0, "files/l": 30.0})
+    poller = FileReadyPoller(get_state, jitter=0.0)
+    poller.wait_many({"files/s": MB, "files/l": 120 * MB})
+
+    assert calls.count("files/s") <= 3
+    stats = poller.stats()
+    assert stats["<10MB"]["files"] == 1
+    assert stats[">=100MB"]["avg_processing_s"] >= 30.0
+
+
+def test_failed_file_raises_runtime_error(clock: FakeClock) -> None:
+    poller = FileReadyPoller(lambda name: "FAILED")
+    with pytest.raises(RuntimeError, match="files/x"):
+        poller.wait("files/x")
+    assert poller.stats()["<10MB"]["failures"] == 1
+
+
+def test_timeout_lists_pending_files_and_counts(clock: FakeClock) -> None:
+    poller = FileReadyPoller(lambda name: "PROCESSING")
+    with pytest.raises(TimeoutError, match="files/a, files/b"):
+        poller.wait_many({"files/a": 0, "files/b": 0}, timeout=20.0)
+    assert clock.now == pytest.approx(20.0)
+    assert poller.stats()["<10MB"]["timeouts"] == 2
+
+
+def test_wait_many_async_sleeps_on_event_loop(clock: FakeClock) -> None:
+    """async 版本以 asyncio.sleep 等待，輪詢行為與同步版相同。"""
+
+    async def fake_sleep(seconds: float) -> None:
+        clock.sleep(seconds)
+
+    get_state, calls = _active_after(clock, {"files/a": 6.0, "files/b": 0.0})
+    poller = FileReadyPoller(get_state)
+    with patch("src.clients.file_poller.asyncio.sleep", side_effect=fake_sleep):
+        asyncio.run(poller.wait_many_async({"files/a": MB, "files/b": MB}, fixed_interval=2.0))
+    assert clock.sleeps == [2.0, 2.0, 2.0]
+    assert calls.count("files/b") == 1
+    assert poller.stats()["<10MB"]["files"] == 2
+
+
+def test_wait_many_async_failed_raises(clock: FakeClock) -> None:
+    poller = FileReadyPoller(lambda name: "FAILED")
+    with pytest.raises(FileProcessingFailed, match="files/x") as exc_info:
+        asyncio.run(poller.wait_many_async({"files/x": 0}))
+    assert exc_info.value.file_name == "files/x"
@@ -3,7 +3,7 @@
 import pytest
 from unittest.mock import MagicMock, patch
 
-from src.clients.gcs_client import GCSClient
+from src.clients.gcs_client import BlobInfo, GCSClient
 
 
 @pytest.fixture
@@ -61,3 +61,353 @@ def test_init_uses_bucket_name(
     client = GCSClient(bucket_name="custom-bucket")
     client.read_blob_bytes("x.pdf")
     _client.bucket.assert_called_once_with("custom-bucket")
+
+
+def _fake_ranged_blob(content: bytes) -> MagicMock:
+    """回傳依 start/end 切片 content 的 mock blob，模擬 GCS Range 下載。"""
+    blob = MagicMock()
+    blob.download_as_bytes.side_effect = (
+        lambda start=None, end=None, **_kw: content[start:end + 1] if start is not None else content
+    )
+    return blob
+
+
+def test_get_blob_info_returns_size_and_generation(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+) -> None:
+    """get_blob_info 應以 get_blob 取得 size 與 generation。"""
+    _client, mock_bucket, _blob = mock_storage_client
+    meta = MagicMock()
+    meta.size = 1234
+    meta.generation = 42
+    mock_bucket.get_blob.return_value = meta
+    info = GCSClient(bucket_name="b").get_blob_info("a.pdf")
+    assert (info.name, info.size, info.generation) == ("a.pdf", 1234, 42)
+
+
+def test_get_blob_info_missing_raises(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+) -> None:
+    """物件不存在時 get_blob_info 應拋 FileNotFoundError。"""
+    _client, mock_bucket, _blob = mock_storage_client
+    mock_bucket.get_blob.return_value = None
+    with pytest.raises(FileNotFoundError, match="gs://b/missing.pdf"):
+        GCSClient(bucket_name="b").get_blob_info("missing.pdf")
+
+
+def test_read_blob_bytes_sliced_assembles_ranges_pinned_to_generation(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+) -> None:
+    """分段下載應依 slice_size 切段、每段指定同一 generation，並依序組回完整內容。"""
+    _client, mock_bucket, _blob = mock_storage_client
+    content = bytes(range(256)) * 4  # 1024 bytes
+    meta = MagicMock()
+    meta.size = len(content)
+    meta.generation = 7
+    mock_bucket.get_blob.return_value = meta
+    ranged = _fake_ranged_blob(content)
+    mock_bucket.blob.return_value = ranged
+
+    client = GCSClient(bucket_name="b", slice_size=100, max_workers=4)
+    result = client.read_blob_bytes_sliced("big.pdf")
+
+    assert result == content
+    assert isinstance(result, bytearray)  # 直接回傳預先配置的緩衝區，不再複製
+    assert ranged.download_as_bytes.call_count == 11
+    for call in mock_bucket.blob.call_args_list:
+        assert call.kwargs["generation"] == 7
+    for call in ranged.download_as_bytes.call_args_list:
+        assert call.kwargs["if_generation_match"] == 7
+
+
+def test_read_blob_bytes_sliced_small_blob_single_request(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+) -> None:
+    """物件小於單段大小時只發一次請求。"""
+    _client, mock_bucket, _blob = mock_storage_client
+    meta = MagicMock()
+    meta.size = 10
+    meta.generation = 3
+    mock_bucket.get_blob.return_value = meta
+    ranged = _fake_ranged_blob(b"0123456789")
+    mock_bucket.blob.return_value = ranged
+
+    result = GCSClient(bucket_name="b", slice_size=100).read_blob_bytes_sliced("s.pdf")
+
+    assert result == b"0123456789"
+    ranged.download_as_bytes.assert_called_once_with(if_generation_match=3)
+
+
+def test_read_blob_bytes_sliced_short_read_raises(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+) -> None:
+    """任一段回傳長度不符時應拋 IOError，不回傳不完整內容。"""
+    _client, mock_bucket, _blob = mock_storage_client
+    meta = MagicMock()
+    meta.size = 300
+    meta.generation = 1
+    mock_bucket.get_blob.return_value = meta
+    ranged = MagicMock()
+    ranged.download_as_bytes.return_value = b"short"
+    mock_bucket.blob.return_value = ranged
+
+    with pytest.raises(IOError, match="Short read"):
+        GCSClient(bucket_name="b", slice_size=100).read_blob_bytes_sliced("x.pdf")
+
+
+def test_download_blob_to_file_writes_slices_at_offsets(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+    tmp_path,
+) -> None:
+    """download_blob_to_file 應將各段寫入檔案對應 offset，結果與原內容一致。"""
+    _client, mock_bucket, _blob = mock_storage_client
+    content = bytes(range(256)) * 3
+    meta = MagicMock()
+    meta.size = len(content)
+    meta.generation = 9
+    mock_bucket.get_blob.return_value = meta
+    mock_bucket.blob.return_value = _fake_ranged_blob(content)
+    dest = tmp_path / "spool.pdf"
+
+    info = GCSClient(bucket_name="b", slice_size=64, max_workers=4).download_blob_to_file("big.pdf", dest)
+
+    assert dest.read_bytes() == content
+    assert info.generation == 9
+
+
+def test_download_blob_to_file_small_blob_streams_directly(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+    tmp_path,
+) -> None:
+    """小檔應以單一 download_to_file 寫入，不切段。"""
+    _client, mock_bucket, _blob = mock_storage_client
+    meta = MagicMock()
+    meta.size = 5
+    meta.generation = 2
+    mock_bucket.get_blob.return_value = meta
+    pinned = MagicMock()
+    pinned.download_to_file.side_effect = lambda f, **_kw: f.write(b"hello")
+    mock_bucket.blob.return_value = pinned
+    dest = tmp_path / "small.pdf"
+
+    GCSClient(bucket_name="b", slice_size=64).download_blob_to_file("small.pdf", dest)
+
+    assert dest.read_bytes() == b"hello"
+    pinned.download_as_bytes.assert_not_called()
+
+
+def test_download_with_given_info_pins_generation_without_metadata(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+    tmp_path,
+) -> None:
+    """呼叫端給 BlobInfo 時不再查 metadata，下載固定在該 generation（與快取 key 同一版本）。"""
+    _client, mock_bucket, _blob = mock_storage_client
+    pinned = MagicMock()
+    pinned.download_as_bytes.return_value = b"v5"
+    pinned.download_to_file.side_effect = lambda f, **_kw: f.write(b"v5")
+    mock_bucket.blob.return_value = pinned
+    info = BlobInfo(name="doc.pdf", size=2, generation=5)
+    client = GCSClient(bucket_name="b", slice_size=64)
+
+    assert client.read_blob_bytes("doc.pdf", info=info) == b"v5"
+    assert client.read_blob_bytes_sliced("doc.pdf", info=info) == b"v5"
+    assert client.download_blob_to_file("doc.pdf", tmp_path / "d.pdf", info=info) is info
+
+    mock_bucket.get_blob.assert_not_called()
+    assert all(call.kwargs == {"generation": 5} for call in mock_bucket.blob.call_args_list)
+    assert all(call.kwargs["if_generation_match"] == 5 for call in pinned.download_as_bytes.call_args_list)
+
+
+def test_read_blob_bytes_with_cache_skips_download_on_hit(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+    tmp_path,
+) -> None:
+    """有 blob_cache 時第二次讀取同 generation 只發 metadata 請求，不再下載。"""
+    from src.clients.blob_cache import BlobDiskCache
+
+    _client, mock_bucket, mock_blob = mock_storage_client
+    meta = MagicMock()
+    meta.size = 11
+    meta.generation = 5
+    mock_bucket.get_blob.return_value = meta
+    mock_blob.download_as_bytes.return_value = b"pdf content"
+    cache = BlobDiskCache(cache_dir=tmp_path, max_bytes=1000)
+    client = GCSClient(bucket_name="b", blob_cache=cache)
+
+    assert client.read_blob_bytes("a.pdf") == b"pdf content"
+    assert client.read_blob_bytes("a.pdf") == b"pdf content"
+
+    mock_blob.download_as_bytes.assert_called_once()
+    assert mock_bucket.get_blob.call_count == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_download_blob_to_file_with_cache_hit(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+    tmp_path,
+) -> None:
+    """download_blob_to_file 命中快取時應由本機提供檔案，不呼叫 download。"""
+    from src.clients.blob_cache import BlobDiskCache
+
+    _client, mock_bucket, mock_blob = mock_storage_client
+    meta = MagicMock()
+    meta.size = 4
+    meta.generation = 8
+    mock_bucket.get_blob.return_value = meta
+    cache = BlobDiskCache(cache_dir=tmp_path / "cache", max_bytes=1000)
+    cache.put_bytes("b", "doc.pdf", 8, b"data")
+    dest = tmp_path / "spool.pdf"
+
+    GCSClient(bucket_name="b", blob_cache=cache).download_blob_to_file("doc.pdf", dest)
+
+    assert dest.read_bytes() == b"data"
+    mock_blob.download_to_file.assert_not_called()
+    mock_blob.download_as_bytes.assert_not_called()
+
+
+def test_read_blob_bytes_or_none_returns_none_when_missing(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+) -> None:
+    """物件不存在（NotFound）時 read_blob_bytes_or_none 回傳 None。"""
+    from google.api_core.exceptions import NotFound
+
+    _client, _bucket, mock_blob = mock_storage_client
+    mock_blob.download_as_bytes.side_effect = NotFound("nope")
+    assert GCSClient(bucket_name="b").read_blob_bytes_or_none("cache/x.json") is None
+
+
+def test_upload_bytes_uploads_with_content_type(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+) -> None:
+    """upload_bytes 應以指定 content_type 上傳並回傳 gs:// URI。"""
+    _client, mock_bucket, mock_blob = mock_storage_client
+    uri = GCSClient(bucket_name="b").upload_bytes("cache/x.json", b"{}", content_type="application/json")
+    mock_bucket.blob.assert_called_with("cache/x.json")
+    mock_blob.upload_from_string.assert_called_once_with(b"{}", content_type="application/json")
+    assert uri == "gs://b/cache/x.json"
+
+
+def test_read_blob_versioned_returns_data_and_generation(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+) -> None:
+    """read_blob_versioned 應以 get_blob 的 generation 固定版本讀取。"""
+    _client, mock_bucket, _blob = mock_storage_client
+    blob = mock_bucket.get_blob.return_value
+    blob.generation = 9
+    blob.download_as_bytes.return_value = b"{}"
+    assert GCSClient(bucket_name="b").read_blob_versioned("claims/x") == (b"{}", 9)
+    blob.download_as_bytes.assert_called_once_with(if_generation_match=9)
+
+
+def test_read_blob_versioned_missing_returns_none(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+) -> None:
+    _client, mock_bucket, _blob = mock_storage_client
+    mock_bucket.get_blob.return_value = None
+    assert GCSClient(bucket_name="b").read_blob_versioned("claims/x") is None
+
+
+def test_upload_bytes_if_generation_match(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+) -> None:
+    """generation 相符時覆寫並回傳 True；PreconditionFailed 時回傳 False。"""
+    from google.api_core.exceptions import PreconditionFailed
+
+    _client, _bucket, mock_blob = mock_storage_client
+    gcs = GCSClient(bucket_name="b")
+    assert gcs.upload_bytes_if_generation_match("claims/x", b"{}", 9, content_type="application/json") is True
+    mock_blob.upload_from_string.assert_called_once_with(b"{}", content_type="application/json", if_generation_match=9)
+
+    mock_blob.upload_from_string.side_effect = PreconditionFailed("changed")
+    assert gcs.upload_bytes_if_generation_match("claims/x", b"{}", 9) is False
+
+
+def test_create_resumable_upload_returns_v4_signed_post(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+    monkeypatch,
+) -> None:
+    """正式環境應產生 V4 簽章的 POST URL，headers 含 x-goog-resumable: start。"""
+    import google.auth.credentials
+
+    monkeypatch.delenv("STORAGE_EMULATOR_HOST", raising=False)
+    mock_client, _bucket, mock_blob = mock_storage_client
+    mock_client._credentials = MagicMock(spec=google.auth.credentials.Signing)
+    mock_blob.generate_signed_url.return_value = "https://signed"
+
+    session = GCSClient(bucket_name="b").create_resumable_upload("uploads/a.pdf", origin="https://x")
+
+    assert session.url == "https://signed"
+    assert session.method == "POST"
+    assert session.requires_start is True
+    assert session.headers["x-goog-resumable"] == "start"
+    kwargs = mock_blob.generate_signed_url.call_args.kwargs
+    assert kwargs["version"] == "v4"
+    assert kwargs["method"] == "POST"
+    assert kwargs["headers"] == {"x-goog-resumable": "start"}
+    assert "service_account_email" not in kwargs
+
+
+def test_create_resumable_upload_signs_content_length_range(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+    monkeypatch,
+) -> None:
+    """max_bytes 有值時應簽入 x-goog-content-length-range，並回傳給瀏覽器帶上。"""
+    import google.auth.credentials
+
+    monkeypatch.delenv("STORAGE_EMULATOR_HOST", raising=False)
+    mock_client, _bucket, mock_blob = mock_storage_client
+    mock_client._credentials = MagicMock(spec=google.auth.credentials.Signing)
+
+    session = GCSClient(bucket_name="b").create_resumable_upload("uploads/a.pdf", max_bytes=1024)
+
+    signed = mock_blob.generate_signed_url.call_args.kwargs["headers"]
+    assert signed == {"x-goog-resumable": "start", "x-goog-content-length-range": "0,1024"}
+    assert session.headers["x-goog-content-length-range"] == "0,1024"
+    assert session.headers["Content-Type"] == "application/pdf"
+
+
+def test_create_resumable_upload_without_private_key_uses_iam_signing(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+    monkeypatch,
+) -> None:
+    """憑證無私鑰（GCF metadata server）時應改傳 service_account_email + access_token。"""
+    monkeypatch.delenv("STORAGE_EMULATOR_HOST", raising=False)
+    mock_client, _bucket, mock_blob = mock_storage_client
+    creds = MagicMock(spec=["valid", "refresh", "service_account_email", "token"])
+    creds.valid = True
+    creds.service_account_email = "gcf@p.iam.gserviceaccount.com"
+    creds.token = "tok"
+    mock_client._credentials = creds
+
+    GCSClient(bucket_name="b").create_resumable_upload("uploads/a.pdf")
+
+    kwargs = mock_blob.generate_signed_url.call_args.kwargs
+    assert kwargs["service_account_email"] == "gcf@p.iam.gserviceaccount.com"
+    assert kwargs["access_token"] == "tok"
+
+
+def test_create_resumable_upload_emulator_creates_session(
+    mock_storage_client: tuple[MagicMock, MagicMock, MagicMock],
+    monkeypatch,
+) -> None:
+    """設定 STORAGE_EMULATOR_HOST 時應直接建立 session URI，不簽章。"""
+    monkeypatch.setenv("STORAGE_EMULATOR_HOST", "http://localhost:4443")
+    _client, _bucket, mock_blob = mock_storage_client
+    mock_blob.create_resumable_upload_session.return_value = "http://localhost:4443/upload?upload_id=1"
+
+    session = GCSClient(bucket_name="b").create_resumable_upload("uploads/a.pdf")
+
+    assert session.url == "http://localhost:4443/upload?upload_id=1"
+    assert session.method == "PUT"
+    assert session.requires_start is False
+    mock_blob.generate_signed_url.assert_not_called()
+
+
+def test_delete_blob_ignores_missing(mock_storage_client: tuple[MagicMock, MagicMock, MagicMock]) -> None:
+    """delete_blob 遇到 NotFound 應視為已刪除。"""
+    from google.api_core.exceptions import NotFound
+
+    _client, _bucket, mock_blob = mock_storage_client
+    mock_blob.delete.side_effect = NotFound("gone")
+    GCSClient(bucket_name="b").delete_blob("x")
+    mock_blob.delete.assert_called_once()
@@ -0,0 +1,81 @@
+"""GeminiBatchClient 單元測試（Mock HTTP）：送出 inline 請求、解析狀態與各筆回應、錯誤處理。"""
+
+import pytest
+from unittest.mock import MagicMock
+
+from src.clients.gemini_batch import API_BASE, GeminiBatchClient, parse_batch
+
+
+def _resp(status: int = 200, body: dict | None = None) -> MagicMock:
+    r = MagicMock()
+    r.status_code = status
+    r.content = b"{}"
+    r.json.return_value = body or {}
+    r.text = ""
+    return r
+
+
+def test_submit_posts_inline_requests_with_keys() -> None:
+    session = MagicMock()
+    session.request.return_value = _resp(body={"name": "batches/b1"})
+    client = GeminiBatchClient("key", session=session)
+    name = client.submit("gemini-2.5-flash", {"0": {"contents": []}, "1": {"contents": []}}, display_name="obe")
+    assert name == "batches/b1"
+    method, url = session.request.call_args.args
+    assert method == "POST" and url == f"{API_BASE}/models/gemini-2.5-flash:batchGenerateContent"
+    assert session.request.call_args.kwargs["headers"] == {"x-goog-api-key": "key"}
+    requests = session.request.call_args.kwargs["json"]["batch"]["input_config"]["requests"]["requests"]
+    assert [r["metadata"]["key"] for r in requests] == ["0", "1"]
+
+
+def test_submit_without_requests_raises() -> None:
+    with pytest.raises(ValueError):
+        GeminiBatchClient("key", session=MagicMock()).submit("m", {}, display_name="x")
+
+
+def test_http_errors_map_to_retryable_or_runtime() -> None:
+    session = MagicMock()
+    client = GeminiBatchClient("key", session=session)
+    session.request.return_value = _resp(status=503)
+    with pytest.raises(ConnectionError):
+        client.get("batches/b1")
+    session.request.return_value = _resp(status=400)
+    with pytest.raises(RuntimeError):
+        client.get("batches/b1")
+
+
+def test_parse_batch_running_state() -> None:
+    job = parse_batch("batches/b1", {"name": "batches/b1", "metadata": {"state": "BATCH_STATE_RUNNING"}})
+    assert job.state == "RUNNING" and not job.done and job.results == {}
+
+
+def test_parse_batch_inlined_responses() -> None:
+    """完成的 batch：依 metadata.key 取出文字、截斷標記與單筆錯誤。"""
+    data = {
+        "done": True,
+        "metadata": {"state": "BATCH_STATE_SUCCEEDED"},
+        "response": {
+            "inlinedResponses": {
+                "inlinedResponses": [
+                    {
+                        "metadata": {"key": "0"},
+                        "response": {
+                            "candidates": [
+                                {"content": {"parts": [{"text": "[{"}, {"text": "}]"}]}, "finishReason": "STOP"}
+                            ]
+                        },
+                    },
+                    {
+                        "metadata": {"key": "1"},
+                        "response": {"candidates": [{"content": {"parts": [{"text": "["}]}, "finishReason": "MAX_TOKENS"}]},
+                    },
+                    {"metadata": {"key": "2"}, "error": {"message": "file not found"}},
+                ]
+            }
+        },
+    }
+    job = parse_batch("batches/b1", data)
+    assert job.succeeded and job.done
+    assert job.results["0"].text == "[{}]" and not job.results["0"].truncated
+    assert job.results["1"].truncated
+    assert job.results["2"].error == "file not found"
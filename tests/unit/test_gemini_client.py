@@ -9,25 +9,25 @@ GeminiFileClient 單元測試（Mock）。
 import pytest
 from unittest.mock import MagicMock, patch
 
-from src.clients.gemini_client import GeminiFileClient
+from src.clients.file_poller import FileProcessingFailed
+from src.clients.gemini_client import GeminiFileClient, PendingFile
 from src.models.schema import BlockElement, PageBlock, PageExtract
 
 
 @pytest.fixture
-def gemini_client() -> GeminiFileClient:
-    """建立受測的 GeminiFileClient，API key 以 Mock 取代實際呼叫。"""
-    with patch("src.clients.gemini_client.genai"):
-        return GeminiFileClient(api_key="test-key")
+def mock_upload_file():
+    """Mock ResumableUploader.upload，回傳 File 資源（不發出實際 HTTP 請求）。"""
+    with patch("src.clients.gemini_client.ResumableUploader") as MockUploader:
+        m = MockUploader.return_value.upload
+        m.return_value = {"name": "files/abc123"}
+        yield m
 
 
 @pytest.fixture
-def mock_upload_file():
-    """Mock genai.upload_file 回傳的檔案物件。"""
-    with patch("src.clients.gemini_client.genai.upload_file") as m:
-        fake_file = MagicMock()
-        fake_file.name = "files/abc123"
-        m.return_value = fake_file
-        yield m
+def gemini_client(mock_upload_file: MagicMock) -> GeminiFileClient:
+    """建立受測的 GeminiFileClient，API key 與上傳器以 Mock 取代實際呼叫。"""
+    with patch("src.clients.gemini_client.genai"):
+        return GeminiFileClient(api_key="test-key")
 
 
 @pytest.fixture
@@ -127,33 +127,526 @@ def test_parse_pdf_with_file_uri_handles_pages_dict(gemini_client: GeminiFileCli
     assert result[0].page_number == 2
 
 
-def test_upload_bytes_writes_temp_file_and_calls_upload_file(
+def test_upload_bytes_streams_without_temp_file(
     gemini_client: GeminiFileClient,
     mock_upload_file: MagicMock,
     mock_get_file_active: MagicMock,
 ) -> None:
-    """upload_bytes 應寫入暫存檔後呼叫 upload_file(path=...)，回傳 file URI。"""
+    """upload_bytes 應直接以記憶體串流分塊上傳（不寫暫存檔），回傳 file URI。"""
     data = b"%PDF-1.4 minimal"
-    uri = gemini_client.upload_bytes(data, display_name="test.pdf", mime_type="application/pdf")
+    with patch("tempfile.NamedTemporaryFile") as mock_tmp:
+        uri = gemini_client.upload_bytes(data, display_name="test.pdf", mime_type="application/pdf")
 
-    assert mock_upload_file.called
+    mock_tmp.assert_not_called()
+    stream, size = mock_upload_file.call_args.args
+    assert size == len(data)
     call_kw = mock_upload_file.call_args[1]
     assert call_kw.get("mime_type") == "application/pdf"
-    assert "generativelanguage.googleapis.com" in uri or "files/" in uri
+    assert uri.endswith("files/abc123")
 
 
-def test_parse_response_to_page_blocks_returns_page_blocks(gemini_client: GeminiFileClient) -> None:
-    """_parse_response_to_page_blocks 將 JSON 陣列轉成 PageBlock 列表。"""
-    mock_response = MagicMock()
-    mock_response.text = '[{"page": 1, "elements": [{"type": "image", "content": "", "description": "圖"}, {"type": "text", "content": "內文", "description": ""}]}]'
+def _file_with_state(name: str) -> MagicMock:
+    file_obj = MagicMock()
+    file_obj.state.name = name
+    return file_obj
 
-    result = gemini_client._parse_response_to_page_blocks(mock_response)
 
+def test_upload_bytes_reuses_active_cached_file(mock_upload_file: MagicMock) -> None:
+    """相同內容第二次上傳時，get_file 確認 ACTIVE 即沿用，不再呼叫 upload_file。"""
+    from src.clients.gemini_file_cache import GeminiFileCache
+
+    with patch("src.clients.gemini_client.genai.get_file", return_value=_file_with_state("ACTIVE")):
+        client = GeminiFileClient(api_key="k", file_cache=GeminiFileCache())
+        first = client.upload_bytes(b"%PDF same", display_name="a.pdf")
+        second = client.upload_bytes(b"%PDF same", display_name="b.pdf")
+
+    assert first == second
+    mock_upload_file.assert_called_once()
+
+
+def test_upload_file_and_bytes_share_cache_by_content(mock_upload_file: MagicMock, tmp_path) -> None:
+    """路徑與 bytes 上傳以同一 SHA-256 為 key。"""
+    from src.clients.gemini_file_cache import GeminiFileCache
+
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF shared")
+    with patch("src.clients.gemini_client.genai.get_file", return_value=_file_with_state("ACTIVE")):
+        client = GeminiFileClient(api_key="k", file_cache=GeminiFileCache())
+        client.upload_file(pdf)
+        client.upload_bytes(b"%PDF shared", display_name="a.pdf")
+    mock_upload_file.assert_called_once()
+
+
+def test_cached_file_still_processing_is_awaited_not_reuploaded(mock_upload_file: MagicMock) -> None:
+    """前次請求上傳後等待逾時，重試時應繼續等待同一檔案而非重新上傳。"""
+    from src.clients.gemini_file_cache import GeminiFileCache
+
+    cache = GeminiFileCache()
+    cache.put("d" * 64, "files/old")
+    client = GeminiFileClient(api_key="k", file_cache=cache)
+    states = [_file_with_state("PROCESSING"), _file_with_state("PROCESSING"), _file_with_state("ACTIVE")]
+    with (
+        patch("src.clients.gemini_client.genai.get_file", side_effect=states),
+        patch("src.clients.gemini_client.hashlib.file_digest") as mock_digest,
+        patch("src.clients.file_poller.time.sleep"),
+    ):
+        mock_digest.return_value.hexdigest.return_value = "d" * 64
+        uri = client.upload_bytes(b"%PDF", display_name="a.pdf")
+
+    assert uri.endswith("files/old")
+    mock_upload_file.assert_not_called()
+
+
+def test_expired_cached_file_is_forgotten_and_reuploaded(mock_upload_file: MagicMock) -> None:
+    """get_file 失敗（已過期／被刪除）時移除對應並重新上傳。"""
+    from src.clients.gemini_file_cache import GeminiFileCache
+
+    cache = GeminiFileCache()
+    client = GeminiFileClient(api_key="k", file_cache=cache)
+    with patch("src.clients.gemini_client.genai.get_file", return_value=_file_with_state("ACTIVE")):
+        client.upload_bytes(b"%PDF x", display_name="a.pdf")
+    with patch(
+        "src.clients.gemini_client.genai.get_file",
+        side_effect=[Exception("403 permission denied"), _file_with_state("ACTIVE")],
+    ):
+        client.upload_bytes(b"%PDF x", display_name="a.pdf")
+
+    assert mock_upload_file.call_count == 2
+    assert cache.stats()["invalidated"] == 1
+
+
+def test_interrupted_upload_resumes_session_on_retry(mock_get_file_active: MagicMock) -> None:
+    """上傳中斷後，同一內容的重試應把先前的 session_url 交給上傳器續傳。"""
+    from src.clients.gemini_upload import UploadInterrupted
+
+    uploader = MagicMock()
+    uploader.upload.side_effect = [
+        UploadInterrupted("reset", "https://upload/session-9", 4096),
+        {"name": "files/resumed"},
+    ]
+    client = GeminiFileClient(api_key="k", uploader=uploader)
+    with pytest.raises(ConnectionError):
+        client.upload_bytes(b"%PDF big", display_name="a.pdf")
+    uri = client.upload_bytes(b"%PDF big", display_name="a.pdf")
+
+    assert uri.endswith("files/resumed")
+    assert uploader.upload.call_args_list[0].kwargs["session_url"] is None
+    assert uploader.upload.call_args_list[1].kwargs["session_url"] == "https://upload/session-9"
+
+
+def test_throttled_upload_backs_off_in_limiter_and_resumes_session(mock_get_file_active: MagicMock) -> None:
+    """上傳因 429 中斷（UploadThrottled）時，限流器應記錄限流並重試，重試從同一 session 續傳。"""
+    from src.clients.gemini_upload import UploadThrottled
+    from src.clients.rate_limiter import GeminiRateLimiter
+
+    uploader = MagicMock()
+    uploader.upload.side_effect = [
+        UploadThrottled("HTTP 429", "https://upload/session-7", 0),
+        {"name": "files/after-throttle"},
+    ]
+    limiter = GeminiRateLimiter(sleep=lambda _s: None)
+    client = GeminiFileClient(api_key="k", uploader=uploader, rate_limiter=limiter)
+    uri = client.upload_bytes(b"%PDF throttled", display_name="a.pdf")
+
+    assert uri.endswith("files/after-throttle")
+    assert uploader.upload.call_args_list[1].kwargs["session_url"] == "https://upload/session-7"
+    assert limiter.stats()["throttled"] == 1
+
+
+def test_wait_for_files_waits_on_all_and_returns_uris(gemini_client: GeminiFileClient) -> None:
+    """wait_for_files 以單一輪詢器等待多個檔案，依序回傳 file URI；已 ACTIVE 的檔案不輪詢。"""
+    pending = [
+        PendingFile(name="files/a", size=100, digest="da"),
+        PendingFile(name="files/b", size=200, digest="db"),
+        PendingFile(name="files/c", size=300, digest="dc", active=True),
+    ]
+    with patch("src.clients.gemini_client.genai.get_file", return_value=_file_with_state("ACTIVE")) as get_file:
+        uris = gemini_client.wait_for_files(pending)
+    assert uris == [f"https://generativelanguage.googleapis.com/v1beta/files/{name}" for name in "abc"]
+    assert get_file.call_count == 2
+    assert gemini_client.poll_stats()["<10MB"]["files"] == 2
+
+
+def test_wait_for_files_forgets_only_failed_upload() -> None:
+    """任一檔案 FAILED 時只移除該檔案的內容快取，下次重新上傳。"""
+    from src.clients.gemini_file_cache import GeminiFileCache
+
+    cache = GeminiFileCache()
+    cache.put("da", "files/a")
+    cache.put("db", "files/b")
+    client = GeminiFileClient(api_key="k", file_cache=cache)
+    pending = [PendingFile(name="files/a", size=1, digest="da"), PendingFile(name="files/b", size=1, digest="db")]
+    states = {"files/a": "ACTIVE", "files/b": "FAILED"}
+    with (
+        patch("src.clients.gemini_client.genai.get_file", side_effect=lambda name: _file_with_state(states[name])),
+        pytest.raises(FileProcessingFailed, match="files/b"),
+    ):
+        client.wait_for_files(pending)
+    assert cache.get("da") == "files/a"
+    assert cache.get("db") is None
+
+
+def test_file_states_queries_once_without_waiting() -> None:
+    """file_states 每個檔案只查一次；已 ACTIVE 的不查，FAILED 與查不到的移除內容快取。"""
+    from src.clients.gemini_file_cache import GeminiFileCache
+
+    cache = GeminiFileCache()
+    for digest, name in (("da", "files/a"), ("db", "files/b"), ("dc", "files/c")):
+        cache.put(digest, name)
+    client = GeminiFileClient(api_key="k", file_cache=cache)
+    pending = [
+        PendingFile(name="files/a", size=1, digest="da"),
+        PendingFile(name="files/b", size=1, digest="db"),
+        PendingFile(name="files/c", size=1, digest="dc"),
+        PendingFile(name="files/d", size=1, digest="dd", active=True),
+    ]
+    states = {"files/a": "PROCESSING", "files/b": "FAILED"}
+
+    def get_file(name: str) -> MagicMock:
+        if name not in states:
+            raise RuntimeError("not found")
+        return _file_with_state(states[name])
+
+    with patch("src.clients.gemini_client.genai.get_file", side_effect=get_file) as mock_get:
+        result = client.file_states(pending)
+    assert result == {"files/a": "PROCESSING", "files/b": "FAILED", "files/c": "MISSING", "files/d": "ACTIVE"}
+    assert mock_get.call_count == 3
+    assert cache.get("da") == "files/a"
+    assert cache.get("db") is None and cache.get("dc") is None
+
+
+def _stream_chunks(*texts: str) -> list[MagicMock]:
+    chunks = []
+    for text in texts:
+        chunk = MagicMock()
+        chunk.text = text
+        chunks.append(chunk)
+    return chunks
+
+
+def test_iter_pdf_structured_yields_pages_from_stream(gemini_client: GeminiFileClient) -> None:
+    """串流片段任意切分時，每頁完整即 yield，並以 stream=True 呼叫。"""
+    chunks = _stream_chunks('[{"page": 1, "elements": [{"type": "text", "con', 'tent": "a"}]}, {"pa', 'ge": 2}]')
+    model = MagicMock()
+    model.generate_content.return_value = iter(chunks)
+    with (
+        patch("src.clients.gemini_client.genai.get_file"),
+        patch.object(gemini_client, "_get_structured_model", return_value=model),
+    ):
+        pages = gemini_client.iter_pdf_structured("https://generativelanguage.googleapis.com/v1beta/files/x")
+        first = next(pages)
+        assert first.page == 1
+        assert first.elements[0].content == "a"
+        assert [b.page for b in pages] == [2]
+    assert model.generate_content.call_args.kwargs["stream"] is True
+
+
+def test_parse_pdf_structured_salvages_pages_before_malformed_tail(gemini_client: GeminiFileClient) -> None:
+    """尾端截斷時保留已完整的頁面，而非整份退回單一文字塊。"""
+    chunks = _stream_chunks('[{"page": 1, "elements": []}, {"page": 2, "elements": []}, {"page": 3, "elem')
+    model = MagicMock()
+    model.generate_content.return_value = iter(chunks)
+    with (
+        patch("src.clients.gemini_client.genai.get_file"),
+        patch.object(gemini_client, "_get_structured_model", return_value=model),
+    ):
+        result = gemini_client.parse_pdf_structured("https://generativelanguage.googleapis.com/v1beta/files/x")
+    assert [b.page for b in result] == [1, 2]
+    assert all(b.partial for b in result)
+
+
+def test_parse_pdf_structured_non_json_falls_back_to_text_block(gemini_client: GeminiFileClient) -> None:
+    """完全不是 JSON 陣列的回應仍維持原行為：整段文字作為第 1 頁。"""
+    model = MagicMock()
+    model.generate_content.return_value = iter(_stream_chunks("無法解析", "此文件"))
+    with (
+        patch("src.clients.gemini_client.genai.get_file"),
+        patch.object(gemini_client, "_get_structured_model", return_value=model),
+    ):
+        result = gemini_client.parse_pdf_structured("https://generativelanguage.googleapis.com/v1beta/files/x")
     assert len(result) == 1
-    assert isinstance(result[0], PageBlock)
-    assert result[0].page == 1
-    assert len(result[0].elements) == 2
-    assert result[0].elements[0].type == "image"
-    assert result[0].elements[0].description == "圖"
-    assert result[0].elements[1].type == "text"
-    assert result[0].elements[1].content == "內文"
+    assert result[0].elements[0].content == "無法解析此文件"
+    assert result[0].partial
+
+
+def _schema_client(mock_upload_file: MagicMock, **kwargs) -> GeminiFileClient:
+    with patch("src.clients.gemini_client.genai"):
+        return GeminiFileClient(api_key="test-key", response_schema=True, **kwargs)
+
+
+def test_schema_mode_validates_json_with_response_schema_config(mock_upload_file: MagicMock) -> None:
+    """response_schema 模式以 application/json + schema 呼叫（不串流），回應直接驗證為 PageBlock。"""
+    client = _schema_client(mock_upload_file)
+    model = MagicMock()
+    model.generate_content.return_value = MagicMock(
+        text='[{"page": 1, "elements": [{"type": "text", "content": "a", "description": ""}]}]'
+    )
+    with (
+        patch("src.clients.gemini_client.genai.get_file"),
+        patch.object(client, "_get_structured_model", return_value=model),
+    ):
+        result = client.parse_pdf_structured("https://generativelanguage.googleapis.com/v1beta/files/x")
+    assert result[0].elements[0].content == "a"
+    assert not result[0].partial
+    config = model.generate_content.call_args.kwargs["generation_config"]
+    assert config.response_mime_type == "application/json"
+    assert config.response_schema["items"]["required"] == ["page", "elements"]
+    assert client.schema_stats() == {"calls": 1, "attempts": 1, "malformed": 0, "retries": 0, "salvaged": 0}
+
+
+def test_schema_mode_retries_malformed_then_salvages(mock_upload_file: MagicMock) -> None:
+    """格式錯誤時重新呼叫並計數；重試用盡後搶救已完整的頁面。"""
+    client = _schema_client(mock_upload_file, schema_retries=1)
+    model = MagicMock()
+    model.generate_content.side_effect = [
+        MagicMock(text='[{"page": 1, "elements": []}, {"page": 0'),
+        MagicMock(text='[{"page": 1, "elements": []}, {"page": "x"'),
+    ]
+    with (
+        patch("src.clients.gemini_client.genai.get_file"),
+        patch.object(client, "_get_structured_model", return_value=model),
+    ):
+        result = client.parse_pdf_structured("https://generativelanguage.googleapis.com/v1beta/files/x")
+    assert [b.page for b in result] == [1]
+    assert result[0].partial
+    assert model.generate_content.call_count == 2
+    assert client.schema_stats() == {"calls": 1, "attempts": 2, "malformed": 2, "retries": 1, "salvaged": 1}
+
+
+def test_schema_mode_changes_prompt_version(mock_upload_file: MagicMock, gemini_client: GeminiFileClient) -> None:
+    """開啟 response_schema 時 prompt_version 不同，結果快取不與一般模式混用。"""
+    assert _schema_client(mock_upload_file).prompt_version != gemini_client.prompt_version
+
+
+def test_context_cache_changes_prompt_version(mock_upload_file: MagicMock, gemini_client: GeminiFileClient) -> None:
+    """啟用 context cache 時規則改放 user prompt，prompt_version 不同，結果快取不與非快取模式混用。"""
+    from src.clients.context_cache import GeminiContextCache
+
+    cached = GeminiFileClient(api_key="k", context_cache=GeminiContextCache("gemini-2.5-flash"))
+    assert cached.prompt_version != gemini_client.prompt_version
+
+
+def test_cached_context_replaces_file_in_structured_request(gemini_client: GeminiFileClient) -> None:
+    """有 CachedContent 時改用快取 model，contents 不再附上 File，結構化規則併入 user prompt。"""
+    cached_model = MagicMock()
+    cached_model.generate_content.return_value = iter(_stream_chunks('[{"page": 1, "elements": []}]'))
+    context_cache = MagicMock()
+    context_cache.model_for.return_value = cached_model
+    gemini_client._context_cache = context_cache
+    with patch("src.clients.gemini_client.genai.get_file"):
+        result = gemini_client.parse_pdf_structured("https://generativelanguage.googleapis.com/v1beta/files/x")
+    assert [b.page for b in result] == [1]
+    contents = cached_model.generate_content.call_args.args[0]
+    assert len(contents) == 1 and "page" in contents[0]
+
+
+def test_structured_request_falls_back_without_cache(gemini_client: GeminiFileClient) -> None:
+    context_cache = MagicMock()
+    context_cache.model_for.return_value = None
+    gemini_client._context_cache = context_cache
+    file_obj = MagicMock()
+    with patch.object(gemini_client, "_get_structured_model", return_value="structured") as get_model:
+        model, contents = gemini_client.structured_request(file_obj)
+    assert model == "structured"
+    assert contents[-1] is file_obj
+    get_model.assert_called_once()
+
+
+def test_ask_document_reuses_cached_context(gemini_client: GeminiFileClient) -> None:
+    """後續提問只送問題文字，PDF 由 CachedContent 提供。"""
+    cached_model = MagicMock()
+    cached_model.generate_content.return_value = MagicMock(text=" 答案 ")
+    context_cache = MagicMock()
+    context_cache.model_for.return_value = cached_model
+    context_cache.stats.return_value = {"hits": 1}
+    gemini_client._context_cache = context_cache
+    with patch("src.clients.gemini_client.genai.get_file"):
+        answer = gemini_client.ask_document("https://generativelanguage.googleapis.com/v1beta/files/x", "價格？")
+    assert answer == "答案"
+    cached_model.generate_content.assert_called_once_with(["價格？"])
+    assert gemini_client.context_cache_stats() == {"hits": 1}
+
+
+def test_context_cache_stats_empty_when_disabled(gemini_client: GeminiFileClient) -> None:
+    assert gemini_client.context_cache_stats() == {}
+
+
+def _truncated_chunks(*texts: str) -> list[MagicMock]:
+    """最後一個片段帶 finish_reason=MAX_TOKENS。"""
+    chunks = _stream_chunks(*texts)
+    chunks[-1].candidates[0].finish_reason.name = "MAX_TOKENS"
+    return chunks
+
+
+def test_truncated_output_continues_after_last_complete_page(gemini_client: GeminiFileClient) -> None:
+    """MAX_TOKENS 截斷時保留完整頁面，只請求其後的頁面；接續回應中的重複頁面略過。"""
+    model = MagicMock()
+    model.generate_content.side_effect = [
+        iter(_truncated_chunks('[{"page": 1, "elements": []}, {"page": 2, "elements": []}, {"page": 3, "ele')),
+        iter(_truncated_chunks('[{"page": 2, "elements": []}, {"page": 3, "elements": []}, {"pa')),
+        iter(_stream_chunks('[{"page": 4, "elements": []}]')),
+    ]
+    with (
+        patch("src.clients.gemini_client.genai.get_file"),
+        patch.object(gemini_client, "_get_structured_model", return_value=model),
+    ):
+        result = gemini_client.parse_pdf_structured("https://generativelanguage.googleapis.com/v1beta/files/x")
+    assert [b.page for b in result] == [1, 2, 3, 4]
+    assert not any(b.partial for b in result)
+    prompts = [c.args[0][-1] for c in model.generate_content.call_args_list]
+    assert "第 3 頁（含）之後" in prompts[1] and "第 4 頁（含）之後" in prompts[2]
+    assert gemini_client.continuation_stats() == {"truncated": 2, "continuations": 2, "incomplete": 0}
+
+
+def test_truncation_without_progress_stops(gemini_client: GeminiFileClient) -> None:
+    model = MagicMock()
+    model.generate_content.side_effect = [
+        iter(_truncated_chunks('[{"page": 1, "elements": []}, {"pa')),
+        iter(_truncated_chunks('[{"page": 1, "elements": []}, {"pa')),
+    ]
+    with (
+        patch("src.clients.gemini_client.genai.get_file"),
+        patch.object(gemini_client, "_get_structured_model", return_value=model),
+    ):
+        result = gemini_client.parse_pdf_structured("https://generativelanguage.googleapis.com/v1beta/files/x")
+    assert [b.page for b in result] == [1]
+    assert result[0].partial
+    assert model.generate_content.call_count == 2
+    assert gemini_client.continuation_stats()["incomplete"] == 1
+
+
+def test_schema_mode_truncation_salvages_and_continues(mock_upload_file: MagicMock) -> None:
+    """response_schema 模式截斷時不重試同一請求，直接搶救完整頁面並接續。"""
+    client = _schema_client(mock_upload_file)
+    truncated = MagicMock(text='[{"page": 1, "elements": []}, {"page": 2, "elem')
+    truncated.candidates[0].finish_reason.name = "MAX_TOKENS"
+    model = MagicMock()
+    model.generate_content.side_effect = [truncated, MagicMock(text='[{"page": 2, "elements": []}]')]
+    with (
+        patch("src.clients.gemini_client.genai.get_file"),
+        patch.object(client, "_get_structured_model", return_value=model),
+    ):
+        result = client.parse_pdf_structured("https://generativelanguage.googleapis.com/v1beta/files/x")
+    assert [b.page for b in result] == [1, 2]
+    assert not any(b.partial for b in result)
+    assert client.schema_stats()["malformed"] == 0
+
+
+def test_structured_batch_request_matches_interactive_prompt(mock_upload_file: MagicMock) -> None:
+    """Batch 請求使用相同的 System Instruction、prompt 與 File；schema 模式帶入大寫 type 的 REST schema。"""
+    from src.clients.gemini_client import STRUCTURED_PROMPT, STRUCTURED_SYSTEM_INSTRUCTION
+
+    uri = "https://generativelanguage.googleapis.com/v1beta/files/x"
+    request = _schema_client(mock_upload_file).structured_batch_request(uri)
+    assert request["system_instruction"]["parts"][0]["text"] == STRUCTURED_SYSTEM_INSTRUCTION
+    parts = request["contents"][0]["parts"]
+    assert parts[0]["text"] == STRUCTURED_PROMPT
+    assert parts[1]["file_data"]["file_uri"] == uri
+    assert request["generation_config"]["response_schema"]["type"] == "ARRAY"
+
+
+def test_parse_batch_output_salvages_pages(gemini_client: GeminiFileClient) -> None:
+    blocks = gemini_client.parse_batch_output('[{"page": 1, "elements": []}, {"page": 2, "ele')
+    assert [b.page for b in blocks] == [1]
+    assert blocks[0].partial
+
+
+def test_parse_batch_output_complete_is_not_partial(gemini_client: GeminiFileClient) -> None:
+    blocks = gemini_client.parse_batch_output('[{"page": 1, "elements": []}, {"page": 2, "elements": []}]')
+    assert [b.page for b in blocks] == [1, 2]
+    assert not any(b.partial for b in blocks)
+    assert "partial" not in blocks[0].model_dump()
+
+
+def test_generate_content_routed_through_hedger(mock_upload_file: MagicMock) -> None:
+    """有 hedger 時 generate_content 經 hedger 呼叫（內層仍為限流器）。"""
+    hedger = MagicMock()
+    hedger.call.side_effect = lambda fn, *args, **kwargs: fn(*args, **kwargs)
+    hedger.stats.return_value = {"hedged": 0}
+    with patch("src.clients.gemini_client.genai"):
+        client = GeminiFileClient(api_key="test-key", hedger=hedger)
+    model = MagicMock()
+    model.generate_content.return_value = MagicMock(text="答案")
+    with (
+        patch("src.clients.gemini_client.genai.get_file"),
+        patch.object(client, "_document_request", return_value=(model, ["q"])),
+    ):
+        assert client.ask_document("https://generativelanguage.googleapis.com/v1beta/files/x", "q") == "答案"
+    assert hedger.call.call_args.args[:2] == (client.rate_limiter.call, model.generate_content)
+    assert client.hedge_stats() == {"hedged": 0}
+
+
+def test_gs_uri_parsed_through_vertex_backend(mock_upload_file: MagicMock) -> None:
+    """gs:// URI 交由 Vertex 後端建立模型與檔案 Part，不呼叫 get_file。"""
+    vertex = MagicMock()
+    vertex.accepts.return_value = True
+    model = vertex.model.return_value
+    model.generate_content.return_value = iter(_stream_chunks('[{"page": 1, "elements": []}]'))
+    with patch("src.clients.gemini_client.genai") as mock_genai:
+        client = GeminiFileClient(api_key="test-key", vertex=vertex)
+        result = client.parse_pdf_structured("gs://bucket/doc.pdf", size_bytes=4096)
+    assert [b.page for b in result] == [1]
+    mock_genai.get_file.assert_not_called()
+    vertex.file_part.assert_called_once_with("gs://bucket/doc.pdf")
+    assert model.generate_content.call_args.args[0][-1] is vertex.file_part.return_value
+    assert client.reads_gcs_uri(4096)
+
+
+def test_gs_uri_without_vertex_backend_raises(gemini_client: GeminiFileClient) -> None:
+    assert not gemini_client.reads_gcs_uri(1)
+    with pytest.raises(ValueError):
+        gemini_client.parse_pdf_structured("gs://bucket/doc.pdf")
+
+
+def test_inline_bytes_matches_file_api_output(gemini_client: GeminiFileClient) -> None:
+    """inline bytes 與 File API 路徑使用相同的 prompt 與解析規則，輸出的 PageBlock 一致。"""
+    text = '[{"page": 1, "elements": [{"type": "text", "content": "hi", "description": ""}]}, {"page": 2, "ele'
+    model = MagicMock()
+    model.generate_content.side_effect = lambda *args, **kwargs: iter(_stream_chunks(text))
+    with (
+        patch("src.clients.gemini_client.genai.get_file"),
+        patch.object(gemini_client, "_get_structured_model", return_value=model),
+    ):
+        via_file = gemini_client.parse_pdf_structured("https://generativelanguage.googleapis.com/v1beta/files/x")
+        inline = gemini_client.parse_pdf_bytes(b"%PDF-1.4 small")
+    assert inline == via_file
+    contents = model.generate_content.call_args.args[0]
+    assert contents[-1] == {"mime_type": "application/pdf", "data": b"%PDF-1.4 small"}
+
+
+def test_inline_bytes_rejects_oversized_pdf(gemini_client: GeminiFileClient) -> None:
+    with patch("src.clients.gemini_client.MAX_INLINE_BYTES", 4):
+        with pytest.raises(ValueError):
+            gemini_client.inline_structured_call(b"12345")
+
+
+def test_compact_output_expands_to_standard_page_blocks(mock_upload_file: MagicMock) -> None:
+    """精簡格式的串流輸出展開後與標準格式相同；圖片 content 留空待填入。"""
+    with patch("src.clients.gemini_client.genai"):
+        compact = GeminiFileClient(api_key="test-key", output_format="compact")
+        standard = GeminiFileClient(api_key="test-key")
+    model = MagicMock()
+    model.generate_content.return_value = iter(
+        _stream_chunks('[[1, ["i", "紅色椅子"], ["t", "型號 A-1', '00"]], [2, ["t", "規格"], ["x"]], ["bad"], [3')
+    )
+    with patch.object(compact, "_get_structured_model", return_value=model):
+        result = compact.parse_pdf_bytes(b"%PDF")
+    expected = standard.parse_batch_output(
+        '[{"page": 1, "elements": [{"type": "image", "content": "", "description": "紅色椅子"},'
+        ' {"type": "text", "content": "型號 A-100", "description": ""}]},'
+        ' {"page": 2, "elements": [{"type": "text", "content": "規格", "description": ""}]}]'
+    )
+    assert [b.model_dump() for b in result] == [b.model_dump() for b in expected]
+    # 串流以未完成的第 3 頁結束：輸出不完整，頁面標記 partial（不寫入結果快取）
+    assert all(b.partial for b in result) and not any(b.partial for b in expected)
+    assert "精簡陣列" in model.generate_content.call_args.args[0][0]
+    assert compact.prompt_version != standard.prompt_version
+
+
+def test_compact_output_ignored_in_schema_mode(mock_upload_file: MagicMock) -> None:
+    with patch("src.clients.gemini_client.genai"):
+        schema_client = GeminiFileClient(api_key="test-key", response_schema=True, output_format="compact")
+        standard = GeminiFileClient(api_key="test-key", response_schema=True)
+        assert schema_client.prompt_version == standard.prompt_version
+        with pytest.raises(ValueError):
+            GeminiFileClient(api_key="test-key", output_format="yaml")
@@ -0,0 +1,62 @@
+"""GeminiFileCache 單元測試：記憶體命中、GCS 持久化、TTL 過期與失效移除。"""
+
+import json
+import time
+
+from unittest.mock import MagicMock
+
+from src.clients.gemini_file_cache import GeminiFileCache
+
+
+def test_put_then_get_in_memory() -> None:
+    cache = GeminiFileCache()
+    cache.put("abc", "files/1")
+    assert cache.get("abc") == "files/1"
+    assert cache.get("other") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "invalidated": 0}
+
+
+def test_expired_entry_is_miss() -> None:
+    cache = GeminiFileCache(ttl_seconds=-1)
+    cache.put("abc", "files/1")
+    assert cache.get("abc") is None
+
+
+def test_put_persists_to_store_and_new_instance_reads_it() -> None:
+    """寫入 GCS 後，另一個 instance（新的快取物件）可讀回同一檔名。"""
+    store = MagicMock()
+    GeminiFileCache(store=store).put("abc", "files/1")
+    path, payload = store.upload_bytes.call_args.args[:2]
+    assert path == "gemini-files/abc.json"
+
+    store.read_blob_bytes_or_none.return_value = payload
+    assert GeminiFileCache(store=store).get("abc") == "files/1"
+
+
+def test_expired_persisted_entry_is_miss() -> None:
+    store = MagicMock()
+    store.read_blob_bytes_or_none.return_value = json.dumps(
+        {"name": "files/1", "expires_at": int(time.time()) - 10}
+    ).encode()
+    assert GeminiFileCache(store=store).get("abc") is None
+
+
+def test_store_errors_are_treated_as_miss() -> None:
+    store = MagicMock()
+    store.read_blob_bytes_or_none.side_effect = RuntimeError("gcs down")
+    store.upload_bytes.side_effect = RuntimeError("gcs down")
+    cache = GeminiFileCache(store=store)
+    assert cache.get("abc") is None
+    cache.put("abc", "files/1")
+    assert cache.get("abc") == "files/1"
+
+
+def test_forget_removes_memory_and_store_entry() -> None:
+    store = MagicMock()
+    store.read_blob_bytes_or_none.return_value = None
+    cache = GeminiFileCache(store=store)
+    cache.put("abc", "files/1")
+    cache.forget("abc")
+    assert cache.get("abc") is None
+    store.delete_blob.assert_called_once_with("gemini-files/abc.json")
+    assert cache.stats()["invalidated"] == 1
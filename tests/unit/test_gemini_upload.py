@@ -0,0 +1,187 @@
+"""ResumableUploader 單元測試：分塊、finalize、中斷後查詢 offset 續傳、start 失敗重試、429 對應、session 失效與統計。"""
+
+import io
+
+import pytest
+import requests
+from google.api_core import exceptions as google_exceptions
+from unittest.mock import MagicMock
+
+from src.clients.gemini_upload import CHUNK_GRANULARITY, ResumableUploader, UploadInterrupted, UploadThrottled
+
+SESSION_URL = "https://upload.example/session-1"
+
+
+def _resp(status: int = 200, headers: dict | None = None, body: dict | None = None) -> MagicMock:
+    r = MagicMock()
+    r.status_code = status
+    r.headers = headers or {}
+    r.json.return_value = body or {}
+    r.text = ""
+    return r
+
+
+class FakeUploadServer:
+    """模擬 File API resumable 端點：記錄收到的位元組，可指定某些 upload 請求失敗。"""
+
+    def __init__(
+        self,
+        fail_uploads: set[int] | None = None,
+        lose_session: bool = False,
+        start_statuses: list[int] | None = None,
+        upload_status: int | None = None,
+    ) -> None:
+        self.received = bytearray()
+        self.calls: list[dict] = []
+        self._fail_uploads = fail_uploads or set()
+        self._start_statuses = list(start_statuses or [])
+        self._upload_status = upload_status
+        self._upload_count = 0
+        self._lose_session = lose_session
+
+    def post(self, url: str, timeout: float, **kwargs) -> MagicMock:
+        headers = kwargs.get("headers", {})
+        command = headers.get("X-Goog-Upload-Command")
+        self.calls.append({"url": url, "command": command, "offset": headers.get("X-Goog-Upload-Offset")})
+        if command == "start":
+            if self._start_statuses:
+                return _resp(status=self._start_statuses.pop(0))
+            return _resp(headers={"X-Goog-Upload-URL": SESSION_URL})
+        if command == "query":
+            if self._lose_session:
+                return _resp(status=404)
+            return _resp(headers={
+                "X-Goog-Upload-Status": "active",
+                "X-Goog-Upload-Size-Received": str(len(self.received)),
+            })
+        self._upload_count += 1
+        if self._upload_count in self._fail_uploads:
+            if self._upload_status is not None:
+                return _resp(status=self._upload_status)
+            raise requests.ConnectionError("connection reset")
+        assert int(headers["X-Goog-Upload-Offset"]) == len(self.received)
+        self.received.extend(kwargs["data"])
+        if "finalize" in command:
+            return _resp(body={"file": {"name": "files/done", "sizeBytes": str(len(self.received))}})
+        return _resp()
+
+
+def _uploader(server: FakeUploadServer, max_resumes: int = 3) -> ResumableUploader:
+    session = MagicMock()
+    session.post.side_effect = server.post
+    return ResumableUploader(
+        "key", chunk_size=CHUNK_GRANULARITY, max_resumes=max_resumes, session=session, retry_backoff=0.0
+    )
+
+
+def test_chunk_size_must_be_multiple_of_granularity() -> None:
+    with pytest.raises(ValueError):
+        ResumableUploader("key", chunk_size=1000)
+
+
+def test_uploads_in_chunks_and_finalizes_last() -> None:
+    payload = bytes(range(256)) * (CHUNK_GRANULARITY * 2 // 256) + b"tail"
+    server = FakeUploadServer()
+    resource = _uploader(server).upload(io.BytesIO(payload), len(payload), display_name="a.pdf")
+
+    assert resource["name"] == "files/done"
+    assert bytes(server.received) == payload
+    commands = [c["command"] for c in server.calls]
+    assert commands == ["start", "upload", "upload", "upload, finalize"]
+
+
+def test_interrupted_chunk_resumes_from_acknowledged_offset() -> None:
+    """第二塊失敗時應 query 已確認 offset 並從該處續傳，不重傳第一塊。"""
+    payload = b"x" * (CHUNK_GRANULARITY * 3)
+    server = FakeUploadServer(fail_uploads={2})
+    uploader = _uploader(server)
+    uploader.upload(io.BytesIO(payload), len(payload))
+
+    assert bytes(server.received) == payload
+    assert "query" in [c["command"] for c in server.calls]
+    assert [c["command"] for c in server.calls].count("start") == 1
+    assert uploader.stats()["resumes"] == 1
+
+
+def test_exhausted_resumes_raise_with_session_for_later_resume() -> None:
+    """本次呼叫續傳次數用完時拋 UploadInterrupted，帶 session_url 與 offset。"""
+    payload = b"x" * (CHUNK_GRANULARITY * 2)
+    server = FakeUploadServer(fail_uploads={2, 3})
+    with pytest.raises(UploadInterrupted) as exc_info:
+        _uploader(server, max_resumes=1).upload(io.BytesIO(payload), len(payload))
+    assert exc_info.value.session_url == SESSION_URL
+    assert exc_info.value.offset == CHUNK_GRANULARITY
+    assert isinstance(exc_info.value, ConnectionError)
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_transient_status_on_start_is_retried(status: int) -> None:
+    """開啟 session 遇到 429／5xx 時應在同一個重試迴圈內重試，不直接失敗。"""
+    payload = b"s" * 10
+    server = FakeUploadServer(start_statuses=[status])
+    resource = _uploader(server).upload(io.BytesIO(payload), len(payload))
+
+    assert resource["name"] == "files/done"
+    assert [c["command"] for c in server.calls].count("start") == 2
+
+
+def test_persistent_429_on_start_raises_too_many_requests() -> None:
+    """start 持續 429 時拋 UploadThrottled：是 TooManyRequests（限流器可見）也是可重試的 ConnectionError。"""
+    server = FakeUploadServer(start_statuses=[429, 429])
+    with pytest.raises(UploadThrottled) as exc_info:
+        _uploader(server, max_resumes=1).upload(io.BytesIO(b"abc"), 3)
+    assert isinstance(exc_info.value, google_exceptions.TooManyRequests)
+    assert isinstance(exc_info.value, ConnectionError)
+    assert exc_info.value.session_url is None
+
+
+def test_5xx_on_chunk_resumes_and_exhaustion_is_connection_error() -> None:
+    payload = b"x" * (CHUNK_GRANULARITY * 2)
+    server = FakeUploadServer(fail_uploads={2, 3}, upload_status=503)
+    with pytest.raises(UploadInterrupted) as exc_info:
+        _uploader(server, max_resumes=1).upload(io.BytesIO(payload), len(payload))
+    assert not isinstance(exc_info.value, google_exceptions.TooManyRequests)
+    assert exc_info.value.session_url == SESSION_URL
+
+
+def test_upload_with_existing_session_continues_without_restart() -> None:
+    """傳入先前的 session_url 時從已確認 offset 續傳，不重新 start。"""
+    payload = b"y" * (CHUNK_GRANULARITY * 2)
+    server = FakeUploadServer()
+    server.received.extend(payload[:CHUNK_GRANULARITY])
+    uploader = _uploader(server)
+    uploader.upload(io.BytesIO(payload), len(payload), session_url=SESSION_URL)
+
+    assert bytes(server.received) == payload
+    assert "start" not in [c["command"] for c in server.calls]
+    stats = uploader.stats()
+    assert stats["resumes"] == 1
+    assert stats["bytes"] == CHUNK_GRANULARITY
+
+
+def test_lost_session_restarts_from_zero() -> None:
+    payload = b"z" * 10
+    server = FakeUploadServer(lose_session=True)
+    uploader = _uploader(server)
+    uploader.upload(io.BytesIO(payload), len(payload), session_url="https://upload.example/expired")
+
+    assert bytes(server.received) == payload
+    assert uploader.stats()["restarts"] == 1
+
+
+def test_client_error_is_not_resumed() -> None:
+    session = MagicMock()
+    session.post.side_effect = [_resp(headers={"X-Goog-Upload-URL": SESSION_URL}), _resp(status=400)]
+    uploader = ResumableUploader("key", chunk_size=CHUNK_GRANULARITY, session=session)
+    with pytest.raises(RuntimeError, match="HTTP 400"):
+        uploader.upload(io.BytesIO(b"abc"), 3)
+
+
+def test_stats_report_throughput() -> None:
+    payload = b"p" * 1000
+    uploader = _uploader(FakeUploadServer())
+    uploader.upload(io.BytesIO(payload), len(payload))
+    stats = uploader.stats()
+    assert stats["uploads"] == 1
+    assert stats["bytes"] == 1000
+    assert stats["throughput_mbps"] >= 0.0
@@ -0,0 +1,210 @@
+"""HedgedCaller 單元測試：逾時送出對沖、取先完成者、對沖比例上限、串流與 asyncio 版本。"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.clients.hedging import KIND_CALL, KIND_STREAM, HedgedCaller
+
+
+def _caller(**kwargs) -> HedgedCaller:
+    """樣本不足時以 initial_delay 等待；測試以極短的等待時間觸發對沖。"""
+    kwargs.setdefault("initial_delay", 0.05)
+    kwargs.setdefault("max_hedge_ratio", 1.0)
+    return HedgedCaller(**kwargs)
+
+
+def test_fast_call_is_not_hedged() -> None:
+    calls = []
+    hedger = _caller()
+    assert hedger.call(lambda x: calls.append(x) or x * 2, 21) == 42
+    assert calls == [21]
+    stats = hedger.stats()
+    assert stats["calls"] == 1 and stats["hedged"] == 0 and stats["won"] == 0
+
+
+def test_slow_primary_is_hedged_and_secondary_wins() -> None:
+    """第一個呼叫卡住時送出第二個相同呼叫，回傳先完成者並記錄 won。"""
+    release = threading.Event()
+    attempts = []
+
+    def fn() -> str:
+        attempts.append(1)
+        if len(attempts) == 1:
+            release.wait(5)
+            return "primary"
+        return "secondary"
+
+    hedger = _caller()
+    try:
+        assert hedger.call(fn) == "secondary"
+    finally:
+        release.set()
+    stats = hedger.stats()
+    assert len(attempts) == 2
+    assert stats["hedged"] == 1 and stats["won"] == 1 and stats["hedge_rate"] == 1.0
+
+
+def test_hedge_ratio_cap() -> None:
+    """超過 max_hedge_ratio 時不再對沖，只等待第一個呼叫。"""
+    hedger = _caller(max_hedge_ratio=0.5)
+    for _ in range(4):
+        hedger.call(time.sleep, 0.1)
+    stats = hedger.stats()
+    assert stats["calls"] == 4
+    assert stats["hedged"] == 2
+
+
+def test_failed_hedge_falls_back_to_primary() -> None:
+    """對沖呼叫失敗時等待第一個呼叫的結果。"""
+    attempts = []
+
+    def fn() -> str:
+        attempts.append(1)
+        if len(attempts) == 1:
+            time.sleep(0.2)
+            return "primary"
+        raise RuntimeError("boom")
+
+    hedger = _caller()
+    assert hedger.call(fn) == "primary"
+    assert hedger.stats()["won"] == 0
+
+
+def test_both_failing_raises_primary_error() -> None:
+    attempts = []
+
+    def fn() -> None:
+        attempts.append(1)
+        if len(attempts) == 1:
+            time.sleep(0.2)
+            raise ValueError("primary")
+        raise RuntimeError("secondary")
+
+    with pytest.raises(ValueError, match="primary"):
+        _caller().call(fn)
+
+
+def test_hedge_delay_uses_latency_percentile() -> None:
+    now = [0.0]
+    hedger = HedgedCaller(percentile=0.9, min_samples=10, initial_delay=30.0, clock=lambda: now[0])
+    assert hedger.hedge_delay() == 30.0
+    for latency in range(1, 11):
+        hedger._record(KIND_CALL, start=now[0] - latency)
+    assert hedger.hedge_delay() == 10.0
+
+
+def test_call_and_stream_keep_separate_latency_windows() -> None:
+    """非串流的完整延遲與串流的第一個片段延遲分開統計，各自決定對沖等待時間。"""
+    now = [0.0]
+    hedger = HedgedCaller(percentile=0.5, min_samples=3, initial_delay=30.0, clock=lambda: now[0])
+
+    def unary(seconds: float) -> str:
+        now[0] += seconds
+        return "done"
+
+    def chunks(seconds: float):
+        now[0] += seconds
+        yield "first"
+        now[0] += 100.0  # 第一個片段之後的時間不計入
+        yield "rest"
+
+    for seconds in (8.0, 10.0, 12.0):
+        assert hedger.call(unary, seconds) == "done"
+    assert hedger.hedge_delay(KIND_CALL) == 10.0
+    assert hedger.hedge_delay(KIND_STREAM) == 30.0  # 串流尚無樣本，不受非串流延遲影響
+
+    for seconds in (1.0, 2.0, 3.0):
+        assert list(hedger.stream(chunks, seconds)) == ["first", "rest"]
+    assert hedger.hedge_delay(KIND_STREAM) == 2.0
+    assert hedger.hedge_delay(KIND_CALL) == 10.0
+    stats = hedger.stats()
+    assert stats["delay"] == 10.0 and stats["stream_delay"] == 2.0 and stats["calls"] == 6
+
+
+def test_percentile_must_be_fraction() -> None:
+    with pytest.raises(ValueError):
+        HedgedCaller(percentile=95)
+
+
+def test_stream_hedges_on_first_chunk_and_closes_loser() -> None:
+    """串流以第一個片段為準；落敗的串流在其第一個片段到達後關閉。"""
+    release = threading.Event()
+    closed = threading.Event()
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) == 1:
+            try:
+                release.wait(5)
+                yield "slow"
+                yield "slow-2"
+            finally:
+                closed.set()
+        else:
+            yield "a"
+            yield "b"
+
+    hedger = _caller()
+    assert list(hedger.stream(fn)) == ["a", "b"]
+    release.set()
+    assert closed.wait(2)
+    assert hedger.stats()["won"] == 1
+
+
+def test_empty_stream() -> None:
+    assert list(_caller().stream(lambda: iter([]))) == []
+
+
+def test_call_async_cancels_losing_task() -> None:
+    cancelled = []
+
+    async def run() -> str:
+        attempts = []
+
+        async def fn() -> str:
+            attempts.append(1)
+            if len(attempts) == 1:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+                return "primary"
+            return "secondary"
+
+        hedger = _caller()
+        result = await hedger.call_async(fn)
+        await asyncio.sleep(0)
+        assert hedger.stats()["won"] == 1
+        return result
+
+    assert asyncio.run(run()) == "secondary"
+    assert cancelled == [True]
+
+
+def test_astream_hedges_on_first_chunk() -> None:
+    async def run() -> list[str]:
+        attempts = []
+
+        async def fn():
+            attempts.append(1)
+            slow = len(attempts) == 1
+
+            async def chunks():
+                if slow:
+                    await asyncio.sleep(5)
+                yield "a"
+                yield "b"
+
+            return chunks()
+
+        hedger = _caller()
+        items = [item async for item in hedger.astream(fn)]
+        assert hedger.stats()["hedged"] == 1
+        return items
+
+    assert asyncio.run(run()) == ["a", "b"]
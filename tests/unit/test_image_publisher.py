@@ -0,0 +1,70 @@
+"""ImagePublisher 單元測試：內容雜湊命名、略過已存在物件、URL 形式、順序保持。"""
+
+import hashlib
+
+import pytest
+from unittest.mock import MagicMock
+
+from src.clients.gcs_client import GCSClient
+from src.services.image_publisher import ImagePublisher
+
+
+@pytest.fixture
+def mock_gcs() -> MagicMock:
+    gcs = MagicMock(spec=GCSClient)
+    gcs.upload_bytes_if_absent.return_value = True
+    gcs.get_public_url.side_effect = lambda p: f"https://storage.googleapis.com/b/{p}"
+    gcs.get_blob_uri.side_effect = lambda p: f"gs://b/{p}"
+    return gcs
+
+
+def test_publish_returns_hash_named_urls_in_order(mock_gcs: MagicMock) -> None:
+    """每頁回傳順序與輸入一致，URL 以內容 sha256 命名。"""
+    images = {0: [(b"img-a", "image/png"), (b"img-b", "image/jpeg")], 2: [(b"img-c", "image/png")]}
+    result = ImagePublisher(mock_gcs, prefix="imgs/", url_style="https", public_bucket=True).publish(images)
+
+    sha_a = hashlib.sha256(b"img-a").hexdigest()
+    sha_b = hashlib.sha256(b"img-b").hexdigest()
+    assert result[0] == [
+        (f"https://storage.googleapis.com/b/imgs/{sha_a}.png", "image/png"),
+        (f"https://storage.googleapis.com/b/imgs/{sha_b}.jpg", "image/jpeg"),
+    ]
+    assert len(result[2]) == 1
+    assert mock_gcs.upload_bytes_if_absent.call_count == 3
+
+
+def test_publish_dedupes_repeated_images(mock_gcs: MagicMock) -> None:
+    """同一份文件內重複的圖片（如每頁 logo）只上傳一次，但每頁都拿到 URL。"""
+    logo = (b"logo", "image/png")
+    result = ImagePublisher(mock_gcs).publish({0: [logo], 1: [logo], 2: [logo]})
+    mock_gcs.upload_bytes_if_absent.assert_called_once()
+    assert result[0] == result[1] == result[2]
+
+
+def test_publish_defaults_to_gs_url_style(mock_gcs: MagicMock) -> None:
+    """預設回傳 gs:// URI，不依賴 bucket 公開讀取。"""
+    result = ImagePublisher(mock_gcs).publish({0: [(b"x", "image/png")]})
+    assert result[0][0][0].startswith("gs://b/parsed-images/")
+    mock_gcs.get_public_url.assert_not_called()
+
+
+def test_invalid_url_style_raises(mock_gcs: MagicMock) -> None:
+    with pytest.raises(ValueError, match="url_style"):
+        ImagePublisher(mock_gcs, url_style="ftp")
+
+
+def test_https_url_style_requires_public_bucket(mock_gcs: MagicMock) -> None:
+    """私有 bucket 的 https URL 無法讀取，未明確設為公開時拒絕。"""
+    with pytest.raises(ValueError, match="public"):
+        ImagePublisher(mock_gcs, url_style="https")
+
+
+def test_publish_empty_does_nothing(mock_gcs: MagicMock) -> None:
+    assert ImagePublisher(mock_gcs).publish({}) == {}
+    mock_gcs.upload_bytes_if_absent.assert_not_called()
+
+
+def test_url_base_reflects_bucket_prefix_and_style(mock_gcs: MagicMock) -> None:
+    assert ImagePublisher(mock_gcs, prefix="imgs/").url_base == "gs://b/imgs/"
+    https = ImagePublisher(mock_gcs, prefix="imgs/", url_style="https", public_bucket=True)
+    assert https.url_base == "https://storage.googleapis.com/b/imgs/"
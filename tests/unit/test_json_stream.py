@@ -0,0 +1,68 @@
+"""JsonArrayStreamParser 單元測試：任意切分、字串內括號、程式碼區塊包裝、尾端截斷與格式錯誤元素。"""
+
+import json
+
+import pytest
+
+from src.clients.json_stream import JsonArrayStreamParser
+
+PAGES = [
+    {"page": 1, "elements": [{"type": "text", "content": "含 } 與 ] 的 \"字串\" \\\\", "description": ""}]},
+    {"page": 2, "elements": [{"type": "image", "content": "", "description": "[圖]"}]},
+    {"page": 3, "elements": []},
+]
+
+
+def _feed_all(parser: JsonArrayStreamParser, text: str, size: int) -> list:
+    items: list = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 17, 10_000])
+def test_emits_each_element_regardless_of_chunking(chunk_size: int) -> None:
+    text = json.dumps(PAGES, ensure_ascii=False)
+    parser = JsonArrayStreamParser()
+    assert _feed_all(parser, text, chunk_size) == PAGES
+    assert parser.finished
+    assert parser.remainder == ""
+
+
+def test_element_emitted_as_soon_as_complete() -> None:
+    """第一頁物件結束時即交出，不等整個陣列。"""
+    parser = JsonArrayStreamParser()
+    first = json.dumps(PAGES[0], ensure_ascii=False)
+    assert parser.feed("[" + first[:-1]) == []
+    assert parser.feed(first[-1] + ', {"page": 2') == [PAGES[0]]
+
+
+def test_markdown_fence_and_preamble_are_skipped() -> None:
+    text = "以下是結果：\n```json\n" + json.dumps(PAGES[:2], ensure_ascii=False) + "\n```"
+    assert JsonArrayStreamParser().feed(text) == PAGES[:2]
+
+
+def test_truncated_tail_keeps_complete_elements() -> None:
+    text = json.dumps(PAGES, ensure_ascii=False)
+    cut = text[: text.index('{"page": 3') + 5]
+    parser = JsonArrayStreamParser()
+    assert parser.feed(cut) == PAGES[:2]
+    assert not parser.finished
+    assert parser.remainder.startswith('{"pag')
+
+
+def test_malformed_element_is_skipped_and_parsing_continues() -> None:
+    text = '[{"page": 1, "elements": []}, {"page": 2, "elements": [,]}, {"page": 3, "elements": []}]'
+    parser = JsonArrayStreamParser()
+    assert [item["page"] for item in parser.feed(text)] == [1, 3]
+    assert parser.skipped == 1
+
+
+def test_scalar_elements() -> None:
+    assert JsonArrayStreamParser().feed('[1, "a,b", true, null]') == [1, "a,b", True, None]
+
+
+def test_feed_after_finish_is_ignored() -> None:
+    parser = JsonArrayStreamParser()
+    parser.feed("[1]")
+    assert parser.feed("[2]") == []
@@ -0,0 +1,68 @@
+"""main.batch_ingest 單元測試：請求驗證、送出與收尾分派，mock BatchIngestService 與 jsonify。"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+
+def _fake_jsonify(obj: dict) -> MagicMock:
+    m = MagicMock()
+    m.get_json.return_value = obj
+    return m
+
+
+@pytest.fixture(autouse=True)
+def mock_service():
+    with (
+        patch("main.get_client_pool"),
+        patch("main.BatchIngestService") as MockService,
+        patch("main.jsonify", side_effect=_fake_jsonify),
+    ):
+        yield MockService.return_value
+
+
+def _request(body: dict, method: str = "POST") -> MagicMock:
+    req = MagicMock()
+    req.method = method
+    req.get_json = MagicMock(return_value=body)
+    return req
+
+
+def test_submit_with_blob_paths(mock_service: MagicMock) -> None:
+    import main
+    mock_service.submit.return_value = {"job_id": "j1", "batch": "batches/j1", "submitted": ["a.pdf"], "cached": []}
+    resp, status = main.batch_ingest(_request({"bucket": "b", "blob_paths": ["a.pdf"], "image_output": "url"}))
+    assert status == 200
+    assert resp.get_json()["job_id"] == "j1"
+    args, kwargs = mock_service.submit.call_args
+    assert args == ("b", ["a.pdf"]) and kwargs["options"].image_output == "url"
+
+
+def test_collect_with_job_id(mock_service: MagicMock) -> None:
+    import main
+    mock_service.collect.return_value = {"job_id": "j1", "state": "RUNNING", "done": False}
+    resp, status = main.batch_ingest(_request({"bucket": "b", "job_id": "j1"}))
+    assert status == 200 and resp.get_json()["done"] is False
+    mock_service.submit.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "body",
+    [{"bucket": "b"}, {"blob_paths": ["a.pdf"]}, {"bucket": "b", "blob_paths": "a.pdf"}],
+)
+def test_invalid_body_returns_400(body: dict) -> None:
+    import main
+    _resp, status = main.batch_ingest(_request(body))
+    assert status == 400
+
+
+def test_unknown_job_returns_404(mock_service: MagicMock) -> None:
+    import main
+    mock_service.collect.side_effect = FileNotFoundError("Batch job not found: x")
+    _resp, status = main.batch_ingest(_request({"bucket": "b", "job_id": "x"}))
+    assert status == 404
+
+
+def test_method_not_allowed() -> None:
+    import main
+    _resp, status = main.batch_ingest(_request({}, method="GET"))
+    assert status == 405
@@ -3,7 +3,8 @@
 import pytest
 from unittest.mock import MagicMock, patch
 
-from src.models.schema import BlockElement, PageBlock
+from src.clients.gcs_client import BlobInfo
+from src.models.schema import BlockElement, PageBlock, ParseOptions
 
 
 def _fake_jsonify(obj: dict) -> MagicMock:
@@ -15,14 +16,15 @@ def _fake_jsonify(obj: dict) -> MagicMock:
 
 @pytest.fixture(autouse=True)
 def mock_dependencies():
-    """Mock GCSClient、GeminiFileClient、PDFProcessor、jsonify，避免實際 I/O 與 app context。"""
+    """Mock ClientPool、PDFProcessor、jsonify，避免實際 I/O 與 app context。"""
     with (
-        patch("main.GCSClient"),
-        patch("main.GeminiFileClient"),
+        patch("main.get_client_pool"),
         patch("main.PDFProcessor") as MockProcessor,
         patch("main.jsonify", side_effect=_fake_jsonify),
     ):
         mock_instance = MagicMock()
+        mock_instance.blob_info.return_value = BlobInfo(name="uploads/x.pdf", size=10, generation=3)
+        mock_instance.result_cache_key.return_value = "etag123"
         mock_instance.parse_from_gcs.return_value = [
             PageBlock(page=1, elements=[BlockElement(type="text", content="hi", description="")]),
         ]
@@ -30,9 +32,10 @@ def mock_dependencies():
         yield MockProcessor
 
 
-def _request(method: str, json_body: dict | None = None) -> MagicMock:
+def _request(method: str, json_body: dict | None = None, headers: dict | None = None) -> MagicMock:
     req = MagicMock()
     req.method = method
+    req.headers = headers or {}
     req.get_json = MagicMock(return_value=json_body if json_body is not None else {})
     return req
 
@@ -84,9 +87,15 @@ def test_parse_pdf_post_valid_returns_200_and_pages(mock_dependencies: MagicMock
     assert len(data["pages"]) == 1
     assert data["pages"][0]["page"] == 1
     assert data["pages"][0]["elements"][0]["content"] == "hi"
+    # ETag 與解析共用同一次 metadata 查詢的 BlobInfo
+    info = mock_dependencies.return_value.blob_info.return_value
+    mock_dependencies.return_value.blob_info.assert_called_once_with("uploads/x.pdf", bucket_name="obe-files")
+    assert mock_dependencies.return_value.result_cache_key.call_args.kwargs["info"] is info
     mock_dependencies.return_value.parse_from_gcs.assert_called_once_with(
         "uploads/x.pdf",
         bucket_name="obe-files",
+        options=ParseOptions(),
+        info=info,
     )
 
 
@@ -112,3 +121,73 @@ def test_parse_pdf_post_processor_retryable_returns_500_after_retries(mock_depen
     assert response.get_json()["success"] is False
     assert "timeout" in response.get_json()["error"]
     assert mock_dependencies.return_value.parse_from_gcs.call_count == 2  # PARSE_MAX_RETRIES
+
+
+def test_parse_pdf_uses_process_wide_client_pool(mock_dependencies: MagicMock) -> None:
+    """parse_pdf 應從 ClientPool 取得 Client，並把 pool.get_gcs 交給 PDFProcessor 作為 gcs_factory。"""
+    import main
+    req = _request("POST", {"bucket": "obe-files", "blob_path": "uploads/x.pdf"})
+    main.parse_pdf(req)
+    pool = main.get_client_pool.return_value
+    pool.get_gcs.assert_called_with("obe-files")
+    pool.get_gemini.assert_called_once()
+    kwargs = mock_dependencies.call_args.kwargs
+    assert kwargs["gcs_factory"] is pool.get_gcs
+    assert kwargs["gemini_client"] is pool.get_gemini.return_value
+
+
+def test_parse_pdf_returns_etag_header_and_body(mock_dependencies: MagicMock) -> None:
+    """成功時回應應帶 ETag header 與 body 的 etag（即結果快取 key）。"""
+    import main
+    req = _request("POST", {"bucket": "b", "blob_path": "p.pdf"})
+    response, status_code = main.parse_pdf(req)
+    assert status_code == 200
+    assert response.get_json()["etag"] == "etag123"
+    response.headers.__setitem__.assert_called_with("ETag", '"etag123"')
+
+
+def test_parse_pdf_if_none_match_returns_304_without_parsing(mock_dependencies: MagicMock) -> None:
+    """If-None-Match 與目前 ETag 相同時應回 304，且不呼叫 parse_from_gcs。"""
+    import main
+    req = _request("POST", {"bucket": "b", "blob_path": "p.pdf"}, headers={"If-None-Match": 'W/"etag123"'})
+    _response, status_code = main.parse_pdf(req)
+    assert status_code == 304
+    mock_dependencies.return_value.parse_from_gcs.assert_not_called()
+
+
+def test_parse_pdf_if_none_match_stale_parses_again(mock_dependencies: MagicMock) -> None:
+    """If-None-Match 不符（PDF 或 prompt 已變）時應照常解析並回 200。"""
+    import main
+    req = _request("POST", {"bucket": "b", "blob_path": "p.pdf"}, headers={"If-None-Match": '"old"'})
+    _response, status_code = main.parse_pdf(req)
+    assert status_code == 200
+    mock_dependencies.return_value.parse_from_gcs.assert_called_once()
+
+
+def test_parse_pdf_missing_blob_returns_404_without_retry(mock_dependencies: MagicMock) -> None:
+    """PDF 不存在時應直接回 404，不進入重試。"""
+    import main
+    mock_dependencies.return_value.blob_info.side_effect = FileNotFoundError("Blob not found: gs://b/p.pdf")
+    req = _request("POST", {"bucket": "b", "blob_path": "p.pdf"})
+    response, status_code = main.parse_pdf(req)
+    assert status_code == 404
+    assert "Blob not found" in response.get_json()["error"]
+    mock_dependencies.return_value.parse_from_gcs.assert_not_called()
+
+
+def test_parse_pdf_passes_image_output_option(mock_dependencies: MagicMock) -> None:
+    """body 的 image_output 應轉成 ParseOptions 傳給 processor。"""
+    import main
+    req = _request("POST", {"bucket": "b", "blob_path": "p.pdf", "image_output": "url"})
+    main.parse_pdf(req)
+    kwargs = mock_dependencies.return_value.parse_from_gcs.call_args.kwargs
+    assert kwargs["options"].image_output == "url"
+
+
+def test_parse_pdf_invalid_option_returns_400() -> None:
+    """不合法的選項值應回傳 400。"""
+    import main
+    req = _request("POST", {"bucket": "b", "blob_path": "p.pdf", "image_output": "base64"})
+    response, status_code = main.parse_pdf(req)
+    assert status_code == 400
+    assert "Invalid options" in response.get_json()["error"]
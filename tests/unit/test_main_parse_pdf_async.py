@@ -0,0 +1,165 @@
+"""main.parse_pdf_async 單元測試：ASGI 入口的請求驗證、ETag/304、重試，mock AsyncPDFProcessor。"""
+
+import asyncio
+import json
+
+import h11
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.clients.gcs_client import BlobInfo
+from src.models.schema import BlockElement, PageBlock, ParseOptions
+
+
+@pytest.fixture(autouse=True)
+def mock_dependencies():
+    """Mock ClientPool 與 AsyncPDFProcessor，避免實際 I/O。"""
+    with (
+        patch("main.get_client_pool"),
+        patch("main.AsyncPDFProcessor") as MockProcessor,
+        patch("main.asyncio.sleep", new=AsyncMock()),
+    ):
+        mock_instance = MagicMock()
+        mock_instance.blob_info = AsyncMock(return_value=BlobInfo(name="p.pdf", size=10, generation=3))
+        mock_instance.result_cache_key = AsyncMock(return_value="etag123")
+        mock_instance.parse_from_gcs = AsyncMock(
+            return_value=[PageBlock(page=1, elements=[BlockElement(type="text", content="hi", description="")])]
+        )
+        MockProcessor.return_value = mock_instance
+        yield MockProcessor
+
+
+def _request(method: str, json_body=None, headers: dict | None = None) -> MagicMock:
+    req = MagicMock()
+    req.method = method
+    req.headers = headers or {}
+    if isinstance(json_body, Exception):
+        req.json = AsyncMock(side_effect=json_body)
+    else:
+        req.json = AsyncMock(return_value=json_body if json_body is not None else {})
+    return req
+
+
+def _call(req: MagicMock):
+    import main
+    response = asyncio.run(main.parse_pdf_async(req))
+    return response, json.loads(response.body)
+
+
+def test_get_returns_405() -> None:
+    response, _ = _call(_request("GET"))
+    assert response.status_code == 405
+
+
+def test_invalid_json_returns_400() -> None:
+    response, body = _call(_request("POST", ValueError("bad json")))
+    assert response.status_code == 400
+    assert body["error"] == "Missing bucket or blob_path"
+
+
+def test_valid_request_returns_pages_and_etag(mock_dependencies: MagicMock) -> None:
+    response, body = _call(_request("POST", {"bucket": "b", "blob_path": "p.pdf", "image_output": "url"}))
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"etag123"'
+    assert body["count"] == 1
+    assert body["pages"][0]["elements"][0]["content"] == "hi"
+    info = BlobInfo(name="p.pdf", size=10, generation=3)
+    assert mock_dependencies.return_value.result_cache_key.await_args.kwargs["info"] == info
+    mock_dependencies.return_value.parse_from_gcs.assert_awaited_once_with(
+        "p.pdf", bucket_name="b", options=ParseOptions(image_output="url"), info=info
+    )
+
+
+def test_if_none_match_returns_304_without_parsing(mock_dependencies: MagicMock) -> None:
+    import main
+    req = _request("POST", {"bucket": "b", "blob_path": "p.pdf"}, headers={"If-None-Match": '"etag123"'})
+    response = asyncio.run(main.parse_pdf_async(req))
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["ETag"] == '"etag123"'
+    mock_dependencies.return_value.parse_from_gcs.assert_not_awaited()
+
+
+def _serve_over_h11(body: dict, headers: dict[str, str]) -> tuple[int, dict[bytes, bytes], bytes]:
+    """
+    經 ASGI app 呼叫 parse_pdf_async，並以 h11（uvicorn 的 HTTP/1.1 實作）序列化回應；
+    回應違反 HTTP 框架規則（如 304 帶 body）時 h11 拋 LocalProtocolError。
+    """
+    import main
+
+    app = Starlette(routes=[Route("/", main.parse_pdf_async, methods=["POST"])])
+    payload = json.dumps(body).encode("utf-8")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/",
+        "raw_path": b"/",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+    }
+    messages: list[dict] = []
+    received = False
+
+    async def receive() -> dict:
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+
+    conn = h11.Connection(h11.SERVER)
+    conn.receive_data(b"POST / HTTP/1.1\r\nHost: testserver\r\nContent-Length: 0\r\n\r\n")
+    conn.next_event()
+    start = messages[0]
+    conn.send(h11.Response(status_code=start["status"], headers=start["headers"]))
+    sent = b"".join(m.get("body", b"") for m in messages[1:])
+    if sent:
+        conn.send(h11.Data(data=sent))
+    conn.send(h11.EndOfMessage())
+    return start["status"], dict(start["headers"]), sent
+
+
+def test_304_is_valid_http_through_asgi_app(mock_dependencies: MagicMock) -> None:
+    """經 ASGI app 與 h11 送出的 304 不應帶 body（否則 uvicorn 回報 Too much data for declared Content-Length）。"""
+    status, headers, sent = _serve_over_h11(
+        {"bucket": "b", "blob_path": "p.pdf"},
+        {"Content-Type": "application/json", "If-None-Match": '"etag123"'},
+    )
+    assert status == 304
+    assert sent == b""
+    assert headers[b"etag"] == b'"etag123"'
+
+
+def test_200_is_valid_http_through_asgi_app(mock_dependencies: MagicMock) -> None:
+    status, _headers, sent = _serve_over_h11(
+        {"bucket": "b", "blob_path": "p.pdf"}, {"Content-Type": "application/json"}
+    )
+    assert status == 200
+    assert json.loads(sent)["success"] is True
+
+
+def test_missing_blob_returns_404(mock_dependencies: MagicMock) -> None:
+    mock_dependencies.return_value.blob_info.side_effect = FileNotFoundError("Blob not found")
+    response, _ = _call(_request("POST", {"bucket": "b", "blob_path": "p.pdf"}))
+    assert response.status_code == 404
+
+
+def test_retryable_error_retries_then_500(mock_dependencies: MagicMock) -> None:
+    mock_dependencies.return_value.parse_from_gcs.side_effect = TimeoutError("timeout")
+    response, body = _call(_request("POST", {"bucket": "b", "blob_path": "p.pdf"}))
+    assert response.status_code == 500
+    assert "timeout" in body["error"]
+    assert mock_dependencies.return_value.parse_from_gcs.await_count == 2  # PARSE_MAX_RETRIES
@@ -0,0 +1,117 @@
+"""main.on_pdf_finalized 單元測試：過濾、去重、成功寫入快取、失敗釋放、不可重試的錯誤與過舊的事件不重送。"""
+
+import time
+from datetime import datetime, timezone
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from cloudevents.http import CloudEvent
+from google.api_core.exceptions import InvalidArgument
+from pydantic import ValidationError
+
+from src.services.preparse import PreparseGate
+
+
+def _event(name: str = "uploads/a.pdf", generation: str = "7", age: float = 0.0) -> CloudEvent:
+    sent = datetime.fromtimestamp(time.time() - age, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+    attributes = {"type": "google.cloud.storage.object.v1.finalized", "source": "test", "time": sent}
+    return CloudEvent(attributes, {"bucket": "obe-files", "name": name, "generation": generation, "size": "10"})
+
+
+@pytest.fixture(autouse=True)
+def mock_deps():
+    """每個測試使用全新的 PreparseGate，並 Mock ClientPool 與 PDFProcessor。"""
+    with (
+        patch("main.get_client_pool") as mock_get_pool,
+        patch("main.PDFProcessor") as mock_processor_cls,
+        patch("main._preparse_gate", PreparseGate(prefix="uploads/")),
+    ):
+        claim_gcs = mock_get_pool.return_value.get_gcs.return_value
+        claim_gcs.upload_bytes_if_absent.return_value = True
+        mock_processor_cls.return_value.parse_from_gcs.return_value = [MagicMock()]
+        yield mock_processor_cls, claim_gcs
+
+
+def test_pdf_under_prefix_is_preparsed(mock_deps: tuple[MagicMock, MagicMock]) -> None:
+    import main
+    mock_processor_cls, _claim = mock_deps
+    main.on_pdf_finalized(_event())
+    mock_processor_cls.return_value.parse_from_gcs.assert_called_once_with(
+        "uploads/a.pdf", bucket_name="obe-files"
+    )
+    # 與 parse_pdf 相同的處理器設定（含解析快取），互動請求才會命中
+    assert mock_processor_cls.call_args.kwargs["result_cache"] is not None
+
+
+def test_other_prefix_is_ignored(mock_deps: tuple[MagicMock, MagicMock]) -> None:
+    import main
+    mock_processor_cls, _claim = mock_deps
+    main.on_pdf_finalized(_event(name="parse-cache/abc.json"))
+    mock_processor_cls.return_value.parse_from_gcs.assert_not_called()
+
+
+def test_duplicate_event_parsed_once(mock_deps: tuple[MagicMock, MagicMock]) -> None:
+    import main
+    mock_processor_cls, _claim = mock_deps
+    main.on_pdf_finalized(_event())
+    main.on_pdf_finalized(_event())
+    assert mock_processor_cls.return_value.parse_from_gcs.call_count == 1
+
+
+def test_failure_raises_and_releases_claim(mock_deps: tuple[MagicMock, MagicMock]) -> None:
+    """解析失敗應拋出（交給 Eventarc 重送）並刪除 claim。"""
+    import main
+    mock_processor_cls, claim_gcs = mock_deps
+    mock_processor_cls.return_value.parse_from_gcs.side_effect = ConnectionError("reset")
+    with pytest.raises(ConnectionError):
+        main.on_pdf_finalized(_event())
+    claim_gcs.delete_blob.assert_called_once()
+
+
+def test_deleted_object_is_not_an_error(mock_deps: tuple[MagicMock, MagicMock]) -> None:
+    import main
+    mock_processor_cls, claim_gcs = mock_deps
+    mock_processor_cls.return_value.parse_from_gcs.side_effect = FileNotFoundError("gone")
+    main.on_pdf_finalized(_event())
+    claim_gcs.delete_blob.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "error",
+    [ValueError("bad pdf"), InvalidArgument("unsupported file"), TimeoutError("slow")],
+)
+def test_non_retryable_error_is_logged_not_raised(mock_deps: tuple[MagicMock, MagicMock], error: Exception) -> None:
+    """不可重試的錯誤不應拋出（避免 --retry 反覆重送），claim 保留。"""
+    import main
+    mock_processor_cls, claim_gcs = mock_deps
+    mock_processor_cls.return_value.parse_from_gcs.side_effect = error
+    main.on_pdf_finalized(_event())
+    claim_gcs.delete_blob.assert_not_called()
+
+    main.on_pdf_finalized(_event())
+    assert mock_processor_cls.return_value.parse_from_gcs.call_count == 1
+
+
+def test_schema_validation_error_is_not_raised(mock_deps: tuple[MagicMock, MagicMock]) -> None:
+    import main
+    from src.models.schema import PageBlock
+    mock_processor_cls, _claim = mock_deps
+    try:
+        PageBlock(page="x", elements=[])
+    except ValidationError as e:
+        mock_processor_cls.return_value.parse_from_gcs.side_effect = e
+    main.on_pdf_finalized(_event())
+
+
+def test_old_event_is_dropped_without_parsing(mock_deps: tuple[MagicMock, MagicMock]) -> None:
+    """--retry 反覆重送超過 PREPARSE_MAX_EVENT_AGE_S 的事件記錄後結束，不解析也不拋出。"""
+    import main
+    mock_processor_cls, claim_gcs = mock_deps
+    with patch("main.PREPARSE_MAX_EVENT_AGE_S", 600.0):
+        main.on_pdf_finalized(_event(age=601.0))
+        mock_processor_cls.return_value.parse_from_gcs.assert_not_called()
+        claim_gcs.upload_bytes_if_absent.assert_not_called()
+
+        main.on_pdf_finalized(_event(age=30.0))
+    mock_processor_cls.return_value.parse_from_gcs.assert_called_once()
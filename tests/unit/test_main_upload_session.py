@@ -0,0 +1,203 @@
+"""main.create_upload_session 單元測試：ID token 驗證、CORS 來源、參數驗證、bucket 白名單、回傳 session 資訊。"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.clients.gcs_client import UploadSession
+
+
+def _fake_jsonify(obj: dict) -> MagicMock:
+    m = MagicMock()
+    m.get_json.return_value = obj
+    return m
+
+
+@pytest.fixture
+def mock_verify():
+    """Mock ID token 驗證：預設回傳已驗證 email 的 claims。"""
+    with patch("google.oauth2.id_token.verify_oauth2_token") as verify:
+        verify.return_value = {"email": "a@example.com", "email_verified": True, "hd": "example.com"}
+        yield verify
+
+
+@pytest.fixture(autouse=True)
+def mock_pool(mock_verify: MagicMock):
+    """Mock ClientPool、jsonify 與 ID token 驗證；GCSClient.create_resumable_upload 回傳固定 session。"""
+    with (
+        patch("main.get_client_pool") as mock_get_pool,
+        patch("main.jsonify", side_effect=_fake_jsonify),
+        patch("main.UPLOAD_ALLOWED_BUCKETS", {"obe-files"}),
+        patch("main.UPLOAD_ALLOWED_ORIGINS", {"https://example.github.io"}),
+        patch("main.UPLOAD_AUTH_AUDIENCE", "client-id.apps.googleusercontent.com"),
+        patch("main.UPLOAD_ALLOWED_DOMAIN", None),
+        patch("main.UPLOAD_MAX_BYTES", 1024),
+    ):
+        gcs = mock_get_pool.return_value.get_gcs.return_value
+        gcs.create_resumable_upload.return_value = UploadSession(
+            url="https://storage.googleapis.com/obe-files/uploads/x?X-Goog-Signature=abc",
+            method="POST",
+            headers={"x-goog-resumable": "start", "Content-Type": "application/pdf"},
+        )
+        yield gcs
+
+
+def _request(
+    method: str,
+    json_body: dict | None = None,
+    origin: str = "https://example.github.io",
+    authorization: str | None = "Bearer id-token",
+) -> MagicMock:
+    req = MagicMock()
+    req.method = method
+    req.headers = {"Origin": origin}
+    if authorization is not None:
+        req.headers["Authorization"] = authorization
+    req.get_json = MagicMock(return_value=json_body if json_body is not None else {})
+    return req
+
+
+def test_options_preflight_returns_204_with_cors() -> None:
+    """OPTIONS 預檢應回 204 並帶 CORS header。"""
+    import main
+    body, status, headers = main.create_upload_session(_request("OPTIONS"))
+    assert status == 204
+    assert "POST" in headers["Access-Control-Allow-Methods"]
+    assert "Authorization" in headers["Access-Control-Allow-Headers"]
+    assert headers["Access-Control-Allow-Origin"] == "https://example.github.io"
+
+
+def test_preflight_from_other_origin_has_no_allow_origin() -> None:
+    """白名單外的 Origin 不應拿到 Access-Control-Allow-Origin（預設不再是 *）。"""
+    import main
+    _body, status, headers = main.create_upload_session(_request("OPTIONS", origin="https://evil.example"))
+    assert status == 204
+    assert "Access-Control-Allow-Origin" not in headers
+
+
+def test_post_from_other_origin_returns_403(mock_pool: MagicMock) -> None:
+    import main
+    _resp, status, _headers = main.create_upload_session(
+        _request("POST", {"file_name": "a.pdf"}, origin="https://evil.example")
+    )
+    assert status == 403
+    mock_pool.create_resumable_upload.assert_not_called()
+
+
+def test_missing_bearer_token_returns_401(mock_pool: MagicMock, mock_verify: MagicMock) -> None:
+    """未帶 ID token 時應回 401，且不驗證也不產生 session。"""
+    import main
+    _resp, status, _headers = main.create_upload_session(_request("POST", {"file_name": "a.pdf"}, authorization=None))
+    assert status == 401
+    mock_verify.assert_not_called()
+    mock_pool.create_resumable_upload.assert_not_called()
+
+
+def test_invalid_id_token_returns_401(mock_pool: MagicMock, mock_verify: MagicMock) -> None:
+    import main
+    mock_verify.side_effect = ValueError("Token expired")
+    _resp, status, _headers = main.create_upload_session(_request("POST", {"file_name": "a.pdf"}))
+    assert status == 401
+    assert mock_verify.call_args.kwargs["audience"] == "client-id.apps.googleusercontent.com"
+    mock_pool.create_resumable_upload.assert_not_called()
+
+
+def test_domain_mismatch_returns_403(mock_pool: MagicMock) -> None:
+    import main
+    with patch("main.UPLOAD_ALLOWED_DOMAIN", "corp.example"):
+        _resp, status, _headers = main.create_upload_session(_request("POST", {"file_name": "a.pdf"}))
+    assert status == 403
+    mock_pool.create_resumable_upload.assert_not_called()
+
+
+def test_auth_not_configured_returns_503(mock_pool: MagicMock) -> None:
+    """未設定 UPLOAD_AUTH_AUDIENCE 時不發出 session。"""
+    import main
+    with patch("main.UPLOAD_AUTH_AUDIENCE", None):
+        _resp, status, _headers = main.create_upload_session(_request("POST", {"file_name": "a.pdf"}))
+    assert status == 503
+    mock_pool.create_resumable_upload.assert_not_called()
+
+
+def test_get_returns_405() -> None:
+    import main
+    _resp, status, _headers = main.create_upload_session(_request("GET"))
+    assert status == 405
+
+
+def test_missing_file_name_returns_400() -> None:
+    import main
+    resp, status, _headers = main.create_upload_session(_request("POST", {}))
+    assert status == 400
+    assert resp.get_json()["error"] == "Missing file_name"
+
+
+def test_bucket_not_allowed_returns_403(mock_pool: MagicMock) -> None:
+    """不在白名單內的 bucket 應回 403，且不產生 session。"""
+    import main
+    _resp, status, _headers = main.create_upload_session(
+        _request("POST", {"file_name": "a.pdf", "bucket": "someone-else"})
+    )
+    assert status == 403
+    mock_pool.create_resumable_upload.assert_not_called()
+
+
+def test_non_pdf_content_type_returns_400() -> None:
+    import main
+    _resp, status, _headers = main.create_upload_session(
+        _request("POST", {"file_name": "a.exe", "content_type": "application/octet-stream"})
+    )
+    assert status == 400
+
+
+@pytest.mark.parametrize("file_name", ["a.exe", "..", "uploads/", "   "])
+def test_non_pdf_file_name_returns_400(mock_pool: MagicMock, file_name: str) -> None:
+    """檔名須為 .pdf，路徑只剩 . / .. 或空白時應回 400。"""
+    import main
+    _resp, status, _headers = main.create_upload_session(_request("POST", {"file_name": file_name}))
+    assert status == 400
+    mock_pool.create_resumable_upload.assert_not_called()
+
+
+def test_long_file_name_is_truncated_under_uploads(mock_pool: MagicMock) -> None:
+    import main
+    resp, status, _headers = main.create_upload_session(_request("POST", {"file_name": "a" * 500 + ".pdf"}))
+    assert status == 200
+    blob_path = resp.get_json()["blob_path"]
+    name = blob_path[len("uploads/"):].split("_", 1)[1]
+    assert blob_path.startswith("uploads/")
+    assert len(name) == main.UPLOAD_MAX_NAME_LENGTH
+    assert name.endswith(".pdf")
+
+
+def test_valid_request_returns_session_under_uploads_prefix(mock_pool: MagicMock) -> None:
+    """有效請求應回傳 upload_url、method、headers 與 uploads/ 下的 blob_path。"""
+    import main
+    resp, status, headers = main.create_upload_session(
+        _request("POST", {"file_name": "../../etc/型錄.pdf", "bucket": "obe-files"})
+    )
+    assert status == 200
+    data = resp.get_json()
+    assert data["success"] is True
+    assert data["bucket"] == "obe-files"
+    assert data["blob_path"].startswith("uploads/")
+    assert data["blob_path"].endswith("_型錄.pdf")
+    assert "/etc/" not in data["blob_path"]
+    assert data["method"] == "POST"
+    assert data["headers"]["x-goog-resumable"] == "start"
+    assert data["requires_start"] is True
+    assert data["max_bytes"] == 1024
+    assert headers["Access-Control-Allow-Origin"] == "https://example.github.io"
+    mock_pool.create_resumable_upload.assert_called_once_with(
+        data["blob_path"],
+        content_type="application/pdf",
+        origin="https://example.github.io",
+        max_bytes=1024,
+    )
+
+
+def test_signing_failure_returns_500(mock_pool: MagicMock) -> None:
+    import main
+    mock_pool.create_resumable_upload.side_effect = RuntimeError("signBlob denied")
+    resp, status, _headers = main.create_upload_session(_request("POST", {"file_name": "a.pdf"}))
+    assert status == 500
+    assert "signBlob" in resp.get_json()["error"]
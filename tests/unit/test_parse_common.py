@@ -0,0 +1,111 @@
+"""parse_common 單元測試：快取 key 的選項變體、inline 判斷、分片 URI 對應、Vertex 直讀判斷與頁面合併。"""
+
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.clients.gcs_client import BlobInfo, GCSClient
+from src.models.schema import BlockElement, PageBlock, ParseOptions
+from src.services.image_publisher import ImagePublisher
+from src.services.parse_common import (
+    display_name_for,
+    extract_images,
+    fits_inline,
+    inline_bytes,
+    is_complete,
+    merge_page_blocks,
+    options_variant,
+    reads_gcs_uri,
+    result_cache_key,
+    shard_file_uris,
+)
+
+
+def test_options_variant_ignores_execution_options() -> None:
+    """分片設定只影響執行方式，不應改變快取 key；影響輸出的選項才納入。"""
+    assert options_variant(ParseOptions()) == ""
+    assert options_variant(ParseOptions(shard_pages=10, shard_concurrency=2)) == ""
+    assert options_variant(ParseOptions(image_output="url")) == '{"image_output": "url"}'
+
+
+def test_result_cache_key_changes_with_output_options() -> None:
+    info = BlobInfo(name="a.pdf", size=10, generation=1)
+    base = result_cache_key("b", info, "m", "p", ParseOptions())
+    assert base == result_cache_key("b", info, "m", "p", ParseOptions(shard_pages=5))
+    assert base != result_cache_key("b", info, "m", "p", ParseOptions(hybrid=True))
+
+
+def test_result_cache_key_changes_with_image_bucket_and_url_style() -> None:
+    """url 模式下 IMAGE_BUCKET 或 URL 形式改變時，回傳的圖片 URL 不同，快取 key 也必須不同；inline 不受影響。"""
+    info = BlobInfo(name="a.pdf", size=10, generation=1)
+    url = ParseOptions(image_output="url")
+
+    def publisher(bucket: str, url_style: str) -> ImagePublisher:
+        gcs = MagicMock(spec=GCSClient)
+        gcs.get_blob_uri.side_effect = lambda path: f"gs://{bucket}/{path}"
+        gcs.get_public_url.side_effect = lambda path: f"https://storage.googleapis.com/{bucket}/{path}"
+        return ImagePublisher(gcs, url_style=url_style, public_bucket=True)
+
+    keys = {
+        result_cache_key("b", info, "m", "p", url, publisher(bucket, style))
+        for bucket in ("img-a", "img-b")
+        for style in ("gs", "https")
+    }
+    assert len(keys) == 4
+    assert result_cache_key("b", info, "m", "p", ParseOptions(), publisher("img-a", "gs")) == result_cache_key(
+        "b", info, "m", "p", ParseOptions(), publisher("img-b", "https")
+    )
+
+
+def test_is_complete_rejects_empty_and_partial_results() -> None:
+    """空結果或含 partial 頁面（退回文字塊、搶救、截斷放棄）不寫入快取。"""
+    assert is_complete([PageBlock(page=1), PageBlock(page=2)]) is True
+    assert is_complete([]) is False
+    assert is_complete([PageBlock(page=1), PageBlock(page=2, partial=True)]) is False
+
+
+def test_fits_inline_and_inline_bytes(tmp_path: Path) -> None:
+    """不超過上限的 bytes 或檔案可 inline；上限 <= 0 表示停用。"""
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"x" * 10)
+    assert fits_inline(b"x" * 10, 10) is True
+    assert fits_inline(b"x" * 11, 10) is False
+    assert fits_inline(b"x", 0) is False
+    assert inline_bytes(path, 10) == b"x" * 10
+    assert inline_bytes(path, 9) is None
+
+
+def test_shard_file_uris_keeps_inline_shards_as_none() -> None:
+    uploads = [object(), None, object()]
+    assert shard_file_uris(uploads, ["u1", "u3"]) == ["u1", None, "u3"]
+
+
+def test_reads_gcs_uri_requires_vertex_and_whole_document() -> None:
+    vertex = object()
+    assert reads_gcs_uri(ParseOptions(), vertex) is True
+    assert reads_gcs_uri(ParseOptions(), None) is False
+    assert reads_gcs_uri(ParseOptions(hybrid=True), vertex) is False
+    assert reads_gcs_uri(ParseOptions(shard_pages=10), vertex) is False
+
+
+def test_display_name_for_uses_last_segment() -> None:
+    assert display_name_for("uploads/x/catalog.pdf") == "catalog.pdf"
+    assert display_name_for("uploads/") == "document.pdf"
+
+
+def test_extract_images_url_requires_publisher() -> None:
+    with pytest.raises(ValueError, match="ImagePublisher"):
+        extract_images(b"%PDF", ParseOptions(image_output="url"), None)
+
+
+def test_merge_page_blocks_sorts_and_concatenates_duplicate_pages() -> None:
+    blocks = [
+        PageBlock(page=2, elements=[BlockElement(type="text", content="b")]),
+        PageBlock(page=1, elements=[BlockElement(type="text", content="a1")]),
+        PageBlock(page=1, elements=[BlockElement(type="text", content="a2")], partial=True),
+    ]
+    merged = merge_page_blocks(blocks)
+    assert [b.page for b in merged] == [1, 2]
+    assert [el.content for el in merged[0].elements] == ["a1", "a2"]
+    assert merged[0].partial and not merged[1].partial
@@ -0,0 +1,61 @@
+"""pdf_image_extractor 單元測試：以 PyMuPDF 產生含圖 PDF，驗證 bytes 與檔案路徑兩種來源。"""
+
+from pathlib import Path
+
+import pytest
+
+from src.services.pdf_image_extractor import extract_images_by_page, extract_raw_images_by_page
+
+pymupdf = pytest.importorskip("pymupdf")
+
+
+def _make_pdf_with_image() -> bytes:
+    """產生兩頁 PDF，僅第 2 頁放一張小 PNG。"""
+    pix = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 4, 4), False)
+    pix.clear_with(200)
+    doc = pymupdf.open()
+    doc.new_page()
+    page = doc.new_page()
+    page.insert_image(pymupdf.Rect(10, 10, 50, 50), stream=pix.tobytes("png"))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_extract_images_by_page_from_bytes() -> None:
+    """傳入 bytes 應回傳 {page_index: [(base64, mime)]}，無圖頁不出現。"""
+    result = extract_images_by_page(_make_pdf_with_image())
+    assert list(result.keys()) == [1]
+    b64, mime = result[1][0]
+    assert b64
+    assert mime.startswith("image/")
+
+
+def test_extract_images_by_page_from_path_matches_bytes(tmp_path: Path) -> None:
+    """傳入檔案路徑（spool 模式）結果應與 bytes 相同。"""
+    data = _make_pdf_with_image()
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(data)
+    assert extract_images_by_page(pdf) == extract_images_by_page(data)
+
+
+def test_extract_images_by_page_invalid_pdf_returns_empty() -> None:
+    """無法開啟的內容應回傳空 dict，不拋例外。"""
+    assert extract_images_by_page(b"not a pdf") == {}
+
+
+def test_extract_raw_images_by_page_returns_bytes() -> None:
+    """extract_raw_images_by_page 應回傳原始位元組，base64 版為其編碼結果。"""
+    import base64
+
+    data = _make_pdf_with_image()
+    raw = extract_raw_images_by_page(data)
+    encoded = extract_images_by_page(data)
+    raw_bytes, mime = raw[1][0]
+    assert isinstance(raw_bytes, bytes)
+    assert encoded[1][0] == (base64.standard_b64encode(raw_bytes).decode("ascii"), mime)
+
+
+def test_extract_raw_images_by_page_respects_max_bytes() -> None:
+    """超過 max_image_bytes 的圖片應略過。"""
+    assert extract_raw_images_by_page(_make_pdf_with_image(), max_image_bytes=1) == {}
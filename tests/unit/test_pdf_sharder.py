@@ -0,0 +1,56 @@
+"""pdf_sharder 單元測試：以 PyMuPDF 產生多頁 PDF，驗證分片頁數、頁碼範圍與頁碼換回原文件。"""
+
+from pathlib import Path
+
+import pytest
+
+from src.models.schema import BlockElement, PageBlock
+from src.services.pdf_sharder import PdfShard, remap_pages, split_pdf
+
+pymupdf = pytest.importorskip("pymupdf")
+
+
+def _make_pdf(pages: int) -> bytes:
+    """產生每頁寫有頁碼文字的 PDF。"""
+    doc = pymupdf.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"page {i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_split_pdf_into_fixed_page_ranges(tmp_path: Path) -> None:
+    shards = split_pdf(_make_pdf(7), shard_pages=3, out_dir=tmp_path)
+    assert [(s.first_page, s.page_count) for s in shards] == [(1, 3), (4, 3), (7, 1)]
+    # 第二片的第一頁應為原文件第 4 頁
+    with pymupdf.open(str(shards[1].path)) as sub:
+        assert len(sub) == 3
+        assert "page 4" in sub[0].get_text()
+
+
+def test_split_pdf_accepts_path(tmp_path: Path) -> None:
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(_make_pdf(4))
+    out = tmp_path / "shards"
+    out.mkdir()
+    assert len(split_pdf(pdf, shard_pages=2, out_dir=out)) == 2
+
+
+def test_split_pdf_invalid_source_returns_empty(tmp_path: Path) -> None:
+    assert split_pdf(b"not a pdf", shard_pages=2, out_dir=tmp_path) == []
+
+
+def test_split_pdf_rejects_zero_pages(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        split_pdf(_make_pdf(1), shard_pages=0, out_dir=tmp_path)
+
+
+def test_remap_pages_offsets_and_clamps() -> None:
+    """子文件頁碼加上 first_page - 1；越界頁碼夾回分片範圍。"""
+    shard = PdfShard(index=1, first_page=11, page_count=10, path=Path("x.pdf"))
+    blocks = [
+        PageBlock(page=1, elements=[BlockElement(type="text", content="a")]),
+        PageBlock(page=12, elements=[BlockElement(type="text", content="b")]),
+    ]
+    assert [b.page for b in remap_pages(blocks, shard)] == [11, 20]
@@ -0,0 +1,59 @@
+"""PdfSlimmer 單元測試：以 PyMuPDF 產生含高解析度圖片的 PDF，驗證瘦身、略過條件與統計。"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from src.services.pdf_slimmer import PdfSlimmer, SlimResult
+
+pymupdf = pytest.importorskip("pymupdf")
+
+
+def _make_pdf(image_px: int = 1200) -> bytes:
+    """產生一頁 PDF，將 image_px 見方的雜訊圖放在 2 英吋見方區域（約 image_px / 2 DPI）。"""
+    doc = pymupdf.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "catalog page")
+    pix = pymupdf.Pixmap(pymupdf.csRGB, image_px, image_px, os.urandom(image_px * image_px * 3), False)
+    page.insert_image(pymupdf.Rect(72, 100, 216, 244), pixmap=pix)
+    data = doc.tobytes(deflate=True)
+    doc.close()
+    return data
+
+
+def test_slim_downsamples_high_dpi_images(tmp_path: Path) -> None:
+    data = _make_pdf()
+    slimmer = PdfSlimmer(target_dpi=100, min_bytes=0)
+    result = slimmer.slim(data, tmp_path)
+    assert result is not None
+    assert result.slim_bytes < result.original_bytes / 4
+    with pymupdf.open(str(result.path)) as doc:
+        assert "catalog page" in doc[0].get_text()
+        assert len(doc[0].get_images()) == 1
+    stats = slimmer.stats()
+    assert stats["documents"] == 1 and stats["slimmed"] == 1
+    assert stats["bytes_before"] == len(data) and stats["bytes_after"] == result.slim_bytes
+
+
+def test_slim_accepts_path(tmp_path: Path) -> None:
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(_make_pdf())
+    out = tmp_path / "out"
+    out.mkdir()
+    assert PdfSlimmer(target_dpi=100, min_bytes=0).slim(pdf, out) is not None
+
+
+def test_small_or_invalid_pdf_is_skipped(tmp_path: Path) -> None:
+    slimmer = PdfSlimmer(min_bytes=10 * 1024 * 1024)
+    assert slimmer.slim(_make_pdf(100), tmp_path) is None
+    assert PdfSlimmer(min_bytes=0).slim(b"not a pdf", tmp_path) is None
+    assert slimmer.stats()["documents"] == 1 and slimmer.stats()["slimmed"] == 0
+
+
+def test_record_upload_estimates_time_saved(tmp_path: Path) -> None:
+    """上傳 10 秒、檔案縮為 1/4：原檔約需 40 秒，扣除瘦身 2 秒後估計省 28 秒。"""
+    slimmer = PdfSlimmer()
+    result = SlimResult(path=tmp_path / "slim.pdf", original_bytes=400, slim_bytes=100, seconds=2.0)
+    assert slimmer.record_upload(result, 10.0) == pytest.approx(28.0)
+    assert slimmer.stats()["estimated_seconds_saved"] == 28.0
@@ -0,0 +1,67 @@
+"""pdf_text_layer 單元測試：以 PyMuPDF 產生文字頁與圖片頁，驗證分類、文字塊閱讀順序、子文件與頁碼換回。"""
+
+from pathlib import Path
+
+import pytest
+
+from src.models.schema import PageBlock
+from src.services.pdf_text_layer import SOURCE_TEXT_LAYER, plan_hybrid, remap_selected_pages
+
+pymupdf = pytest.importorskip("pymupdf")
+
+LONG_TEXT = "Product catalog item description " * 10
+
+
+def _make_pdf(kinds: str) -> bytes:
+    """kinds 每個字元一頁：t 為文字頁（含小圖示），i 為大圖頁（只有短標題）。"""
+    doc = pymupdf.open()
+    pix = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 8, 8), False)
+    pix.clear_with(128)
+    for i, kind in enumerate(kinds):
+        page = doc.new_page()
+        if kind == "t":
+            page.insert_textbox(pymupdf.Rect(72, 300, 540, 700), f"body {i + 1} " + LONG_TEXT)
+            page.insert_text((72, 72), f"title {i + 1}")
+            page.insert_image(pymupdf.Rect(72, 100, 122, 150), pixmap=pix)
+        else:
+            page.insert_text((72, 72), f"photo {i + 1}")
+            page.insert_image(pymupdf.Rect(50, 100, 550, 780), pixmap=pix)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_plan_hybrid_splits_text_and_vision_pages(tmp_path: Path) -> None:
+    plan = plan_hybrid(_make_pdf("tiit"), tmp_path)
+    assert plan is not None
+    assert [b.page for b in plan.text_blocks] == [1, 4]
+    assert plan.vision_pages == [2, 3]
+    with pymupdf.open(str(plan.vision_path)) as sub:
+        assert len(sub) == 2
+        assert "photo 3" in sub[1].get_text()
+
+
+def test_text_layer_blocks_follow_reading_order(tmp_path: Path) -> None:
+    """標題、圖片佔位、內文依版面由上而下排列，來源標記為 text_layer。"""
+    block = plan_hybrid(_make_pdf("ti"), tmp_path).text_blocks[0]
+    assert block.source == SOURCE_TEXT_LAYER
+    assert [el.type for el in block.elements] == ["text", "image", "text"]
+    assert block.elements[0].content == "title 1"
+    assert block.elements[1].content == ""
+    assert block.elements[2].content.startswith("body 1")
+
+
+def test_plan_hybrid_all_text_pages_has_no_vision_document(tmp_path: Path) -> None:
+    plan = plan_hybrid(_make_pdf("tt"), tmp_path)
+    assert plan.vision_pages == [] and plan.vision_path is None
+
+
+def test_plan_hybrid_without_text_pages_returns_none(tmp_path: Path) -> None:
+    """沒有文字頁時整份仍送 Gemini，不另外產生子文件。"""
+    assert plan_hybrid(_make_pdf("ii"), tmp_path) is None
+    assert plan_hybrid(b"not a pdf", tmp_path) is None
+
+
+def test_remap_selected_pages_maps_back_and_clamps() -> None:
+    blocks = [PageBlock(page=1), PageBlock(page=2), PageBlock(page=9)]
+    assert [b.page for b in remap_selected_pages(blocks, [2, 5])] == [2, 5, 5]
@@ -0,0 +1,157 @@
+"""PreparseGate / FinalizedObject 單元測試：前綴過濾、去重、claim、過期 claim 接手、並行上限與失敗釋放。"""
+
+import json
+import time
+from unittest.mock import MagicMock
+
+from src.services.preparse import FinalizedObject, PreparseGate, event_age
+
+
+def _obj(name: str = "uploads/a.pdf", generation: int = 1) -> FinalizedObject:
+    return FinalizedObject(bucket="b", name=name, generation=generation)
+
+
+def _claim_gcs(claimed: bool = True, claimed_at: float | None = None) -> MagicMock:
+    """claimed=False 時模擬既有 claim（claimed_at 預設為現在，generation 5）。"""
+    gcs = MagicMock()
+    gcs.upload_bytes_if_absent.return_value = claimed
+    existing = {"key": "b/uploads/a.pdf#1", "claimed_at": time.time() if claimed_at is None else claimed_at}
+    gcs.read_blob_versioned.return_value = (json.dumps(existing).encode("utf-8"), 5)
+    gcs.upload_bytes_if_generation_match.return_value = True
+    return gcs
+
+
+def test_from_event_data_parses_string_fields() -> None:
+    """GCS 事件 JSON 的 generation／size 為字串，應轉為 int。"""
+    obj = FinalizedObject.from_event_data(
+        {"bucket": "b", "name": "uploads/a.pdf", "generation": "1700000000000001", "size": "123"}
+    )
+    assert obj.generation == 1700000000000001
+    assert obj.size == 123
+    assert obj.key == "b/uploads/a.pdf#1700000000000001"
+
+
+def test_event_age_parses_rfc3339_time() -> None:
+    """接受 Z 結尾與奈秒精度的時間；缺少或無法解析時回傳 None。"""
+    now = 1_700_000_100.0
+    assert event_age("2023-11-14T22:13:20Z", now=now) == 100.0
+    assert event_age("2023-11-14T22:13:20.500000000Z", now=now) == 99.5
+    assert event_age("2023-11-14T22:13:20+00:00", now=now) == 100.0
+    assert event_age(None, now=now) is None
+    assert event_age("yesterday", now=now) is None
+
+
+def test_matches_only_pdf_under_prefix() -> None:
+    gate = PreparseGate(prefix="uploads/")
+    assert gate.matches(_obj("uploads/a.PDF")) is True
+    assert gate.matches(_obj("parse-cache/x.json")) is False
+    assert gate.matches(_obj("uploads/a.png")) is False
+    assert gate.stats()["skipped"] == 2
+
+
+def test_duplicate_event_in_same_instance_is_ignored() -> None:
+    """同一 generation 的事件第二次送達時不再 claim。"""
+    gate = PreparseGate()
+    gcs = _claim_gcs()
+    assert gate.try_acquire(_obj(), gcs) is True
+    gate.release(_obj(), gcs, success=True)
+
+    assert gate.try_acquire(_obj(), gcs) is False
+    assert gcs.upload_bytes_if_absent.call_count == 1
+    assert gate.stats()["duplicates"] == 1
+
+
+def test_new_generation_is_processed_again() -> None:
+    gate = PreparseGate()
+    gcs = _claim_gcs()
+    assert gate.try_acquire(_obj(generation=1), gcs) is True
+    gate.release(_obj(generation=1), gcs, success=True)
+    assert gate.try_acquire(_obj(generation=2), gcs) is True
+
+
+def test_claim_held_by_other_instance_is_duplicate() -> None:
+    """claim 物件已存在（其他 instance 處理中）時回傳 False 並釋放名額。"""
+    gate = PreparseGate(max_concurrency=1)
+    assert gate.try_acquire(_obj(), _claim_gcs(claimed=False)) is False
+    # 名額已釋放，其他物件仍可取得
+    assert gate.try_acquire(_obj("uploads/b.pdf"), _claim_gcs()) is True
+
+
+def test_stale_claim_is_taken_over_with_generation_match() -> None:
+    """claim 超過 claim_timeout（持有者已逾時結束）時以 if_generation_match 接手。"""
+    gate = PreparseGate(claim_timeout=540.0)
+    gcs = _claim_gcs(claimed=False, claimed_at=time.time() - 600)
+    assert gate.try_acquire(_obj(), gcs) is True
+    args = gcs.upload_bytes_if_generation_match.call_args
+    assert args.args[0] == "preparse-claims/b/uploads/a.pdf#1"
+    assert args.args[2] == 5
+    assert gate.stats()["stale_takeovers"] == 1
+
+
+def test_fresh_claim_is_not_taken_over() -> None:
+    gate = PreparseGate(claim_timeout=540.0)
+    gcs = _claim_gcs(claimed=False, claimed_at=time.time() - 60)
+    assert gate.try_acquire(_obj(), gcs) is False
+    gcs.upload_bytes_if_generation_match.assert_not_called()
+
+
+def test_stale_claim_race_lost_is_duplicate() -> None:
+    """多個 instance 同時接手過期 claim 時，generation 不符者放棄。"""
+    gate = PreparseGate(claim_timeout=540.0)
+    gcs = _claim_gcs(claimed=False, claimed_at=time.time() - 600)
+    gcs.upload_bytes_if_generation_match.return_value = False
+    assert gate.try_acquire(_obj(), gcs) is False
+    assert gate.stats()["stale_takeovers"] == 0
+
+
+def test_unreadable_claim_is_treated_as_stale() -> None:
+    gate = PreparseGate()
+    gcs = _claim_gcs(claimed=False)
+    gcs.read_blob_versioned.return_value = (b"not json", 3)
+    assert gate.try_acquire(_obj(), gcs) is True
+    assert gcs.upload_bytes_if_generation_match.call_args.args[2] == 3
+
+
+def test_claim_released_meanwhile_is_left_to_redelivery() -> None:
+    gate = PreparseGate()
+    gcs = _claim_gcs(claimed=False)
+    gcs.read_blob_versioned.return_value = None
+    assert gate.try_acquire(_obj(), gcs) is False
+
+
+def test_concurrency_limit_throttles() -> None:
+    gate = PreparseGate(max_concurrency=1)
+    gcs = _claim_gcs()
+    assert gate.try_acquire(_obj("uploads/a.pdf"), gcs) is True
+    assert gate.try_acquire(_obj("uploads/b.pdf"), gcs) is False
+    assert gate.stats()["throttled"] == 1
+
+    gate.release(_obj("uploads/a.pdf"), gcs, success=True)
+    assert gate.try_acquire(_obj("uploads/b.pdf"), gcs) is True
+
+
+def test_failure_releases_claim_and_dedup_entry() -> None:
+    """失敗時應刪除 claim 物件並忘記去重紀錄，重送事件可重新處理。"""
+    gate = PreparseGate()
+    gcs = _claim_gcs()
+    assert gate.try_acquire(_obj(), gcs) is True
+    gate.release(_obj(), gcs, success=False)
+
+    gcs.delete_blob.assert_called_once_with("preparse-claims/b/uploads/a.pdf#1")
+    assert gate.try_acquire(_obj(), gcs) is True
+
+
+def test_claim_error_fails_open() -> None:
+    """claim 寫入失敗時仍放行（寧可重複解析也不漏掉預解析）。"""
+    gate = PreparseGate()
+    gcs = MagicMock()
+    gcs.upload_bytes_if_absent.side_effect = RuntimeError("gcs down")
+    assert gate.try_acquire(_obj(), gcs) is True
+
+
+def test_expired_dedup_entry_allows_reprocessing() -> None:
+    gate = PreparseGate(dedup_ttl=0.0)
+    gcs = _claim_gcs()
+    assert gate.try_acquire(_obj(), gcs) is True
+    gate.release(_obj(), gcs, success=True)
+    assert gate.try_acquire(_obj(), gcs) is True
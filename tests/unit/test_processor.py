@@ -3,10 +3,11 @@
 import pytest
 from unittest.mock import MagicMock, patch
 
-from src.clients.gcs_client import GCSClient
+from src.clients.gcs_client import BlobInfo, GCSClient
 from src.clients.gemini_client import GeminiFileClient
-from src.models.schema import BlockElement, PageBlock
-from src.services.processor import PDFProcessor, _fill_image_content
+from src.models.schema import BlockElement, PageBlock, ParseOptions
+from src.services.parse_common import fill_image_content
+from src.services.processor import PDFProcessor
 
 
 @pytest.fixture
@@ -19,6 +20,7 @@ def mock_gcs() -> MagicMock:
 @pytest.fixture
 def mock_gemini() -> MagicMock:
     gemini = MagicMock(spec=GeminiFileClient)
+    gemini.reads_gcs_uri.return_value = False
     gemini.upload_bytes.return_value = "https://generativelanguage.googleapis.com/v1beta/files/abc"
     gemini.parse_pdf_structured.return_value = [
         PageBlock(page=1, elements=[BlockElement(type="text", content="hi", description="")]),
@@ -33,7 +35,7 @@ def test_parse_from_gcs_calls_gcs_then_gemini_then_parse(
     """parse_from_gcs 應依序：讀 GCS → upload_bytes → parse_pdf_structured，回傳 PageBlock 列表。"""
     processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
     result = processor.parse_from_gcs("uploads/123/file.pdf")
-    mock_gcs.read_blob_bytes.assert_called_once_with("uploads/123/file.pdf")
+    mock_gcs.read_blob_bytes.assert_called_once_with("uploads/123/file.pdf", info=mock_gcs.get_blob_info.return_value)
     mock_gemini.upload_bytes.assert_called_once()
     call_kw = mock_gemini.upload_bytes.call_args[1]
     assert call_kw["data"] == b"fake pdf bytes"
@@ -57,7 +59,7 @@ def test_parse_from_gcs_with_bucket_name_creates_new_gcs(
         MockGCS.return_value = mock_new_gcs
         processor.parse_from_gcs("path/doc.pdf", bucket_name="other-bucket")
     MockGCS.assert_called_once_with("other-bucket")
-    mock_new_gcs.read_blob_bytes.assert_called_once_with("path/doc.pdf")
+    mock_new_gcs.read_blob_bytes.assert_called_once_with("path/doc.pdf", info=mock_new_gcs.get_blob_info.return_value)
 
 
 def test_parse_from_gcs_display_name_from_blob_path(
@@ -83,7 +85,7 @@ def test_parse_from_gcs_gemini_raises_propagates(
 
 
 def test_fill_image_content_fills_empty_image_elements() -> None:
-    """_fill_image_content 應將 type=image 且 content 為空的區塊填入 data URI。"""
+    """fill_image_content 應將 type=image 且 content 為空的區塊填入 data URI。"""
     blocks = [
         PageBlock(
             page=1,
@@ -100,7 +102,7 @@ def test_fill_image_content_fills_empty_image_elements() -> None:
             ("base64img2", "image/jpeg"),
         ],
     }
-    result = _fill_image_content(blocks, images_by_page)
+    result = fill_image_content(blocks, images_by_page)
     assert len(result) == 1
     assert result[0].page == 1
     assert result[0].elements[0].type == "image"
@@ -112,12 +114,498 @@ def test_fill_image_content_fills_empty_image_elements() -> None:
 
 
 def test_fill_image_content_skips_when_no_images_for_page() -> None:
-    """_fill_image_content 無該頁圖片時不改動 content。"""
+    """fill_image_content 無該頁圖片時不改動 content。"""
     blocks = [
         PageBlock(
             page=1,
             elements=[BlockElement(type="image", content="", description="圖")],
         ),
     ]
-    result = _fill_image_content(blocks, {})
+    result = fill_image_content(blocks, {})
     assert result[0].elements[0].content == ""
+
+
+def test_parse_from_gcs_sliced_download_uses_sliced_reader(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+) -> None:
+    """sliced_download=True 時應改用 read_blob_bytes_sliced。"""
+    mock_gcs.read_blob_bytes_sliced.return_value = b"sliced bytes"
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, sliced_download=True)
+    processor.parse_from_gcs("a/b.pdf")
+    mock_gcs.read_blob_bytes_sliced.assert_called_once_with("a/b.pdf", info=mock_gcs.get_blob_info.return_value)
+    mock_gcs.read_blob_bytes.assert_not_called()
+    assert mock_gemini.upload_bytes.call_args[1]["data"] == b"sliced bytes"
+
+
+def test_parse_from_gcs_spool_to_disk_shares_one_file(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+) -> None:
+    """spool_to_disk=True 時應下載至暫存檔，圖片擷取與 upload_file 皆使用同一路徑，且不讀 bytes。"""
+    seen_paths: list = []
+    mock_gcs.download_blob_to_file.side_effect = lambda _blob, dest, info=None: seen_paths.append(dest)
+    mock_gemini.upload_file.side_effect = (
+        lambda path, **_kw: seen_paths.append(path) or "https://generativelanguage.googleapis.com/v1beta/files/s"
+    )
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, spool_to_disk=True)
+    with patch("src.services.parse_common.extract_images_by_page", return_value={}) as mock_extract:
+        result = processor.parse_from_gcs("a/doc.pdf")
+
+    mock_gcs.read_blob_bytes.assert_not_called()
+    mock_gemini.upload_bytes.assert_not_called()
+    mock_extract.assert_called_once_with(seen_paths[0])
+    assert seen_paths[0] == seen_paths[1]
+    assert not seen_paths[0].exists()  # 結束後暫存檔已清除
+    mock_gemini.parse_pdf_structured.assert_called_once_with(
+        "https://generativelanguage.googleapis.com/v1beta/files/s"
+    )
+    assert result[0].elements[0].content == "hi"
+
+
+def test_parse_from_gcs_with_bucket_name_uses_gcs_factory(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+) -> None:
+    """有 gcs_factory 時應改由 factory 取得該 bucket 的 Client（例如 ClientPool.get_gcs），不另建 GCSClient。"""
+    pooled = MagicMock()
+    pooled.read_blob_bytes.return_value = b"pooled bytes"
+    factory = MagicMock(return_value=pooled)
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, gcs_factory=factory)
+    with patch("src.services.processor.GCSClient") as MockGCS:
+        processor.parse_from_gcs("p/doc.pdf", bucket_name="other-bucket")
+    MockGCS.assert_not_called()
+    factory.assert_called_once_with("other-bucket")
+    pooled.read_blob_bytes.assert_called_once_with("p/doc.pdf", info=pooled.get_blob_info.return_value)
+
+
+def test_parse_from_gcs_result_cache_hit_skips_download_and_gemini(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+) -> None:
+    """結果快取命中時不應下載 PDF 或呼叫 Gemini。"""
+    from src.clients.gcs_client import BlobInfo
+
+    mock_gcs.get_blob_info.return_value = BlobInfo(name="x.pdf", size=1, generation=1, md5_hash="m==")
+    mock_gemini.model_name = "gemini-2.5-flash"
+    mock_gemini.prompt_version = "v1"
+    cached_blocks = [PageBlock(page=3, elements=[])]
+    cache = MagicMock()
+    cache.get.return_value = cached_blocks
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, result_cache=cache)
+
+    result = processor.parse_from_gcs("x.pdf")
+
+    assert result == cached_blocks
+    mock_gcs.read_blob_bytes.assert_not_called()
+    mock_gemini.upload_bytes.assert_not_called()
+    cache.put.assert_not_called()
+
+
+def test_parse_from_gcs_result_cache_miss_stores_result(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+) -> None:
+    """結果快取未命中時應正常解析並以相同 key 寫入快取。"""
+    from src.clients.gcs_client import BlobInfo
+
+    mock_gcs.get_blob_info.return_value = BlobInfo(name="x.pdf", size=1, generation=1, md5_hash="m==")
+    mock_gemini.model_name = "gemini-2.5-flash"
+    mock_gemini.prompt_version = "v1"
+    cache = MagicMock()
+    cache.get.return_value = None
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, result_cache=cache)
+
+    result = processor.parse_from_gcs("x.pdf")
+
+    key = processor.result_cache_key("x.pdf")
+    cache.get.assert_called_once_with(key)
+    cache.put.assert_called_once_with(key, result)
+    mock_gemini.parse_pdf_structured.assert_called_once()
+
+
+def test_parse_from_gcs_incomplete_result_not_cached(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+) -> None:
+    """解析不完整（partial 頁面）時照常回傳，但不寫入結果快取。"""
+    from src.clients.gcs_client import BlobInfo
+
+    mock_gcs.get_blob_info.return_value = BlobInfo(name="x.pdf", size=1, generation=1, md5_hash="m==")
+    mock_gemini.model_name = "gemini-2.5-flash"
+    mock_gemini.prompt_version = "v1"
+    mock_gemini.parse_pdf_structured.return_value = [PageBlock(page=1, elements=[], partial=True)]
+    cache = MagicMock()
+    cache.get.return_value = None
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, result_cache=cache)
+
+    result = processor.parse_from_gcs("x.pdf")
+
+    assert [b.page for b in result] == [1]
+    cache.put.assert_not_called()
+
+
+def test_fill_image_content_url_mode_uses_url_directly() -> None:
+    """inline=False 時 content 應直接填入 URL，不包 data URI。"""
+    blocks = [PageBlock(page=1, elements=[BlockElement(type="image", content="", description="圖")])]
+    result = fill_image_content(blocks, {0: [("https://storage.googleapis.com/b/i.png", "image/png")]}, inline=False)
+    assert result[0].elements[0].content == "https://storage.googleapis.com/b/i.png"
+
+
+def test_parse_from_gcs_image_output_url_publishes_images(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+) -> None:
+    """image_output=url 時應擷取原始圖片交給 ImagePublisher，並把 URL 填入 image 區塊。"""
+    from src.models.schema import ParseOptions
+
+    mock_gemini.parse_pdf_structured.return_value = [
+        PageBlock(page=1, elements=[BlockElement(type="image", content="", description="圖")]),
+    ]
+    publisher = MagicMock()
+    publisher.publish.return_value = {0: [("https://storage.googleapis.com/b/h.png", "image/png")]}
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, image_publisher=publisher)
+    with patch(
+        "src.services.parse_common.extract_raw_images_by_page",
+        return_value={0: [(b"raw", "image/png")]},
+    ) as mock_extract:
+        result = processor.parse_from_gcs("x.pdf", options=ParseOptions(image_output="url"))
+
+    mock_extract.assert_called_once()
+    publisher.publish.assert_called_once_with({0: [(b"raw", "image/png")]})
+    assert result[0].elements[0].content == "https://storage.googleapis.com/b/h.png"
+
+
+def test_parse_from_gcs_image_output_url_without_publisher_raises(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+) -> None:
+    """未設定 ImagePublisher 卻要求 url 輸出時應拋 ValueError。"""
+    from src.models.schema import ParseOptions
+
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with pytest.raises(ValueError, match="ImagePublisher"):
+        processor.parse_from_gcs("x.pdf", options=ParseOptions(image_output="url"))
+
+
+def test_result_cache_key_differs_by_image_output(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+) -> None:
+    """inline 與 url 輸出的結果不同，快取 key（ETag）也必須不同。"""
+    from src.clients.gcs_client import BlobInfo
+    from src.models.schema import ParseOptions
+
+    mock_gcs.get_blob_info.return_value = BlobInfo(name="x.pdf", size=1, generation=1, md5_hash="m==")
+    mock_gemini.model_name = "m"
+    mock_gemini.prompt_version = "p"
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, result_cache=MagicMock())
+    inline_key = processor.result_cache_key("x.pdf")
+    url_key = processor.result_cache_key("x.pdf", options=ParseOptions(image_output="url"))
+    assert inline_key != url_key
+
+
+def _shard_files(tmp_path, count: int, pages: int = 1) -> list:
+    from src.services.pdf_sharder import PdfShard
+
+    shards = []
+    for i in range(count):
+        path = tmp_path / f"s{i}.pdf"
+        path.write_bytes(b"%PDF shard")
+        shards.append(PdfShard(index=i, first_page=1 + i * pages, page_count=pages, path=path))
+    return shards
+
+
+def _begin_and_wait(mock_gemini: MagicMock) -> None:
+    """begin_upload 回傳以檔名命名的 PendingFile；wait_for_files 依序回傳 uri:<檔名>。"""
+    from src.clients.gemini_client import PendingFile
+
+    mock_gemini.begin_upload.side_effect = lambda f, display_name, mime_type: PendingFile(
+        name=display_name, size=10, digest="d"
+    )
+    mock_gemini.wait_for_files.side_effect = lambda pending, **kw: [f"uri:{p.name}" for p in pending]
+
+
+def test_parse_from_gcs_sharded_parses_each_shard_and_remaps_pages(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+    tmp_path,
+) -> None:
+    """shard_pages 有給時先上傳全部分片、一次等待就緒，再各自解析；頁碼換回原文件並依序合併。"""
+    from src.models.schema import ParseOptions
+
+    shards = _shard_files(tmp_path, 3, pages=2)
+    _begin_and_wait(mock_gemini)
+    mock_gemini.parse_pdf_structured.side_effect = lambda uri: [
+        PageBlock(page=2, elements=[BlockElement(type="text", content=uri)]),
+        PageBlock(page=1, elements=[BlockElement(type="text", content=uri)]),
+    ]
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with (
+        patch("src.services.processor.split_pdf", return_value=shards) as mock_split,
+        patch("src.services.parse_common.extract_images_by_page", return_value={}),
+    ):
+        result = processor.parse_from_gcs("big.pdf", options=ParseOptions(shard_pages=2, shard_concurrency=2))
+
+    assert mock_split.call_args.args[1] == 2
+    assert [b.page for b in result] == [1, 2, 3, 4, 5, 6]
+    assert result[2].elements[0].content == "uri:s1.pdf"
+    assert mock_gemini.begin_upload.call_count == 3
+    mock_gemini.wait_for_files.assert_called_once()
+    assert [p.name for p in mock_gemini.wait_for_files.call_args.args[0]] == ["s0.pdf", "s1.pdf", "s2.pdf"]
+    mock_gemini.upload_file.assert_not_called()
+    mock_gemini.upload_bytes.assert_not_called()
+
+
+def test_parse_from_gcs_sharded_retries_only_failed_shard(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+    tmp_path,
+) -> None:
+    """單一分片暫時失敗時只重試該分片，沿用已就緒的 File。"""
+    from src.models.schema import ParseOptions
+
+    shards = _shard_files(tmp_path, 2)
+    calls: list[str] = []
+
+    def parse(uri: str) -> list[PageBlock]:
+        calls.append(uri)
+        if uri == "uri:s1.pdf" and calls.count(uri) == 1:
+            raise TimeoutError("shard timeout")
+        return [PageBlock(page=1, elements=[])]
+
+    _begin_and_wait(mock_gemini)
+    mock_gemini.parse_pdf_structured.side_effect = parse
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, shard_retry_backoff=0.0)
+    with (
+        patch("src.services.processor.split_pdf", return_value=shards),
+        patch("src.services.parse_common.extract_images_by_page", return_value={}),
+    ):
+        result = processor.parse_from_gcs("big.pdf", options=ParseOptions(shard_pages=1))
+
+    assert [b.page for b in result] == [1, 2]
+    assert calls.count("uri:s0.pdf") == 1
+    assert calls.count("uri:s1.pdf") == 2
+    assert mock_gemini.begin_upload.call_count == 2
+
+
+def test_parse_from_gcs_sharded_inline_shards_skip_upload_and_wait(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+    tmp_path,
+) -> None:
+    """可 inline 的分片不上傳；全部分片皆 inline 時不呼叫 wait_for_files。"""
+    from src.models.schema import ParseOptions
+
+    shards = _shard_files(tmp_path, 2)
+    mock_gemini.parse_pdf_bytes.return_value = [PageBlock(page=1, elements=[])]
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, inline_max_bytes=1024)
+    with (
+        patch("src.services.processor.split_pdf", return_value=shards),
+        patch("src.services.parse_common.extract_images_by_page", return_value={}),
+    ):
+        result = processor.parse_from_gcs("big.pdf", options=ParseOptions(shard_pages=1))
+
+    assert [b.page for b in result] == [1, 2]
+    assert mock_gemini.parse_pdf_bytes.call_count == 2
+    mock_gemini.begin_upload.assert_not_called()
+    mock_gemini.wait_for_files.assert_not_called()
+
+
+def test_parse_from_gcs_single_shard_falls_back_to_whole_document(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+) -> None:
+    """文件頁數不超過 shard_pages（或無法分片）時以原流程整份上傳。"""
+    from src.models.schema import ParseOptions
+
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with (
+        patch("src.services.processor.split_pdf", return_value=[]),
+        patch("src.services.parse_common.extract_images_by_page", return_value={}),
+    ):
+        processor.parse_from_gcs("small.pdf", options=ParseOptions(shard_pages=50))
+    mock_gemini.upload_bytes.assert_called_once()
+
+
+def test_result_cache_key_ignores_shard_options(
+    mock_gcs: MagicMock,
+    mock_gemini: MagicMock,
+) -> None:
+    """分片只影響執行方式，不影響輸出，快取 key 應與整份解析相同。"""
+    from src.clients.gcs_client import BlobInfo
+    from src.models.schema import ParseOptions
+
+    mock_gcs.get_blob_info.return_value = BlobInfo(name="x.pdf", size=1, generation=1, md5_hash="m==")
+    mock_gemini.model_name = "m"
+    mock_gemini.prompt_version = "p"
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, result_cache=MagicMock())
+    assert processor.result_cache_key("x.pdf") == processor.result_cache_key(
+        "x.pdf", options=ParseOptions(shard_pages=10, shard_concurrency=8)
+    )
+
+
+def test_parse_from_gcs_hybrid_sends_only_vision_pages(mock_gcs: MagicMock, mock_gemini: MagicMock, tmp_path) -> None:
+    """混合解析：文字頁直接使用文字層，只上傳需視覺的子文件，頁碼換回原文件並標記來源。"""
+    from src.models.schema import ParseOptions
+    from src.services.pdf_text_layer import HybridPlan
+
+    plan = HybridPlan(
+        text_blocks=[PageBlock(page=1, elements=[BlockElement(type="text", content="t")], source="text_layer")],
+        vision_pages=[2, 4],
+        vision_path=tmp_path / "vision_pages.pdf",
+    )
+    mock_gemini.upload_file.return_value = "uri"
+    mock_gemini.parse_pdf_structured.return_value = [PageBlock(page=2), PageBlock(page=1)]
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with (
+        patch("src.services.processor.plan_hybrid", return_value=plan),
+        patch("src.services.parse_common.extract_images_by_page", return_value={}),
+    ):
+        result = processor.parse_from_gcs("doc.pdf", options=ParseOptions(hybrid=True))
+
+    assert [(b.page, b.source) for b in result] == [(1, "text_layer"), (2, "gemini"), (4, "gemini")]
+    assert mock_gemini.upload_file.call_args.args[0] == plan.vision_path
+    mock_gemini.upload_bytes.assert_not_called()
+
+
+def test_parse_from_gcs_hybrid_all_text_pages_skips_gemini(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    from src.models.schema import ParseOptions
+    from src.services.pdf_text_layer import HybridPlan
+
+    plan = HybridPlan(text_blocks=[PageBlock(page=1, source="text_layer")], vision_pages=[], vision_path=None)
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with (
+        patch("src.services.processor.plan_hybrid", return_value=plan),
+        patch("src.services.parse_common.extract_images_by_page", return_value={}),
+    ):
+        result = processor.parse_from_gcs("doc.pdf", options=ParseOptions(hybrid=True))
+    assert [b.page for b in result] == [1]
+    mock_gemini.parse_pdf_structured.assert_not_called()
+
+
+def test_parse_from_gcs_hybrid_without_plan_parses_whole_document(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    """沒有文字頁（或無法分類）時整份送 Gemini，輸出不帶來源標記。"""
+    from src.models.schema import ParseOptions
+
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with (
+        patch("src.services.processor.plan_hybrid", return_value=None),
+        patch("src.services.parse_common.extract_images_by_page", return_value={}),
+    ):
+        result = processor.parse_from_gcs("doc.pdf", options=ParseOptions(hybrid=True))
+    mock_gemini.upload_bytes.assert_called_once()
+    assert result[0].source is None
+
+
+def test_fill_image_content_keeps_source() -> None:
+    blocks = [PageBlock(page=1, elements=[BlockElement(type="image", content="")], source="text_layer")]
+    out = fill_image_content(blocks, {0: [("QUJD", "image/png")]})
+    assert out[0].source == "text_layer"
+    assert out[0].elements[0].content == "data:image/png;base64,QUJD"
+
+
+def test_parse_from_gcs_uploads_slimmed_pdf_but_extracts_original(mock_gcs: MagicMock, mock_gemini: MagicMock, tmp_path) -> None:
+    """有 PdfSlimmer 時上傳瘦身後的檔案並記錄上傳時間；圖片擷取仍使用原始 PDF。"""
+    from src.services.pdf_slimmer import SlimResult
+
+    slim = SlimResult(path=tmp_path / "slim.pdf", original_bytes=100, slim_bytes=40, seconds=0.1)
+    slimmer = MagicMock()
+    slimmer.slim.return_value = slim
+    mock_gemini.upload_file.return_value = "uri"
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, pdf_slimmer=slimmer)
+    with patch("src.services.parse_common.extract_images_by_page", return_value={}) as mock_extract:
+        processor.parse_from_gcs("doc.pdf")
+
+    mock_extract.assert_called_once_with(b"fake pdf bytes")
+    mock_gemini.upload_file.assert_called_once()
+    assert mock_gemini.upload_file.call_args.args[0] == slim.path
+    mock_gemini.upload_bytes.assert_not_called()
+    assert slimmer.record_upload.call_args.args[0] is slim
+
+
+def test_parse_from_gcs_slimmer_skip_uploads_original(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    slimmer = MagicMock()
+    slimmer.slim.return_value = None
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, pdf_slimmer=slimmer)
+    with patch("src.services.parse_common.extract_images_by_page", return_value={}):
+        processor.parse_from_gcs("doc.pdf")
+    mock_gemini.upload_bytes.assert_called_once()
+    slimmer.record_upload.assert_not_called()
+
+
+def _vertex_ready(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    mock_gcs.get_blob_info.return_value = BlobInfo(name="doc.pdf", size=1024, generation=1)
+    mock_gcs.get_blob_uri.return_value = "gs://bucket/doc.pdf"
+    mock_gemini.reads_gcs_uri.return_value = True
+
+
+def test_vertex_backend_parses_gs_uri_without_download(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    """Vertex 後端可讀取 gs:// 時不下載、不上傳；結果沒有待填圖片時也不讀取 PDF。"""
+    _vertex_ready(mock_gcs, mock_gemini)
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    result = processor.parse_from_gcs("doc.pdf")
+    mock_gemini.parse_pdf_structured.assert_called_once_with("gs://bucket/doc.pdf", size_bytes=1024)
+    mock_gcs.read_blob_bytes.assert_not_called()
+    mock_gemini.upload_bytes.assert_not_called()
+    assert result[0].elements[0].content == "hi"
+
+
+def test_vertex_backend_with_result_cache_fetches_metadata_once(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    """結果快取 key 與 gs:// 直讀共用 parse_from_gcs 取得的 BlobInfo，不重查 metadata。"""
+    _vertex_ready(mock_gcs, mock_gemini)
+    mock_gemini.model_name = "gemini-2.5-flash"
+    mock_gemini.prompt_version = "v1"
+    cache = MagicMock()
+    cache.get.return_value = None
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, result_cache=cache)
+    processor.parse_from_gcs("doc.pdf")
+    mock_gcs.get_blob_info.assert_called_once_with("doc.pdf")
+    mock_gemini.parse_pdf_structured.assert_called_once_with("gs://bucket/doc.pdf", size_bytes=1024)
+    cache.put.assert_called_once()
+
+
+def test_vertex_backend_reads_pdf_only_for_images(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    _vertex_ready(mock_gcs, mock_gemini)
+    mock_gemini.parse_pdf_structured.return_value = [
+        PageBlock(page=1, elements=[BlockElement(type="image", content="", description="圖")]),
+    ]
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with patch("src.services.parse_common.extract_images_by_page", return_value={0: [("b64", "image/png")]}):
+        result = processor.parse_from_gcs("doc.pdf")
+    # 圖片從 parse_from_gcs 取得 metadata 的同一 generation 讀取，不再重查
+    mock_gcs.read_blob_bytes.assert_called_once_with("doc.pdf", info=mock_gcs.get_blob_info.return_value)
+    mock_gcs.get_blob_info.assert_called_once_with("doc.pdf")
+    mock_gemini.upload_bytes.assert_not_called()
+    assert result[0].elements[0].content == "data:image/png;base64,b64"
+
+
+def test_vertex_backend_skipped_for_sharding_and_oversized(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    """分片需要本機檔案；超過後端上限的檔案改走上傳。"""
+    _vertex_ready(mock_gcs, mock_gemini)
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini)
+    with (
+        patch("src.services.parse_common.extract_images_by_page", return_value={}),
+        patch("src.services.processor.split_pdf", return_value=[]),
+    ):
+        processor.parse_from_gcs("doc.pdf", options=ParseOptions(shard_pages=10))
+        mock_gemini.reads_gcs_uri.return_value = False
+        processor.parse_from_gcs("doc.pdf")
+    assert mock_gemini.upload_bytes.call_count == 2
+    assert mock_gemini.parse_pdf_structured.call_args_list[-1].args == (
+        "https://generativelanguage.googleapis.com/v1beta/files/abc",
+    )
+
+
+def test_small_pdf_parsed_inline_without_upload(mock_gcs: MagicMock, mock_gemini: MagicMock) -> None:
+    """不超過 inline_max_bytes 的 PDF 以 inline bytes 解析，不經 File API；較大的仍上傳。"""
+    mock_gemini.parse_pdf_bytes.return_value = mock_gemini.parse_pdf_structured.return_value
+    processor = PDFProcessor(gcs_client=mock_gcs, gemini_client=mock_gemini, inline_max_bytes=1024)
+    with patch("src.services.parse_common.extract_images_by_page", return_value={}):
+        result = processor.parse_from_gcs("doc.pdf")
+        mock_gcs.read_blob_bytes.return_value = b"x" * 2048
+        processor.parse_from_gcs("big.pdf")
+    mock_gemini.parse_pdf_bytes.assert_called_once_with(b"fake pdf bytes")
+    mock_gemini.upload_bytes.assert_called_once()
+    assert mock_gemini.upload_bytes.call_args.kwargs["display_name"] == "big.pdf"
+    assert result[0].elements[0].content == "hi"
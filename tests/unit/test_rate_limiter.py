@@ -0,0 +1,168 @@
+"""GeminiRateLimiter 單元測試：rpm／tpm token bucket、AIMD 並行上限、限流重試與串流、stats。"""
+
+import asyncio
+import threading
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from src.clients.rate_limiter import GeminiRateLimiter, estimate_tokens
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _limiter(clock: FakeClock, **kwargs) -> GeminiRateLimiter:
+    kwargs.setdefault("throttle_backoff", 1.0)
+    return GeminiRateLimiter(clock=clock.monotonic, sleep=clock.sleep, **kwargs)
+
+
+def test_requests_are_paced_by_rpm_bucket() -> None:
+    """rpm=60：前 60 個請求立即送出，之後每秒補充一個，平滑而非長時間停頓。"""
+    clock = FakeClock()
+    limiter = _limiter(clock, rpm=60)
+    for _ in range(62):
+        limiter.call(lambda: None, bounded=False)
+    assert clock.sleeps == pytest.approx([1.0, 1.0])
+
+
+def test_token_bucket_waits_for_estimated_tokens() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock, tpm=600)
+    limiter.call(lambda: None, tokens=600)
+    limiter.call(lambda: None, tokens=300)
+    assert sum(clock.sleeps) == pytest.approx(30.0)
+    # 超過容量的請求以容量計，不會永遠等待
+    limiter.call(lambda: None, tokens=10_000)
+
+
+def test_throttle_halves_limit_and_retries() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock, initial_concurrency=8)
+    calls = {"n": 0}
+
+    def flaky() -> str:
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise google_exceptions.ResourceExhausted("quota")
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    stats = limiter.stats()
+    assert stats["concurrency_limit"] == 4
+    assert stats["throttled"] == 1 and stats["retries"] == 1 and stats["decreases"] == 1
+    assert len(clock.sleeps) >= 1
+
+
+def test_throttle_raises_after_retries_exhausted() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock, throttle_retries=1)
+
+    def always_throttled() -> None:
+        raise google_exceptions.TooManyRequests("429")
+
+    with pytest.raises(google_exceptions.TooManyRequests):
+        limiter.call(always_throttled)
+    assert limiter.stats()["throttled"] == 2
+    # 冷卻期內的多次限流只縮減一次
+    assert limiter.stats()["decreases"] <= 2
+
+
+def test_success_increases_limit_additively() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock, initial_concurrency=2, max_concurrency=4)
+    for _ in range(20):
+        limiter.call(lambda: None)
+    assert limiter.stats()["concurrency_limit"] == 4
+
+
+def test_other_errors_do_not_change_limit() -> None:
+    limiter = _limiter(FakeClock(), initial_concurrency=3)
+    with pytest.raises(ValueError):
+        limiter.call(lambda: (_ for _ in ()).throw(ValueError("bad")))
+    assert limiter.stats()["concurrency_limit"] == 3
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_concurrency_limit_queues_callers() -> None:
+    limiter = GeminiRateLimiter(initial_concurrency=1, max_concurrency=1)
+    release = threading.Event()
+    entered = threading.Event()
+
+    def hold() -> None:
+        entered.set()
+        release.wait(5)
+
+    worker = threading.Thread(target=limiter.call, args=(hold,))
+    worker.start()
+    entered.wait(5)
+    waiter = threading.Thread(target=limiter.call, args=(lambda: None,))
+    waiter.start()
+    for _ in range(100):
+        if limiter.stats()["queued"] == 1:
+            break
+        threading.Event().wait(0.01)
+    stats = limiter.stats()
+    assert stats["in_flight"] == 1 and stats["queued"] == 1
+    release.set()
+    worker.join(5)
+    waiter.join(5)
+    assert limiter.stats()["queued"] == 0
+
+
+def test_stream_retries_only_before_first_item() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock)
+    attempts = {"n": 0}
+
+    def start_stream():
+        attempts["n"] += 1
+        if attempts["n"] == 1:
+            raise google_exceptions.ResourceExhausted("quota")
+        yield "a"
+        yield "b"
+
+    assert list(limiter.stream(start_stream)) == ["a", "b"]
+    assert attempts["n"] == 2
+
+    def fails_mid_stream():
+        yield "a"
+        raise google_exceptions.ResourceExhausted("quota")
+
+    with pytest.raises(google_exceptions.ResourceExhausted):
+        list(limiter.stream(fails_mid_stream))
+
+
+def test_async_call_and_stream_share_limits() -> None:
+    limiter = GeminiRateLimiter()
+
+    async def value() -> int:
+        return 1
+
+    async def chunks():
+        async def gen():
+            yield "x"
+        return gen()
+
+    async def run():
+        result = await limiter.call_async(value)
+        items = [item async for item in limiter.astream(chunks)]
+        return result, items
+
+    assert asyncio.run(run()) == (1, ["x"])
+    assert limiter.stats()["calls"] == 2
+
+
+def test_estimate_tokens() -> None:
+    assert estimate_tokens(0) == 1
+    assert estimate_tokens(50_000) == 250
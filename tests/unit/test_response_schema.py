@@ -0,0 +1,51 @@
+"""gemini_response_schema 單元測試：展開 $ref、只保留 Gemini 支援的欄位、Optional 轉 nullable。"""
+
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+from src.clients.response_schema import gemini_response_schema, to_rest_schema
+from src.models.schema import PageBlock
+
+
+def test_page_blocks_schema_inlines_block_element() -> None:
+    schema = gemini_response_schema(list[PageBlock], exclude=frozenset({"source"}))
+    assert schema["type"] == "array"
+    page = schema["items"]
+    assert page["required"] == ["page", "elements"]
+    element = page["properties"]["elements"]["items"]
+    assert element["type"] == "object"
+    assert set(element["properties"]) == {"type", "content", "description"}
+    assert "$defs" not in schema and "title" not in page
+    assert "minimum" not in page["properties"]["page"]
+
+
+def test_optional_becomes_nullable() -> None:
+    class Item(BaseModel):
+        note: Optional[str] = None
+
+    prop = gemini_response_schema(Item)["properties"]["note"]
+    assert prop == {"type": "string", "nullable": True}
+
+
+def test_unsupported_union_raises() -> None:
+    class Item(BaseModel):
+        value: int | str
+
+    with pytest.raises(ValueError):
+        gemini_response_schema(Item)
+
+
+def test_excluded_properties_are_dropped() -> None:
+    page = gemini_response_schema(list[PageBlock])["items"]
+    assert "source" in page["required"]
+    page = gemini_response_schema(list[PageBlock], exclude=frozenset({"source"}))["items"]
+    assert "source" not in page["properties"] and "source" not in page["required"]
+
+
+def test_to_rest_schema_uppercases_types() -> None:
+    schema = to_rest_schema(gemini_response_schema(list[PageBlock], exclude=frozenset({"source"})))
+    assert schema["type"] == "ARRAY"
+    assert schema["items"]["type"] == "OBJECT"
+    assert schema["items"]["properties"]["page"]["type"] == "INTEGER"
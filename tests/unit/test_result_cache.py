@@ -0,0 +1,78 @@
+"""ParseResultCache 單元測試：key 組成、GCS 讀寫、損壞與失敗時視為未命中。"""
+
+import json
+
+import pytest
+from unittest.mock import MagicMock
+
+from src.clients.gcs_client import BlobInfo, GCSClient
+from src.models.schema import BlockElement, PageBlock
+from src.services.result_cache import ParseResultCache
+
+
+@pytest.fixture
+def mock_gcs() -> MagicMock:
+    return MagicMock(spec=GCSClient)
+
+
+def _info(md5: str | None = "md5==", generation: int = 1, name: str = "a.pdf") -> BlobInfo:
+    return BlobInfo(name=name, size=10, generation=generation, md5_hash=md5)
+
+
+def test_make_key_changes_with_prompt_model_and_content() -> None:
+    """prompt 版本、模型或內容 md5 改變時 key 應不同；相同輸入 key 相同。"""
+    base = ParseResultCache.make_key("b", _info(), "m1", "p1")
+    assert base == ParseResultCache.make_key("b", _info(), "m1", "p1")
+    assert base != ParseResultCache.make_key("b", _info(), "m1", "p2")
+    assert base != ParseResultCache.make_key("b", _info(), "m2", "p1")
+    assert base != ParseResultCache.make_key("b", _info(md5="other=="), "m1", "p1")
+    assert base != ParseResultCache.make_key("b", _info(), "m1", "p1", variant="gcs-images")
+
+
+def test_make_key_same_md5_shared_across_paths() -> None:
+    """相同內容（md5）不同路徑應共用同一個 key。"""
+    assert ParseResultCache.make_key("b", _info(name="x.pdf"), "m", "p") == ParseResultCache.make_key(
+        "b", _info(name="y.pdf"), "m", "p"
+    )
+
+
+def test_make_key_without_md5_falls_back_to_generation() -> None:
+    """無 md5（如 composite 物件）時以路徑 + generation 區分。"""
+    assert ParseResultCache.make_key("b", _info(md5=None, generation=1), "m", "p") != ParseResultCache.make_key(
+        "b", _info(md5=None, generation=2), "m", "p"
+    )
+
+
+def test_put_then_get_round_trip(mock_gcs: MagicMock) -> None:
+    """put 寫入的 JSON 應能由 get 還原為 PageBlock 列表。"""
+    store: dict[str, bytes] = {}
+    mock_gcs.upload_bytes.side_effect = lambda path, data, content_type: store.__setitem__(path, data)
+    mock_gcs.read_blob_bytes_or_none.side_effect = lambda path: store.get(path)
+    cache = ParseResultCache(mock_gcs, prefix="cache/")
+    blocks = [PageBlock(page=2, elements=[BlockElement(type="text", content="內文", description="")])]
+
+    cache.put("k1", blocks)
+
+    assert "cache/k1.json" in store
+    assert json.loads(store["cache/k1.json"])["pages"][0]["page"] == 2
+    assert cache.get("k1") == blocks
+
+
+def test_get_missing_returns_none(mock_gcs: MagicMock) -> None:
+    """物件不存在時回傳 None。"""
+    mock_gcs.read_blob_bytes_or_none.return_value = None
+    assert ParseResultCache(mock_gcs).get("nope") is None
+
+
+def test_get_corrupt_or_error_returns_none(mock_gcs: MagicMock) -> None:
+    """內容損壞或 GCS 錯誤時視為未命中，不拋例外。"""
+    mock_gcs.read_blob_bytes_or_none.return_value = b"{not json"
+    assert ParseResultCache(mock_gcs).get("bad") is None
+    mock_gcs.read_blob_bytes_or_none.side_effect = RuntimeError("gcs down")
+    assert ParseResultCache(mock_gcs).get("bad") is None
+
+
+def test_put_failure_is_swallowed(mock_gcs: MagicMock) -> None:
+    """寫入失敗只記 log，不影響呼叫端。"""
+    mock_gcs.upload_bytes.side_effect = RuntimeError("403")
+    ParseResultCache(mock_gcs).put("k", [PageBlock(page=1)])
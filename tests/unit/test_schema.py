@@ -3,7 +3,7 @@
 import pytest
 from pydantic import ValidationError
 
-from src.models.schema import BlockElement, ImageTextExtract, PageBlock, PageExtract
+from src.models.schema import BlockElement, ImageTextExtract, PageBlock, PageExtract, ParseOptions
 
 
 class TestBlockElement:
@@ -110,3 +110,25 @@ class TestImageTextExtract:
                 text_analysis="y",
                 page_number=0,
             )
+
+
+class TestParseOptions:
+    """ParseOptions：預設值維持原行為，非法值拋 ValidationError。"""
+
+    def test_defaults(self) -> None:
+        assert ParseOptions().image_output == "inline"
+
+    def test_invalid_image_output_raises(self) -> None:
+        with pytest.raises(ValidationError):
+            ParseOptions(image_output="base64")
+
+    def test_shard_defaults_keep_whole_document(self) -> None:
+        options = ParseOptions()
+        assert options.shard_pages is None
+        assert options.shard_concurrency == 4
+
+    def test_shard_bounds_validated(self) -> None:
+        with pytest.raises(ValidationError):
+            ParseOptions(shard_pages=0)
+        with pytest.raises(ValidationError):
+            ParseOptions(shard_concurrency=64)
@@ -0,0 +1,55 @@
+"""VertexGeminiBackend 單元測試（以假的 vertexai 模組取代 SDK）：延遲初始化、模型重用、gs:// Part 與大小上限。"""
+
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.clients.vertex_backend import VertexGeminiBackend, is_gcs_uri
+
+
+@pytest.fixture
+def fake_vertexai():
+    vertexai = MagicMock()
+    with patch.dict(sys.modules, {"vertexai": vertexai, "vertexai.generative_models": vertexai.generative_models}):
+        yield vertexai
+
+
+def test_sdk_initialized_once_and_models_reused(fake_vertexai: MagicMock) -> None:
+    backend = VertexGeminiBackend(project="proj", location="asia-east1")
+    sdk = fake_vertexai.generative_models
+    sdk.GenerativeModel.side_effect = lambda *args, **kwargs: MagicMock()
+    first = backend.model("gemini-2.5-flash", "instruction")
+    assert backend.model("gemini-2.5-flash", "instruction") is first
+    assert backend.model("gemini-2.5-flash") is not first
+    fake_vertexai.init.assert_called_once_with(project="proj", location="asia-east1")
+    assert sdk.GenerativeModel.call_count == 2
+
+
+def test_file_part_references_gcs_uri(fake_vertexai: MagicMock) -> None:
+    backend = VertexGeminiBackend()
+    part = backend.file_part("gs://bucket/doc.pdf")
+    fake_vertexai.generative_models.Part.from_uri.assert_called_once_with(
+        "gs://bucket/doc.pdf", mime_type="application/pdf"
+    )
+    assert part is fake_vertexai.generative_models.Part.from_uri.return_value
+    with pytest.raises(ValueError):
+        backend.file_part("https://example.com/doc.pdf")
+
+
+def test_generation_config_uses_json_schema(fake_vertexai: MagicMock) -> None:
+    VertexGeminiBackend().generation_config({"type": "ARRAY"})
+    fake_vertexai.generative_models.GenerationConfig.assert_called_once_with(
+        response_mime_type="application/json", response_schema={"type": "ARRAY"}
+    )
+
+
+def test_accepts_respects_max_pdf_bytes() -> None:
+    backend = VertexGeminiBackend(max_pdf_bytes=100)
+    assert backend.accepts(100)
+    assert not backend.accepts(101)
+
+
+def test_is_gcs_uri() -> None:
+    assert is_gcs_uri("gs://bucket/a.pdf")
+    assert not is_gcs_uri("https://generativelanguage.googleapis.com/v1beta/files/x")